@@ -9,12 +9,141 @@
 import pandas as pd # Imports the pandas library and gives it the common alias 'pd' for working with data tables (DataFrames).
 import numpy as np # Imports the numpy library with the alias 'np' for fast mathematical and numerical operations.
 import os # Imports the 'os' library, which lets our script interact with the operating system (like finding file paths).
+import argparse # Imports 'argparse' so the script can be run with options from the command line (like the streaming chunk size).
+import sys # Lets us add the repository root to the import path, where the shared 'comun' folder lives.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun import instrumentacion # Shared per-stage timing and memory instrumentation (comun/instrumentacion.py).
+from comun.instrumentacion import etapa # Measures one named stage; does nothing unless a trace was requested.
+from desurvey import load_survey, build_stations, desurvey_xyz # Our vectorized desurvey engine (desurvey.py, same folder).
+from compositing import composite_samples, RESIDUAL_OPTIONS # Our vectorized downhole compositing (compositing.py, same folder).
+import block_model # Our block model grid and KD-tree estimator (block_model.py, same folder).
+import desurvey_store # Our incremental, hole-partitioned desurvey store (desurvey_store.py, same folder).
+
+# Columns we need from each input file.
+REQUIRED_COLLAR_COLS = ['HoleID', 'Easting', 'Northing', 'Elevation', 'Dip', 'Azimuth']
+REQUIRED_SAMPLE_COLS = ['HoleID', 'From_m', 'To_m', 'Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Metal columns that end up in the output file.
+METAL_COLUMNS = ['Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Numeric sample columns are always read as floats, so a chunk (or a file) that happens to hold only
+# whole numbers is still written with the same '%.3f' formatting as everything else.
+SAMPLE_DTYPES = {'From_m': 'float64', 'To_m': 'float64', 'Ag_ppm': 'float64', 'Pb_pct': 'float64', 'Zn_pct': 'float64'}
+# Columns of the final output file, in order.
+OUTPUT_COLUMNS = ['Sample_X', 'Sample_Y', 'Sample_Z'] + METAL_COLUMNS
+# Default number of sample rows read per chunk in streaming mode.
+DEFAULT_CHUNK_SIZE = 1_000_000
+# Default name of the downhole survey file (optional).
+DEFAULT_SURVEY_FILENAME = 'MPA_Survey_20240227.csv'
+
+
+def build_collar_lookup(collar_df):
+    """
+    Turns the (small) collar table into an in-memory lookup keyed by HoleID.
+    Returns the unique HoleID index and a dict of NumPy arrays aligned with it.
+    """
+    # If a HoleID appears more than once we keep the first row, so every sample gets exactly one collar.
+    if collar_df['HoleID'].duplicated().any():
+        print("WARNING: Duplicated HoleIDs found in the collar file. Only the first row of each will be used.")
+        collar_df = collar_df.drop_duplicates(subset='HoleID', keep='first')
+    hole_index = pd.Index(collar_df['HoleID']) # The lookup key.
+    # One float array per collar attribute, in the same order as 'hole_index'.
+    collar_arrays = {col: collar_df[col].to_numpy(dtype='float64') for col in REQUIRED_COLLAR_COLS[1:]}
+    return hole_index, collar_arrays
+
+
+def desurvey_drillholes_streaming(collar_file_path, samples_file_path, output_file_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                                  survey_file_path=None):
+    """
+    Bounded-memory version of the desurvey for very large sample files.
+    The collar table is kept in memory as a lookup by HoleID, the samples are read in fixed-size chunks,
+    XYZ is calculated straight into NumPy arrays (no temporary columns) and every chunk is appended to the output.
+    The output file is byte-identical to the one written by the in-memory path.
+    If 'survey_file_path' is given, surveyed holes are desurveyed with minimum curvature.
+    Returns a dict with the row counts, or None if the input is not valid.
+    """
+    print(f"Streaming mode: reading samples in chunks of {chunk_size:,} rows.")
+
+    # --- LOAD THE COLLAR LOOKUP ---
+    try:
+        print(f"Loading collar data from '{collar_file_path}'...")
+        collar_df = pd.read_csv(collar_file_path)
+        # Reads only the header of the samples file, to validate its columns before streaming it.
+        sample_header = pd.read_csv(samples_file_path, nrows=0)
+    except FileNotFoundError as e:
+        print(f"\nERROR: Could not find a file! - {e}")
+        print("Please make sure your CSV files are in the same 'mina' folder as 'main.py'.")
+        return None
+
+    if not all(col in collar_df.columns for col in REQUIRED_COLLAR_COLS) or \
+       not all(col in sample_header.columns for col in REQUIRED_SAMPLE_COLS):
+        print("ERROR: One of your files is missing a required column.")
+        return None
+
+    hole_index, collar = build_collar_lookup(collar_df[REQUIRED_COLLAR_COLS])
+    del collar_df # The lookup arrays are all we need from here on.
+
+    # The survey stations are built once and shared by every chunk.
+    stations = None
+    if survey_file_path is not None:
+        survey_df = load_survey(survey_file_path)
+        if survey_df is None:
+            return None
+        stations = build_stations(hole_index, collar, survey_df)
+        del survey_df
+
+    # --- STREAM THE SAMPLES ---
+    rows_read = 0 # Total sample rows read.
+    rows_unmatched = 0 # Samples without a matching collar.
+    rows_before_cleaning = 0 # Samples with a collar (same meaning as in the in-memory path).
+    rows_written = 0 # Rows appended to the output.
+
+    reader = pd.read_csv(samples_file_path, usecols=REQUIRED_SAMPLE_COLS, dtype=SAMPLE_DTYPES, chunksize=chunk_size)
+    with open(output_file_path, 'w', newline='') as output_file:
+        # The header is written once, before the first chunk.
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(output_file, index=False)
+
+        for chunk in reader:
+            rows_read += len(chunk)
+
+            # Position of each sample's HoleID in the collar lookup (-1 means "not found").
+            positions = hole_index.get_indexer(chunk['HoleID'])
+            matched = positions >= 0
+            rows_unmatched += int((~matched).sum())
+            positions = positions[matched]
+            rows_before_cleaning += len(positions)
+
+            sample_x, sample_y, sample_z = desurvey_xyz(
+                positions, chunk['From_m'].to_numpy()[matched], chunk['To_m'].to_numpy()[matched],
+                hole_index, collar, stations)
+
+            out = pd.DataFrame({'Sample_X': sample_x, 'Sample_Y': sample_y, 'Sample_Z': sample_z})
+            for col in METAL_COLUMNS:
+                out[col] = chunk[col].to_numpy()[matched]
+
+            # Same cleaning rule as the in-memory path: drop a row only if ALL metal values are empty.
+            out = out[out[METAL_COLUMNS].notna().any(axis=1)]
+            rows_written += len(out)
+
+            out.to_csv(output_file, index=False, header=False, float_format='%.3f')
+
+    if rows_unmatched > 0:
+        print(f"WARNING: {rows_unmatched} samples did not have a matching HoleID in the collar file. These rows were dropped.")
+    rows_removed = rows_before_cleaning - rows_written
+    if rows_removed > 0:
+        print(f"Cleaned data: Removed {rows_removed} rows that had no values for Ag, Pb, or Zn.")
+    else:
+        print("Data is already clean. No rows with missing metal values were found.")
+
+    return {'rows_read': rows_read, 'rows_unmatched': rows_unmatched, 'rows_written': rows_written}
+
 
 # Defines the main function that will contain all of our script's logic.
-def desurvey_drillholes():
+def desurvey_drillholes(chunk_size=None, survey_filename=None):
     """
     Loads collar and sample data, calculates XYZ coordinates for each sample,
     and saves a clean result with X, Y, Z, Ag, Pb, and Zn columns to a new CSV file.
+    If 'chunk_size' is given, the samples are streamed in chunks of that many rows (bounded memory).
+    If a downhole survey file is found, surveyed holes are desurveyed with minimum curvature
+    and the rest are treated as straight lines from the collar Dip/Azimuth.
     """
     # Prints a message to the user's console to show that the script has started running.
     print("--- Drillhole Desurvey Script Started ---")
@@ -29,6 +158,9 @@ def desurvey_drillholes():
     samples_filename = 'MPA_Samples_BD_20240227.csv'
     # Defines the desired name for our final output file.
     output_filename = 'clean_xyz_ag_pb_zn_data.csv' # Name to reflect new metals.
+    # Defines the name of the (optional) downhole survey file: HoleID, Depth_m, Dip, Azimuth.
+    if survey_filename is None:
+        survey_filename = DEFAULT_SURVEY_FILENAME
 
     # Creates the full, operating-system-agnostic path to the collar file by joining the script's directory and the filename.
     collar_file_path = os.path.join(script_dir, collar_filename)
@@ -36,23 +168,44 @@ def desurvey_drillholes():
     samples_file_path = os.path.join(script_dir, samples_filename)
     # Creates the full path for our final output file.
     output_file_path = os.path.join(script_dir, output_filename)
+    # Creates the full path to the survey file. If it does not exist, every hole is treated as a straight line.
+    survey_file_path = os.path.join(script_dir, survey_filename)
+    if os.path.exists(survey_file_path):
+        print(f"Survey file '{survey_filename}' found: surveyed holes will be desurveyed with minimum curvature.")
+    else:
+        survey_file_path = None
+
+    # --- STREAMING MODE (for sample files too big to fit in memory) ---
+    if chunk_size is not None:
+        with etapa("Streaming desurvey") as stage:
+            counts = desurvey_drillholes_streaming(collar_file_path, samples_file_path, output_file_path, chunk_size,
+                                                   survey_file_path)
+            stage.filas = counts['rows_written'] if counts is not None else None
+        if counts is None: # The input was not valid, the error was already printed.
+            return
+        print("\n--- All Done! ---")
+        print(f"Successfully created '{output_filename}' in your 'mina' folder.")
+        print(f"It contains {counts['rows_written']} data points with XYZ and metal grades, ready for kriging.")
+        return
     
     # --- 2. LOAD DATA ---
-    try: # Starts a 'try' block, which lets us attempt code that might cause an error (like a file not being found).
-        print(f"Loading collar data from '{collar_file_path}'...") # Informs the user what file is being loaded.
-        collar_df = pd.read_csv(collar_file_path) # Reads the collar CSV file into a pandas DataFrame called 'collar_df'.
-        print(f"Loading samples data from '{samples_file_path}'...") # Informs the user about the next file being loaded.
-        samples_df = pd.read_csv(samples_file_path) # Reads the samples CSV file into a pandas DataFrame called 'samples_df'.
-        print("Files loaded successfully.") # Confirms that both files were found and loaded without errors.
-    except FileNotFoundError as e: # If a 'FileNotFoundError' occurs in the 'try' block, this code will run.
-        print(f"\nERROR: Could not find a file! - {e}") # Prints a helpful error message, including the system error 'e'.
-        print("Please make sure your CSV files are in the same 'mina' folder as 'main.py'.") # Gives the user instructions to fix the error.
-        return # Exits the function immediately because the script cannot continue without the data.
+    with etapa("Load data") as stage: # Measures this step when a trace was requested (see comun/instrumentacion.py).
+        try: # Starts a 'try' block, which lets us attempt code that might cause an error (like a file not being found).
+            print(f"Loading collar data from '{collar_file_path}'...") # Informs the user what file is being loaded.
+            collar_df = pd.read_csv(collar_file_path) # Reads the collar CSV file into a pandas DataFrame called 'collar_df'.
+            print(f"Loading samples data from '{samples_file_path}'...") # Informs the user about the next file being loaded.
+            samples_df = pd.read_csv(samples_file_path, dtype=SAMPLE_DTYPES) # Reads the samples CSV file into a pandas DataFrame called 'samples_df'.
+            print("Files loaded successfully.") # Confirms that both files were found and loaded without errors.
+            stage.filas = len(samples_df) # Row count recorded in the trace.
+        except FileNotFoundError as e: # If a 'FileNotFoundError' occurs in the 'try' block, this code will run.
+            print(f"\nERROR: Could not find a file! - {e}") # Prints a helpful error message, including the system error 'e'.
+            print("Please make sure your CSV files are in the same 'mina' folder as 'main.py'.") # Gives the user instructions to fix the error.
+            return # Exits the function immediately because the script cannot continue without the data.
 
     # --- 3. MERGE DATA ---
     print("\nMerging collar and sample data...") # Informs the user about the current step.
-    required_collar_cols = ['HoleID', 'Easting', 'Northing', 'Elevation', 'Dip', 'Azimuth'] # Creates a list of required columns for the collar file.
-    required_sample_cols = ['HoleID', 'From_m', 'To_m', 'Ag_ppm', 'Pb_pct', 'Zn_pct'] # Checks for Ag, Pb and Zn columns.
+    required_collar_cols = REQUIRED_COLLAR_COLS # Uses the list of required columns for the collar file.
+    required_sample_cols = REQUIRED_SAMPLE_COLS # Checks for Ag, Pb and Zn columns.
     
     # This 'if' statement checks if all required columns are present in their respective DataFrames.
     if not all(col in collar_df.columns for col in required_collar_cols) or \
@@ -60,74 +213,277 @@ def desurvey_drillholes():
         print("ERROR: One of your files is missing a required column.") # If a column is missing, prints an error message.
         return # Exits the function because the script can't run without these specific columns.
         
-    # Combines the two DataFrames into one called 'merged_df'.
-    # It uses 'HoleID' as the key and a 'left' merge to keep all sample rows.
-    merged_df = pd.merge(samples_df, collar_df, on='HoleID', how='left')
+    with etapa("Merge", filas=len(samples_df)):
+        # Combines the two DataFrames into one called 'merged_df'.
+        # It uses 'HoleID' as the key and a 'left' merge to keep all sample rows.
+        merged_df = pd.merge(samples_df, collar_df, on='HoleID', how='left')
     
-    # Checks if any row in the 'Easting' column is empty (null/NaN), which indicates a failed merge for that sample.
-    if merged_df['Easting'].isnull().any():
-        print("WARNING: Some samples did not have a matching HoleID in the collar file. These rows will be dropped.") # Warns the user.
-        merged_df.dropna(subset=['Easting'], inplace=True) # Removes any rows where 'Easting' is null, as they can't be processed.
+        # Checks if any row in the 'Easting' column is empty (null/NaN), which indicates a failed merge for that sample.
+        if merged_df['Easting'].isnull().any():
+            print("WARNING: Some samples did not have a matching HoleID in the collar file. These rows will be dropped.") # Warns the user.
+            merged_df.dropna(subset=['Easting'], inplace=True) # Removes any rows where 'Easting' is null, as they can't be processed.
 
     # --- 4. CALCULATE SAMPLE XYZ COORDINATES ---
     print("Calculating XYZ coordinates for each sample midpoint...") # Informs the user about the calculation step.
-    merged_df['Midpoint_Depth'] = (merged_df['From_m'] + merged_df['To_m']) / 2 # Calculates the midpoint depth for each sample and creates a new column.
-    merged_df['Azimuth_rad'] = np.radians(merged_df['Azimuth']) # Converts the 'Azimuth' from degrees to radians for trig functions and creates a new column.
-    merged_df['Dip_rad'] = np.radians(merged_df['Dip']) # Converts the 'Dip' from degrees to radians and creates a new column.
+    with etapa("Straight-hole XYZ", filas=len(merged_df)):
+        merged_df['Midpoint_Depth'] = (merged_df['From_m'] + merged_df['To_m']) / 2 # Calculates the midpoint depth for each sample and creates a new column.
+        merged_df['Azimuth_rad'] = np.radians(merged_df['Azimuth']) # Converts the 'Azimuth' from degrees to radians for trig functions and creates a new column.
+        merged_df['Dip_rad'] = np.radians(merged_df['Dip']) # Converts the 'Dip' from degrees to radians and creates a new column.
     
-    # Calculates the change in X (Easting) based on the depth, azimuth, and dip.
-    merged_df['delta_X'] = merged_df['Midpoint_Depth'] * np.sin(merged_df['Azimuth_rad']) * np.cos(merged_df['Dip_rad'])
-    # Calculates the change in Y (Northing).
-    merged_df['delta_Y'] = merged_df['Midpoint_Depth'] * np.cos(merged_df['Azimuth_rad']) * np.cos(merged_df['Dip_rad'])
-    # Calculates the change in Z (Elevation). A negative dip correctly results in a negative delta_Z.
-    merged_df['delta_Z'] = merged_df['Midpoint_Depth'] * np.sin(merged_df['Dip_rad'])
+        # Calculates the change in X (Easting) based on the depth, azimuth, and dip.
+        merged_df['delta_X'] = merged_df['Midpoint_Depth'] * np.sin(merged_df['Azimuth_rad']) * np.cos(merged_df['Dip_rad'])
+        # Calculates the change in Y (Northing).
+        merged_df['delta_Y'] = merged_df['Midpoint_Depth'] * np.cos(merged_df['Azimuth_rad']) * np.cos(merged_df['Dip_rad'])
+        # Calculates the change in Z (Elevation). A negative dip correctly results in a negative delta_Z.
+        merged_df['delta_Z'] = merged_df['Midpoint_Depth'] * np.sin(merged_df['Dip_rad'])
     
-    # Calculates the final X coordinate of the sample by adding the change in X to the collar's Easting.
-    merged_df['Sample_X'] = merged_df['Easting'] + merged_df['delta_X']
-    # Calculates the final Y coordinate of the sample.
-    merged_df['Sample_Y'] = merged_df['Northing'] + merged_df['delta_Y']
-    # Calculates the final Z coordinate of the sample.
-    merged_df['Sample_Z'] = merged_df['Elevation'] + merged_df['delta_Z']
+        # Calculates the final X coordinate of the sample by adding the change in X to the collar's Easting.
+        merged_df['Sample_X'] = merged_df['Easting'] + merged_df['delta_X']
+        # Calculates the final Y coordinate of the sample.
+        merged_df['Sample_Y'] = merged_df['Northing'] + merged_df['delta_Y']
+        # Calculates the final Z coordinate of the sample.
+        merged_df['Sample_Z'] = merged_df['Elevation'] + merged_df['delta_Z']
+
+    # If we have a downhole survey, the holes that were surveyed are re-positioned with minimum curvature.
+    if survey_file_path is not None:
+        print("Applying minimum curvature to the surveyed holes...")
+        with etapa("Minimum curvature", filas=len(merged_df)):
+            survey_df = load_survey(survey_file_path) # Reads the downhole survey table.
+            if survey_df is None: # A required survey column is missing, the error was already printed.
+                return
+            hole_index, collar = build_collar_lookup(collar_df[REQUIRED_COLLAR_COLS]) # HoleID lookup of the collar arrays.
+            stations = build_stations(hole_index, collar, survey_df) # Minimum curvature stations of every surveyed hole.
+            hole = hole_index.get_indexer(merged_df['HoleID']) # Position of each sample's hole in the lookup.
+            sample_x, sample_y, sample_z = desurvey_xyz(hole, merged_df['From_m'].to_numpy(), merged_df['To_m'].to_numpy(),
+                                                        hole_index, collar, stations)
+            merged_df['Sample_X'], merged_df['Sample_Y'], merged_df['Sample_Z'] = sample_x, sample_y, sample_z
     print("Calculations complete.") # Confirms that the calculations are finished.
 
     # --- 5. CREATE AND SAVE CLEAN FINAL OUTPUT ---
     print("\nCreating final, clean output file with X, Y, Z, Ag, Pb, and Zn...")
+    with etapa("Clean and save") as stage:
+        # Step A: Selects only the final desired columns and creates a new, clean DataFrame called 'final_df'.
+        # Includes Pb_pct and Zn_pct in the final selection.
+        final_df = merged_df[['Sample_X', 'Sample_Y', 'Sample_Z', 'Ag_ppm', 'Pb_pct', 'Zn_pct']].copy()
 
-    # Step A: Selects only the final desired columns and creates a new, clean DataFrame called 'final_df'.
-    # Includes Pb_pct and Zn_pct in the final selection.
-    final_df = merged_df[['Sample_X', 'Sample_Y', 'Sample_Z', 'Ag_ppm', 'Pb_pct', 'Zn_pct']].copy()
-
-    # Step B: Stores the number of rows before cleaning the data.
-    rows_before_cleaning = len(final_df)
+        # Step B: Stores the number of rows before cleaning the data.
+        rows_before_cleaning = len(final_df)
     
-    # Defines the list of metal columns to check for missing values.
-    metal_columns = ['Ag_ppm', 'Pb_pct', 'Zn_pct']
-    # Removes a row ONLY IF all of the specified metal columns are empty (NaN) for that row.
-    final_df.dropna(subset=metal_columns, how='all', inplace=True)
+        # Defines the list of metal columns to check for missing values.
+        metal_columns = METAL_COLUMNS
+        # Removes a row ONLY IF all of the specified metal columns are empty (NaN) for that row.
+        final_df.dropna(subset=metal_columns, how='all', inplace=True)
     
-    # Stores the number of rows after the cleaning process.
-    rows_after_cleaning = len(final_df)
+        # Stores the number of rows after the cleaning process.
+        rows_after_cleaning = len(final_df)
     
-    # Calculates how many rows were removed during cleaning.
-    rows_removed = rows_before_cleaning - rows_after_cleaning
-    # Checks if any rows were actually removed.
-    if rows_removed > 0:
-        #Message now explains the new cleaning logic.
-        print(f"Cleaned data: Removed {rows_removed} rows that had no values for Ag, Pb, or Zn.")
-    else: # If no rows were removed.
-        # This confirms that the data was already clean.
-        print("Data is already clean. No rows with missing metal values were found.")
+        # Calculates how many rows were removed during cleaning.
+        rows_removed = rows_before_cleaning - rows_after_cleaning
+        # Checks if any rows were actually removed.
+        if rows_removed > 0:
+            #Message now explains the new cleaning logic.
+            print(f"Cleaned data: Removed {rows_removed} rows that had no values for Ag, Pb, or Zn.")
+        else: # If no rows were removed.
+            # This confirms that the data was already clean.
+            print("Data is already clean. No rows with missing metal values were found.")
 
-    # Step C: Saves the 'final_df' DataFrame to a CSV file at the specified path.
-    # index=False prevents writing row numbers, and float_format rounds numbers to 3 decimal places.
-    final_df.to_csv(output_file_path, index=False, float_format='%.3f')
+        # Step C: Saves the 'final_df' DataFrame to a CSV file at the specified path.
+        # index=False prevents writing row numbers, and float_format rounds numbers to 3 decimal places.
+        final_df.to_csv(output_file_path, index=False, float_format='%.3f')
+        stage.filas = rows_after_cleaning # Row count recorded in the trace.
 
     print("\n--- All Done! ---") # Prints a final success message.
     print(f"Successfully created '{output_filename}' in your 'mina' folder.") # Tells the user where the file was saved.
     print(f"It contains {rows_after_cleaning} data points with XYZ and metal grades, ready for kriging.") # UPDATED: More general success message.
 
+# Defines the compositing step: regular-length composites with XYZ, ready for estimation.
+def composite_drillholes(composite_length, residual='drop', exclude_low_recovery=False, survey_filename=None):
+    """
+    Loads collar and sample data, regularizes the samples into composites of 'composite_length' metres
+    (length-weighted and density-weighted Ag, Pb and Zn), calculates the XYZ of each composite midpoint
+    and saves the result to a new CSV file.
+    """
+    print(f"--- Drillhole Compositing Script Started ({composite_length:g} m composites) ---")
+
+    # --- SETUP FILE PATHS ---
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    collar_file_path = os.path.join(script_dir, 'MPA_Collar_20240227.csv')
+    samples_file_path = os.path.join(script_dir, 'MPA_Samples_BD_20240227.csv')
+    output_filename = f'composites_{composite_length:g}m_xyz_ag_pb_zn_data.csv'
+    output_file_path = os.path.join(script_dir, output_filename)
+    survey_file_path = os.path.join(script_dir, survey_filename or DEFAULT_SURVEY_FILENAME)
+    if not os.path.exists(survey_file_path):
+        survey_file_path = None
+
+    # --- LOAD DATA ---
+    try:
+        print(f"Loading collar data from '{collar_file_path}'...")
+        collar_df = pd.read_csv(collar_file_path)
+        print(f"Loading samples data from '{samples_file_path}'...")
+        samples_df = pd.read_csv(samples_file_path, dtype=SAMPLE_DTYPES)
+    except FileNotFoundError as e:
+        print(f"\nERROR: Could not find a file! - {e}")
+        print("Please make sure your CSV files are in the same 'mina' folder as 'main.py'.")
+        return
+
+    if not all(col in collar_df.columns for col in REQUIRED_COLLAR_COLS) or \
+       not all(col in samples_df.columns for col in REQUIRED_SAMPLE_COLS):
+        print("ERROR: One of your files is missing a required column.")
+        return
+
+    # --- COMPOSITE ---
+    print(f"\nCompositing {len(samples_df)} samples...")
+    composites_df = composite_samples(samples_df, composite_length, residual=residual,
+                                      exclude_low_recovery=exclude_low_recovery)
+    del samples_df # The composites are all we need from here on.
+    print(f"Created {len(composites_df)} composites.")
+
+    # --- CALCULATE COMPOSITE XYZ ---
+    print("Calculating XYZ coordinates for each composite midpoint...")
+    hole_index, collar = build_collar_lookup(collar_df[REQUIRED_COLLAR_COLS])
+    stations = None
+    if survey_file_path is not None:
+        survey_df = load_survey(survey_file_path)
+        if survey_df is None:
+            return
+        stations = build_stations(hole_index, collar, survey_df)
+    hole = hole_index.get_indexer(composites_df['HoleID'])
+    matched = hole >= 0
+    if not matched.all():
+        print("WARNING: Some composites did not have a matching HoleID in the collar file. These rows will be dropped.")
+        composites_df = composites_df[matched].reset_index(drop=True)
+        hole = hole[matched]
+    sample_x, sample_y, sample_z = desurvey_xyz(hole, composites_df['From_m'].to_numpy(), composites_df['To_m'].to_numpy(),
+                                                hole_index, collar, stations)
+    composites_df.insert(3, 'Sample_X', sample_x)
+    composites_df.insert(4, 'Sample_Y', sample_y)
+    composites_df.insert(5, 'Sample_Z', sample_z)
+
+    # --- CLEAN AND SAVE ---
+    composites_df = composites_df.dropna(subset=METAL_COLUMNS, how='all')
+    composites_df.to_csv(output_file_path, index=False, float_format='%.3f')
+
+    print("\n--- All Done! ---")
+    print(f"Successfully created '{output_filename}' in your 'mina' folder.")
+    print(f"It contains {len(composites_df)} composites with XYZ and metal grades, ready for kriging.")
+
+# Defines the incremental desurvey: only new or changed holes are recomputed, into a binary column store.
+def desurvey_drillholes_incremental(store_dirname='desurvey_store', survey_filename=None):
+    """
+    Updates the columnar store in 'store_dirname' with the current collar, sample and survey files.
+    Every hole is fingerprinted and only added or changed holes are desurveyed again; deleted holes are removed.
+    Readers can memory-map the X/Y/Z/grade columns (see desurvey_store.py) instead of parsing the CSV.
+    """
+    print("--- Incremental Drillhole Desurvey Started ---")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    store_dir = os.path.join(script_dir, store_dirname)
+    survey_file_path = os.path.join(script_dir, survey_filename or DEFAULT_SURVEY_FILENAME)
+
+    try:
+        collar_df = pd.read_csv(os.path.join(script_dir, 'MPA_Collar_20240227.csv'))
+        samples_df = pd.read_csv(os.path.join(script_dir, 'MPA_Samples_BD_20240227.csv'),
+                                 usecols=REQUIRED_SAMPLE_COLS, dtype=SAMPLE_DTYPES)
+    except FileNotFoundError as e:
+        print(f"\nERROR: Could not find a file! - {e}")
+        print("Please make sure your CSV files are in the same 'mina' folder as 'main.py'.")
+        return
+    except ValueError as e: # Raised by 'usecols' when a required column is missing.
+        print(f"ERROR: One of your files is missing a required column. - {e}")
+        return
+    if not all(col in collar_df.columns for col in REQUIRED_COLLAR_COLS):
+        print("ERROR: One of your files is missing a required column.")
+        return
+    survey_df = None # No survey file: every hole is a straight line.
+    if os.path.exists(survey_file_path):
+        survey_df = load_survey(survey_file_path)
+        if survey_df is None: # A required survey column is missing, the error was already printed. The store is left untouched.
+            return
+
+    changes = desurvey_store.update_store(store_dir, collar_df, samples_df, survey_df)
+
+    print("\n--- All Done! ---")
+    print(f"Holes added: {len(changes['added'])}, changed: {len(changes['changed'])}, deleted: {len(changes['deleted'])}.")
+    print(f"The store '{store_dirname}' is up to date.")
+
+# Defines the block model step: a regular grid estimated from the desurveyed points (or composites).
+def make_block_model(points_filename, block_size, rotation=0.0, search=None, power=2.0, workers=1):
+    """
+    Builds a regular block model around the points in 'points_filename' (Sample_X, Sample_Y, Sample_Z + grades),
+    estimates Ag, Pb and Zn into every block with inverse distance and nearest neighbour,
+    and saves it as 'block_model.npz' (all blocks) and 'block_model_estimated.csv' (estimated blocks only).
+    """
+    print("\n--- Block Model Started ---")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    points_file_path = os.path.join(script_dir, points_filename)
+    print(f"Loading points from '{points_file_path}'...")
+    points_df = pd.read_csv(points_file_path, usecols=OUTPUT_COLUMNS)
+    xyz = points_df[['Sample_X', 'Sample_Y', 'Sample_Z']].to_numpy()
+    values = points_df[METAL_COLUMNS].to_numpy()
+
+    # The grid covers all the points, with one extra block on every side.
+    grid = block_model.grid_from_points(xyz, block_size, rotation=rotation, padding=1)
+    print(f"Grid of {' x '.join(str(n) for n in grid['n_blocks'])} = {block_model.block_count(grid):,} blocks "
+          f"of {' x '.join(f'{d:g}' for d in grid['block_size'])} m.")
+
+    print(f"Estimating {len(points_df)} points into the blocks with {workers} worker(s)...")
+    estimates = block_model.estimate_blocks(grid, xyz, values, search=search, power=power, workers=workers)
+
+    model_file_path = os.path.join(script_dir, 'block_model.npz')
+    block_model.save_block_model(model_file_path, grid, estimates, METAL_COLUMNS)
+    n_estimated = block_model.estimated_blocks_to_csv(os.path.join(script_dir, 'block_model_estimated.csv'),
+                                                      grid, estimates, METAL_COLUMNS)
+    print(f"Saved 'block_model.npz' and 'block_model_estimated.csv' ({n_estimated:,} estimated blocks).")
+
 # This is a standard Python entry point.
 # The code inside this 'if' statement will only run when the script is executed directly.
 if __name__ == "__main__":
-    # Calls the main function to start the entire process.
-    desurvey_drillholes()
\ No newline at end of file
+    # Reads the optional command line arguments.
+    parser = argparse.ArgumentParser(description="Desurvey drillhole samples into XYZ points with Ag, Pb and Zn grades.")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f"Stream the samples file in chunks of this many rows (bounded memory). Try {DEFAULT_CHUNK_SIZE}.")
+    parser.add_argument('--survey', default=None,
+                        help=f"Downhole survey file (HoleID, Depth_m, Dip, Azimuth) in the script folder. Default: '{DEFAULT_SURVEY_FILENAME}' if it exists.")
+    parser.add_argument('--composite-length', type=float, default=None,
+                        help="Write regular composites of this length (m) instead of raw sample midpoints, e.g. 2 or the bench height.")
+    parser.add_argument('--residual', choices=RESIDUAL_OPTIONS, default='drop',
+                        help="What to do with the short composite at the bottom of each hole (default: drop).")
+    parser.add_argument('--exclude-low-recovery', action='store_true',
+                        help="Do not use grades from samples flagged with recovery <= 85%% in the composites.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Update the binary store 'desurvey_store' recomputing only added or changed holes (instead of the CSV).")
+    parser.add_argument('--block-size', type=float, nargs=3, default=None, metavar=('DX', 'DY', 'DZ'),
+                        help="Also build and estimate a block model with blocks of this size (m).")
+    parser.add_argument('--block-rotation', type=float, default=0.0, help="Clockwise rotation of the block grid (degrees).")
+    parser.add_argument('--search-ranges', type=float, nargs=3, default=block_model.DEFAULT_SEARCH['ranges'],
+                        metavar=('MAJOR', 'SEMI', 'MINOR'), help="Search ellipsoid radii (m).")
+    parser.add_argument('--search-angles', type=float, nargs=3, default=(0.0, 0.0, 0.0),
+                        metavar=('AZIMUTH', 'DIP', 'RAKE'), help="Search ellipsoid orientation (degrees).")
+    parser.add_argument('--min-samples', type=int, default=block_model.DEFAULT_SEARCH['min_samples'])
+    parser.add_argument('--max-samples', type=int, default=block_model.DEFAULT_SEARCH['max_samples'])
+    parser.add_argument('--max-per-octant', type=int, default=block_model.DEFAULT_SEARCH['max_per_octant'],
+                        help="Maximum samples per octant (0 = no octant limit).")
+    parser.add_argument('--idw-power', type=float, default=2.0, help="Inverse distance power.")
+    parser.add_argument('--workers', type=int, default=block_model.default_workers(), help="Processes for the block estimation.")
+    instrumentacion.agregar_argumentos(parser) # Adds --traza / --perfil (per-stage timing and memory).
+    args = parser.parse_args()
+    instrumentacion.configurar_desde_argumentos(args) # Turns the stage measurements on only if they were requested.
+    points_filename = None
+    if args.incremental:
+        # Calls the incremental process (it updates the binary store, not a CSV).
+        desurvey_drillholes_incremental(survey_filename=args.survey)
+    elif args.composite_length is not None:
+        # Calls the compositing process.
+        composite_drillholes(args.composite_length, residual=args.residual,
+                             exclude_low_recovery=args.exclude_low_recovery, survey_filename=args.survey)
+        points_filename = f'composites_{args.composite_length:g}m_xyz_ag_pb_zn_data.csv'
+    else:
+        # Calls the main function to start the entire process.
+        desurvey_drillholes(chunk_size=args.chunk_size, survey_filename=args.survey)
+        points_filename = 'clean_xyz_ag_pb_zn_data.csv'
+    if args.block_size is not None and points_filename is not None:
+        # Builds the block model from the points we just wrote.
+        search = {'ranges': tuple(args.search_ranges), 'azimuth': args.search_angles[0], 'dip': args.search_angles[1],
+                  'rake': args.search_angles[2], 'min_samples': args.min_samples, 'max_samples': args.max_samples,
+                  'max_per_octant': args.max_per_octant}
+        make_block_model(points_filename, args.block_size, rotation=args.block_rotation, search=search,
+                         power=args.idw_power, workers=args.workers)
\ No newline at end of file
@@ -0,0 +1,256 @@
+#28DiasPythonParaMinería
+
+#The Bull Miner GitHub repository
+#Follow me on Linkedin for more content like this:    https://www.linkedin.com/in/mikemine/
+
+# Regular 3D block model with a KD-tree backed estimator.
+#
+# The block model is NOT a DataFrame: it is a small grid definition (origin, block size, number of blocks, rotation)
+# plus one NumPy array per estimated variable with one value per block. Block centroids are calculated on the fly
+# from the flat block index, so a 10M block model costs only its estimates in memory.
+#
+# Estimation:
+#   - the samples are moved into "search ellipsoid space" (rotated and divided by the ranges), where the ellipsoid
+#     becomes a sphere of radius 1 and a normal KD-tree (scipy cKDTree) finds the neighbours of each block,
+#   - neighbours are limited by min/max samples and by a maximum number per octant,
+#   - Ag, Pb and Zn are estimated with inverse distance (IDW) and nearest neighbour (NN),
+#   - blocks are processed in fixed-size chunks that can be spread over a process pool. The chunks never depend on
+#     the number of workers, so the results are identical whatever the worker count.
+
+# === 1. IMPORT LIBRARIES ===
+import os # File paths and CPU count.
+from concurrent.futures import ProcessPoolExecutor # Process pool for the block chunks.
+import numpy as np # Fast array maths.
+import pandas as pd # Used only to export the blocks to CSV.
+from scipy.spatial import cKDTree # Spatial index for the neighbour search.
+
+# Default search parameters.
+DEFAULT_SEARCH = {
+    'ranges': (100.0, 100.0, 50.0), # Major, semi-major and minor radius of the search ellipsoid (m).
+    'azimuth': 0.0, # Azimuth of the major axis, clockwise from North (degrees).
+    'dip': 0.0, # Dip of the major axis, positive downwards (degrees).
+    'rake': 0.0, # Rotation around the major axis (degrees).
+    'min_samples': 3, # Blocks with fewer samples in the ellipsoid are not estimated.
+    'max_samples': 24, # Maximum samples used per block.
+    'max_per_octant': 0, # Maximum samples per octant of the ellipsoid (0 = no octant limit).
+    'n_candidates': 64, # Nearest samples looked at before the octant and max_samples limits are applied.
+}
+# Default number of blocks per chunk (fixed, so results do not depend on the number of workers).
+DEFAULT_CHUNK_SIZE = 50_000
+# Distances below this (in ellipsoid units) are treated as a sample sitting on the block centroid.
+MIN_DISTANCE = 1e-6
+
+
+# === 2. THE BLOCK GRID ===
+def make_grid(origin, block_size, n_blocks, rotation=0.0):
+    """
+    Defines a regular block grid.
+    origin     : (x, y, z) world coordinates of the minimum corner of the first block.
+    block_size : (dx, dy, dz) block dimensions in metres.
+    n_blocks   : (nx, ny, nz) number of blocks along each grid axis.
+    rotation   : clockwise rotation of the grid around the vertical axis, in degrees.
+    Blocks are numbered with X fastest, then Y, then Z (the usual GSLIB order).
+    """
+    return {'origin': np.asarray(origin, dtype='float64'),
+            'block_size': np.asarray(block_size, dtype='float64'),
+            'n_blocks': np.asarray(n_blocks, dtype='int64'),
+            'rotation': float(rotation)}
+
+
+def _grid_rotation_matrix(rotation):
+    """Matrix whose columns are the grid axes in world coordinates (clockwise rotation around Z)."""
+    angle = np.radians(rotation)
+    return np.array([[np.cos(angle), np.sin(angle), 0.0],
+                     [-np.sin(angle), np.cos(angle), 0.0],
+                     [0.0, 0.0, 1.0]])
+
+
+def grid_from_points(xyz, block_size, rotation=0.0, padding=0):
+    """Smallest grid (with 'padding' extra blocks on every side) that covers all the points."""
+    block_size = np.asarray(block_size, dtype='float64')
+    rot = _grid_rotation_matrix(rotation)
+    local = xyz @ rot # Points in grid axes (rotation around the world origin).
+    low = np.floor(local.min(axis=0) / block_size) * block_size - padding * block_size
+    high = np.ceil(local.max(axis=0) / block_size) * block_size + padding * block_size
+    n_blocks = np.maximum(np.round((high - low) / block_size).astype('int64'), 1)
+    return make_grid(rot @ low, block_size, n_blocks, rotation)
+
+
+def block_count(grid):
+    """Total number of blocks in the grid."""
+    return int(np.prod(grid['n_blocks']))
+
+
+def block_centroids(grid, flat_index):
+    """World coordinates (n, 3) of the centroids of the blocks with the given flat indices."""
+    nx, ny, nz = grid['n_blocks']
+    k, j, i = np.unravel_index(flat_index, (nz, ny, nx))
+    local = (np.column_stack([i, j, k]) + 0.5) * grid['block_size']
+    return grid['origin'] + local @ _grid_rotation_matrix(grid['rotation']).T
+
+
+# === 3. THE SEARCH ELLIPSOID ===
+def ellipsoid_matrix(ranges, azimuth=0.0, dip=0.0, rake=0.0):
+    """
+    Matrix that moves world offsets into ellipsoid space, where the search ellipsoid is the unit sphere.
+    Axis order of the result: major, semi-major, minor.
+    """
+    az, dp, rk = np.radians([azimuth, dip, rake])
+    rot_z = np.array([[np.cos(az), np.sin(az), 0.0], [-np.sin(az), np.cos(az), 0.0], [0.0, 0.0, 1.0]])
+    rot_x = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(dp), np.sin(dp)], [0.0, -np.sin(dp), np.cos(dp)]])
+    rot_y = np.array([[np.cos(rk), 0.0, -np.sin(rk)], [0.0, 1.0, 0.0], [np.sin(rk), 0.0, np.cos(rk)]])
+    axes = rot_z @ rot_x @ rot_y # Columns: semi-major (local X), major (local Y), minor (local Z) in world coordinates.
+    major, semi, minor = axes[:, 1], axes[:, 0], axes[:, 2]
+    return np.vstack([major / ranges[0], semi / ranges[1], minor / ranges[2]])
+
+
+# === 4. NEIGHBOUR SELECTION AND ESTIMATION ===
+def _select_neighbours(distance, offset, search):
+    """
+    Applies the ellipsoid, octant and max_samples limits to the KD-tree candidates of a chunk of blocks.
+    Candidates come sorted by distance, so "first" means "closest". Returns a boolean mask (m, K).
+    """
+    keep = np.isfinite(distance) # Candidates outside the ellipsoid come back with an infinite distance.
+    if search['max_per_octant'] > 0:
+        octant = ((offset[..., 0] > 0) * 4 + (offset[..., 1] > 0) * 2 + (offset[..., 2] > 0)).astype(np.int8)
+        rank = np.zeros(distance.shape, dtype=np.int32)
+        for code in range(8): # Only 8 octants, everything else is vectorized.
+            in_octant = keep & (octant == code)
+            rank += np.where(in_octant, np.cumsum(in_octant, axis=1), 0)
+        keep &= rank <= search['max_per_octant']
+    keep &= np.cumsum(keep, axis=1) <= search['max_samples']
+    return keep
+
+
+def _estimate_chunk(grid, flat_index, tree, scaled_xyz, values, matrix, search, power):
+    """Estimates one chunk of blocks. Returns (idw, nn, n_samples, mean_distance)."""
+    centroids = block_centroids(grid, flat_index) @ matrix.T
+    k = min(search['n_candidates'], len(scaled_xyz))
+    distance, index = tree.query(centroids, k=k, distance_upper_bound=1.0)
+    if k == 1:
+        distance, index = distance[:, None], index[:, None]
+    found = np.isfinite(distance)
+    index = np.where(found, index, 0) # Missing neighbours point at sample 0 but are masked out below.
+
+    offset = scaled_xyz[index] - centroids[:, None, :]
+    keep = _select_neighbours(distance, offset, search)
+    n_samples = keep.sum(axis=1)
+    estimated = n_samples >= search['min_samples']
+
+    n_vars = values.shape[1]
+    idw = np.full((len(flat_index), n_vars), np.nan, dtype='float32')
+    nn = np.full((len(flat_index), n_vars), np.nan, dtype='float32')
+    weights = np.where(keep, 1.0 / np.maximum(distance, MIN_DISTANCE) ** power, 0.0)
+    for v in range(n_vars): # One pass per grade (3 for Ag, Pb and Zn).
+        grade = values[index, v]
+        valid = keep & ~np.isnan(grade)
+        w = np.where(valid, weights, 0.0)
+        total_weight = w.sum(axis=1)
+        total = (w * np.where(valid, grade, 0.0)).sum(axis=1)
+        ok = estimated & (total_weight > 0)
+        idw[ok, v] = total[ok] / total_weight[ok]
+        # Nearest neighbour: the first (closest) valid sample.
+        first = np.argmax(valid, axis=1)
+        has_valid = estimated & valid.any(axis=1)
+        rows = np.flatnonzero(has_valid)
+        nn[rows, v] = grade[rows, first[rows]]
+
+    mean_distance = np.where(n_samples > 0, np.where(keep, distance, 0.0).sum(axis=1) / np.maximum(n_samples, 1), np.nan)
+    return idw, nn, n_samples.astype('int16'), mean_distance.astype('float32')
+
+
+# Per-process state: every worker builds the KD-tree once and then estimates many chunks with it.
+_WORKER = {}
+
+
+def _init_worker(grid, xyz, values, search, power):
+    """Builds the worker's search structures (runs once per process)."""
+    matrix = ellipsoid_matrix(search['ranges'], search['azimuth'], search['dip'], search['rake'])
+    scaled_xyz = xyz @ matrix.T
+    _WORKER.update(grid=grid, tree=cKDTree(scaled_xyz), scaled_xyz=scaled_xyz, values=values,
+                   matrix=matrix, search=search, power=power)
+
+
+def _run_chunk(bounds):
+    """Estimates the blocks [start, stop) with the worker's state."""
+    start, stop = bounds
+    w = _WORKER
+    return start, _estimate_chunk(w['grid'], np.arange(start, stop), w['tree'], w['scaled_xyz'], w['values'],
+                                  w['matrix'], w['search'], w['power'])
+
+
+def estimate_blocks(grid, xyz, values, search=None, power=2.0, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Estimates every block of the grid with inverse distance and nearest neighbour.
+
+    xyz     : (n, 3) sample coordinates.
+    values  : (n, v) sample grades (NaN = not assayed).
+    search  : dict with the search parameters (see DEFAULT_SEARCH; missing keys take the default).
+    power   : inverse distance power.
+    workers : number of processes (1 = run in this process).
+
+    Returns a dict of arrays with one row per block: 'idw' (n_blocks, v), 'nn' (n_blocks, v),
+    'n_samples' (n_blocks,) and 'mean_distance' (n_blocks,) in ellipsoid units.
+    """
+    search = {**DEFAULT_SEARCH, **(search or {})}
+    xyz = np.ascontiguousarray(xyz, dtype='float64')
+    values = np.ascontiguousarray(values, dtype='float64')
+    n_total = block_count(grid)
+    n_vars = values.shape[1]
+    result = {'idw': np.full((n_total, n_vars), np.nan, dtype='float32'),
+              'nn': np.full((n_total, n_vars), np.nan, dtype='float32'),
+              'n_samples': np.zeros(n_total, dtype='int16'),
+              'mean_distance': np.full(n_total, np.nan, dtype='float32')}
+    chunks = [(start, min(start + chunk_size, n_total)) for start in range(0, n_total, chunk_size)]
+
+    def store(start, chunk_result):
+        stop = start + len(chunk_result[2])
+        result['idw'][start:stop], result['nn'][start:stop] = chunk_result[0], chunk_result[1]
+        result['n_samples'][start:stop], result['mean_distance'][start:stop] = chunk_result[2], chunk_result[3]
+
+    if workers <= 1:
+        _init_worker(grid, xyz, values, search, power)
+        for bounds in chunks:
+            store(*_run_chunk(bounds))
+        _WORKER.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(grid, xyz, values, search, power)) as pool:
+            for start, chunk_result in pool.map(_run_chunk, chunks):
+                store(start, chunk_result)
+    return result
+
+
+# === 5. SAVING THE MODEL ===
+def save_block_model(path, grid, estimates, variable_names):
+    """Saves the grid definition and the estimate arrays to a single .npz file (no text parsing needed to read it back)."""
+    arrays = {f'{method}_{name}': estimates[method][:, v] for method in ('idw', 'nn') for v, name in enumerate(variable_names)}
+    np.savez(path, origin=grid['origin'], block_size=grid['block_size'], n_blocks=grid['n_blocks'],
+             rotation=grid['rotation'], n_samples=estimates['n_samples'], mean_distance=estimates['mean_distance'],
+             variable_names=np.array(variable_names), **arrays)
+
+
+def load_block_model(path):
+    """Reads a model saved with save_block_model. Returns (grid, arrays) where arrays maps names to block arrays."""
+    data = np.load(path)
+    grid = make_grid(data['origin'], data['block_size'], data['n_blocks'], float(data['rotation']))
+    arrays = {name: data[name] for name in data.files if name not in ('origin', 'block_size', 'n_blocks', 'rotation')}
+    return grid, arrays
+
+
+def estimated_blocks_to_csv(path, grid, estimates, variable_names):
+    """Writes only the estimated blocks (with their centroids) to CSV, for viewing in other software."""
+    flat_index = np.flatnonzero(~np.isnan(estimates['idw']).all(axis=1))
+    centroids = block_centroids(grid, flat_index)
+    table = pd.DataFrame({'Block': flat_index, 'X': centroids[:, 0], 'Y': centroids[:, 1], 'Z': centroids[:, 2],
+                          'N_Samples': estimates['n_samples'][flat_index]})
+    for v, name in enumerate(variable_names):
+        table[f'{name}_IDW'] = estimates['idw'][flat_index, v]
+        table[f'{name}_NN'] = estimates['nn'][flat_index, v]
+    table.to_csv(path, index=False, float_format='%.3f')
+    return len(table)
+
+
+def default_workers():
+    """Number of worker processes to use by default (all the CPUs)."""
+    return os.cpu_count() or 1
@@ -0,0 +1,201 @@
+#28DiasPythonParaMinería
+
+#The Bull Miner GitHub repository
+#Follow me on Linkedin for more content like this:    https://www.linkedin.com/in/mikemine/
+
+# Vectorized downhole compositing.
+#
+# Raw samples have uneven lengths (0.3 m to 6 m), so their grades have different "supports".
+# Compositing cuts every hole into regular intervals (for example 2 m or the bench height) and gives each composite
+# the LENGTH-WEIGHTED grade of the sample pieces inside it, plus a DENSITY-WEIGHTED grade using BD_tonnes_m3.
+#
+# Everything is done with NumPy on the whole table at once:
+#   1. each sample is split where it crosses a composite boundary (np.repeat + cumulative counts),
+#   2. the pieces are summed per (hole, composite) in one grouped pass (np.bincount on the group number,
+#      which does the same job as np.add.reduceat but is faster when there are millions of small groups).
+
+# === 1. IMPORT LIBRARIES ===
+import numpy as np # Fast array maths.
+import pandas as pd # Input and output tables.
+
+# Grade columns that get composited.
+GRADE_COLUMNS = ['Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Density column used for the density-weighted grades.
+DENSITY_COLUMN = 'BD_tonnes_m3'
+# Low recovery flag column ('Y' means the sample had 85% recovery or less).
+LOW_RECOVERY_COLUMN = 'LowRecovery_<=85pct'
+# What to do with the short composite left at the bottom of each hole.
+RESIDUAL_OPTIONS = ('drop', 'keep', 'merge')
+
+
+# === 2. SPLITTING SAMPLES AT COMPOSITE BOUNDARIES ===
+def split_intervals(hole, from_m, to_m, composite_length, origin):
+    """
+    Splits every interval where it crosses a composite boundary.
+    'origin' is the depth where the first composite of each interval's hole starts.
+    Returns (parent, composite, piece_from, piece_to): the index of the original interval of each piece,
+    the composite number of the piece inside its hole, and the piece limits.
+    """
+    first = np.floor((from_m - origin) / composite_length).astype(np.int64)
+    last = np.ceil((to_m - origin) / composite_length).astype(np.int64) - 1
+    last = np.maximum(last, first) # Zero-length intervals still make one (empty) piece.
+    pieces = last - first + 1
+
+    parent = np.repeat(np.arange(len(hole)), pieces)
+    # Position of each piece inside its parent: 0, 1, 2... (cumulative count trick, no loop).
+    starts = np.cumsum(pieces) - pieces
+    step = np.arange(len(parent)) - np.repeat(starts, pieces)
+    composite = first[parent] + step
+
+    piece_origin = origin[parent] + composite * composite_length
+    piece_from = np.maximum(from_m[parent], piece_origin)
+    piece_to = np.minimum(to_m[parent], piece_origin + composite_length)
+    return parent, composite, piece_from, piece_to
+
+
+def _group_starts(hole, composite):
+    """Index of the first piece of every (hole, composite) group. Pieces must be sorted by hole and composite."""
+    new_group = np.ones(len(hole), dtype=bool)
+    new_group[1:] = (hole[1:] != hole[:-1]) | (composite[1:] != composite[:-1])
+    return np.flatnonzero(new_group)
+
+
+def _group_ids(starts, size):
+    """Group number of every piece, from the group start indices."""
+    new_group = np.zeros(size, dtype=np.int64)
+    new_group[starts] = 1
+    return np.cumsum(new_group) - 1
+
+
+def _group_sum(values, group, n_groups):
+    """Sum of 'values' per group."""
+    return np.bincount(group, weights=values, minlength=n_groups)
+
+
+def _weighted_average(weights, values, group, n_groups):
+    """Grouped weighted average that ignores missing values (NaN). Groups with no valid value get NaN."""
+    valid = ~np.isnan(values)
+    weights = np.where(valid, weights, 0.0)
+    total_weight = _group_sum(weights, group, n_groups)
+    total = _group_sum(weights * np.where(valid, values, 0.0), group, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total_weight > 0, total / np.where(total_weight > 0, total_weight, 1.0), np.nan)
+
+
+# === 3. COMPOSITING ===
+def composite_samples(samples_df, composite_length=2.0, residual='drop', min_fraction=0.5,
+                      exclude_low_recovery=False, origin='first_sample'):
+    """
+    Regularizes the sample intervals of every hole into composites of 'composite_length' metres.
+
+    samples_df           : HoleID, From_m, To_m, Ag_ppm, Pb_pct, Zn_pct and optionally BD_tonnes_m3 and LowRecovery_<=85pct.
+    residual             : what to do with the last composite of a hole when it has less than
+                           'min_fraction' * composite_length of samples: 'drop' it, 'keep' it, or 'merge' it into the one above.
+    exclude_low_recovery : if True, samples flagged with low recovery do not contribute grades (their length still counts as sampled).
+    origin               : 'first_sample' starts the composites at each hole's first sample, 'collar' starts them at depth 0.
+
+    Returns a DataFrame with one row per composite: HoleID, From_m, To_m, Length_m (sampled length), the length-weighted
+    grades, BD_tonnes_m3, the density-weighted grades (suffix '_dw') and LowRecovery_frac (fraction of the length with low recovery).
+    """
+    if residual not in RESIDUAL_OPTIONS:
+        raise ValueError(f"residual must be one of {RESIDUAL_OPTIONS}, not '{residual}'")
+    if composite_length <= 0:
+        raise ValueError("composite_length must be positive")
+
+    # --- Sort the samples by hole and depth, with the holes as integer codes ---
+    hole_codes, hole_names = pd.factorize(samples_df['HoleID'])
+    from_m = samples_df['From_m'].to_numpy(dtype='float64')
+    to_m = samples_df['To_m'].to_numpy(dtype='float64')
+    # Drillhole files are normally already grouped by hole and sorted by depth, so the (slow) sort is skipped when possible.
+    same_hole = hole_codes[1:] == hole_codes[:-1]
+    is_sorted = np.all((hole_codes[1:] > hole_codes[:-1]) | (same_hole & (from_m[1:] >= from_m[:-1])))
+    order = np.arange(len(hole_codes)) if is_sorted else np.lexsort((from_m, hole_codes))
+    hole_codes, from_m, to_m = hole_codes[order], from_m[order], to_m[order]
+
+    grades = {col: samples_df[col].to_numpy(dtype='float64')[order] for col in GRADE_COLUMNS}
+    if DENSITY_COLUMN in samples_df.columns:
+        density = samples_df[DENSITY_COLUMN].to_numpy(dtype='float64')[order]
+    else:
+        density = np.full(len(order), np.nan)
+    if LOW_RECOVERY_COLUMN in samples_df.columns:
+        low_recovery = (samples_df[LOW_RECOVERY_COLUMN].astype(str).str.upper() == 'Y').to_numpy()[order]
+    else:
+        low_recovery = np.zeros(len(order), dtype=bool)
+    if exclude_low_recovery:
+        for col in GRADE_COLUMNS:
+            grades[col] = np.where(low_recovery, np.nan, grades[col])
+
+    # --- Where the composites of every hole start ---
+    if origin == 'collar':
+        hole_origin = np.zeros(len(hole_names))
+    elif origin == 'first_sample':
+        hole_origin = np.full(len(hole_names), np.inf)
+        np.minimum.at(hole_origin, hole_codes, from_m)
+    else:
+        raise ValueError("origin must be 'first_sample' or 'collar'")
+
+    # --- Split and group ---
+    parent, composite, piece_from, piece_to = split_intervals(
+        hole_codes, from_m, to_m, composite_length, hole_origin[hole_codes])
+    piece_hole = hole_codes[parent]
+    piece_length = piece_to - piece_from
+
+    if residual == 'merge':
+        composite = _merge_residuals(piece_hole, composite, piece_length, composite_length, min_fraction)
+
+    starts = _group_starts(piece_hole, composite)
+    group = _group_ids(starts, len(composite))
+    n_groups = len(starts)
+    length = _group_sum(piece_length, group, n_groups)
+    result = pd.DataFrame({
+        'HoleID': hole_names[piece_hole[starts]],
+        'From_m': np.minimum.reduceat(piece_from, starts),
+        'To_m': np.maximum.reduceat(piece_to, starts),
+        'Length_m': length,
+    })
+
+    # Length-weighted grades and density.
+    for col in GRADE_COLUMNS:
+        result[col] = _weighted_average(piece_length, grades[col][parent], group, n_groups)
+    piece_density = density[parent]
+    result[DENSITY_COLUMN] = _weighted_average(piece_length, piece_density, group, n_groups)
+    # Density-weighted grades: weights are length x density (i.e. tonnes per m2 of section).
+    mass = piece_length * piece_density # NaN where the density is missing, so those pieces are ignored.
+    for col in GRADE_COLUMNS:
+        result[f'{col}_dw'] = _weighted_average(np.where(np.isnan(mass), 0.0, mass),
+                                                np.where(np.isnan(mass), np.nan, grades[col][parent]), group, n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['LowRecovery_frac'] = _group_sum(piece_length * low_recovery[parent], group, n_groups) / length
+
+    # --- Residuals ---
+    if residual == 'drop':
+        # Only the last composite of a hole is a residual (short composites inside a hole are sampling gaps, kept as in 'merge').
+        group_hole = piece_hole[starts]
+        is_last = np.ones(n_groups, dtype=bool)
+        is_last[:-1] = group_hole[1:] != group_hole[:-1]
+        result = result[~is_last | (result['Length_m'] >= min_fraction * composite_length).to_numpy()]
+    return result.reset_index(drop=True)
+
+
+def _merge_residuals(piece_hole, composite, piece_length, composite_length, min_fraction):
+    """Moves the pieces of each hole's last composite into the composite above it when it is too short."""
+    starts = _group_starts(piece_hole, composite)
+    group_length = _group_sum(piece_length, _group_ids(starts, len(composite)), len(starts))
+    group_hole = piece_hole[starts]
+    group_composite = composite[starts]
+    # The last composite of a hole is the last group before the hole changes.
+    is_last = np.ones(len(starts), dtype=bool)
+    is_last[:-1] = group_hole[1:] != group_hole[:-1]
+    has_previous = np.zeros(len(starts), dtype=bool)
+    has_previous[1:] = group_hole[1:] == group_hole[:-1]
+    merge = is_last & has_previous & (group_length < min_fraction * composite_length)
+    if not merge.any():
+        return composite
+
+    # Every piece takes the composite number of the group before it (only used where 'merge' is True).
+    previous_composite = np.empty(len(starts), dtype=composite.dtype)
+    previous_composite[0] = group_composite[0]
+    previous_composite[1:] = group_composite[:-1]
+    sizes = np.diff(np.append(starts, len(composite)))
+    piece_merge = np.repeat(merge, sizes)
+    return np.where(piece_merge, np.repeat(previous_composite, sizes), composite)
@@ -0,0 +1,216 @@
+#28DiasPythonParaMinería
+
+#The Bull Miner GitHub repository
+#Follow me on Linkedin for more content like this:    https://www.linkedin.com/in/mikemine/
+
+# Vectorized desurvey engine.
+#
+# Places sample midpoints in 3D for ALL holes at once with NumPy:
+#   - holes with downhole survey rows (HoleID, Depth_m, Dip, Azimuth) use MINIMUM CURVATURE,
+#   - holes without survey rows fall back to the straight-line math from the collar Dip/Azimuth.
+# There are no per-hole Python loops: holes are handled with sorting, segment boundaries and cumulative sums,
+# and every sample is placed on its hole with a single 'searchsorted'.
+#
+# Angle conventions are the same as the collar file: Dip is negative downwards, Azimuth is clockwise from North.
+
+# === 1. IMPORT LIBRARIES ===
+import numpy as np # Fast array maths.
+import pandas as pd # Used to read the survey table and to build the HoleID lookup.
+
+# Columns we need from the downhole survey file.
+REQUIRED_SURVEY_COLS = ['HoleID', 'Depth_m', 'Dip', 'Azimuth']
+# Below this dogleg angle (radians) a segment is treated as straight, to avoid dividing by ~0.
+MIN_DOGLEG_RAD = 1e-9
+
+
+# === 2. STRAIGHT HOLES ===
+def straight_hole_xyz(easting, northing, elevation, dip, azimuth, from_m, to_m):
+    """
+    Calculates the XYZ of each sample midpoint assuming a straight hole (NumPy arrays in, arrays out).
+    The operations are done in exactly the same order as the DataFrame version so the results are bit-for-bit equal.
+    """
+    midpoint_depth = (from_m + to_m) / 2 # Midpoint depth of each sample.
+    azimuth_rad = np.radians(azimuth) # Azimuth in radians.
+    dip_rad = np.radians(dip) # Dip in radians.
+    sample_x = easting + midpoint_depth * np.sin(azimuth_rad) * np.cos(dip_rad) # Collar Easting + delta X.
+    sample_y = northing + midpoint_depth * np.cos(azimuth_rad) * np.cos(dip_rad) # Collar Northing + delta Y.
+    sample_z = elevation + midpoint_depth * np.sin(dip_rad) # Collar Elevation + delta Z (negative dip goes down).
+    return sample_x, sample_y, sample_z
+
+
+def direction_vectors(dip, azimuth):
+    """Unit direction vectors (East, North, Up) for arrays of Dip/Azimuth in degrees."""
+    dip_rad = np.radians(dip)
+    azimuth_rad = np.radians(azimuth)
+    return np.column_stack([np.sin(azimuth_rad) * np.cos(dip_rad),
+                            np.cos(azimuth_rad) * np.cos(dip_rad),
+                            np.sin(dip_rad)])
+
+
+def _ratio_factor(dogleg):
+    """Minimum curvature ratio factor 2/b * tan(b/2), equal to 1 for straight segments."""
+    rf = np.ones_like(dogleg)
+    curved = dogleg > MIN_DOGLEG_RAD
+    rf[curved] = 2.0 / dogleg[curved] * np.tan(dogleg[curved] / 2.0)
+    return rf
+
+
+# === 3. SURVEY STATIONS ===
+def load_survey(survey_file_path):
+    """Reads a downhole survey CSV and checks its columns. Returns a DataFrame, or None if a column is missing."""
+    survey_df = pd.read_csv(survey_file_path, usecols=lambda col: col in REQUIRED_SURVEY_COLS,
+                            dtype={'Depth_m': 'float64', 'Dip': 'float64', 'Azimuth': 'float64'})
+    if not all(col in survey_df.columns for col in REQUIRED_SURVEY_COLS):
+        print("ERROR: The survey file is missing a required column.")
+        return None
+    return survey_df
+
+
+def build_stations(hole_index, collar_arrays, survey_df):
+    """
+    Runs minimum curvature over every surveyed hole at once.
+
+    'hole_index' and 'collar_arrays' are the collar lookup (see build_collar_lookup in 2_Make_BlockModel.py).
+    Returns a dict of NumPy arrays, one entry per survey station, sorted by hole and depth:
+        'hole'     -> position of the hole in 'hole_index'
+        'depth'    -> downhole depth of the station
+        'xyz'      -> absolute coordinates of the station (n, 3)
+        'dir'      -> unit direction at the station (n, 3)
+        'next_dir' -> direction at the next station of the same hole (its own direction for the last one)
+        'next_depth', 'dogleg' -> depth of the next station and dogleg angle to it
+        'key'      -> sort key used by locate_samples
+        'span'     -> depth span used to build 'key'
+        'has_survey' -> boolean array (one per collar hole) telling which holes have survey rows
+    A station at depth 0 with the collar orientation is added to every hole whose survey does not start at 0.
+    """
+    # --- Keep only surveys of known holes and sort them by (hole, depth) ---
+    hole = hole_index.get_indexer(survey_df['HoleID'])
+    known = hole >= 0
+    if not known.all():
+        print(f"WARNING: {int((~known).sum())} survey rows did not have a matching HoleID in the collar file. They will be ignored.")
+    hole = hole[known]
+    depth = survey_df['Depth_m'].to_numpy(dtype='float64')[known]
+    dip = survey_df['Dip'].to_numpy(dtype='float64')[known]
+    azimuth = survey_df['Azimuth'].to_numpy(dtype='float64')[known]
+
+    # --- Add a collar station (depth 0) where the survey starts below the collar ---
+    order = np.lexsort((depth, hole))
+    hole, depth, dip, azimuth = hole[order], depth[order], dip[order], azimuth[order]
+    is_first = np.ones(len(hole), dtype=bool)
+    is_first[1:] = hole[1:] != hole[:-1]
+    needs_collar = is_first & (depth > 0)
+    collar_holes = hole[needs_collar]
+    hole = np.concatenate([collar_holes, hole])
+    depth = np.concatenate([np.zeros(len(collar_holes)), depth])
+    dip = np.concatenate([collar_arrays['Dip'][collar_holes], dip])
+    azimuth = np.concatenate([collar_arrays['Azimuth'][collar_holes], azimuth])
+    order = np.lexsort((depth, hole))
+    hole, depth, dip, azimuth = hole[order], depth[order], dip[order], azimuth[order]
+
+    # --- Segment boundaries: a segment joins station i to station i+1 of the same hole ---
+    n = len(hole)
+    direction = direction_vectors(dip, azimuth)
+    same_hole_next = np.zeros(n, dtype=bool)
+    same_hole_next[:-1] = hole[1:] == hole[:-1]
+    next_index = np.where(same_hole_next, np.arange(n) + 1, np.arange(n))
+    next_dir = direction[next_index]
+    next_depth = depth[next_index]
+
+    # --- Minimum curvature step of every segment ---
+    cos_dogleg = np.clip(np.einsum('ij,ij->i', direction, next_dir), -1.0, 1.0)
+    dogleg = np.arccos(cos_dogleg)
+    step = ((next_depth - depth) / 2.0 * _ratio_factor(dogleg))[:, None] * (direction + next_dir)
+
+    # --- Cumulative sums within each hole give every station's offset from its collar ---
+    # The steps are shifted by one (station i is reached by the step of station i-1), and the running total
+    # is reset at each hole start by subtracting the total reached at that hole's first station.
+    shifted = np.zeros_like(step)
+    shifted[1:] = step[:-1]
+    cumulative = np.cumsum(shifted, axis=0)
+    is_first = np.ones(n, dtype=bool)
+    is_first[1:] = hole[1:] != hole[:-1]
+    first_index = np.maximum.accumulate(np.where(is_first, np.arange(n), 0))
+    offset = cumulative - cumulative[first_index]
+
+    collar_xyz = np.column_stack([collar_arrays['Easting'][hole], collar_arrays['Northing'][hole],
+                                  collar_arrays['Elevation'][hole]])
+
+    # Sort key (hole, depth) packed in one float, so a single searchsorted finds any sample's station.
+    span = float(np.max(depth, initial=0.0)) + 1.0
+
+    has_survey = np.zeros(len(hole_index), dtype=bool)
+    has_survey[hole] = True
+
+    return {'hole': hole, 'depth': depth, 'xyz': collar_xyz + offset, 'dir': direction,
+            'next_dir': next_dir, 'next_depth': next_depth, 'dogleg': dogleg,
+            'key': hole * span + depth, 'span': span, 'has_survey': has_survey}
+
+
+# === 4. PLACING SAMPLES ON THE HOLES ===
+def locate_depths(stations, hole, depth):
+    """
+    Returns the (n, 3) coordinates of points at downhole 'depth' on holes 'hole' (positions in the collar lookup).
+    Every hole in 'hole' must have survey stations. Points between two stations follow the circular arc;
+    points below the last station continue straight along its direction.
+    """
+    span = stations['span']
+    # One searchsorted for every point: the last station of the same hole at or above the point.
+    # Depths above the collar are clamped to the collar station.
+    key = hole * span + np.clip(depth, 0.0, span - 1.0)
+    station = np.searchsorted(stations['key'], key, side='right') - 1
+
+    base_depth = stations['depth'][station]
+    base_xyz = stations['xyz'][station]
+    t1 = stations['dir'][station]
+    t2 = stations['next_dir'][station]
+    dogleg = stations['dogleg'][station]
+    length = depth - base_depth # Distance along the hole from the station.
+    segment_length = stations['next_depth'][station] - base_depth
+
+    # Fraction of the segment covered (0 for points below the last station, which have no next station).
+    inside = segment_length > 0
+    fraction = np.zeros_like(length)
+    fraction[inside] = np.clip(length[inside] / segment_length[inside], 0.0, 1.0)
+
+    # Direction at the point: spherical interpolation between the two station directions.
+    partial = fraction * dogleg
+    curved = dogleg > MIN_DOGLEG_RAD
+    t_point = t1 + fraction[:, None] * (t2 - t1) # Straight segments: linear blend (t1 == t2 in practice).
+    if curved.any():
+        sin_dogleg = np.sin(dogleg[curved])
+        w1 = np.sin(dogleg[curved] - partial[curved]) / sin_dogleg
+        w2 = np.sin(partial[curved]) / sin_dogleg
+        t_point[curved] = w1[:, None] * t1[curved] + w2[:, None] * t2[curved]
+
+    return base_xyz + (length / 2.0 * _ratio_factor(partial))[:, None] * (t1 + t_point)
+
+
+def desurvey_xyz(hole, from_m, to_m, hole_index, collar_arrays, stations=None):
+    """
+    Calculates Sample_X, Sample_Y, Sample_Z for the sample midpoints of holes 'hole' (positions in the collar lookup).
+    Holes with survey stations use minimum curvature; holes without them use straight_hole_xyz,
+    so a run without any survey file gives exactly the same numbers as before.
+    """
+    if stations is None:
+        return straight_hole_xyz(
+            collar_arrays['Easting'][hole], collar_arrays['Northing'][hole], collar_arrays['Elevation'][hole],
+            collar_arrays['Dip'][hole], collar_arrays['Azimuth'][hole], from_m, to_m)
+
+    sample_x = np.empty(len(hole))
+    sample_y = np.empty(len(hole))
+    sample_z = np.empty(len(hole))
+
+    surveyed = stations['has_survey'][hole]
+    straight = ~surveyed
+    if straight.any():
+        h = hole[straight]
+        sample_x[straight], sample_y[straight], sample_z[straight] = straight_hole_xyz(
+            collar_arrays['Easting'][h], collar_arrays['Northing'][h], collar_arrays['Elevation'][h],
+            collar_arrays['Dip'][h], collar_arrays['Azimuth'][h], from_m[straight], to_m[straight])
+    if surveyed.any():
+        midpoint_depth = (from_m[surveyed] + to_m[surveyed]) / 2
+        xyz = locate_depths(stations, hole[surveyed], midpoint_depth)
+        sample_x[surveyed] = xyz[:, 0]
+        sample_y[surveyed] = xyz[:, 1]
+        sample_z[surveyed] = xyz[:, 2]
+    return sample_x, sample_y, sample_z
@@ -0,0 +1,252 @@
+#28DiasPythonParaMinería
+
+#The Bull Miner GitHub repository
+#Follow me on Linkedin for more content like this:    https://www.linkedin.com/in/mikemine/
+
+# Incremental desurvey into a columnar, hole-partitioned store.
+#
+# Instead of rewriting 'clean_xyz_ag_pb_zn_data.csv' as text every time a few holes are added, the desurveyed samples
+# live in a folder of binary NumPy columns:
+#
+#   desurvey_store/
+#       manifest.json          -> for every hole: its fingerprint and where its rows are (segment, start, stop)
+#       seg_000000/Sample_X.npy, Sample_Y.npy, ...   -> one .npy file per column, rows grouped by hole
+#       seg_000001/...         -> holes recomputed by a later update
+#
+# Each update fingerprints every hole (its collar row + its sample rows + its survey rows) and recomputes ONLY the holes
+# that were added or changed; deleted holes are just removed from the manifest. Recomputed holes go to a new segment,
+# the old rows of changed holes are left as garbage and are cleaned up when a segment has no live rows left
+# (or by compact_store()).
+#
+# Readers memory-map the columns with np.load(..., mmap_mode='r'): no text parsing at all.
+
+# === 1. IMPORT LIBRARIES ===
+import os # File paths.
+import json # The manifest.
+import shutil # Removing dead segments.
+import numpy as np # Fast array maths and the .npy columns.
+import pandas as pd # Input tables and row hashing.
+from desurvey import build_stations, desurvey_xyz # Our vectorized desurvey engine (desurvey.py, same folder).
+
+# Columns saved for every desurveyed sample.
+STORE_COLUMNS = ['From_m', 'To_m', 'Sample_X', 'Sample_Y', 'Sample_Z', 'Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Metal columns (a sample is dropped only if ALL of them are empty, same rule as the CSV output).
+METAL_COLUMNS = ['Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Collar columns that define where a hole is.
+COLLAR_COLUMNS = ['HoleID', 'Easting', 'Northing', 'Elevation', 'Dip', 'Azimuth']
+# Sample columns that go into each hole's fingerprint.
+SAMPLE_COLUMNS = ['HoleID', 'From_m', 'To_m', 'Ag_ppm', 'Pb_pct', 'Zn_pct']
+MANIFEST_FILENAME = 'manifest.json'
+
+
+# === 2. FINGERPRINTS ===
+def _hole_sums(hole_ids, df):
+    """
+    Order-sensitive hash of the rows of each hole: every row is hashed together with its position inside its hole,
+    and the row hashes are added up per hole (uint64, wrapping around). Returns a Series indexed by HoleID.
+    """
+    if len(df) == 0:
+        return pd.Series(dtype='uint64')
+    rank = df.groupby('HoleID', sort=False).cumcount().to_numpy()
+    row_hash = pd.util.hash_pandas_object(df.assign(_rank=rank), index=False).to_numpy()
+    codes, names = pd.factorize(hole_ids)
+    sums = np.zeros(len(names), dtype='uint64')
+    np.add.at(sums, codes, row_hash)
+    return pd.Series(sums, index=names)
+
+
+def fingerprint_holes(collar_df, samples_df, survey_df=None):
+    """One hex fingerprint per collar HoleID, covering its collar row, its samples and its survey rows."""
+    collar_df = collar_df[COLLAR_COLUMNS].drop_duplicates(subset='HoleID', keep='first')
+    collar_hash = pd.Series(pd.util.hash_pandas_object(collar_df, index=False).to_numpy(), index=collar_df['HoleID'])
+    sample_hash = _hole_sums(samples_df['HoleID'], samples_df[SAMPLE_COLUMNS]).reindex(collar_hash.index, fill_value=0)
+    sample_count = samples_df['HoleID'].value_counts().reindex(collar_hash.index, fill_value=0)
+    if survey_df is not None:
+        survey_hash = _hole_sums(survey_df['HoleID'], survey_df).reindex(collar_hash.index, fill_value=0)
+    else:
+        survey_hash = pd.Series(0, index=collar_hash.index, dtype='uint64')
+    return {hole: f'{c:016x}{s:016x}{v:016x}-{n}' for hole, c, s, v, n in
+            zip(collar_hash.index, collar_hash.to_numpy(), sample_hash.to_numpy(), survey_hash.to_numpy(),
+                sample_count.to_numpy())}
+
+
+# === 3. THE MANIFEST ===
+def load_manifest(store_dir):
+    """Reads the store manifest (an empty one if the store does not exist yet)."""
+    path = os.path.join(store_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {'version': 1, 'next_segment': 0, 'columns': STORE_COLUMNS, 'holes': {}, 'segments': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(store_dir, manifest):
+    # Written to a temporary file first, so a crash never leaves a half-written manifest.
+    path = os.path.join(store_dir, MANIFEST_FILENAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.tmp', path)
+
+
+# === 4. INCREMENTAL UPDATE ===
+def _desurvey_holes(collar_df, samples_df, survey_df, holes):
+    """Desurveys the samples of 'holes' only. Returns (hole_names, table) with rows grouped by hole."""
+    collar_df = collar_df[COLLAR_COLUMNS].drop_duplicates(subset='HoleID', keep='first')
+    collar_df = collar_df[collar_df['HoleID'].isin(holes)]
+    hole_index = pd.Index(collar_df['HoleID'])
+    collar = {col: collar_df[col].to_numpy(dtype='float64') for col in COLLAR_COLUMNS[1:]}
+
+    samples = samples_df[samples_df['HoleID'].isin(holes)]
+    hole = hole_index.get_indexer(samples['HoleID'])
+    # Rows grouped by hole, keeping the file order inside each hole.
+    order = np.argsort(hole, kind='stable')
+    hole = hole[order]
+    samples = samples.iloc[order]
+
+    stations = None
+    if survey_df is not None:
+        survey = survey_df[survey_df['HoleID'].isin(holes)]
+        if len(survey):
+            stations = build_stations(hole_index, collar, survey)
+
+    from_m = samples['From_m'].to_numpy(dtype='float64')
+    to_m = samples['To_m'].to_numpy(dtype='float64')
+    sample_x, sample_y, sample_z = desurvey_xyz(hole, from_m, to_m, hole_index, collar, stations)
+    table = {'From_m': from_m, 'To_m': to_m, 'Sample_X': sample_x, 'Sample_Y': sample_y, 'Sample_Z': sample_z}
+    for col in METAL_COLUMNS:
+        table[col] = samples[col].to_numpy(dtype='float64')
+
+    # Same cleaning rule as the CSV output: drop a row only if ALL metal values are empty.
+    keep = ~np.all(np.isnan(np.column_stack([table[col] for col in METAL_COLUMNS])), axis=1)
+    table = {col: values[keep] for col, values in table.items()}
+    return np.asarray(hole_index)[hole[keep]], table
+
+
+def update_store(store_dir, collar_df, samples_df, survey_df=None):
+    """
+    Brings the store up to date with the input tables, recomputing only added and changed holes.
+    Samples whose HoleID is not in the collar table are ignored (as in the CSV output).
+    Returns a dict with the lists of added, changed and deleted holes.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_manifest(store_dir)
+    fingerprints = fingerprint_holes(collar_df, samples_df, survey_df)
+
+    stored = manifest['holes']
+    added = [hole for hole in fingerprints if hole not in stored]
+    changed = [hole for hole in fingerprints if hole in stored and stored[hole]['hash'] != fingerprints[hole]]
+    deleted = [hole for hole in stored if hole not in fingerprints]
+
+    # --- Forget the old rows of changed and deleted holes ---
+    for hole in changed + deleted:
+        entry = stored.pop(hole)
+        manifest['segments'][entry['segment']]['live'] -= entry['stop'] - entry['start']
+
+    # --- Desurvey the new and changed holes into a new segment ---
+    to_compute = added + changed
+    if to_compute:
+        segment = f"seg_{manifest['next_segment']:06d}"
+        manifest['next_segment'] += 1
+        hole_names, table = _desurvey_holes(collar_df, samples_df, survey_df, to_compute)
+        _write_segment(os.path.join(store_dir, segment), table)
+        manifest['segments'][segment] = {'rows': len(hole_names), 'live': len(hole_names)}
+
+        # Row range of every hole inside the new segment (rows are grouped by hole).
+        starts = np.flatnonzero(np.r_[True, hole_names[1:] != hole_names[:-1]]) if len(hole_names) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(hole_names)]
+        ranges = {hole_names[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+        for hole in to_compute:
+            start, stop = ranges.get(hole, (0, 0)) # Holes without usable samples have an empty range.
+            stored[hole] = {'hash': fingerprints[hole], 'segment': segment, 'start': start, 'stop': stop}
+
+    # --- Remove segments that no longer have live rows ---
+    for segment in [name for name, info in manifest['segments'].items() if info['live'] == 0]:
+        if not any(entry['segment'] == segment for entry in stored.values()):
+            shutil.rmtree(os.path.join(store_dir, segment), ignore_errors=True)
+            del manifest['segments'][segment]
+
+    _save_manifest(store_dir, manifest)
+    return {'added': added, 'changed': changed, 'deleted': deleted}
+
+
+def _write_segment(segment_dir, table):
+    os.makedirs(segment_dir, exist_ok=True)
+    for col in STORE_COLUMNS:
+        np.save(os.path.join(segment_dir, f'{col}.npy'), np.ascontiguousarray(table[col]))
+
+
+def compact_store(store_dir):
+    """Rewrites all the live rows into a single segment (removes the garbage left by changed holes)."""
+    manifest = load_manifest(store_dir)
+    columns = read_columns(store_dir, STORE_COLUMNS)
+    segment = f"seg_{manifest['next_segment']:06d}"
+    manifest['next_segment'] += 1
+    _write_segment(os.path.join(store_dir, segment), columns)
+    # read_columns returns the holes in _live_ranges order, so the new ranges follow the same order.
+    start = 0
+    for holes, starts, stops in _live_ranges(manifest).values():
+        for hole, n in zip(holes, stops - starts):
+            manifest['holes'][hole].update(segment=segment, start=start, stop=start + int(n))
+            start += int(n)
+    for hole, entry in manifest['holes'].items():
+        if entry['stop'] == entry['start']: # Holes without rows.
+            entry.update(segment=segment, start=0, stop=0)
+    old_segments = list(manifest['segments'])
+    manifest['segments'] = {segment: {'rows': start, 'live': start}}
+    _save_manifest(store_dir, manifest)
+    for old in old_segments:
+        shutil.rmtree(os.path.join(store_dir, old), ignore_errors=True)
+
+
+# === 5. READING THE STORE ===
+def open_segment(store_dir, segment, columns=None):
+    """Memory-maps the columns of one segment (nothing is read until the arrays are used)."""
+    columns = columns or STORE_COLUMNS
+    return {col: np.load(os.path.join(store_dir, segment, f'{col}.npy'), mmap_mode='r') for col in columns}
+
+
+def read_hole(store_dir, hole, columns=None, manifest=None):
+    """Memory-mapped views of the rows of one hole."""
+    manifest = manifest or load_manifest(store_dir)
+    entry = manifest['holes'][hole]
+    segment = open_segment(store_dir, entry['segment'], columns)
+    return {col: values[entry['start']:entry['stop']] for col, values in segment.items()}
+
+
+def _live_ranges(manifest):
+    """For every segment: (hole names, start rows, stop rows) of its live holes, sorted by start row."""
+    by_segment = {}
+    for hole, entry in manifest['holes'].items():
+        if entry['stop'] > entry['start']:
+            by_segment.setdefault(entry['segment'], []).append((entry['start'], entry['stop'], hole))
+    ranges = {}
+    for segment in sorted(by_segment):
+        rows = sorted(by_segment[segment])
+        ranges[segment] = (np.array([r[2] for r in rows], dtype=object),
+                           np.array([r[0] for r in rows], dtype='int64'), np.array([r[1] for r in rows], dtype='int64'))
+    return ranges
+
+
+def read_columns(store_dir, columns=None):
+    """
+    Live rows of the store as in-memory arrays (grouped by hole, segment by segment).
+    Segments are memory-mapped and only their live rows are copied.
+    """
+    columns = columns or STORE_COLUMNS
+    manifest = load_manifest(store_dir)
+    pieces = {col: [] for col in columns}
+    for segment, (holes, starts, stops) in _live_ranges(manifest).items():
+        mapped = open_segment(store_dir, segment, columns)
+        # Row numbers of all the live ranges at once: ranges of consecutive integers built with repeat + cumsum.
+        lengths = stops - starts
+        rows = np.repeat(starts - np.cumsum(np.r_[0, lengths[:-1]]), lengths) + np.arange(lengths.sum())
+        for col in columns:
+            pieces[col].append(np.asarray(mapped[col][rows]))
+    return {col: np.concatenate(pieces[col]) if pieces[col] else np.array([]) for col in columns}
+
+
+def read_hole_ids(store_dir):
+    """HoleID of every row returned by read_columns (same order)."""
+    manifest = load_manifest(store_dir)
+    return np.concatenate([np.repeat(holes, stops - starts) for holes, starts, stops in _live_ranges(manifest).values()]
+                          or [np.array([], dtype=object)])
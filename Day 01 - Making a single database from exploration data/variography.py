@@ -0,0 +1,251 @@
+#28DiasPythonParaMinería
+
+#The Bull Miner GitHub repository
+#Follow me on Linkedin for more content like this:    https://www.linkedin.com/in/mikemine/
+
+# Experimental variograms for Ag, Pb and Zn, before kriging the Day 01 output.
+#
+# A naive variogram looks at every pair of points (n² pairs), which is unusable above ~50k composites.
+# Here a KD-tree returns only the pairs closer than the maximum lag, a chunk of points at a time, so memory stays bounded.
+# Each chunk of pairs is binned by lag distance and by direction (tolerance cone + bandwidth) and added to running sums
+# for ALL the variables in one pass:  gamma(h) = sum( (z_i - z_j)² ) / (2 * N(h)).
+#
+# Downhole variograms use the HoleID ordering instead of the tree (pairs of samples of the same hole).
+#
+# Usage example:
+#   python variography.py --input clean_xyz_ag_pb_zn_data.csv --lag 10 --nlags 15 --direction 0 0 22.5 --direction 90 0 22.5
+
+# === 1. IMPORT LIBRARIES ===
+import os # File paths and CPU count.
+import argparse # Command line options.
+from concurrent.futures import ProcessPoolExecutor # Process pool for the point chunks.
+import numpy as np # Fast array maths.
+import pandas as pd # Input and output tables.
+from scipy.spatial import cKDTree # Spatial index for the pair search.
+
+# Grades used by default.
+DEFAULT_VARIABLES = ['Ag_ppm', 'Pb_pct', 'Zn_pct']
+# Coordinate columns of the desurveyed point file.
+XYZ_COLUMNS = ['Sample_X', 'Sample_Y', 'Sample_Z']
+# An omnidirectional "direction": any azimuth, any dip.
+OMNIDIRECTIONAL = {'name': 'omni', 'azimuth': 0.0, 'dip': 0.0, 'tolerance': 90.0, 'bandwidth': np.inf}
+# Default number of points whose pairs are generated at once.
+DEFAULT_CHUNK_SIZE = 20_000
+
+
+# === 2. DIRECTIONS ===
+def make_direction(azimuth, dip, tolerance, bandwidth=np.inf, name=None):
+    """A variogram direction: azimuth (clockwise from North), dip (positive downwards), half-angle tolerance and bandwidth."""
+    return {'name': name or f'az{azimuth:g}_dip{dip:g}', 'azimuth': float(azimuth), 'dip': float(dip),
+            'tolerance': float(tolerance), 'bandwidth': float(bandwidth)}
+
+
+def _unit_vector(direction):
+    az, dp = np.radians(direction['azimuth']), np.radians(direction['dip'])
+    return np.array([np.sin(az) * np.cos(dp), np.cos(az) * np.cos(dp), -np.sin(dp)])
+
+
+# === 3. BINNING PAIRS ===
+def _accumulate(sums, offset, distance, diff_sq, directions, lag, n_lags):
+    """
+    Adds a batch of pairs to the running sums.
+    offset (p, 3) is the vector between the two points of each pair, distance (p,) its length,
+    diff_sq (p, v) the squared grade differences (NaN if one of the grades is missing).
+    """
+    lag_index = np.floor(distance / lag + 0.5).astype(np.int64) # Lag k covers [(k - 0.5) * lag, (k + 0.5) * lag).
+    in_range = (lag_index >= 1) & (lag_index <= n_lags)
+    valid = ~np.isnan(diff_sq)
+    diff_sq = np.where(valid, diff_sq, 0.0)
+    n_bins = len(directions) * n_lags
+
+    for d, direction in enumerate(directions):
+        if direction['tolerance'] >= 90.0 and np.isinf(direction['bandwidth']):
+            keep = in_range # Omnidirectional: every pair counts.
+        else:
+            # Pairs are not oriented, so the angle to the direction is taken on |cos|.
+            along = np.abs(offset @ _unit_vector(direction))
+            keep = in_range & (along >= np.cos(np.radians(direction['tolerance'])) * distance)
+            if np.isfinite(direction['bandwidth']):
+                across = np.sqrt(np.maximum(distance ** 2 - along ** 2, 0.0))
+                keep &= across <= direction['bandwidth']
+        bins = d * n_lags + lag_index[keep] - 1
+        for v in range(diff_sq.shape[1]):
+            sums['n'][:, v] += np.bincount(bins, weights=valid[keep, v], minlength=n_bins)
+            sums['sum_sq'][:, v] += np.bincount(bins, weights=diff_sq[keep, v], minlength=n_bins)
+            sums['sum_h'][:, v] += np.bincount(bins, weights=distance[keep] * valid[keep, v], minlength=n_bins)
+
+
+def _empty_sums(n_bins, n_vars):
+    return {key: np.zeros((n_bins, n_vars)) for key in ('n', 'sum_sq', 'sum_h')}
+
+
+# Per-process state: each worker builds the KD-tree once.
+_WORKER = {}
+
+
+def _init_worker(xyz, values, directions, lag, n_lags):
+    _WORKER.update(xyz=xyz, values=values, directions=directions, lag=lag, n_lags=n_lags, tree=cKDTree(xyz))
+
+
+def _pairs_of_chunk(bounds):
+    """Sums of all the pairs (i, j) with i in [start, stop), j > i and distance below the maximum lag."""
+    start, stop = bounds
+    w = _WORKER
+    max_distance = (w['n_lags'] + 0.5) * w['lag']
+    chunk_tree = cKDTree(w['xyz'][start:stop])
+    pairs = chunk_tree.sparse_distance_matrix(w['tree'], max_distance, output_type='ndarray')
+    i = pairs['i'] + start
+    j = pairs['j']
+    keep = j > i # Each pair only once (and no point paired with itself).
+    i, j, distance = i[keep], j[keep], pairs['v'][keep]
+    offset = w['xyz'][j] - w['xyz'][i]
+    diff_sq = (w['values'][j] - w['values'][i]) ** 2
+    sums = _empty_sums(len(w['directions']) * w['n_lags'], w['values'].shape[1])
+    _accumulate(sums, offset, distance, diff_sq, w['directions'], w['lag'], w['n_lags'])
+    return sums
+
+
+def _to_table(sums, directions, variables, lag, n_lags):
+    """Turns the running sums into a tidy table: one row per direction, lag and variable."""
+    rows = []
+    for d, direction in enumerate(directions):
+        for k in range(n_lags):
+            b = d * n_lags + k
+            for v, name in enumerate(variables):
+                n = sums['n'][b, v]
+                rows.append({'direction': direction['name'], 'azimuth': direction['azimuth'], 'dip': direction['dip'],
+                             'lag': (k + 1) * lag, 'mean_distance': sums['sum_h'][b, v] / n if n else np.nan,
+                             'variable': name, 'n_pairs': int(n),
+                             'gamma': sums['sum_sq'][b, v] / (2 * n) if n else np.nan})
+    return pd.DataFrame(rows)
+
+
+# === 4. EXPERIMENTAL VARIOGRAMS ===
+def subsample(df, n, seed=42):
+    """Random subset of 'n' rows with a fixed seed (the full table if it is smaller)."""
+    if n is None or n >= len(df):
+        return df
+    rng = np.random.default_rng(seed)
+    return df.iloc[np.sort(rng.choice(len(df), size=n, replace=False))]
+
+
+def experimental_variograms(points_df, lag, n_lags, directions=None, variables=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Directional experimental variograms of several variables in a single pass over the pairs.
+
+    points_df  : table with Sample_X, Sample_Y, Sample_Z and the variables.
+    lag        : lag spacing (m). Lag k collects the pairs separated by k * lag +/- lag / 2.
+    n_lags     : number of lags (the maximum pair distance is (n_lags + 0.5) * lag).
+    directions : list of make_direction(...) dicts (default: omnidirectional).
+    workers    : processes for the point chunks (1 = run in this process).
+    Returns a tidy DataFrame (direction, lag, variable, n_pairs, gamma...).
+    """
+    directions = directions or [OMNIDIRECTIONAL]
+    variables = variables or DEFAULT_VARIABLES
+    xyz = np.ascontiguousarray(points_df[XYZ_COLUMNS].to_numpy(dtype='float64'))
+    values = np.ascontiguousarray(points_df[variables].to_numpy(dtype='float64'))
+    sums = _empty_sums(len(directions) * n_lags, len(variables))
+    chunks = [(start, min(start + chunk_size, len(xyz))) for start in range(0, len(xyz), chunk_size)]
+
+    def add(chunk_sums):
+        for key in sums:
+            sums[key] += chunk_sums[key]
+
+    if workers <= 1:
+        _init_worker(xyz, values, directions, lag, n_lags)
+        for bounds in chunks:
+            add(_pairs_of_chunk(bounds))
+        _WORKER.clear()
+    else:
+        # Chunk results are added in chunk order, so the sums do not depend on the number of workers.
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(xyz, values, directions, lag, n_lags)) as pool:
+            for chunk_sums in pool.map(_pairs_of_chunk, chunks):
+                add(chunk_sums)
+    return _to_table(sums, directions, variables, lag, n_lags)
+
+
+def downhole_variograms(points_df, lag, n_lags, variables=None, max_neighbours=None):
+    """
+    Downhole experimental variograms: pairs of samples of the same hole, with the lag measured along the hole.
+    Needs HoleID and From_m/To_m (for example the composites file). Samples are paired with the next
+    1, 2, ... samples of their hole, a vectorized pass per offset, up to the largest offset that can still be
+    within the maximum lag distance (derived from the closest sample spacing), or 'max_neighbours' if given.
+    """
+    variables = variables or DEFAULT_VARIABLES
+    hole, _ = pd.factorize(points_df['HoleID'])
+    depth = ((points_df['From_m'] + points_df['To_m']) / 2).to_numpy(dtype='float64')
+    order = np.lexsort((depth, hole))
+    hole, depth = hole[order], depth[order]
+    values = points_df[variables].to_numpy(dtype='float64')[order]
+    max_distance = (n_lags + 0.5) * lag
+
+    # Largest useful offset: no hole can fit more than max_distance / (closest spacing) samples within the maximum lag.
+    same_hole_next = hole[1:] == hole[:-1] # Consecutive samples of the same hole.
+    spacing = np.diff(depth)[same_hole_next] # Distance between them along the hole.
+    longest_hole = int(np.bincount(hole).max()) if len(hole) else 1 # Offsets beyond the longest hole pair nothing.
+    positive = spacing[spacing > 0]
+    step_limit = longest_hole - 1
+    if len(positive) and not (spacing == 0).any(): # Repeated depths break the bound, then the hole length is the limit.
+        step_limit = min(step_limit, int(np.ceil(max_distance / positive.min())))
+    capped = max_neighbours is not None and max_neighbours < step_limit # The caller's limit is tighter than the bound.
+    if capped:
+        step_limit = max_neighbours
+
+    direction = {'name': 'downhole', 'azimuth': np.nan, 'dip': np.nan, 'tolerance': 90.0, 'bandwidth': np.inf}
+    sums = _empty_sums(n_lags, len(variables))
+    truncated = False # True if the caller's limit was reached while offsets still found pairs.
+    for step in range(1, step_limit + 1):
+        same_hole = hole[step:] == hole[:-step]
+        distance = depth[step:] - depth[:-step]
+        keep = same_hole & (distance <= max_distance)
+        if not keep.any():
+            break # Samples are sorted by depth, so larger offsets can only be farther away.
+        truncated = capped and step == step_limit
+        diff_sq = (values[step:][keep] - values[:-step][keep]) ** 2
+        _accumulate(sums, np.zeros((int(keep.sum()), 3)), distance[keep], diff_sq, [direction], lag, n_lags)
+    if truncated:
+        print(f"WARNING: Downhole pairs were limited to the next {step_limit} samples of each hole; "
+              f"closer-spaced samples have pairs within {max_distance:g} m that were not counted.")
+    return _to_table(sums, [direction], variables, lag, n_lags)
+
+
+# === 5. COMMAND LINE ===
+def main():
+    parser = argparse.ArgumentParser(description="Experimental variograms of the desurveyed Day 01 points.")
+    parser.add_argument('--input', default='clean_xyz_ag_pb_zn_data.csv', help="Point file in the script folder.")
+    parser.add_argument('--output', default='variograms_experimental.csv', help="Output CSV in the script folder.")
+    parser.add_argument('--lag', type=float, required=True, help="Lag spacing (m).")
+    parser.add_argument('--nlags', type=int, default=10, help="Number of lags.")
+    parser.add_argument('--direction', type=float, nargs='+', action='append', default=None,
+                        metavar='AZ DIP TOL [BANDWIDTH]', help="Direction (repeat for several). Default: omnidirectional.")
+    parser.add_argument('--downhole', action='store_true', help="Also compute downhole variograms (needs HoleID, From_m, To_m).")
+    parser.add_argument('--subsample', type=int, default=None, help="Use a random subset of this many points.")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the random subset.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes for the pair search.")
+    args = parser.parse_args()
+
+    for d in args.direction or []: # Each direction needs AZ DIP TOL and, optionally, a bandwidth.
+        if not 3 <= len(d) <= 4:
+            parser.error(f"--direction takes AZ DIP TOL [BANDWIDTH] (3 or 4 numbers), got {len(d)}: {' '.join(f'{v:g}' for v in d)}")
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    points_df = pd.read_csv(os.path.join(script_dir, args.input))
+    points_df = subsample(points_df, args.subsample, args.seed)
+    directions = [make_direction(*d) for d in args.direction] if args.direction else None
+
+    print(f"Computing variograms of {len(points_df)} points...")
+    tables = [experimental_variograms(points_df, args.lag, args.nlags, directions, workers=args.workers)]
+    if args.downhole:
+        if 'HoleID' not in points_df.columns:
+            print("ERROR: Downhole variograms need HoleID, From_m and To_m (use the composites file).")
+            return
+        tables.append(downhole_variograms(points_df, args.lag, args.nlags))
+    result = pd.concat(tables, ignore_index=True)
+    result.to_csv(os.path.join(script_dir, args.output), index=False, float_format='%.6g')
+    print(f"Saved '{args.output}' ({len(result)} rows).")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,18 @@
 # pip install pulp matplotlib
 # --------------------------------------------------------------------------
 
+import argparse
+import os
+import sys
+
 import pulp
 import matplotlib.pyplot as plt
 
+# Instrumentación por etapas compartida (carpeta 'comun' en la raíz del repositorio)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun import instrumentacion
+from comun.instrumentacion import etapa
+
 # --- PASO 1: Definición de los Datos del Problema ---
 
 stockpiles = {
@@ -31,32 +40,37 @@ planta_req = {
 
 # --- PASO 2: Creación del Modelo de Programación Lineal ---
 
-model = pulp.LpProblem("Optimizacion_Mezcla_Costo_Restringido", pulp.LpMaximize)
+def construir_modelo(stockpiles, planta_req):
+    model = pulp.LpProblem("Optimizacion_Mezcla_Costo_Restringido", pulp.LpMaximize)
 
-tons_to_take = pulp.LpVariable.dicts(
-    "Tons", stockpiles.keys(), lowBound=0, cat='Continuous'
-)
+    tons_to_take = pulp.LpVariable.dicts(
+        "Tons", stockpiles.keys(), lowBound=0, cat='Continuous'
+    )
 
-# --- PASO 3: Definición del Objetivo y las Restricciones ---
+    # --- PASO 3: Definición del Objetivo y las Restricciones ---
 
-model += pulp.lpSum([tons_to_take[s] * stockpiles[s]['cu_grade'] for s in stockpiles]), "Total_Cobre_Maximizar"
+    model += pulp.lpSum([tons_to_take[s] * stockpiles[s]['cu_grade'] for s in stockpiles]), "Total_Cobre_Maximizar"
 
-model += pulp.lpSum([tons_to_take[s] for s in stockpiles]) == planta_req['total_feed_tons'], "Alimentacion_Exacta_Planta"
+    model += pulp.lpSum([tons_to_take[s] for s in stockpiles]) == planta_req['total_feed_tons'], "Alimentacion_Exacta_Planta"
 
-model += pulp.lpSum([
-    tons_to_take[s] * stockpiles[s]['as_grade'] for s in stockpiles
-]) <= planta_req['max_as_grade_plant'] * planta_req['total_feed_tons'], "Maximo_Arsenico_Permitido"
+    model += pulp.lpSum([
+        tons_to_take[s] * stockpiles[s]['as_grade'] for s in stockpiles
+    ]) <= planta_req['max_as_grade_plant'] * planta_req['total_feed_tons'], "Maximo_Arsenico_Permitido"
 
-model += pulp.lpSum([
-    tons_to_take[s] * stockpiles[s]['cost_per_ton'] for s in stockpiles
-]) <= planta_req['max_total_cost'], "Maximo_Costo_Total"
+    model += pulp.lpSum([
+        tons_to_take[s] * stockpiles[s]['cost_per_ton'] for s in stockpiles
+    ]) <= planta_req['max_total_cost'], "Maximo_Costo_Total"
 
-for s in stockpiles:
-    model += tons_to_take[s] <= stockpiles[s]['tons_available'], f"Maximo_Tons_{s}"
+    for s in stockpiles:
+        model += tons_to_take[s] <= stockpiles[s]['tons_available'], f"Maximo_Tons_{s}"
+
+    return model, tons_to_take
 
 # --- PASO 4: Resolver el Problema ---
 
-model.solve(pulp.PULP_CBC_CMD(msg=False))
+def resolver_modelo(model):
+    model.solve(pulp.PULP_CBC_CMD(msg=False))
+    return pulp.LpStatus[model.status]
 
 # --- PASO 5: Función para Generar el Gráfico ---
 
@@ -86,41 +100,58 @@ def generar_grafico_resultados(resultados_dict, titulo, filename):
 
 # --- PASO 6: Presentación de Resultados en Consola y Llamada al Gráfico ---
 
-print("="*60)
-print(f"Día 02: Resultados de Optimización con Restricción de Costo")
-print("="*60)
-print(f"Estado de la solución: {pulp.LpStatus[model.status]}")
-
-if pulp.LpStatus[model.status] == 'Optimal':
-    total_tons_mezcla = 0
-    total_costo_mezcla = 0
-    total_cobre_fino = 0
-    total_arsenico_fino = 0
-
-    print("\n--- Plan de Extracción Óptimo ---")
-    datos_para_grafico = {s: tons_to_take[s].varValue for s in stockpiles}
+def main():
+    parser = argparse.ArgumentParser(description="Mezcla óptima de stockpiles con restricciones de costo y arsénico.")
+    instrumentacion.agregar_argumentos(parser)
+    instrumentacion.configurar_desde_argumentos(parser.parse_args())
+
+    with etapa("Construcción del modelo", filas=len(stockpiles)):
+        model, tons_to_take = construir_modelo(stockpiles, planta_req)
+    with etapa("Resolución (CBC)", filas=len(stockpiles)):
+        estado = resolver_modelo(model)
+
+    print("="*60)
+    print(f"Día 02: Resultados de Optimización con Restricción de Costo")
+    print("="*60)
+    print(f"Estado de la solución: {estado}")
+
+    if estado == 'Optimal':
+        total_tons_mezcla = 0
+        total_costo_mezcla = 0
+        total_cobre_fino = 0
+        total_arsenico_fino = 0
+
+        print("\n--- Plan de Extracción Óptimo ---")
+        datos_para_grafico = {s: tons_to_take[s].varValue for s in stockpiles}
     
-    for s, tons in datos_para_grafico.items():
-        print(f"  - Extraer {tons:,.2f} toneladas de {s}")
-        total_tons_mezcla += tons
-        total_costo_mezcla += tons * stockpiles[s]['cost_per_ton']
-        total_cobre_fino += tons * stockpiles[s]['cu_grade']
-        total_arsenico_fino += tons * stockpiles[s]['as_grade']
-
-    ley_cu_final = total_cobre_fino / total_tons_mezcla
-    ley_as_final = total_arsenico_fino / total_tons_mezcla
-    costo_promedio_ton = total_costo_mezcla / total_tons_mezcla
-
-    print("\n--- Resumen de la Mezcla Final ---")
-    print(f"Tonelaje Total Alimentado: {total_tons_mezcla:,.2f} Toneladas")
-    print(f"Costo Total de Extracción: ${total_costo_mezcla:,.2f} (Límite <= ${planta_req['max_total_cost']:,})")
-    print(f"Ley de Cobre (Cu) en Cabeza: {ley_cu_final:.3f}% (Objetivo Maximizado)")
-    print(f"Ley de Arsénico (As) en Cabeza: {ley_as_final:.3f}% (Límite <= {planta_req['max_as_grade_plant']:.3f}%)")
+        for s, tons in datos_para_grafico.items():
+            print(f"  - Extraer {tons:,.2f} toneladas de {s}")
+            total_tons_mezcla += tons
+            total_costo_mezcla += tons * stockpiles[s]['cost_per_ton']
+            total_cobre_fino += tons * stockpiles[s]['cu_grade']
+            total_arsenico_fino += tons * stockpiles[s]['as_grade']
+
+        ley_cu_final = total_cobre_fino / total_tons_mezcla
+        ley_as_final = total_arsenico_fino / total_tons_mezcla
+        costo_promedio_ton = total_costo_mezcla / total_tons_mezcla
+
+        print("\n--- Resumen de la Mezcla Final ---")
+        print(f"Tonelaje Total Alimentado: {total_tons_mezcla:,.2f} Toneladas")
+        print(f"Costo Total de Extracción: ${total_costo_mezcla:,.2f} (Límite <= ${planta_req['max_total_cost']:,})")
+        print(f"Ley de Cobre (Cu) en Cabeza: {ley_cu_final:.3f}% (Objetivo Maximizado)")
+        print(f"Ley de Arsénico (As) en Cabeza: {ley_as_final:.3f}% (Límite <= {planta_req['max_as_grade_plant']:.3f}%)")
     
-    titulo_grafico = f'Plan Óptimo con Presupuesto de ${planta_req["max_total_cost"]:,}'
-    generar_grafico_resultados(datos_para_grafico, titulo_grafico, "dia02_plan_costo_restringido.png")
+        titulo_grafico = f'Plan Óptimo con Presupuesto de ${planta_req["max_total_cost"]:,}'
+        with etapa("Gráfico"):
+            generar_grafico_resultados(datos_para_grafico, titulo_grafico, "dia02_plan_costo_restringido.png")
+
+    else:
+        print("\nNo se encontró una solución óptima.")
+
+    print("="*60)
 
-else:
-    print("\nNo se encontró una solución óptima.")
 
-print("="*60)
\ No newline at end of file
+# Los datos y funciones de arriba se pueden importar desde otros scripts (por ejemplo el barrido de escenarios)
+# sin resolver el modelo; solo se resuelve al ejecutar este archivo directamente.
+if __name__ == "__main__":
+    main()
\ No newline at end of file
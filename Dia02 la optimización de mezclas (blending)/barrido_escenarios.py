@@ -0,0 +1,293 @@
+# --------------------------------------------------------------------------
+# #28DiasDePythonParaMineria - Día 02 (complemento)
+# Título: Barrido Paramétrico de Escenarios para la Optimización de Mezclas
+#
+# Descripción:
+# Resuelve el mismo modelo de Dia02.py para miles de combinaciones de presupuesto (max_total_cost)
+# y límite de arsénico (max_as_grade_plant) y entrega la curva de compromiso Ley de Cu vs Costo vs As.
+#
+# La matriz de restricciones se arma UNA sola vez; entre escenarios solo cambian los lados derechos.
+# Con 'highspy' instalado el mismo modelo HiGHS se reutiliza (arranque en caliente desde la base anterior);
+# sin 'highspy' se usa scipy.optimize.linprog con las mismas matrices ya armadas.
+# Los escenarios imposibles se descartan antes de resolver con cotas baratas (llenado voraz por ley/costo).
+#
+# Librerías necesarias:
+# pip install pulp matplotlib numpy pandas scipy
+# pip install highspy   (opcional, recomendado)
+# --------------------------------------------------------------------------
+
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy.optimize import linprog
+
+try:
+    import highspy
+except ImportError:  # Sin highspy usamos el HiGHS que trae scipy
+    highspy = None
+
+from Dia02 import stockpiles, planta_req
+
+# Tamaño de cada lote de escenarios enviado a un proceso
+TAMANO_LOTE = 500
+
+# --- PASO 1: Armado del Modelo en Forma Matricial (una sola vez) ---
+
+def construir_matrices(stockpiles, total_feed_tons):
+    """
+    Fila 0: sum(x) == alimentación;  fila 1: sum(x * As) <= límite_As * alimentación;
+    fila 2: sum(x * costo) <= presupuesto;  cotas 0 <= x <= toneladas disponibles.
+    """
+    nombres = list(stockpiles.keys())
+    cu = np.array([stockpiles[s]['cu_grade'] for s in nombres], dtype=float)
+    arsenico = np.array([stockpiles[s]['as_grade'] for s in nombres], dtype=float)
+    costo = np.array([stockpiles[s]['cost_per_ton'] for s in nombres], dtype=float)
+    capacidad = np.array([stockpiles[s]['tons_available'] for s in nombres], dtype=float)
+    return {
+        'nombres': nombres,
+        'cu': cu, 'as': arsenico, 'costo': costo, 'capacidad': capacidad,
+        'A': np.vstack([np.ones(len(nombres)), arsenico, costo]),
+        'total_feed_tons': float(total_feed_tons),
+    }
+
+
+def crear_resolvedor(matrices):
+    """
+    Devuelve una función resolver(max_as_grade, max_total_cost) -> (estado, toneladas).
+    El modelo se construye aquí una vez; cada llamada solo cambia los lados derechos.
+    """
+    A = matrices['A']
+    feed = matrices['total_feed_tons']
+    n = A.shape[1]
+
+    if highspy is not None:
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        inf = highspy.kHighsInf
+        lp = highspy.HighsLp()
+        lp.num_col_ = n
+        lp.num_row_ = 3
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = matrices['cu']
+        lp.col_lower_ = np.zeros(n)
+        lp.col_upper_ = matrices['capacidad']
+        lp.row_lower_ = np.array([feed, -inf, -inf])
+        lp.row_upper_ = np.array([feed, inf, inf])
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = np.arange(0, 3 * n + 1, n)
+        lp.a_matrix_.index_ = np.tile(np.arange(n), 3)
+        lp.a_matrix_.value_ = A.ravel()
+        h.passModel(lp)
+
+        def resolver(max_as_grade, max_total_cost):
+            h.changeRowBounds(1, -inf, max_as_grade * feed)
+            h.changeRowBounds(2, -inf, max_total_cost)
+            h.run()
+            if h.getModelStatus() == highspy.HighsModelStatus.kOptimal:
+                return 'Optimal', np.array(h.getSolution().col_value)
+            if h.getModelStatus() == highspy.HighsModelStatus.kInfeasible:
+                return 'Infeasible', None
+            # Ante cualquier estado dudoso se parte de cero en el siguiente escenario
+            h.clearSolver()
+            return 'Not Solved', None
+        return resolver
+
+    limites = list(zip(np.zeros(n), matrices['capacidad']))
+
+    def resolver(max_as_grade, max_total_cost):
+        r = linprog(-matrices['cu'], A_ub=A[1:], b_ub=[max_as_grade * feed, max_total_cost],
+                    A_eq=A[:1], b_eq=[feed], bounds=limites, method='highs')
+        if r.status == 0:
+            return 'Optimal', r.x
+        return ('Infeasible' if r.status == 2 else 'Not Solved'), None
+    return resolver
+
+# --- PASO 2: Descarte Rápido de Escenarios Imposibles ---
+
+def _minimo_llenando(valor, capacidad, feed):
+    """Mínimo de sum(x * valor) llenando la alimentación con los stockpiles de menor valor primero."""
+    orden = np.argsort(valor)
+    acumulado = np.cumsum(capacidad[orden])
+    tomado = np.minimum(capacidad[orden], np.maximum(feed - (acumulado - capacidad[orden]), 0))
+    return float(np.sum(tomado * valor[orden]))
+
+
+def factibilidad_rapida(matrices, max_as_grades, max_total_costs):
+    """
+    Cotas necesarias (no suficientes) de factibilidad para todos los escenarios a la vez:
+    hay tonelaje suficiente, el menor arsénico posible cabe en el límite y el menor costo posible cabe en el presupuesto.
+    """
+    feed = matrices['total_feed_tons']
+    if matrices['capacidad'].sum() < feed:
+        return np.zeros(len(max_as_grades), dtype=bool)
+    as_minimo = _minimo_llenando(matrices['as'], matrices['capacidad'], feed)
+    costo_minimo = _minimo_llenando(matrices['costo'], matrices['capacidad'], feed)
+    tolerancia = 1e-9
+    return ((np.asarray(max_as_grades) * feed >= as_minimo - tolerancia) &
+            (np.asarray(max_total_costs) >= costo_minimo - tolerancia))
+
+# --- PASO 3: Barrido en Paralelo ---
+
+_PROCESO = {}
+
+
+def _iniciar_proceso(stockpiles, total_feed_tons):
+    _PROCESO['matrices'] = construir_matrices(stockpiles, total_feed_tons)
+
+
+def _resolver_lote(lote):
+    """Resuelve un lote de escenarios (max_as_grade, max_total_cost) con las matrices del proceso."""
+    as_lote, costo_lote = lote
+    matrices = _PROCESO['matrices']
+    # Cada lote arranca con el solver limpio: así el resultado no depende de qué proceso resolvió qué lote
+    # (dentro del lote cada escenario arranca en caliente desde el anterior).
+    resolver = crear_resolvedor(matrices)
+    factible = factibilidad_rapida(matrices, as_lote, costo_lote)
+    n = len(matrices['nombres'])
+    toneladas = np.full((len(as_lote), n), np.nan)
+    estados = []
+    for i, (max_as, max_costo) in enumerate(zip(as_lote, costo_lote)):
+        if not factible[i]:
+            estados.append('Infeasible')
+            continue
+        estado, x = resolver(max_as, max_costo)
+        estados.append(estado)
+        if x is not None:
+            toneladas[i] = x
+    return estados, toneladas, ~factible
+
+
+def grilla_escenarios(max_as_grades, max_total_costs):
+    """Todas las combinaciones de límites de arsénico y presupuestos (en arreglos planos)."""
+    a, c = np.meshgrid(np.asarray(max_as_grades, dtype=float), np.asarray(max_total_costs, dtype=float), indexing='ij')
+    return a.ravel(), c.ravel()
+
+
+def barrer_escenarios(stockpiles, total_feed_tons, max_as_grades, max_total_costs, procesos=1, tamano_lote=TAMANO_LOTE):
+    """
+    Resuelve un escenario por cada par (max_as_grades[i], max_total_costs[i]).
+    Devuelve una tabla ordenada con el plan, la ley de Cu y As, el costo y el estado de cada escenario.
+    """
+    max_as_grades = np.asarray(max_as_grades, dtype=float)
+    max_total_costs = np.asarray(max_total_costs, dtype=float)
+    lotes = [(max_as_grades[i:i + tamano_lote], max_total_costs[i:i + tamano_lote])
+             for i in range(0, len(max_as_grades), tamano_lote)]
+
+    if procesos <= 1:
+        _iniciar_proceso(stockpiles, total_feed_tons)
+        resultados = [_resolver_lote(lote) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                 initargs=(stockpiles, total_feed_tons)) as pool:
+            resultados = list(pool.map(_resolver_lote, lotes))
+
+    matrices = construir_matrices(stockpiles, total_feed_tons)
+    estados = [e for r in resultados for e in r[0]]
+    toneladas = np.vstack([r[1] for r in resultados]) if resultados else np.empty((0, len(matrices['nombres'])))
+    descartado = np.concatenate([r[2] for r in resultados]) if resultados else np.array([], dtype=bool)
+
+    tabla = pd.DataFrame({'max_as_grade_plant': max_as_grades, 'max_total_cost': max_total_costs,
+                          'estado': estados, 'descartado_sin_resolver': descartado})
+    total = toneladas.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tabla['ley_cu'] = toneladas @ matrices['cu'] / total
+        tabla['ley_as'] = toneladas @ matrices['as'] / total
+    tabla['costo_total'] = toneladas @ matrices['costo']
+    # Las columnas de toneladas se agregan en un solo bloque (una por una es cuadrático con miles de stockpiles)
+    tons = pd.DataFrame(toneladas, columns=[f'tons_{nombre}' for nombre in matrices['nombres']], index=tabla.index)
+    return pd.concat([tabla, tons], axis=1)
+
+# --- PASO 4: Frontera de Pareto ---
+
+def frontera_pareto(tabla, tamano_bloque=1000):
+    """
+    Planes óptimos no dominados: ningún otro plan tiene igual o mayor ley de Cu con igual o menor costo y arsénico
+    (y al menos una de ellas estrictamente mejor). La comparación se hace por bloques para acotar la memoria.
+    """
+    optimos = tabla[tabla['estado'] == 'Optimal'].drop_duplicates(subset=['ley_cu', 'costo_total', 'ley_as'])
+    cu = optimos['ley_cu'].to_numpy()
+    costo = optimos['costo_total'].to_numpy()
+    arsenico = optimos['ley_as'].to_numpy()
+    dominado = np.zeros(len(optimos), dtype=bool)
+    for i in range(0, len(optimos), tamano_bloque):
+        b = slice(i, i + tamano_bloque)
+        igual_o_mejor = ((cu[None, :] >= cu[b, None]) & (costo[None, :] <= costo[b, None]) &
+                         (arsenico[None, :] <= arsenico[b, None]))
+        estricto = ((cu[None, :] > cu[b, None]) | (costo[None, :] < costo[b, None]) |
+                    (arsenico[None, :] < arsenico[b, None]))
+        dominado[b] = np.any(igual_o_mejor & estricto, axis=1)
+    return optimos[~dominado].sort_values('costo_total').reset_index(drop=True)
+
+# --- PASO 5: Gráfico de Curvas de Compromiso ---
+
+def generar_grafico_curvas(tabla, filename, max_curvas=8):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    limites_as = np.unique(tabla['max_as_grade_plant'])
+    if len(limites_as) > max_curvas:
+        limites_as = limites_as[np.linspace(0, len(limites_as) - 1, max_curvas).round().astype(int)]
+    colores = plt.cm.viridis(np.linspace(0, 0.9, len(limites_as)))
+    for limite, color in zip(limites_as, colores):
+        curva = tabla[(tabla['max_as_grade_plant'] == limite) & (tabla['estado'] == 'Optimal')].sort_values('max_total_cost')
+        ax.plot(curva['max_total_cost'], curva['ley_cu'], color=color, linewidth=2, label=f'As <= {limite:.3f}%')
+
+    ax.set_xlabel('Presupuesto Máximo ($)', fontsize=12)
+    ax.set_ylabel('Ley de Cu en Cabeza (%)', fontsize=12)
+    ax.set_title('Ley de Cobre vs Presupuesto y Límite de Arsénico', fontsize=16, weight='bold', pad=20)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.yaxis.grid(True, linestyle='--', alpha=0.6)
+    ax.legend(frameon=False)
+
+    plt.tight_layout()
+    plt.savefig(filename, dpi=300)
+    plt.close(fig)
+    print(f"\n[+] Gráfico de curvas guardado como '{filename}'")
+
+# --- PASO 6: Ejecución del Barrido ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de escenarios del modelo de mezclas del Día 02.")
+    parser.add_argument('--costo-min', type=float, default=80000)
+    parser.add_argument('--costo-max', type=float, default=180000)
+    parser.add_argument('--n-costos', type=int, default=100)
+    parser.add_argument('--as-min', type=float, default=0.02)
+    parser.add_argument('--as-max', type=float, default=0.20)
+    parser.add_argument('--n-as', type=int, default=100)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    as_escenarios, costo_escenarios = grilla_escenarios(np.linspace(args.as_min, args.as_max, args.n_as),
+                                                        np.linspace(args.costo_min, args.costo_max, args.n_costos))
+
+    print("=" * 60)
+    print("Día 02: Barrido de Escenarios (Ley de Cu vs Presupuesto vs Arsénico)")
+    print("=" * 60)
+    print(f"Escenarios: {len(as_escenarios):,} | Procesos: {args.procesos} | "
+          f"Solver: {'highspy (modelo reutilizado)' if highspy is not None else 'scipy linprog (HiGHS)'}")
+
+    inicio = time.perf_counter()
+    tabla = barrer_escenarios(stockpiles, planta_req['total_feed_tons'], as_escenarios, costo_escenarios,
+                              procesos=args.procesos)
+    duracion = time.perf_counter() - inicio
+    frontera = frontera_pareto(tabla)
+
+    print(f"Tiempo total del barrido: {duracion:.2f} s ({duracion / len(tabla) * 1000:.3f} ms por escenario)")
+    print(f"Escenarios óptimos: {(tabla['estado'] == 'Optimal').sum():,} | "
+          f"Infactibles: {(tabla['estado'] == 'Infeasible').sum():,} "
+          f"(descartados sin resolver: {tabla['descartado_sin_resolver'].sum():,})")
+    print(f"Planes en la frontera de Pareto: {len(frontera):,}")
+
+    tabla.to_csv('dia02_barrido_escenarios.csv', index=False)
+    frontera.to_csv('dia02_frontera_pareto.csv', index=False)
+    print("\n[+] Tablas guardadas como 'dia02_barrido_escenarios.csv' y 'dia02_frontera_pareto.csv'")
+    generar_grafico_curvas(tabla, 'dia02_curvas_compromiso.png')
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
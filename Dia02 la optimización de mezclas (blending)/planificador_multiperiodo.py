@@ -0,0 +1,245 @@
+# --------------------------------------------------------------------------
+# #28DiasDePythonParaMineria - Día 02 (complemento)
+# Título: Planificador de Mezclas Multiperiodo con Matrices Dispersas
+#
+# Descripción:
+# Extiende el modelo de Dia02.py a muchos stockpiles / frentes y muchos periodos (por ejemplo 300 x 52 semanas).
+# Cada stockpile mantiene los mismos datos que en Dia02.py (tons_available, cost_per_ton, cu_grade, as_grade)
+# y cada periodo tiene su propio requerimiento de planta (total_feed_tons, max_as_grade_plant, max_total_cost).
+# Lo que se extrae en un periodo ya no está disponible en los siguientes (agotamiento entre periodos).
+#
+# En vez de sumar expresiones con lpSum sobre diccionarios, el modelo se arma directamente como una matriz
+# dispersa (scipy.sparse COO -> CSR) con operaciones vectorizadas de NumPy, y se resuelve con HiGHS
+# (highspy si está instalado; si no, el HiGHS incluido en scipy.optimize.linprog).
+#
+# Librerías necesarias:
+# pip install numpy pandas scipy
+# pip install highspy   (opcional, recomendado)
+# --------------------------------------------------------------------------
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+
+try:
+    import highspy
+except ImportError:  # Sin highspy usamos el HiGHS que trae scipy
+    highspy = None
+
+# --- PASO 1: Datos en Forma de Arreglos ---
+
+def datos_a_arreglos(stockpiles, periodos, reposicion=None):
+    """
+    stockpiles : dict como en Dia02.py.
+    periodos   : lista de dicts con total_feed_tons, max_as_grade_plant y max_total_cost (uno por periodo).
+    reposicion : opcional, dict {stockpile: lista de toneladas que entran al stockpile en cada periodo}.
+    """
+    nombres = list(stockpiles.keys())
+    campo = lambda k: np.array([stockpiles[s][k] for s in nombres], dtype=float)
+    datos = {
+        'nombres': nombres,
+        'capacidad': campo('tons_available'), 'costo': campo('cost_per_ton'),
+        'cu': campo('cu_grade'), 'as': campo('as_grade'),
+        'feed': np.array([p['total_feed_tons'] for p in periodos], dtype=float),
+        'max_as': np.array([p['max_as_grade_plant'] for p in periodos], dtype=float),
+        'max_costo': np.array([p.get('max_total_cost', np.inf) for p in periodos], dtype=float),
+        'reposicion': None,
+    }
+    if reposicion is not None:
+        datos['reposicion'] = np.array([reposicion.get(s, np.zeros(len(periodos))) for s in nombres], dtype=float)
+    return datos
+
+# --- PASO 2: Armado del Modelo como Matriz Dispersa ---
+
+def construir_modelo_disperso(datos):
+    """
+    Variables x[t, s] = toneladas del stockpile s en el periodo t (índice t * S + s).
+    Filas (todas en la forma fila_min <= A x <= fila_max):
+      - T filas de alimentación exacta por periodo,
+      - T filas de arsénico y T filas de costo por periodo,
+      - agotamiento: lo extraído acumulado hasta t no supera lo disponible acumulado hasta t.
+        Sin reposición basta una fila por stockpile (x >= 0 hace que el total sea la única fila activa).
+    Devuelve un dict con c (objetivo a maximizar), A (CSR), fila_min, fila_max, cota_max.
+    """
+    S = len(datos['nombres'])
+    T = len(datos['feed'])
+    n = S * T
+    t_idx = np.repeat(np.arange(T), S)   # periodo de cada variable
+    s_idx = np.tile(np.arange(S), T)     # stockpile de cada variable
+    var = np.arange(n)
+
+    filas, columnas, valores = [], [], []
+    # Alimentación, arsénico y costo: una fila por periodo, un coeficiente por variable
+    for bloque, coef in enumerate([np.ones(S), datos['as'], datos['costo']]):
+        filas.append(bloque * T + t_idx)
+        columnas.append(var)
+        valores.append(coef[s_idx])
+    fila_min = [datos['feed'], np.full(T, -np.inf), np.full(T, -np.inf)]
+    fila_max = [datos['feed'], datos['max_as'] * datos['feed'], datos['max_costo']]
+
+    inicio = 3 * T
+    if datos['reposicion'] is None:
+        # Una fila por stockpile: suma de todos los periodos <= tons_available
+        filas.append(inicio + s_idx)
+        columnas.append(var)
+        valores.append(np.ones(n))
+        fila_min.append(np.full(S, -np.inf))
+        fila_max.append(datos['capacidad'])
+    else:
+        # Fila (s, t): suma de x[tau, s] con tau <= t  <=  tons_available + reposición acumulada hasta t
+        # Cada variable x[tau, s] aparece en las filas t = tau..T-1 (T - tau coeficientes).
+        repeticiones = T - t_idx
+        var_rep = np.repeat(var, repeticiones)
+        desplazamiento = np.arange(len(var_rep)) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+        t_fila = t_idx[var_rep] + desplazamiento
+        filas.append(inicio + s_idx[var_rep] * T + t_fila)
+        columnas.append(var_rep)
+        valores.append(np.ones(len(var_rep)))
+        fila_min.append(np.full(S * T, -np.inf))
+        fila_max.append((datos['capacidad'][:, None] + np.cumsum(datos['reposicion'], axis=1)).ravel())
+
+    fila_min = np.concatenate(fila_min)
+    fila_max = np.concatenate(fila_max)
+    A = sparse.coo_matrix((np.concatenate(valores), (np.concatenate(filas), np.concatenate(columnas))),
+                          shape=(len(fila_min), n)).tocsr()
+
+    # Cota superior de cada variable: lo que podría haber en el stockpile en ese periodo
+    cota_max = datos['capacidad'][s_idx]
+    if datos['reposicion'] is not None:
+        cota_max = cota_max + np.cumsum(datos['reposicion'], axis=1)[s_idx, t_idx]
+    return {'c': datos['cu'][s_idx], 'A': A, 'fila_min': fila_min, 'fila_max': fila_max,
+            'cota_max': cota_max, 'S': S, 'T': T}
+
+# --- PASO 3: Resolución con HiGHS ---
+
+def resolver_modelo_disperso(modelo):
+    """Maximiza el cobre total. Devuelve (estado, x) con x de forma (T, S) o None."""
+    A = modelo['A']
+    n = A.shape[1]
+    if highspy is not None:
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        inf = highspy.kHighsInf
+        lp = highspy.HighsLp()
+        lp.num_col_ = n
+        lp.num_row_ = A.shape[0]
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = modelo['c']
+        lp.col_lower_ = np.zeros(n)
+        lp.col_upper_ = modelo['cota_max']
+        lp.row_lower_ = np.where(np.isfinite(modelo['fila_min']), modelo['fila_min'], -inf)
+        lp.row_upper_ = np.where(np.isfinite(modelo['fila_max']), modelo['fila_max'], inf)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        h.passModel(lp)
+        h.run()
+        estado = h.getModelStatus()
+        if estado == highspy.HighsModelStatus.kOptimal:
+            return 'Optimal', np.array(h.getSolution().col_value).reshape(modelo['T'], modelo['S'])
+        return ('Infeasible' if estado == highspy.HighsModelStatus.kInfeasible else 'Not Solved'), None
+
+    # linprog separa igualdades y desigualdades (las filas con mínimo = máximo son igualdades)
+    igualdad = modelo['fila_min'] == modelo['fila_max']
+    con_max = ~igualdad & np.isfinite(modelo['fila_max'])
+    con_min = ~igualdad & np.isfinite(modelo['fila_min'])
+    A_ub = sparse.vstack([A[con_max], -A[con_min]]).tocsr()
+    b_ub = np.concatenate([modelo['fila_max'][con_max], -modelo['fila_min'][con_min]])
+    r = linprog(-modelo['c'], A_ub=A_ub, b_ub=b_ub, A_eq=A[igualdad], b_eq=modelo['fila_max'][igualdad],
+                bounds=np.column_stack([np.zeros(n), modelo['cota_max']]), method='highs')
+    if r.status == 0:
+        return 'Optimal', r.x.reshape(modelo['T'], modelo['S'])
+    return ('Infeasible' if r.status == 2 else 'Not Solved'), None
+
+
+def planificar(stockpiles, periodos, reposicion=None):
+    """Arma y resuelve el plan multiperiodo. Devuelve (estado, plan, resumen, tiempos)."""
+    t0 = time.perf_counter()
+    datos = datos_a_arreglos(stockpiles, periodos, reposicion)
+    modelo = construir_modelo_disperso(datos)
+    t1 = time.perf_counter()
+    estado, x = resolver_modelo_disperso(modelo)
+    t2 = time.perf_counter()
+    tiempos = {'construccion_s': t1 - t0, 'resolucion_s': t2 - t1,
+               'variables': modelo['A'].shape[1], 'restricciones': modelo['A'].shape[0], 'no_ceros': modelo['A'].nnz}
+    if x is None:
+        return estado, None, None, tiempos
+
+    plan = pd.DataFrame(x, columns=datos['nombres'])
+    plan.index.name = 'periodo'
+    total = x.sum(axis=1)
+    resumen = pd.DataFrame({
+        'toneladas': total,
+        'ley_cu': x @ datos['cu'] / total,
+        'ley_as': x @ datos['as'] / total,
+        'costo_total': x @ datos['costo'],
+        'cobre_fino': x @ datos['cu'],
+    })
+    resumen.index.name = 'periodo'
+    return estado, plan, resumen, tiempos
+
+# --- PASO 4: Datos Sintéticos para Probar a Escala ---
+
+def generar_caso_sintetico(n_stockpiles=300, n_periodos=52, semilla=42):
+    """Stockpiles y requerimientos semanales aleatorios (reproducibles) con la misma forma que Dia02.py."""
+    rng = np.random.default_rng(semilla)
+    stockpiles = {
+        f'Stockpile_{i:03d}': {
+            'tons_available': float(rng.uniform(5000, 60000)),
+            'cost_per_ton': float(rng.uniform(8, 20)),
+            'cu_grade': float(rng.uniform(0.3, 1.8)),
+            'as_grade': float(rng.uniform(0.01, 0.20)),
+        } for i in range(n_stockpiles)
+    }
+    capacidad_total = sum(s['tons_available'] for s in stockpiles.values())
+    feed = 0.5 * capacidad_total / n_periodos
+    periodos = [{'total_feed_tons': feed, 'max_as_grade_plant': 0.10, 'max_total_cost': 15.0 * feed}
+                for _ in range(n_periodos)]
+    return stockpiles, periodos
+
+# --- PASO 5: Ejecución ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificador de mezclas multiperiodo (matrices dispersas).")
+    parser.add_argument('--stockpiles', type=int, default=300)
+    parser.add_argument('--periodos', type=int, default=52)
+    parser.add_argument('--dia02', action='store_true', help="Resolver el caso de un periodo de Dia02.py.")
+    args = parser.parse_args()
+
+    if args.dia02:
+        from Dia02 import stockpiles, planta_req
+        periodos = [planta_req]
+    else:
+        stockpiles, periodos = generar_caso_sintetico(args.stockpiles, args.periodos)
+
+    print("=" * 60)
+    print("Día 02: Planificación Multiperiodo de Mezclas")
+    print("=" * 60)
+    estado, plan, resumen, tiempos = planificar(stockpiles, periodos)
+    print(f"Stockpiles: {len(stockpiles)} | Periodos: {len(periodos)} | "
+          f"Solver: {'highspy' if highspy is not None else 'scipy linprog (HiGHS)'}")
+    print(f"Variables: {tiempos['variables']:,} | Restricciones: {tiempos['restricciones']:,} | "
+          f"No ceros: {tiempos['no_ceros']:,}")
+    print(f"Tiempo de construcción: {tiempos['construccion_s'] * 1000:.1f} ms")
+    print(f"Tiempo de resolución:   {tiempos['resolucion_s'] * 1000:.1f} ms")
+    print(f"Estado de la solución: {estado}")
+
+    if estado == 'Optimal':
+        print("\n--- Resumen por Periodo ---")
+        print(resumen.head(10).to_string(float_format=lambda v: f'{v:,.3f}'))
+        print(f"\nCobre fino total: {resumen['cobre_fino'].sum():,.2f} t")
+        plan.to_csv('dia02_plan_multiperiodo.csv')
+        resumen.to_csv('dia02_resumen_multiperiodo.csv')
+        print("\n[+] Plan guardado como 'dia02_plan_multiperiodo.csv' y 'dia02_resumen_multiperiodo.csv'")
+    else:
+        print("\nNo se encontró una solución óptima.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
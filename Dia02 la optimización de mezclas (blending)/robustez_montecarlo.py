@@ -0,0 +1,234 @@
+# --------------------------------------------------------------------------
+# #28DiasDePythonParaMineria - Día 02 (complemento)
+# Título: Robustez del Plan de Mezcla ante Leyes Inciertas (Monte Carlo)
+#
+# Descripción:
+# El plan óptimo de Dia02.py supone que cu_grade y as_grade de cada stockpile se conocen exactamente.
+# Aquí se simulan 10^6 (o más) realizaciones de las leyes (y opcionalmente del costo) de cada stockpile
+# y se evalúa el plan en TODAS a la vez con un producto matricial (realizaciones x stockpiles) @ toneladas,
+# por lotes para acotar la memoria. Se reporta la probabilidad de romper cada restricción y los percentiles.
+#
+# También incluye una re-optimización con restricción probabilística: se aprietan los límites de arsénico
+# (y de costo, si es incierto) hasta que la probabilidad de incumplirlos baje del objetivo.
+#
+# Librerías necesarias:
+# pip install pulp matplotlib numpy pandas scipy
+# pip install highspy   (opcional, recomendado)
+# --------------------------------------------------------------------------
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from Dia02 import stockpiles, planta_req
+from barrido_escenarios import construir_matrices, crear_resolvedor, _minimo_llenando
+
+# Incertidumbre por defecto: desviación estándar como fracción del valor nominal (coeficiente de variación)
+INCERTIDUMBRE_DEFECTO = {'cu_cv': 0.10, 'as_cv': 0.25, 'costo_cv': 0.0}
+# Realizaciones simuladas por lote (acota la memoria: lote x stockpiles valores por variable)
+TAMANO_LOTE = 250_000
+PERCENTILES = [5, 50, 95]
+# Tolerancia relativa al comparar con los límites: un plan que los toca exactamente (p. ej. costo 125000.00000000004
+# por redondeo del solver) no cuenta como incumplimiento
+TOLERANCIA_LIMITE = 1e-9
+# Estado de resolver_con_probabilidad cuando ni apretando los límites hasta su mínimo se llega al objetivo
+OBJETIVO_NO_ALCANZABLE = 'Objetivo no alcanzable'
+
+# --- PASO 1: Parámetros de las Distribuciones ---
+
+def parametros_distribucion(stockpiles, incertidumbre=None):
+    """
+    Medias y desviaciones por stockpile. 'incertidumbre' puede traer los CV globales
+    (cu_cv, as_cv, costo_cv) y/o desviaciones por stockpile: {stockpile: {'cu_sd': .., 'as_sd': .., 'costo_sd': ..}}.
+    """
+    incertidumbre = incertidumbre or {}
+    cv = {k: incertidumbre.get(k, v) for k, v in INCERTIDUMBRE_DEFECTO.items()}
+    nombres = list(stockpiles.keys())
+    medias = {
+        'cu': np.array([stockpiles[s]['cu_grade'] for s in nombres], dtype=float),
+        'as': np.array([stockpiles[s]['as_grade'] for s in nombres], dtype=float),
+        'costo': np.array([stockpiles[s]['cost_per_ton'] for s in nombres], dtype=float),
+    }
+    desv = {}
+    for var, clave_cv, clave_sd in [('cu', 'cu_cv', 'cu_sd'), ('as', 'as_cv', 'as_sd'), ('costo', 'costo_cv', 'costo_sd')]:
+        desv[var] = np.array([incertidumbre.get(s, {}).get(clave_sd, cv[clave_cv] * medias[var][i])
+                              for i, s in enumerate(nombres)], dtype=float)
+    return medias, desv
+
+# --- PASO 2: Evaluación Vectorizada del Plan ---
+
+def simular_plan(toneladas, medias, desv, n_realizaciones=1_000_000, semilla=42, tamano_lote=TAMANO_LOTE):
+    """
+    Ley de Cu, ley de As y costo total de la mezcla en cada realización.
+    Cada lote genera una matriz (lote x stockpiles) por variable, truncada en 0, y la multiplica por las toneladas.
+    """
+    toneladas = np.asarray(toneladas, dtype=float)
+    total = toneladas.sum()
+    rng = np.random.default_rng(semilla)
+    resultado = {var: np.empty(n_realizaciones) for var in ('ley_cu', 'ley_as', 'costo_total')}
+    for inicio in range(0, n_realizaciones, tamano_lote):
+        n = min(tamano_lote, n_realizaciones - inicio)
+        fin = inicio + n
+        for var, salida, divisor in [('cu', 'ley_cu', total), ('as', 'ley_as', total), ('costo', 'costo_total', 1.0)]:
+            if np.any(desv[var] > 0):
+                leyes = np.maximum(medias[var] + desv[var] * rng.standard_normal((n, len(toneladas))), 0.0)
+                resultado[salida][inicio:fin] = leyes @ toneladas / divisor
+            else:
+                resultado[salida][inicio:fin] = medias[var] @ toneladas / divisor
+    return resultado
+
+
+def resumir_simulacion(simulacion, planta_req):
+    """Probabilidad de romper cada restricción (más allá de TOLERANCIA_LIMITE) y percentiles de cada resultado."""
+    holgura = 1 + TOLERANCIA_LIMITE
+    probabilidades = {
+        'prob_as_excedido': float(np.mean(simulacion['ley_as'] > planta_req['max_as_grade_plant'] * holgura)),
+        'prob_costo_excedido': float(np.mean(simulacion['costo_total'] > planta_req['max_total_cost'] * holgura)),
+    }
+    percentiles = pd.DataFrame({var: np.percentile(valores, PERCENTILES) for var, valores in simulacion.items()},
+                               index=[f'P{p}' for p in PERCENTILES])
+    return probabilidades, percentiles
+
+
+def evaluar_plan(plan, stockpiles, planta_req, incertidumbre=None, n_realizaciones=1_000_000, semilla=42):
+    """plan: dict {stockpile: toneladas}, como 'datos_para_grafico' en Dia02.py."""
+    medias, desv = parametros_distribucion(stockpiles, incertidumbre)
+    toneladas = np.array([plan[s] for s in stockpiles], dtype=float)
+    simulacion = simular_plan(toneladas, medias, desv, n_realizaciones, semilla)
+    return resumir_simulacion(simulacion, planta_req)
+
+# --- PASO 3: Re-optimización con Restricción Probabilística ---
+
+def _biseccion(evaluar, bajo, alto, prob_objetivo, iteraciones):
+    """
+    Mayor límite efectivo en [bajo, alto] con probabilidad de incumplimiento <= objetivo (evaluar debe crecer con el límite).
+    Si ni 'bajo' cumple, devuelve 'bajo' igual (el límite más apretado posible); quien llama debe volver a verificar.
+    """
+    if evaluar(alto) <= prob_objetivo:
+        return alto
+    for _ in range(iteraciones):
+        medio = (bajo + alto) / 2
+        if evaluar(medio) <= prob_objetivo:
+            bajo = medio
+        else:
+            alto = medio
+    return bajo
+
+
+def resolver_con_probabilidad(stockpiles, planta_req, incertidumbre=None, prob_objetivo=0.05,
+                              n_busqueda=200_000, semilla=42, iteraciones=30, rondas=5):
+    """
+    Busca los límites efectivos de As (y de costo, si es incierto) más holgados cuyo plan óptimo incumple los límites
+    reales con probabilidad <= prob_objetivo. Todas las evaluaciones usan la misma semilla (números aleatorios comunes),
+    así la búsqueda compara planes con las mismas realizaciones.
+    Devuelve (estado, plan, limites_efectivos). Si después de las rondas alguna probabilidad sigue sobre el objetivo,
+    el estado es OBJETIVO_NO_ALCANZABLE y el plan y los límites son los mejores encontrados (los más apretados).
+    """
+    medias, desv = parametros_distribucion(stockpiles, incertidumbre)
+    matrices = construir_matrices(stockpiles, planta_req['total_feed_tons'])
+    resolver = crear_resolvedor(matrices)
+    feed = matrices['total_feed_tons']
+    limites = {'max_as_grade_plant': planta_req['max_as_grade_plant'], 'max_total_cost': planta_req['max_total_cost']}
+    cache = {}
+
+    def probabilidad(limite_as, limite_costo, campo):
+        clave = (limite_as, limite_costo)
+        if clave not in cache:
+            estado, x = resolver(limite_as, limite_costo)
+            if x is None:
+                cache[clave] = {'prob_as_excedido': 1.0, 'prob_costo_excedido': 1.0}
+            else:
+                cache[clave] = resumir_simulacion(simular_plan(x, medias, desv, n_busqueda, semilla), planta_req)[0]
+        return cache[clave][campo]
+
+    as_minimo = _minimo_llenando(matrices['as'], matrices['capacidad'], feed) / feed
+    costo_minimo = _minimo_llenando(matrices['costo'], matrices['capacidad'], feed)
+    # Apretar un límite mueve el plan y cambia la probabilidad del otro: se alternan las bisecciones
+    # (cada una parte del límite encontrado en la ronda anterior) hasta que ambas probabilidades cumplan.
+    def cumple():
+        return all(probabilidad(limites['max_as_grade_plant'], limites['max_total_cost'], campo) <= prob_objetivo
+                   for campo in ('prob_as_excedido', 'prob_costo_excedido'))
+
+    for _ in range(rondas):
+        limites['max_as_grade_plant'] = _biseccion(
+            lambda a: probabilidad(a, limites['max_total_cost'], 'prob_as_excedido'),
+            as_minimo, limites['max_as_grade_plant'], prob_objetivo, iteraciones)
+        if np.any(desv['costo'] > 0):
+            limites['max_total_cost'] = _biseccion(
+                lambda c: probabilidad(limites['max_as_grade_plant'], c, 'prob_costo_excedido'),
+                costo_minimo, limites['max_total_cost'], prob_objetivo, iteraciones)
+        if cumple():
+            break
+
+    estado, x = resolver(limites['max_as_grade_plant'], limites['max_total_cost'])
+    if x is not None and not cumple():
+        estado = OBJETIVO_NO_ALCANZABLE
+    plan = dict(zip(matrices['nombres'], x)) if x is not None else None
+    return estado, plan, limites
+
+# --- PASO 4: Presentación de Resultados ---
+
+def imprimir_evaluacion(titulo, plan, probabilidades, percentiles, planta_req):
+    print(f"\n--- {titulo} ---")
+    for s, tons in plan.items():
+        print(f"  - Extraer {tons:,.2f} toneladas de {s}")
+    print(f"Probabilidad de exceder As ({planta_req['max_as_grade_plant']:.3f}%): {probabilidades['prob_as_excedido']:.2%}")
+    print(f"Probabilidad de exceder el presupuesto (${planta_req['max_total_cost']:,}): "
+          f"{probabilidades['prob_costo_excedido']:.2%}")
+    print(percentiles.to_string(float_format=lambda v: f'{v:,.4f}'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Robustez Monte Carlo del plan de mezcla del Día 02.")
+    parser.add_argument('--realizaciones', type=int, default=1_000_000)
+    parser.add_argument('--cu-cv', type=float, default=INCERTIDUMBRE_DEFECTO['cu_cv'])
+    parser.add_argument('--as-cv', type=float, default=INCERTIDUMBRE_DEFECTO['as_cv'])
+    parser.add_argument('--costo-cv', type=float, default=INCERTIDUMBRE_DEFECTO['costo_cv'])
+    parser.add_argument('--prob-objetivo', type=float, default=0.05,
+                        help="Probabilidad máxima aceptada de incumplir cada límite en la re-optimización.")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    incertidumbre = {'cu_cv': args.cu_cv, 'as_cv': args.as_cv, 'costo_cv': args.costo_cv}
+
+    print("=" * 60)
+    print("Día 02: Robustez del Plan de Mezcla (Monte Carlo)")
+    print("=" * 60)
+
+    # Plan determinístico (el mismo óptimo de Dia02.py)
+    matrices = construir_matrices(stockpiles, planta_req['total_feed_tons'])
+    estado, x = crear_resolvedor(matrices)(planta_req['max_as_grade_plant'], planta_req['max_total_cost'])
+    if x is None:
+        print(f"Estado de la solución: {estado}\nNo se encontró una solución óptima.")
+        return
+    plan = dict(zip(matrices['nombres'], x))
+
+    inicio = time.perf_counter()
+    probabilidades, percentiles = evaluar_plan(plan, stockpiles, planta_req, incertidumbre, args.realizaciones, args.semilla)
+    print(f"Realizaciones: {args.realizaciones:,} (evaluadas en {time.perf_counter() - inicio:.2f} s)")
+    imprimir_evaluacion("Plan Óptimo Determinístico", plan, probabilidades, percentiles, planta_req)
+
+    estado, plan_robusto, limites = resolver_con_probabilidad(stockpiles, planta_req, incertidumbre,
+                                                              args.prob_objetivo, semilla=args.semilla)
+    if plan_robusto is None:
+        print(f"\nNo se encontró un plan con probabilidad de incumplimiento <= {args.prob_objetivo:.0%} ({estado}).")
+        return
+    if estado == OBJETIVO_NO_ALCANZABLE:
+        titulo = f"Mejor Plan Encontrado ({estado}: P(incumplir) > {args.prob_objetivo:.0%})"
+    else:
+        titulo = f"Plan Robusto (P(incumplir) <= {args.prob_objetivo:.0%})"
+    # La evaluación final usa otra semilla para no premiar el ajuste a las realizaciones de la búsqueda
+    probabilidades, percentiles = evaluar_plan(plan_robusto, stockpiles, planta_req, incertidumbre,
+                                               args.realizaciones, args.semilla + 1)
+    print(f"\nLímites efectivos usados: As <= {limites['max_as_grade_plant']:.4f}% | "
+          f"Costo <= ${limites['max_total_cost']:,.0f}")
+    imprimir_evaluacion(titulo, plan_robusto, probabilidades, percentiles, planta_req)
+    if estado == OBJETIVO_NO_ALCANZABLE:
+        print(f"\nADVERTENCIA: ni con los límites más apretados posibles la probabilidad de incumplir baja de "
+              f"{args.prob_objetivo:.0%}. Este plan NO cumple el objetivo.")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# Almacén incremental de KPIs (solo anexado) para los registros de FMS y Perforación.
+#
+# En vez de releer fms_data.csv y drill_data.csv completos en cada reporte, se guarda en estado.json cuántos bytes
+# de cada registro ya se procesaron. Cada ingesta lee solo la cola nueva (líneas completas), la agrupa UNA vez al
+# grano más fino (fecha, turno, sitio, equipo, destino) y suma el resultado a las particiones diarias afectadas.
+# Los totales por turno, camión, pala y perforadora se sirven desde esas particiones pequeñas, así que el costo de
+# agregar un turno no depende de cuánta historia exista.
+#
+# Cada bloque se confirma en dos pasos: primero se escriben las particiones nuevas como .tmp, luego estado.json con
+# el offset nuevo y la lista de renombres pendientes (punto de confirmación), y por último los renombres. Si el
+# proceso se corta después de confirmar, la ingesta siguiente termina los renombres; si se corta antes, el bloque
+# se vuelve a leer completo. Así una fila nunca se suma dos veces.
+#
+# Estructura:
+#   kpi_store/estado.json
+#   kpi_store/acarreo/fecha=AAAA-MM-DD.csv      (fecha, turno, sitio, truck_id, shovel_id, destination, toneladas, viajes)
+#   kpi_store/perforacion/fecha=AAAA-MM-DD.csv  (fecha, turno, sitio, drill_id, metros, pozos)
+#
+# Uso:
+#   python almacen_kpis.py --ingestar
+#   python almacen_kpis.py --consultar 2025-06-03 A --sitio Rajo_1
+#   python almacen_kpis.py --verificar 2025-06-03 A     (compara el almacén con calcular_kpis sobre los registros)
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Carpeta raíz del repositorio (paquete 'comun') en el path antes de cualquier import local
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from main_report_generator import DATA_PATH, calcular_kpis
+from comun.ingesta import aplicar_esquema, leer_registro
+from generador_lotes import asignar_turno, TURNOS, COLUMNA_SITIO, SITIO_UNICO
+
+STORE_DIRNAME = 'kpi_store'
+# Registro de origen -> esquema en comun/ingesta.py
+ESQUEMA_REGISTRO = {'fms_data.csv': 'fms', 'drill_data.csv': 'perforacion'}
+# Registro de origen -> (tabla, claves de agrupación, {columna agregada: (columna origen, función)})
+TABLAS = {
+    'fms_data.csv': ('acarreo', ['truck_id', 'shovel_id', 'destination'],
+                     {'toneladas': ('payload_tons', 'sum'), 'viajes': ('payload_tons', 'count')}),
+    'drill_data.csv': ('perforacion', ['drill_id'],
+                       {'metros': ('depth_meters', 'sum'), 'pozos': ('hole_id', 'count')}),
+}
+TABLAS_CLAVES = {tabla: claves for tabla, claves, _ in TABLAS.values()}
+TABLAS_VALORES = {tabla: list(agregaciones) for tabla, _, agregaciones in TABLAS.values()}
+CLAVES_TURNO = ['fecha', 'turno', COLUMNA_SITIO]
+# Bytes leídos por bloque de la cola nueva (acota la memoria si la cola es muy grande)
+TAMANO_BLOQUE = 64 * 1024 * 1024
+
+# --- 1. ESTADO DEL ALMACÉN ---
+
+def cargar_estado(store_dir):
+    ruta = os.path.join(store_dir, 'estado.json')
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, 'r') as f:
+        return json.load(f)
+
+
+def guardar_estado(store_dir, estado):
+    # Escritura atómica: un corte a mitad de escritura no deja un estado.json corrupto
+    ruta = os.path.join(store_dir, 'estado.json')
+    with open(ruta + '.tmp', 'w') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(ruta + '.tmp', ruta)
+
+
+def terminar_pendientes(store_dir, estado):
+    """Completa los renombres de un bloque ya confirmado en estado.json (ingesta cortada a mitad)."""
+    pendientes = estado.pop('pendientes', None)
+    if pendientes is None:
+        return
+    for relativa in pendientes:
+        final = os.path.join(store_dir, relativa)
+        if os.path.exists(final + '.tmp'):
+            os.replace(final + '.tmp', final)
+    guardar_estado(store_dir, estado)
+
+# --- 2. LECTURA DE LA COLA NUEVA ---
+
+def _fila_completa(texto, cabecera):
+    """True si una línea sin salto de línea ya trae todos los campos (y el último no está vacío)."""
+    campos = next(csv.reader([texto.decode('utf-8').strip()]), [])
+    return len(campos) == len(cabecera) and campos[-1].strip() != ''
+
+def leer_cola(ruta, offset, cabecera=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera (DataFrame, nuevo_offset, cabecera) con las líneas posteriores a 'offset'.
+    La última línea del archivo sin salto de línea se ingesta si ya tiene todos los campos (los CSV de ejemplo
+    terminan así); si le faltan campos es un registro a medio escribir y se deja para la próxima ingesta.
+    """
+    with open(ruta, 'rb') as f:
+        tamano = os.fstat(f.fileno()).st_size
+        if offset == 0:
+            linea = f.readline()
+            cabecera = linea.decode('utf-8').strip().split(',')
+            offset = len(linea)
+        elif offset < tamano:
+            # Si la última línea ingestada no tenía salto de línea, lo siguiente debe empezar con uno
+            f.seek(offset - 1)
+            anterior, siguiente = f.read(1), f.read(1)
+            if anterior not in (b'\n', b'\r') and siguiente not in (b'\n', b'\r'):
+                raise ValueError(f"{ruta}: la última línea ingestada (sin salto de línea) siguió creciendo. "
+                                 "Borre el almacén para reconstruirlo.")
+        f.seek(offset)
+        while True:
+            bloque = f.read(tamano_bloque)
+            if not bloque:
+                break
+            corte = bloque.rfind(b'\n')
+            completo = bloque[:corte + 1]
+            if offset + len(bloque) >= tamano and bloque[corte + 1:].strip() and _fila_completa(bloque[corte + 1:], cabecera):
+                completo = bloque
+            if not completo:
+                if offset + len(bloque) >= tamano:
+                    break
+                raise ValueError(f"{ruta}: una línea supera el tamaño de bloque ({tamano_bloque} bytes)")
+            offset += len(completo)
+            f.seek(offset)
+            df = pd.read_csv(io.BytesIO(completo), names=cabecera, header=None, skipinitialspace=True)
+            yield aplicar_esquema(df, ESQUEMA_REGISTRO[os.path.basename(ruta)]), offset, cabecera
+
+# --- 3. AGREGACIÓN E INGESTA ---
+
+def agregar(df, claves, agregaciones):
+    """Una sola pasada de groupby al grano (fecha, turno, sitio, claves)."""
+    df = df.copy()
+    if COLUMNA_SITIO not in df.columns:
+        df[COLUMNA_SITIO] = SITIO_UNICO
+    fecha, turno = asignar_turno(df['timestamp'])
+    df['fecha'] = fecha.dt.strftime('%Y-%m-%d')
+    df['turno'] = turno
+    # Las magnitudes float32 del esquema se acumulan en float64
+    sumas = {origen for origen, funcion in agregaciones.values() if funcion == 'sum'}
+    df = df.astype({c: 'float64' for c in sumas})
+    # dropna=False: una fila sin pala, destino o sitio también suma toneladas y metros
+    return df.groupby(CLAVES_TURNO + claves, as_index=False, observed=True, dropna=False).agg(**agregaciones)
+
+
+def ruta_particion(store_dir, tabla, fecha):
+    return os.path.join(store_dir, tabla, f'fecha={fecha}.csv')
+
+
+def preparar_particiones(store_dir, tabla, claves, agregado):
+    """
+    Suma el agregado nuevo a las particiones diarias que toca y deja el resultado en '<partición>.tmp'.
+    Devuelve las rutas (relativas al almacén) que hay que renombrar para confirmar el bloque.
+    """
+    os.makedirs(os.path.join(store_dir, tabla), exist_ok=True)
+    todas = CLAVES_TURNO + claves
+    rutas = []
+    for fecha, nuevo in agregado.groupby('fecha'):
+        ruta = ruta_particion(store_dir, tabla, fecha)
+        if os.path.exists(ruta):
+            existente = pd.read_csv(ruta, dtype={c: str for c in todas})
+            nuevo = pd.concat([existente, nuevo]).groupby(todas, as_index=False, dropna=False).sum()
+        nuevo.to_csv(ruta + '.tmp', index=False)
+        rutas.append(os.path.relpath(ruta, store_dir))
+    return rutas
+
+
+def ingestar(data_path=DATA_PATH, store_dir=None):
+    """Procesa solo lo agregado a cada registro desde la última ingesta. Devuelve filas nuevas por registro."""
+    store_dir = store_dir or os.path.join(data_path, STORE_DIRNAME)
+    os.makedirs(store_dir, exist_ok=True)
+    estado = cargar_estado(store_dir)
+    terminar_pendientes(store_dir, estado)
+    filas_nuevas = {}
+    for archivo, (tabla, claves, agregaciones) in TABLAS.items():
+        ruta = os.path.join(data_path, archivo)
+        registro = estado.get(archivo, {'offset': 0, 'cabecera': None})
+        if os.path.getsize(ruta) < registro['offset']:
+            raise ValueError(f"{ruta} es más corto que lo ya ingestado (¿se rotó o truncó?). "
+                             f"Borre '{store_dir}' para reconstruir el almacén.")
+        filas_nuevas[archivo] = 0
+        for df, offset, cabecera in leer_cola(ruta, registro['offset'], registro['cabecera']):
+            pendientes = preparar_particiones(store_dir, tabla, claves, agregar(df, claves, agregaciones)) if len(df) else []
+            filas_nuevas[archivo] += len(df)
+            # Punto de confirmación: offset nuevo y renombres pendientes en una sola escritura atómica
+            estado[archivo] = {'offset': offset, 'cabecera': cabecera}
+            estado['pendientes'] = pendientes
+            guardar_estado(store_dir, estado)
+            terminar_pendientes(store_dir, estado)
+    return filas_nuevas
+
+# --- 4. CONSULTAS ---
+
+def leer_tabla(store_dir, tabla, fechas):
+    """Une las particiones de las fechas pedidas (las inexistentes se ignoran)."""
+    claves = CLAVES_TURNO + TABLAS_CLAVES[tabla]
+    partes = [pd.read_csv(r, dtype={c: str for c in claves})
+              for r in (ruta_particion(store_dir, tabla, f) for f in fechas) if os.path.exists(r)]
+    if not partes:
+        return pd.DataFrame({c: pd.Series(dtype=str if c in claves else float) for c in claves + TABLAS_VALORES[tabla]})
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumen(store_dir, tabla, por, desde, hasta, sitio=None):
+    """Totales de 'tabla' entre dos fechas (inclusive) agrupados por las columnas 'por' (p. ej. ['shovel_id'])."""
+    fechas = pd.date_range(desde, hasta, freq='D').strftime('%Y-%m-%d')
+    df = leer_tabla(store_dir, tabla, fechas)
+    if sitio is not None:
+        df = df[df[COLUMNA_SITIO] == sitio]
+    return df.groupby(por, as_index=False, dropna=False)[TABLAS_VALORES[tabla]].sum()
+
+
+def _filtrar_turno(df, turno, sitio):
+    filtro = df['turno'] == turno
+    if sitio is not None:
+        filtro &= df[COLUMNA_SITIO] == sitio
+    return df[filtro]
+
+
+def kpis_turno(store_dir, fecha, turno, sitio=None):
+    """Mismo resultado que main_report_generator.calcular_kpis, pero leído del almacén: (kpis, prod_by_truck)."""
+    acarreo = _filtrar_turno(leer_tabla(store_dir, 'acarreo', [fecha]), turno, sitio)
+    perforacion = _filtrar_turno(leer_tabla(store_dir, 'perforacion', [fecha]), turno, sitio)
+
+    por_destino = acarreo.groupby('destination')['toneladas'].sum()
+    prod_by_truck = acarreo[acarreo['destination'] == 'Planta'].groupby('truck_id')['toneladas'].sum()
+    prod_by_truck.name = 'payload_tons'
+    drill_summary = perforacion.groupby('drill_id').agg(
+        total_meters=('metros', 'sum'),
+        hole_count=('pozos', 'sum')
+    ).reset_index()
+    kpis = {
+        "total_mineral_tons": por_destino.get('Planta', 0),
+        "total_waste_tons": por_destino.get('Botadero', 0),
+        "total_drilled_meters": perforacion['metros'].sum(),
+        "drill_summary": drill_summary.to_dict(orient='records')
+    }
+    return kpis, prod_by_truck
+
+
+def verificar_paridad(data_path, store_dir, fecha, turno, sitio=None, tolerancia=1e-6):
+    """
+    Compara kpis_turno (almacén) con calcular_kpis sobre los registros completos del mismo turno.
+    Devuelve la lista de diferencias (vacía si coinciden).
+    """
+    directos = []
+    for nombre in ('fms', 'perforacion'):
+        df = leer_registro(data_path, nombre)
+        fechas, turnos = asignar_turno(df['timestamp'])
+        filtro = (fechas.dt.strftime('%Y-%m-%d') == fecha).to_numpy() & (turnos == turno)
+        if sitio is not None:
+            filtro &= (df[COLUMNA_SITIO] == sitio).to_numpy() if COLUMNA_SITIO in df.columns else sitio == SITIO_UNICO
+        directos.append(df[filtro])
+    kpis_directo, por_camion_directo = calcular_kpis(*directos)
+    kpis_almacen, por_camion_almacen = kpis_turno(store_dir, fecha, turno, sitio)
+
+    diferencias = []
+    for clave in ('total_mineral_tons', 'total_waste_tons', 'total_drilled_meters'):
+        if not np.isclose(kpis_almacen[clave], kpis_directo[clave], rtol=tolerancia):
+            diferencias.append(f"{clave}: almacén {kpis_almacen[clave]:,.3f} vs registros {kpis_directo[clave]:,.3f}")
+    por_camion = pd.concat([por_camion_almacen.rename('almacen'), por_camion_directo.rename('registros')],
+                           axis=1).fillna(0)
+    for camion, fila in por_camion[~np.isclose(por_camion['almacen'], por_camion['registros'], rtol=tolerancia)].iterrows():
+        diferencias.append(f"{camion}: almacén {fila['almacen']:,.3f} t vs registros {fila['registros']:,.3f} t")
+    por_perforadora = {(d['drill_id'], d['hole_count']): d['total_meters'] for d in kpis_directo['drill_summary']}
+    for d in kpis_almacen['drill_summary']:
+        metros = por_perforadora.pop((d['drill_id'], d['hole_count']), None)
+        if metros is None or not np.isclose(d['total_meters'], metros, rtol=tolerancia):
+            diferencias.append(f"perforadora {d['drill_id']}: {d['hole_count']} pozos / {d['total_meters']:,.3f} m "
+                               f"en el almacén no coincide con los registros")
+    diferencias += [f"perforadora {drill}: {pozos} pozos en los registros y no en el almacén"
+                    for drill, pozos in por_perforadora]
+    return diferencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Almacén incremental de KPIs de FMS y Perforación.")
+    parser.add_argument('--datos', default=DATA_PATH)
+    parser.add_argument('--almacen', default=None, help=f"Carpeta del almacén (por defecto <datos>/{STORE_DIRNAME}).")
+    parser.add_argument('--ingestar', action='store_true', help="Procesa las líneas nuevas de los registros.")
+    parser.add_argument('--consultar', nargs=2, metavar=('FECHA', 'TURNO'), help="KPIs de un turno (TURNO: A o B).")
+    parser.add_argument('--verificar', nargs=2, metavar=('FECHA', 'TURNO'),
+                        help="Compara los KPIs del almacén con los calculados sobre los registros completos.")
+    parser.add_argument('--sitio', default=None)
+    args = parser.parse_args()
+    store_dir = args.almacen or os.path.join(args.datos, STORE_DIRNAME)
+
+    if args.ingestar:
+        inicio = time.perf_counter()
+        filas = ingestar(args.datos, store_dir)
+        print(f"Ingesta en {time.perf_counter() - inicio:.2f} s: " +
+              ", ".join(f"{n:,} filas nuevas de {a}" for a, n in filas.items()))
+    if args.consultar:
+        fecha, turno = args.consultar
+        kpis, prod_by_truck = kpis_turno(store_dir, fecha, turno, args.sitio)
+        print(f"--- {fecha} | {TURNOS.get(turno, turno)} | {args.sitio or 'Todos los sitios'} ---")
+        print(f"Mineral a Planta: {kpis['total_mineral_tons']:,.0f} T | Botadero: {kpis['total_waste_tons']:,.0f} T | "
+              f"Perforado: {kpis['total_drilled_meters']:,.1f} m")
+        print(prod_by_truck.sort_values(ascending=False).to_string())
+    if args.verificar:
+        fecha, turno = args.verificar
+        diferencias = verificar_paridad(args.datos, store_dir, fecha, turno, args.sitio)
+        if diferencias:
+            print(f"El almacén NO coincide con los registros ({fecha} turno {turno}):")
+            for d in diferencias:
+                print(f"  - {d}")
+            sys.exit(1)
+        print(f"Almacén y registros coinciden ({fecha} turno {turno}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Generación de reportes de turno por lotes (varios turnos y varios sitios).
+#
+# Los registros de FMS y Perforación se leen una sola vez y se reparten por ventana de turno según 'timestamp'.
+# Cada proceso del pool compila la plantilla Jinja2 y carga style.css una sola vez, y luego genera
+# gráfico + HTML + PDF para los turnos que le tocan. Al final se escribe un resumen de tiempos por reporte.
+#
+# Uso:
+#   python generador_lotes.py --desde 2025-06-01 --hasta 2025-06-30 --sitios Rajo_Norte Rajo_Sur --procesos 8
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Carpeta raíz del repositorio (paquete 'comun') en el path antes de cualquier import local
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from main_report_generator import (DATA_PATH, TEMPLATE_PATH, OUTPUT_PATH, calcular_kpis, crear_grafico_produccion,
+                                   crear_grafico_produccion_svg, cargar_plantilla, leer_css_texto, renderizar_html,
+                                   cargar_css, nombre_reporte, exportar_pdf, exportar_html)
+from comun.ingesta import leer_registro
+
+# Turnos de 12 horas: B (Día) de 08:00 a 20:00 y A (Noche) de 20:00 a 08:00 del día siguiente.
+# Un registro nocturno posterior a medianoche pertenece al turno A de la fecha anterior.
+INICIO_TURNO_DIA_H = 8
+DURACION_TURNO_H = 12
+TURNOS = {'A': 'Turno A - Noche', 'B': 'Turno B - Día'}
+# Columna opcional de sitio en los registros; si no existe, todo el registro corresponde a un único sitio
+COLUMNA_SITIO = 'sitio'
+SITIO_UNICO = 'General'
+SUPERVISOR_DESCONOCIDO = 'No informado'
+
+_WORKER = {}
+
+# --- 1. CARGA Y PARTICIÓN DE LOS REGISTROS ---
+
+def asignar_turno(timestamps):
+    """Fecha y letra de turno de cada registro (vectorizado)."""
+    desplazado = timestamps - pd.Timedelta(hours=INICIO_TURNO_DIA_H)
+    fecha = desplazado.dt.normalize()
+    turno = np.where(desplazado.dt.hour < DURACION_TURNO_H, 'B', 'A')
+    return fecha, turno
+
+
+def particionar_por_turno(df, desde, hasta, sitios):
+    """
+    Índices de filas por (sitio, fecha, turno) en una sola pasada.
+    Devuelve {(sitio, 'AAAA-MM-DD', 'A'|'B'): DataFrame}.
+    """
+    df = df.copy()
+    if COLUMNA_SITIO not in df.columns:
+        df[COLUMNA_SITIO] = SITIO_UNICO
+    fecha, turno = asignar_turno(df['timestamp'])
+    df['_fecha'] = fecha.dt.strftime('%Y-%m-%d')
+    df['_turno'] = turno
+    df = df[(fecha >= desde) & (fecha <= hasta) & df[COLUMNA_SITIO].isin(sitios)]
+    columnas = [c for c in df.columns if not c.startswith('_')]
+    return {clave: df.iloc[filas][columnas] for clave, filas in df.groupby([COLUMNA_SITIO, '_fecha', '_turno'], observed=True).indices.items()}
+
+
+def cargar_supervisores(ruta):
+    """CSV opcional con columnas sitio, fecha, turno (A/B), supervisor."""
+    if not ruta:
+        return {}
+    tabla = pd.read_csv(ruta, dtype=str)
+    return {(r.sitio, r.fecha, r.turno): r.supervisor for r in tabla.itertuples(index=False)}
+
+
+def armar_tareas(desde, hasta, sitios, data_path=DATA_PATH, supervisores=None):
+    """Un reporte por sitio x fecha x turno del rango (los turnos sin registros generan un reporte en cero)."""
+    supervisores = supervisores or {}
+    desde, hasta = pd.Timestamp(desde), pd.Timestamp(hasta)
+    # Solo las filas de los turnos pedidos: el turno A del último día termina a las 08:00 del día siguiente
+    inicio = desde + pd.Timedelta(hours=INICIO_TURNO_DIA_H)
+    fin = hasta + pd.Timedelta(days=1, hours=INICIO_TURNO_DIA_H)
+    df_fms = leer_registro(data_path, 'fms', desde=inicio, hasta=fin)
+    df_drill = leer_registro(data_path, 'perforacion', desde=inicio, hasta=fin)
+    fms = particionar_por_turno(df_fms, desde, hasta, sitios)
+    drill = particionar_por_turno(df_drill, desde, hasta, sitios)
+    vacio_fms, vacio_drill = df_fms.iloc[:0], df_drill.iloc[:0]
+
+    tareas = []
+    for sitio in sitios:
+        for fecha in pd.date_range(desde, hasta, freq='D').strftime('%Y-%m-%d'):
+            for letra, turno in TURNOS.items():
+                clave = (sitio, fecha, letra)
+                shift_info = {'fecha': fecha, 'turno': turno, 'sitio': sitio,
+                              'supervisor': supervisores.get(clave, SUPERVISOR_DESCONOCIDO)}
+                tareas.append({'shift_info': shift_info, 'fms': fms.get(clave, vacio_fms),
+                               'drill': drill.get(clave, vacio_drill)})
+    return tareas
+
+
+def armar_tareas_desde_almacen(desde, hasta, sitios, store_dir, supervisores=None):
+    """Igual que armar_tareas, pero los KPIs salen del almacén incremental (almacen_kpis.py) sin leer los registros."""
+    from almacen_kpis import kpis_turno
+    supervisores = supervisores or {}
+    tareas = []
+    for sitio in sitios:
+        for fecha in pd.date_range(desde, hasta, freq='D').strftime('%Y-%m-%d'):
+            for letra, turno in TURNOS.items():
+                shift_info = {'fecha': fecha, 'turno': turno, 'sitio': sitio,
+                              'supervisor': supervisores.get((sitio, fecha, letra), SUPERVISOR_DESCONOCIDO)}
+                kpis, prod_by_truck = kpis_turno(store_dir, fecha, letra, sitio)
+                tareas.append({'shift_info': shift_info, 'kpis': kpis, 'prod_by_truck': prod_by_truck})
+    return tareas
+
+# --- 2. GENERACIÓN EN PARALELO ---
+
+def _iniciar_proceso(template_path, output_path, formato='pdf'):
+    """Se ejecuta una vez por proceso: plantilla compilada y CSS (interpretado o en texto) quedan en memoria."""
+    _WORKER['template'] = cargar_plantilla(template_path)
+    if formato == 'pdf':
+        _WORKER['css'] = cargar_css(template_path)
+    else:
+        _WORKER['css_inline'] = leer_css_texto(template_path)
+    _WORKER['formato'] = formato
+    _WORKER['template_path'] = template_path
+    _WORKER['output_path'] = output_path
+
+
+def _generar_reporte(tarea):
+    shift_info = tarea['shift_info']
+    tiempos = {'sitio': shift_info['sitio'], 'fecha': shift_info['fecha'], 'turno': shift_info['turno'],
+               'filas_fms': len(tarea.get('fms', ())), 'filas_perforacion': len(tarea.get('drill', ())),
+               'proceso': os.getpid()}
+    t0 = time.perf_counter()
+    if 'kpis' in tarea:
+        kpis, prod_by_truck = tarea['kpis'], tarea['prod_by_truck']
+    else:
+        kpis, prod_by_truck = calcular_kpis(tarea['fms'], tarea['drill'])
+    t1 = time.perf_counter()
+    if _WORKER['formato'] == 'pdf':
+        graficos = {'grafico_produccion_b64': crear_grafico_produccion(prod_by_truck)}
+    else:
+        graficos = {'grafico_produccion_svg': crear_grafico_produccion_svg(prod_by_truck)}
+    t2 = time.perf_counter()
+    html_out = renderizar_html(_WORKER['template'], shift_info, kpis, css_inline=_WORKER.get('css_inline'), **graficos)
+    t3 = time.perf_counter()
+    ruta = os.path.join(_WORKER['output_path'], nombre_reporte(shift_info, _WORKER['formato']))
+    if _WORKER['formato'] == 'pdf':
+        exportar_pdf(html_out, _WORKER['css'], ruta, _WORKER['template_path'])
+    else:
+        exportar_html(html_out, ruta)
+    t4 = time.perf_counter()
+    tiempos.update({'t_kpis_s': t1 - t0, 't_grafico_s': t2 - t1, 't_html_s': t3 - t2, 't_exportar_s': t4 - t3,
+                    't_total_s': t4 - t0, 'archivo': ruta})
+    return tiempos
+
+
+def generar_lote(tareas, procesos=None, template_path=TEMPLATE_PATH, output_path=OUTPUT_PATH, formato='pdf'):
+    """Genera todos los reportes y devuelve el resumen de tiempos (una fila por reporte)."""
+    os.makedirs(output_path, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        _iniciar_proceso(template_path, output_path, formato)
+        resultados = [_generar_reporte(t) for t in tareas]
+    else:
+        # Bloques de varias tareas por envío para amortizar la comunicación entre procesos
+        chunksize = max(1, len(tareas) // (procesos * 4))
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                 initargs=(template_path, output_path, formato)) as executor:
+            resultados = list(executor.map(_generar_reporte, tareas, chunksize=chunksize))
+    return pd.DataFrame(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generación de reportes de turno por lotes.")
+    parser.add_argument('--desde', required=True, help="Fecha inicial (AAAA-MM-DD).")
+    parser.add_argument('--hasta', required=True, help="Fecha final, inclusive (AAAA-MM-DD).")
+    parser.add_argument('--sitios', nargs='+', default=[SITIO_UNICO],
+                        help=f"Sitios a reportar (columna '{COLUMNA_SITIO}' de los registros).")
+    parser.add_argument('--supervisores', default=None, help="CSV opcional: sitio, fecha, turno, supervisor.")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos en paralelo (por defecto, núcleos).")
+    parser.add_argument('--datos', default=DATA_PATH)
+    parser.add_argument('--almacen', default=None,
+                        help="Carpeta del almacén de KPIs: se ingesta la cola nueva y los KPIs se leen de ahí.")
+    parser.add_argument('--salida', default=OUTPUT_PATH)
+    parser.add_argument('--formato', choices=['pdf', 'html'], default='pdf',
+                        help="'html' genera reportes autocontenidos con gráfico SVG, sin matplotlib ni weasyprint.")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    supervisores = cargar_supervisores(args.supervisores)
+    if args.almacen:
+        from almacen_kpis import ingestar
+        print("[1/3] Ingestando registros nuevos y leyendo KPIs del almacén...")
+        ingestar(args.datos, args.almacen)
+        tareas = armar_tareas_desde_almacen(args.desde, args.hasta, args.sitios, args.almacen, supervisores)
+    else:
+        print("[1/3] Cargando y particionando registros por turno...")
+        tareas = armar_tareas(args.desde, args.hasta, args.sitios, args.datos, supervisores)
+    t_carga = time.perf_counter() - inicio
+
+    print(f"[2/3] Generando {len(tareas)} reportes...")
+    resumen = generar_lote(tareas, args.procesos, output_path=args.salida, formato=args.formato)
+    total = time.perf_counter() - inicio
+
+    print("[3/3] Escribiendo resumen de tiempos...")
+    ruta_resumen = os.path.join(args.salida, 'resumen_tiempos_lote.csv')
+    resumen.to_csv(ruta_resumen, index=False)
+
+    print(f"\nCarga y partición: {t_carga:.2f} s | Total: {total:.2f} s | "
+          f"{len(tareas) / total:.1f} reportes/s")
+    if len(resumen):
+        print(resumen[['t_kpis_s', 't_grafico_s', 't_html_s', 't_exportar_s', 't_total_s']].describe()
+              .loc[['mean', '50%', 'max']].to_string(float_format=lambda v: f'{v:.3f}'))
+    print(f"¡Éxito! Resumen de tiempos en: {ruta_resumen}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,244 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import time
+_T_INICIO = time.perf_counter()
+
 import jinja2
-from weasyprint import HTML, CSS
 import json
 import base64
+import html
 from io import BytesIO
 import os
+import sys
+import argparse
+
+# Capa de ingesta compartida con el Día 04 (carpeta 'comun' en la raíz del repositorio)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.ingesta import leer_registro
+from comun import instrumentacion
+from comun.instrumentacion import etapa
+
+# matplotlib y weasyprint NO se importan aquí: juntos tardan más que todo el cálculo de KPIs.
+# Se importan dentro de las funciones que los usan, solo en el modo PDF.
+_T_IMPORTS = time.perf_counter() - _T_INICIO
 
-# --- 1. CONFIGURACIÓN Y CARGA DE DATOS ---
-print("[1/5] Cargando datos...")
 DATA_PATH = 'data'
 TEMPLATE_PATH = 'templates'
 OUTPUT_PATH = 'output'
 
-# Crear carpeta de salida si no existe
-os.makedirs(OUTPUT_PATH, exist_ok=True)
+# --- 1. CONFIGURACIÓN Y CARGA DE DATOS ---
 
-# Cargar la información general del turno
-with open(os.path.join(DATA_PATH, 'shift_info.json'), 'r') as f:
-    shift_info = json.load(f)
+def cargar_datos(data_path=DATA_PATH):
+    """Información del turno y registros de FMS y Perforación."""
+    # Cargar la información general del turno
+    with open(os.path.join(data_path, 'shift_info.json'), 'r') as f:
+        shift_info = json.load(f)
 
-# Cargar datos de FMS y Perforación
-df_fms = pd.read_csv(os.path.join(DATA_PATH, 'fms_data.csv'))
-df_drill = pd.read_csv(os.path.join(DATA_PATH, 'drill_data.csv'))
+    # Cargar datos de FMS y Perforación (tipados: timestamp datetime64, equipos categóricos, magnitudes float32)
+    df_fms = leer_registro(data_path, 'fms')
+    df_drill = leer_registro(data_path, 'perforacion')
+    return shift_info, df_fms, df_drill
 
 # --- 2. PROCESAMIENTO Y CÁLCULO DE KPIs ---
-print("[2/5] Calculando KPIs...")
-
-# KPIs de Acarreo
-mineral_tons = df_fms[df_fms['destination'] == 'Planta']['payload_tons'].sum()
-waste_tons = df_fms[df_fms['destination'] == 'Botadero']['payload_tons'].sum()
-prod_by_truck = df_fms[df_fms['destination'] == 'Planta'].groupby('truck_id')['payload_tons'].sum()
-
-# KPIs de Perforación
-drilled_meters = df_drill['depth_meters'].sum()
-drill_summary = df_drill.groupby('drill_id').agg(
-    total_meters=('depth_meters', 'sum'),
-    hole_count=('hole_id', 'count')
-).reset_index()
-
-# Consolidar KPIs en un diccionario
-kpis = {
-    "total_mineral_tons": mineral_tons,
-    "total_waste_tons": waste_tons,
-    "total_drilled_meters": drilled_meters,
-    "drill_summary": drill_summary.to_dict(orient='records')
-}
 
-# --- 3. GENERACIÓN DEL GRÁFICO ---
-print("[3/5] Creando visualizaciones...")
+def calcular_kpis(df_fms, df_drill):
+    """KPIs de acarreo y perforación. Devuelve (kpis, prod_by_truck)."""
+    # KPIs de Acarreo
+    # Un solo filtro por destino: el subconjunto a Planta sirve para el total y para el detalle por camión
+    df_planta = df_fms[df_fms['destination'] == 'Planta']
+    # Las magnitudes se guardan en float32, pero se suman en float64 para que los totales no pierdan toneladas
+    mineral_tons = df_planta['payload_tons'].astype('float64').sum()
+    waste_tons = df_fms.loc[df_fms['destination'] == 'Botadero', 'payload_tons'].astype('float64').sum()
+    prod_by_truck = df_planta['payload_tons'].astype('float64').groupby(df_planta['truck_id'], observed=True).sum()
+
+    # KPIs de Perforación
+    drilled_meters = df_drill['depth_meters'].astype('float64').sum()
+    drill_summary = df_drill.astype({'depth_meters': 'float64'}).groupby('drill_id', observed=True).agg(
+        total_meters=('depth_meters', 'sum'),
+        hole_count=('hole_id', 'count')
+    ).reset_index()
+
+    # Consolidar KPIs en un diccionario
+    kpis = {
+        "total_mineral_tons": mineral_tons,
+        "total_waste_tons": waste_tons,
+        "total_drilled_meters": drilled_meters,
+        "drill_summary": drill_summary.to_dict(orient='records')
+    }
+    return kpis, prod_by_truck
 
-fig, ax = plt.subplots(figsize=(8, 4))
-prod_by_truck.sort_values().plot(kind='barh', ax=ax, color='#0055A4')
-ax.set_title('Producción de Mineral por Camión')
-ax.set_xlabel('Toneladas')
-ax.set_ylabel('Camión')
-plt.tight_layout()
-
-# Convertir el gráfico a una imagen en memoria para embeber en el PDF
-buffer = BytesIO()
-plt.savefig(buffer, format='png')
-buffer.seek(0)
-image_png = buffer.getvalue()
-buffer.close()
+# --- 3. GENERACIÓN DEL GRÁFICO ---
 
-# Codificar la imagen en Base64
-grafico_produccion_b64 = base64.b64encode(image_png).decode('utf-8')
+def crear_grafico_produccion(prod_by_truck):
+    """Gráfico de barras de producción por camión, codificado en Base64 (PNG). Modo PDF."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    if len(prod_by_truck):
+        prod_by_truck.sort_values().plot(kind='barh', ax=ax, color='#0055A4')
+    else:
+        ax.text(0.5, 0.5, 'Sin envíos a Planta en el turno', ha='center', va='center', transform=ax.transAxes)
+    ax.set_title('Producción de Mineral por Camión')
+    ax.set_xlabel('Toneladas')
+    ax.set_ylabel('Camión')
+    fig.tight_layout()
+
+    # Convertir el gráfico a una imagen en memoria para embeber en el PDF
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    # Cerrar la figura: en un lote de cientos de reportes, las figuras abiertas se acumulan en memoria
+    plt.close(fig)
+    image_png = buffer.getvalue()
+    buffer.close()
+
+    # Codificar la imagen en Base64
+    return base64.b64encode(image_png).decode('utf-8')
+
+
+def crear_grafico_produccion_svg(prod_by_truck, ancho=640, alto_barra=22):
+    """
+    El mismo gráfico de barras horizontales, escrito directamente como SVG en línea a partir de la serie.
+    Sin matplotlib ni PNG/Base64: el HTML queda autocontenido y el texto sigue siendo seleccionable.
+    """
+    inicio_svg = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho}" height="{{alto}}" '
+                  'font-family="Helvetica, Arial, sans-serif">')
+    titulo = (f'<text x="{ancho / 2}" y="18" text-anchor="middle" font-size="14" font-weight="bold">'
+              'Producción de Mineral por Camión</text>')
+    if not len(prod_by_truck):
+        return (inicio_svg.format(alto=80) + titulo +
+                f'<text x="{ancho / 2}" y="55" text-anchor="middle" font-size="12">Sin envíos a Planta en el turno</text>'
+                '</svg>')
+
+    # Mayor producción arriba, igual que sort_values() + barh en matplotlib
+    serie = prod_by_truck.sort_values(ascending=False)
+    margen_izq, margen_der, margen_sup, margen_inf = 70, 70, 30, 30
+    alto = margen_sup + alto_barra * len(serie) + margen_inf
+    escala = (ancho - margen_izq - margen_der) / max(float(serie.max()), 1e-9)
+    barras = []
+    for i, (camion, toneladas) in enumerate(serie.items()):
+        y = margen_sup + i * alto_barra
+        y_texto = y + alto_barra * 0.65
+        largo = float(toneladas) * escala
+        barras.append(
+            f'<text x="{margen_izq - 6}" y="{y_texto:.1f}" text-anchor="end" font-size="11">{html.escape(str(camion))}</text>'
+            f'<rect x="{margen_izq}" y="{y + 3}" width="{largo:.1f}" height="{alto_barra - 6}" fill="#0055A4"/>'
+            f'<text x="{margen_izq + largo + 4:.1f}" y="{y_texto:.1f}" font-size="11">{toneladas:,.0f}</text>'
+        )
+    eje = (f'<line x1="{margen_izq}" y1="{margen_sup}" x2="{margen_izq}" y2="{alto - margen_inf}" stroke="#333"/>'
+           f'<text x="{(ancho + margen_izq - margen_der) / 2}" y="{alto - 8}" text-anchor="middle" font-size="12">Toneladas</text>')
+    return inicio_svg.format(alto=alto) + titulo + ''.join(barras) + eje + '</svg>'
 
 # --- 4. RENDERIZADO DE LA PLANTILLA HTML ---
-print("[4/5] Ensamblando el reporte...")
 
-# Configurar el entorno de Jinja2
-env = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATE_PATH))
-template = env.get_template('template.html')
+def cargar_plantilla(template_path=TEMPLATE_PATH):
+    """Compila la plantilla Jinja2 (una sola vez por proceso)."""
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path))
+    return env.get_template('template.html')
 
-# Preparar el contexto con todos los datos para la plantilla
-context = {
-    "fecha": shift_info['fecha'],
-    "turno": shift_info['turno'],
-    "supervisor": shift_info['supervisor'],
-    "kpis": kpis,
-    "grafico_produccion_b64": grafico_produccion_b64
-}
 
-# Renderizar el HTML con los datos
-html_out = template.render(context)
+def leer_css_texto(template_path=TEMPLATE_PATH):
+    """Texto de style.css para incrustarlo en el HTML autocontenido."""
+    with open(os.path.join(template_path, 'style.css'), 'r', encoding='utf-8') as f:
+        return f.read()
 
-# --- 5. GENERACIÓN DEL PDF ---
-print("[5/5] Exportando a PDF...")
 
-# Cargar el CSS
-css = CSS(os.path.join(TEMPLATE_PATH, 'style.css'))
+def renderizar_html(template, shift_info, kpis, grafico_produccion_b64=None, grafico_produccion_svg=None,
+                    css_inline=None):
+    # Preparar el contexto con todos los datos para la plantilla
+    context = {
+        "fecha": shift_info['fecha'],
+        "turno": shift_info['turno'],
+        "supervisor": shift_info['supervisor'],
+        "sitio": shift_info.get('sitio'),
+        "kpis": kpis,
+        "grafico_produccion_b64": grafico_produccion_b64,
+        "grafico_produccion_svg": grafico_produccion_svg,
+        "css_inline": css_inline
+    }
 
-# Crear el PDF
-pdf_filename = f"reporte_turno_{shift_info['fecha']}_{shift_info['turno'].split(' ')[1]}.pdf"
-pdf_path = os.path.join(OUTPUT_PATH, pdf_filename)
-HTML(string=html_out, base_url=TEMPLATE_PATH).write_pdf(pdf_path, stylesheets=[css])
+    # Renderizar el HTML con los datos
+    return template.render(context)
+
+# --- 5. GENERACIÓN DEL PDF ---
 
-print(f"\n¡Éxito! Reporte generado en: {pdf_path}")
\ No newline at end of file
+def cargar_css(template_path=TEMPLATE_PATH):
+    """Hoja de estilos ya interpretada por WeasyPrint (una sola vez por proceso)."""
+    from weasyprint import CSS
+    return CSS(os.path.join(template_path, 'style.css'))
+
+
+def nombre_reporte(shift_info, extension='pdf'):
+    sitio = f"{shift_info['sitio']}_" if shift_info.get('sitio') else ""
+    return f"reporte_turno_{sitio}{shift_info['fecha']}_{shift_info['turno'].split(' ')[1]}.{extension}"
+
+
+def exportar_pdf(html_out, css, pdf_path, template_path=TEMPLATE_PATH):
+    from weasyprint import HTML
+    HTML(string=html_out, base_url=template_path).write_pdf(pdf_path, stylesheets=[css])
+
+
+def exportar_html(html_out, html_path):
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(html_out)
+
+
+def imprimir_tiempos(tiempos):
+    """Desglose de tiempos desde el arranque del script (incluye los imports)."""
+    total = sum(t for _, t in tiempos)
+    print("\n--- Desglose de tiempos ---")
+    for etapa, t in tiempos:
+        print(f"  {etapa:<32} {t * 1000:9.1f} ms  ({t / total:6.1%})")
+    print(f"  {'Total':<32} {total * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de un turno a PDF o a HTML autocontenido.")
+    parser.add_argument('--formato', choices=['pdf', 'html'], default='pdf',
+                        help="'html' no usa matplotlib ni weasyprint: gráfico SVG y CSS en línea.")
+    parser.add_argument('--tiempos', action='store_true', help="Muestra el desglose de tiempos de arranque y render.")
+    instrumentacion.agregar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacion.configurar_desde_argumentos(args, en_memoria=args.tiempos)
+
+    print("[1/5] Cargando datos...")
+    with etapa("Carga de datos") as e:
+        # Crear carpeta de salida si no existe
+        os.makedirs(OUTPUT_PATH, exist_ok=True)
+        shift_info, df_fms, df_drill = cargar_datos()
+        e.filas = len(df_fms) + len(df_drill)
+
+    print("[2/5] Calculando KPIs...")
+    with etapa("KPIs", filas=len(df_fms) + len(df_drill)):
+        kpis, prod_by_truck = calcular_kpis(df_fms, df_drill)
+
+    print("[3/5] Creando visualizaciones...")
+    if args.formato == 'pdf':
+        with etapa("Gráfico PNG (incl. matplotlib)"):
+            graficos = {'grafico_produccion_b64': crear_grafico_produccion(prod_by_truck)}
+    else:
+        with etapa("Gráfico SVG"):
+            graficos = {'grafico_produccion_svg': crear_grafico_produccion_svg(prod_by_truck)}
+
+    print("[4/5] Ensamblando el reporte...")
+    with etapa("Plantilla HTML"):
+        css_inline = leer_css_texto() if args.formato == 'html' else None
+        html_out = renderizar_html(cargar_plantilla(), shift_info, kpis, css_inline=css_inline, **graficos)
+
+    ruta = os.path.join(OUTPUT_PATH, nombre_reporte(shift_info, args.formato))
+    if args.formato == 'pdf':
+        print("[5/5] Exportando a PDF...")
+        with etapa("PDF (incl. weasyprint)"):
+            exportar_pdf(html_out, cargar_css(), ruta)
+    else:
+        print("[5/5] Exportando a HTML...")
+        with etapa("Escritura HTML"):
+            exportar_html(html_out, ruta)
+
+    print(f"\n¡Éxito! Reporte generado en: {ruta}")
+    if args.tiempos:
+        imprimir_tiempos([("Imports (pandas, jinja2)", _T_IMPORTS)]
+                         + [(r['etapa'], r['segundos']) for r in instrumentacion.registros()])
+
+
+if __name__ == "__main__":
+    main()
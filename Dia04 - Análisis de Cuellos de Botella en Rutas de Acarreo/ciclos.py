@@ -0,0 +1,334 @@
+# Análisis de ciclos de acarreo con geocercas: cola, aculatamiento, carga, acarreo, descarga y retorno.
+#
+# El mapa de calor muestra DÓNDE los camiones van lento; los ciclos explican POR QUÉ (colas en la pala,
+# descargas largas, retornos lentos). Cada ping GPS se asigna a una geocerca (pala, cola de pala, planta,
+# botadero, chancador) sin una llamada de shapely por ping:
+#   1. los pings se agrupan en una grilla gruesa y un STRtree con los polígonos dice qué celdas tocan cada geocerca;
+#   2. para cada geocerca se prueban solo los pings de esas celdas con shapely.contains_xy sobre la geometría
+#      preparada (sin crear un objeto Point por ping).
+# La secuencia de zonas de cada camión se comprime en visitas (tramos contiguos en la misma zona) y las visitas
+# se recorren para armar los ciclos. Cada ciclo se une por tiempo (merge_asof) al registro de tonelaje del FMS.
+#
+# Geocercas: GeoJSON (EPSG:4326) con las propiedades 'nombre', 'tipo' (pala, cola, planta, botadero, chancador)
+# y 'equipo' (shovel_id del FMS para las palas y sus colas). Una pala sin polígono de cola recibe un anillo de
+# BUFFER_COLA_M metros alrededor.
+#
+# Uso:
+#   python ciclos.py --geocercas data/geocercas.geojson
+#   python ciclos.py --desde 2023-11-16 --hasta 2023-11-17 --fms-datos "../Dia03 - Integrador de datos para automatizar reportes/data"
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.ingesta import leer_registro
+from segmentos import proyectar, codigos_camion, orden_camion_tiempo, EPSG_UTM, UMBRAL_BRECHA_S
+
+DATA_PATH = 'data'
+OUTPUT_PATH = 'output'
+FMS_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                             'Dia03 - Integrador de datos para automatizar reportes', 'data')
+# Si dos geocercas se solapan gana la de mayor prioridad (la pala dentro de su anillo de cola)
+PRIORIDAD = {'cola': 0, 'planta': 1, 'botadero': 1, 'chancador': 1, 'pala': 2}
+TIPOS_DESTINO = ('planta', 'botadero', 'chancador')
+BUFFER_COLA_M = 60.0
+TAMANO_CELDA_ZONAS_M = 100.0
+# Bajo esta velocidad el camión está detenido: dentro de la pala, la primera detención marca el inicio de la carga
+VELOCIDAD_DETENIDO_KMH = 3.0
+# Salidas de una zona más cortas que esto (ruido GPS en el borde) no cortan la visita
+TOLERANCIA_SALIDA_S = 30.0
+TOLERANCIA_FMS = pd.Timedelta(minutes=15)
+ETAPAS = ['cola_s', 'aculatamiento_s', 'carga_s', 'acarreo_s', 'descarga_s', 'retorno_s']
+
+# --- 1. GEOCERCAS Y ASIGNACIÓN DE ZONAS ---
+
+def cargar_geocercas(ruta, buffer_cola_m=BUFFER_COLA_M):
+    """GeoDataFrame en EPSG_UTM con nombre, tipo, equipo y prioridad; agrega las colas que falten."""
+    import geopandas
+    gdf = geopandas.read_file(ruta).to_crs(epsg=EPSG_UTM)
+    gdf['tipo'] = gdf['tipo'].str.lower()
+    desconocidos = set(gdf['tipo']) - set(PRIORIDAD)
+    if desconocidos:
+        raise ValueError(f"Tipos de geocerca no reconocidos: {sorted(desconocidos)}. Válidos: {list(PRIORIDAD)}")
+    if 'equipo' not in gdf.columns:
+        gdf['equipo'] = None
+    gdf['equipo'] = gdf['equipo'].fillna(gdf['nombre'])
+    con_cola = set(gdf.loc[gdf['tipo'] == 'cola', 'equipo'])
+    palas = gdf[(gdf['tipo'] == 'pala') & ~gdf['equipo'].isin(con_cola)]
+    if len(palas):
+        colas = palas.copy()
+        colas['geometry'] = palas.buffer(buffer_cola_m).difference(palas.geometry)
+        colas['tipo'] = 'cola'
+        colas['nombre'] = 'Cola ' + palas['nombre']
+        gdf = pd.concat([gdf, colas], ignore_index=True)
+    gdf['prioridad'] = gdf['tipo'].map(PRIORIDAD)
+    return gdf.reset_index(drop=True)
+
+
+def _rangos(inicio, cuenta):
+    """Concatenación de arange(inicio[i], inicio[i] + cuenta[i]) para todos los i, sin bucle."""
+    total = cuenta.sum()
+    desplazamiento = np.repeat(inicio - np.cumsum(cuenta) + cuenta, cuenta)
+    return np.arange(total) + desplazamiento
+
+
+def asignar_zonas(x, y, geocercas, tamano_celda=TAMANO_CELDA_ZONAS_M):
+    """Índice (fila de 'geocercas') de la zona de cada punto; -1 si está fuera de todas."""
+    import shapely
+    poligonos = geocercas.geometry.to_numpy()
+    shapely.prepare(poligonos)
+    zona = np.full(len(x), -1, dtype=np.int32)
+    if not len(x) or not len(poligonos):
+        return zona
+
+    # Pings dentro del rectángulo de todas las geocercas, ordenados por celda de una grilla gruesa
+    xmin, ymin, xmax, ymax = shapely.total_bounds(poligonos)
+    idx = np.flatnonzero((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+    n_col = int((xmax - xmin) // tamano_celda) + 1
+    celda = ((y[idx] - ymin) // tamano_celda).astype(np.int64) * n_col + ((x[idx] - xmin) // tamano_celda).astype(np.int64)
+    orden = np.argsort(celda, kind='stable')
+    idx, celda = idx[orden], celda[orden]
+    inicio = np.flatnonzero(np.r_[True, celda[1:] != celda[:-1]])
+    cuenta = np.diff(np.r_[inicio, len(celda)])
+    ocupadas = celda[inicio]
+
+    # STRtree: qué celdas ocupadas tocan cada geocerca
+    cx = xmin + (ocupadas % n_col) * tamano_celda
+    cy = ymin + (ocupadas // n_col) * tamano_celda
+    cajas = shapely.box(cx, cy, cx + tamano_celda, cy + tamano_celda)
+    i_caja, i_poligono = shapely.STRtree(poligonos).query(cajas, predicate='intersects')
+
+    # De menor a mayor prioridad: en zonas solapadas la última asignación (la más prioritaria) queda
+    for k in np.argsort(geocercas['prioridad'].to_numpy(), kind='stable'):
+        c = i_caja[i_poligono == k]
+        if not len(c):
+            continue
+        candidatos = idx[_rangos(inicio[c], cuenta[c])]
+        zona[candidatos[shapely.contains_xy(poligonos[k], x[candidatos], y[candidatos])]] = k
+    return zona
+
+# --- 2. VISITAS POR CAMIÓN ---
+
+def construir_visitas(camion, t, zona, velocidad, geocercas, tolerancia_s=TOLERANCIA_SALIDA_S,
+                      umbral_brecha_s=UMBRAL_BRECHA_S):
+    """
+    Tramos contiguos de pings de un camión en la misma zona (arreglos ya ordenados por camión y tiempo).
+    Una salida más corta que 'tolerancia_s' entre dos tramos de la misma zona no corta la visita.
+    Devuelve un DataFrame: camion, zona, entrada, salida, primera_detencion (ns; -1 si no se detuvo).
+    """
+    brecha = np.r_[True, (t[1:] - t[:-1]) > umbral_brecha_s * 1e9]
+    corte = np.r_[True, (camion[1:] != camion[:-1]) | (zona[1:] != zona[:-1])] | brecha
+    inicio = np.flatnonzero(corte)
+    fin = np.r_[inicio[1:], len(t)] - 1
+    dentro = zona[inicio] >= 0
+    inicio, fin = inicio[dentro], fin[dentro]
+
+    # Unir tramos de la misma zona y camión separados por una salida breve (sin pérdida de señal entre medio)
+    v_camion, v_zona = camion[inicio], zona[inicio]
+    hueco = t[inicio[1:]] - t[fin[:-1]]
+    continua = ((v_camion[1:] == v_camion[:-1]) & (v_zona[1:] == v_zona[:-1]) & (hueco <= tolerancia_s * 1e9))
+    visita = np.cumsum(np.r_[True, ~continua]) - 1
+    primero = np.flatnonzero(np.r_[True, ~continua])
+    ultimo = np.r_[primero[1:], len(inicio)] - 1
+
+    # Primera detención dentro de cada visita (marca el fin del aculatamiento en la pala)
+    ping_visita = np.full(len(t), -1, dtype=np.int64)
+    ping_visita[_rangos(inicio, fin - inicio + 1)] = np.repeat(visita, fin - inicio + 1)
+    detenido = np.flatnonzero((ping_visita >= 0) & (velocidad < VELOCIDAD_DETENIDO_KMH))
+    primera_detencion = np.full(len(primero), -1, dtype=np.int64)
+    if len(detenido):
+        visitas_detenidas, i_primero = np.unique(ping_visita[detenido], return_index=True)
+        primera_detencion[visitas_detenidas] = t[detenido[i_primero]]
+
+    z = v_zona[primero]
+    return pd.DataFrame({
+        'camion': v_camion[primero],
+        'zona': z,
+        'tipo': geocercas['tipo'].to_numpy()[z],
+        'equipo': geocercas['equipo'].to_numpy()[z],
+        'nombre': geocercas['nombre'].to_numpy()[z],
+        'entrada': t[inicio[primero]],
+        'salida': t[fin[ultimo]],
+        'primera_detencion': primera_detencion,
+    })
+
+# --- 3. CICLOS ---
+
+def _segundos(a, b):
+    return (b - a) / 1e9 if a >= 0 and b >= 0 else np.nan
+
+
+def armar_ciclos(visitas, nombres_camion):
+    """
+    Recorre las visitas de cada camión: un ciclo empieza al llegar a una pala (su cola o la pala misma) y
+    termina al llegar a la siguiente. Visitas consecutivas a la cola y a la pala del mismo equipo forman la
+    estadía en la pala; la primera visita a un destino después de cargar es la descarga.
+    """
+    ciclos = []
+    for camion, grupo in visitas.groupby('camion', sort=True):
+        actual = None
+        estadia = None
+        filas = list(grupo.itertuples(index=False)) + [None]
+        for v in filas:
+            en_pala = v is not None and v.tipo in ('cola', 'pala')
+            if estadia is not None and en_pala and v.equipo == estadia['equipo']:
+                _extender_estadia(estadia, v)
+                continue
+            if estadia is not None:
+                # Termina una estadía en pala: si cargó (pasó por la pala, no solo por la cola), abre un ciclo
+                if estadia['llegada_pala'] >= 0:
+                    if actual is not None:
+                        actual['retorno_s'] = _segundos(actual['salida_destino'], estadia['inicio'])
+                        actual['fin'] = estadia['inicio']
+                        ciclos.append(actual)
+                    actual = _nuevo_ciclo(nombres_camion[camion], estadia)
+                estadia = None
+            if v is None:
+                break
+            if en_pala:
+                estadia = {'equipo': v.equipo, 'inicio': v.entrada, 'llegada_pala': -1, 'inicio_carga': -1,
+                           'fin_carga': -1}
+                _extender_estadia(estadia, v)
+            elif v.tipo in TIPOS_DESTINO and actual is not None and actual['destino'] is None:
+                actual.update(destino=v.nombre, destino_tipo=v.tipo, llegada_destino=v.entrada,
+                              salida_destino=v.salida, acarreo_s=_segundos(actual['fin_carga'], v.entrada),
+                              descarga_s=_segundos(v.entrada, v.salida))
+        if actual is not None:
+            ciclos.append(actual)
+
+    columnas = ['truck_id', 'pala', 'inicio', 'llegada_pala', 'inicio_carga', 'fin_carga', 'destino', 'destino_tipo',
+                'llegada_destino', 'salida_destino', 'fin'] + ETAPAS
+    tabla = pd.DataFrame(ciclos, columns=columnas)
+    for c in ['inicio', 'llegada_pala', 'inicio_carga', 'fin_carga', 'llegada_destino', 'salida_destino', 'fin']:
+        tabla[c] = pd.to_datetime(tabla[c].where(tabla[c] >= 0), unit='ns')
+    tabla['ciclo_s'] = (tabla['fin'] - tabla['inicio']).dt.total_seconds()
+    return tabla
+
+
+def _extender_estadia(estadia, v):
+    if v.tipo == 'pala':
+        if estadia['llegada_pala'] < 0:
+            estadia['llegada_pala'] = v.entrada
+        if estadia['inicio_carga'] < 0 and v.primera_detencion >= 0:
+            estadia['inicio_carga'] = v.primera_detencion
+        estadia['fin_carga'] = v.salida
+
+
+def _nuevo_ciclo(truck_id, estadia):
+    inicio_carga = estadia['inicio_carga']
+    return {
+        'truck_id': truck_id, 'pala': estadia['equipo'], 'inicio': estadia['inicio'],
+        'llegada_pala': estadia['llegada_pala'], 'inicio_carga': inicio_carga, 'fin_carga': estadia['fin_carga'],
+        'destino': None, 'destino_tipo': None, 'llegada_destino': -1, 'salida_destino': -1, 'fin': -1,
+        'cola_s': _segundos(estadia['inicio'], estadia['llegada_pala']),
+        'aculatamiento_s': _segundos(estadia['llegada_pala'], inicio_carga),
+        'carga_s': _segundos(inicio_carga, estadia['fin_carga']),
+        'acarreo_s': np.nan, 'descarga_s': np.nan, 'retorno_s': np.nan,
+    }
+
+# --- 4. CRUCE CON EL FMS Y RESUMEN POR PALA ---
+
+def unir_fms(ciclos, fms, tolerancia=TOLERANCIA_FMS):
+    """
+    Tonelaje del registro FMS de cada ciclo: el del mismo camión más cercano en el tiempo al fin de la carga
+    (dentro de 'tolerancia'). 'coincide_pala' marca si la pala del FMS es la de la geocerca.
+    """
+    izquierda = ciclos.assign(truck_id=ciclos['truck_id'].astype(str)).sort_values('fin_carga')
+    con_carga = izquierda['fin_carga'].notna()
+    derecha = (fms[['timestamp', 'truck_id', 'shovel_id', 'payload_tons', 'destination']]
+               .astype({'truck_id': str, 'shovel_id': str, 'destination': str})
+               .rename(columns={'timestamp': 'timestamp_fms', 'shovel_id': 'pala_fms', 'destination': 'destino_fms'})
+               .sort_values('timestamp_fms'))
+    unidos = pd.merge_asof(izquierda[con_carga], derecha, left_on='fin_carga', right_on='timestamp_fms',
+                           by='truck_id', tolerance=tolerancia, direction='nearest')
+    unidos = pd.concat([unidos, izquierda[~con_carga]], ignore_index=True)
+    unidos['coincide_pala'] = unidos['pala_fms'].isna() | (unidos['pala_fms'] == unidos['pala'].astype(str))
+    return unidos.sort_values(['truck_id', 'inicio']).reset_index(drop=True)
+
+
+def colas_por_pala(ciclos):
+    """Distribución del tiempo de cola por pala (minutos)."""
+    cola_min = ciclos['cola_s'] / 60.0
+    resumen = cola_min.groupby(ciclos['pala']).describe(percentiles=[0.1, 0.5, 0.9])
+    resumen = resumen.rename(columns={'count': 'ciclos', 'mean': 'media_min', 'std': 'desv_min', 'min': 'min_min',
+                                      '10%': 'p10_min', '50%': 'p50_min', '90%': 'p90_min', 'max': 'max_min'})
+    return resumen.reset_index()
+
+
+def grafico_colas(ciclos, ruta):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    palas = sorted(ciclos['pala'].dropna().unique())
+    fig, ax = plt.subplots(figsize=(10, 5))
+    if palas:
+        ax.boxplot([ciclos.loc[ciclos['pala'] == p, 'cola_s'].dropna() / 60.0 for p in palas])
+        ax.set_xticks(range(1, len(palas) + 1), palas)
+    ax.set_title('Tiempo de Cola por Pala', fontsize=14, weight='bold')
+    ax.set_xlabel('Pala')
+    ax.set_ylabel('Minutos en cola')
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.tight_layout()
+    fig.savefig(ruta, dpi=150)
+    plt.close(fig)
+
+# --- 5. FLUJO COMPLETO ---
+
+def analizar_ciclos(df, geocercas):
+    """Pings GPS -> (ciclos, visitas). Todo en bloque salvo el recorrido final de las visitas."""
+    codigos, categorias = codigos_camion(df['truck_id'])
+    t = df['timestamp'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    orden = orden_camion_tiempo(codigos, t)
+    x, y = proyectar(df['longitude'].to_numpy()[orden], df['latitude'].to_numpy()[orden], EPSG_UTM)
+    zona = asignar_zonas(x, y, geocercas)
+    visitas = construir_visitas(codigos[orden], t[orden], zona,
+                                df['speed_kmh'].to_numpy(dtype=np.float64)[orden], geocercas)
+    return armar_ciclos(visitas, np.asarray(categorias)), visitas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ciclos de acarreo (cola, carga, acarreo, descarga, retorno) con geocercas.")
+    parser.add_argument('--datos', default=DATA_PATH)
+    parser.add_argument('--geocercas', default=os.path.join(DATA_PATH, 'geocercas.geojson'))
+    parser.add_argument('--fms-datos', default=FMS_DATA_PATH,
+                        help="Carpeta con fms_data.csv (por defecto, la del Día 03) para unir el tonelaje.")
+    parser.add_argument('--desde', default=None)
+    parser.add_argument('--hasta', default=None, help="Fin exclusivo del rango.")
+    parser.add_argument('--salida', default=OUTPUT_PATH)
+    args = parser.parse_args()
+    os.makedirs(args.salida, exist_ok=True)
+
+    inicio = time.perf_counter()
+    print("[1/4] Cargando pings GPS y geocercas...")
+    df = leer_registro(args.datos, 'gps', columnas=['timestamp', 'truck_id', 'latitude', 'longitude', 'speed_kmh'],
+                       desde=args.desde, hasta=args.hasta)
+    geocercas = cargar_geocercas(args.geocercas)
+    print(f"      {len(df):,} pings, {len(geocercas)} geocercas")
+
+    print("[2/4] Asignando zonas y armando ciclos...")
+    ciclos, visitas = analizar_ciclos(df, geocercas)
+    print(f"      {len(visitas):,} visitas -> {len(ciclos):,} ciclos")
+
+    print("[3/4] Uniendo tonelaje del FMS...")
+    if os.path.exists(os.path.join(args.fms_datos, 'fms_data.csv')):
+        ciclos = unir_fms(ciclos, leer_registro(args.fms_datos, 'fms', desde=args.desde, hasta=args.hasta))
+        print(f"      {ciclos['payload_tons'].notna().sum():,} ciclos con registro FMS")
+    else:
+        print(f"Advertencia: no se encontró fms_data.csv en '{args.fms_datos}'. Ciclos sin tonelaje.")
+
+    print("[4/4] Guardando resultados...")
+    resumen = colas_por_pala(ciclos)
+    ciclos.to_csv(os.path.join(args.salida, 'ciclos.csv'), index=False)
+    resumen.to_csv(os.path.join(args.salida, 'colas_por_pala.csv'), index=False)
+    grafico_colas(ciclos, os.path.join(args.salida, 'colas_por_pala.png'))
+    print(resumen.to_string(index=False, float_format=lambda v: f'{v:,.1f}'))
+    print(f"\n¡Éxito! Ciclos en {time.perf_counter() - inicio:.1f} s: {os.path.join(args.salida, 'ciclos.csv')}")
+
+
+if __name__ == "__main__":
+    main()
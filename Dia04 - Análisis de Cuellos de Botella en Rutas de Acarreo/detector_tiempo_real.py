@@ -0,0 +1,437 @@
+# Detector de cuellos de botella en tiempo real sobre el feed GPS de la flota.
+#
+# El análisis por lotes (main_bottleneck_analysis.py) corre sobre un CSV ya cerrado: despacho se entera de la
+# congestión horas después. Este detector consume pings (timestamp, truck_id, latitude, longitude, speed_kmh)
+# desde un socket TCP o siguiendo un archivo que crece, y emite alertas cuando la velocidad de una celda de
+# camino cae bajo su línea base histórica (p50 por celda y hora del día, tomada del índice de indice_celdas.py).
+# La ventana se resume con el mismo histograma del índice y se compara su p50 con el p50 histórico: misma medida
+# y mismos bins en ambos lados. Las celdas donde el camión normalmente se detiene (colas, carguío, descarga:
+# p10 histórico bajo el primer bin o bajo VELOCIDAD_DETENIDO_KMH) no se evalúan: ahí "lento" es lo normal y la mediana
+# de unos pocos pings salta entre detenido y en marcha.
+#
+# Los bytes recibidos se acumulan y se procesan en lotes cada ~0.1 s: un solo read_csv por lote, una sola
+# llamada a pyproj para reproyectar y agregados por celda con np.unique/np.bincount. El estado se guarda así:
+#   - último punto de cada camión (descarta pings repetidos o atrasados y dice qué camiones están en la celda);
+#   - ventana deslizante en tiempo del evento, como cubetas de 'paso' segundos con suma e histograma por celda.
+#
+# Uso:
+#   python detector_tiempo_real.py --escuchar 127.0.0.1:9100
+#   python detector_tiempo_real.py --seguir data/gps_en_vivo.csv --alertas output/alertas.jsonl
+#   python reproducir_gps.py data/truck_gps_data.csv --velocidad 60 --destino 127.0.0.1:9100   (prueba local)
+#   python detector_tiempo_real.py --verificar     (repite el registro de la línea base: no debe haber alertas)
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from segmentos import proyectar, codigos_camion, EPSG_UTM
+from comun.ingesta import ESQUEMAS, aplicar_esquema, leer_registro
+from ciclos import VELOCIDAD_DETENIDO_KMH
+from indice_celdas import (celdas, clave, desarmar, cargar_dias, dias_disponibles, fusionar, bins_velocidad,
+                           percentiles_histograma, TAMANO_CELDA_M, INDICE_DIRNAME, DATA_PATH, ANCHOS_KMH, N_BINS)
+
+PUERTO = 9100
+VENTANA_S = 300
+PASO_S = 10
+# Alerta cuando el p50 de la ventana cae bajo FACTOR_ALERTA x p50 histórico; se cierra al volver sobre
+# FACTOR_RECUPERACION x p50 (histéresis: una celda en el límite no alerta una y otra vez)
+FACTOR_ALERTA = 0.6
+FACTOR_RECUPERACION = 0.8
+# Celdas con p10 histórico bajo esta velocidad son de detención (no se evalúan)
+BASE_MINIMA_KMH = max(ANCHOS_KMH[0], VELOCIDAD_DETENIDO_KMH)
+MIN_PINGS_VENTANA = 10
+MIN_PINGS_BASE = 30
+INTERVALO_LOTE_S = 0.1
+TAMANO_LECTURA = 1 << 16
+COLUMNAS_GPS = list(ESQUEMAS['gps']['columnas'])
+
+# --- 1. LÍNEA BASE HISTÓRICA ---
+
+def _buscar(claves, valores, consulta):
+    """valores[claves == consulta] para cada consulta (NaN si no está); claves ordenadas."""
+    if not len(claves):
+        return np.full(len(consulta), np.nan)
+    i = np.minimum(np.searchsorted(claves, consulta), len(claves) - 1)
+    return np.where(claves[i] == consulta, valores[i], np.nan)
+
+
+class LineaBase:
+    """
+    Velocidad mediana histórica por (celda, hora del día); si la hora tiene pocos pings, la de la celda.
+    Las celdas de detención (p10 bajo base_minima) quedan con línea base 0.
+    """
+
+    def __init__(self, indice_dir, desde=None, hasta=None, min_pings=MIN_PINGS_BASE, base_minima=BASE_MINIMA_KMH):
+        dias = dias_disponibles(indice_dir)
+        if not dias:
+            raise FileNotFoundError(f"No hay particiones en '{indice_dir}'. "
+                                    "Ejecuta antes: python indice_celdas.py --ingestar")
+        desde, hasta = desde or dias[0], hasta or dias[-1]
+        self.por_hora = self._tabla(fusionar(cargar_dias(indice_dir, desde, hasta), conservar_estado=False),
+                                    min_pings, base_minima)
+        self.por_celda = self._tabla(fusionar(cargar_dias(indice_dir, desde, hasta, resumen=True),
+                                              conservar_estado=False), min_pings, base_minima)
+
+    @staticmethod
+    def _tabla(agregado, min_pings, base_minima):
+        m = agregado['n'] >= min_pings
+        claves = clave(agregado['ix'][m], agregado['iy'][m], 0, agregado['hora'][m].astype(np.int64))
+        p10, p50 = percentiles_histograma(agregado['hist'][m], [10, 50])
+        # Al menos un 10 % de los pings históricos está detenido: celda de detención
+        p50 = np.where(p10 < base_minima, 0.0, p50)
+        orden = np.argsort(claves)
+        return claves[orden], p50[orden]
+
+    def p50(self, ix, iy, hora):
+        base = _buscar(*self.por_hora, clave(ix, iy, 0, hora))
+        falta = np.isnan(base)
+        base[falta] = _buscar(*self.por_celda, clave(ix[falta], iy[falta], 0, 0))
+        return base
+
+# --- 2. ESTADO DEL DETECTOR ---
+
+def _sumar_por_clave(claves, suma, hist):
+    grupos, inverso = np.unique(claves, return_inverse=True)
+    hist_grupo = np.zeros((len(grupos), N_BINS), dtype=np.int64)
+    np.add.at(hist_grupo, inverso, hist)
+    return grupos, np.bincount(inverso, weights=suma, minlength=len(grupos)), hist_grupo
+
+
+class Detector:
+    """
+    Procesa lotes de pings ya tipados y emite alertas (dicts) con la función 'emitir'.
+    Todo el tiempo de la ventana es tiempo del evento (timestamp del ping), así una reproducción a N×
+    se comporta igual que el feed real.
+    """
+
+    def __init__(self, linea_base, emitir, ventana_s=VENTANA_S, paso_s=PASO_S, factor=FACTOR_ALERTA,
+                 factor_recuperacion=FACTOR_RECUPERACION, min_pings=MIN_PINGS_VENTANA, base_minima=BASE_MINIMA_KMH):
+        self.linea_base = linea_base
+        self.emitir = emitir
+        self.paso_ns = int(paso_s * 1e9)
+        self.n_cubetas = max(int(round(ventana_s / paso_s)), 1)
+        self.factor = factor
+        self.factor_recuperacion = factor_recuperacion
+        self.min_pings = min_pings
+        self.base_minima = base_minima
+        # Último punto por camión, indexado por un código entero estable
+        self.codigos = {}
+        self.nombres = []
+        self.ultimo_t = np.empty(0, dtype=np.int64)
+        self.ultima_celda = np.empty(0, dtype=np.int64)
+        self.ultima_velocidad = np.empty(0, dtype=np.float64)
+        # Cubeta (t // paso) -> (claves de celda, suma de velocidad, histograma de velocidad)
+        self.cubetas = {}
+        self.t_max = None
+        # Clave de celda -> alerta abierta
+        self.activas = {}
+        self.pings = 0
+        self.descartados = 0
+
+    def _codigos_estables(self, truck_id):
+        codigos, categorias = codigos_camion(truck_id)
+        mapa = np.empty(len(categorias), dtype=np.int64)
+        for i, camion in enumerate(categorias):
+            if camion not in self.codigos:
+                self.codigos[camion] = len(self.nombres)
+                self.nombres.append(camion)
+            mapa[i] = self.codigos[camion]
+        faltan = len(self.nombres) - len(self.ultimo_t)
+        if faltan > 0:
+            self.ultimo_t = np.concatenate([self.ultimo_t, np.full(faltan, np.iinfo(np.int64).min)])
+            self.ultima_celda = np.concatenate([self.ultima_celda, np.full(faltan, -1, dtype=np.int64)])
+            self.ultima_velocidad = np.concatenate([self.ultima_velocidad, np.full(faltan, np.nan)])
+        return mapa[codigos]
+
+    def agregar_lote(self, df):
+        """Actualiza el último punto de cada camión y las cubetas de la ventana con un lote de pings."""
+        if not len(df):
+            return
+        camion = self._codigos_estables(df['truck_id'])
+        t = df['timestamp'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+        orden = np.lexsort((t, camion))
+        camion, t = camion[orden], t[orden]
+        # Fuera: pings no posteriores al último ya visto del camión y duplicados dentro del lote
+        nuevo = (t > self.ultimo_t[camion]) & np.r_[True, (camion[1:] != camion[:-1]) | (t[1:] != t[:-1])]
+        self.descartados += int((~nuevo).sum())
+        orden, camion, t = orden[nuevo], camion[nuevo], t[nuevo]
+        if not len(t):
+            return
+        self.pings += len(t)
+
+        # Reproyección en bloque
+        x, y = proyectar(df['longitude'].to_numpy()[orden], df['latitude'].to_numpy()[orden], EPSG_UTM)
+        ix, iy = celdas(x, y)
+        claves = clave(ix, iy, 0, 0)
+        velocidad = df['speed_kmh'].to_numpy(dtype=np.float64)[orden]
+
+        ultimo = np.r_[camion[1:] != camion[:-1], True]
+        self.ultimo_t[camion[ultimo]] = t[ultimo]
+        self.ultima_celda[camion[ultimo]] = claves[ultimo]
+        self.ultima_velocidad[camion[ultimo]] = velocidad[ultimo]
+
+        self.t_max = int(t.max()) if self.t_max is None else max(self.t_max, int(t.max()))
+        primera = self.t_max // self.paso_ns - self.n_cubetas + 1
+        cubeta = t // self.paso_ns
+        for b in np.unique(cubeta[cubeta >= primera]):
+            m = cubeta == b
+            hist = np.zeros((int(m.sum()), N_BINS), dtype=np.int64)
+            hist[np.arange(len(hist)), bins_velocidad(velocidad[m])] = 1
+            agregado = _sumar_por_clave(claves[m], velocidad[m], hist)
+            if b in self.cubetas:
+                agregado = _sumar_por_clave(*(np.concatenate(par) for par in zip(self.cubetas[b], agregado)))
+            self.cubetas[b] = agregado
+        for b in [b for b in self.cubetas if b < primera]:
+            del self.cubetas[b]
+
+    def ventana(self):
+        """(claves, conteo, velocidad media, p50 del histograma) por celda en la ventana actual."""
+        if not self.cubetas:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)
+        claves, suma, hist = _sumar_por_clave(*(np.concatenate(c) for c in zip(*self.cubetas.values())))
+        n = hist.sum(axis=1)
+        p50, = percentiles_histograma(hist, [50])
+        return claves, n, suma / n, p50
+
+    def evaluar(self, recibido=None):
+        """Compara la ventana con la línea base; emite alertas nuevas y cierres. Devuelve las alertas nuevas."""
+        if self.t_max is None:
+            return []
+        claves, n, media, p50 = self.ventana()
+        ix, iy, _, _ = desarmar(claves)
+        t_evento = pd.Timestamp(self.t_max)
+        base = self.linea_base.p50(ix, iy, t_evento.hour)
+        with np.errstate(invalid='ignore'):
+            evaluable = (n >= self.min_pings) & (base >= self.base_minima)
+            lenta = evaluable & (p50 < self.factor * base)
+            recuperada = ~(base >= self.base_minima) | (p50 >= self.factor_recuperacion * base)
+
+        latencia_ms = round((time.monotonic() - recibido) * 1000, 1) if recibido is not None else None
+        nuevas = []
+        for i in np.flatnonzero(lenta):
+            c = int(claves[i])
+            if c in self.activas:
+                continue
+            alerta = {
+                'tipo': 'alerta', 't_evento': str(t_evento),
+                'ix': int(ix[i]), 'iy': int(iy[i]),
+                'x_centro': (ix[i] + 0.5) * TAMANO_CELDA_M, 'y_centro': (iy[i] + 0.5) * TAMANO_CELDA_M,
+                'p50_ventana_kmh': round(float(p50[i]), 1), 'media_ventana_kmh': round(float(media[i]), 1),
+                'base_p50_kmh': round(float(base[i]), 1),
+                'pings_ventana': int(n[i]),
+                'camiones': [self.nombres[k] for k in np.flatnonzero(self.ultima_celda == c)],
+                'latencia_ms': latencia_ms,
+            }
+            self.activas[c] = alerta
+            nuevas.append(alerta)
+            self.emitir(alerta)
+
+        # Cierre: la celda se recuperó o ya no tiene pings en la ventana
+        en_ventana = dict(zip(claves.tolist(), recuperada.tolist()))
+        for c in [c for c in self.activas if en_ventana.get(c, True)]:
+            alerta = self.activas.pop(c)
+            self.emitir({'tipo': 'fin', 't_evento': str(t_evento), 'ix': alerta['ix'], 'iy': alerta['iy'],
+                         'inicio': alerta['t_evento'], 'latencia_ms': latencia_ms})
+        return nuevas
+
+
+def verificar_repeticion(data_path, linea_base, desde=None, hasta=None, **opciones):
+    """
+    Repite en tiempo del evento el registro GPS con que se armó la línea base (sin ninguna desaceleración
+    agregada) y devuelve las alertas emitidas. Un detector sano no alerta sobre sus propios datos históricos.
+    """
+    df = leer_registro(data_path, 'gps', desde=desde, hasta=hasta).sort_values('timestamp', kind='stable')
+    alertas = []
+    detector = Detector(linea_base, lambda evento: None, **opciones)
+    cubeta = df['timestamp'].to_numpy().astype('datetime64[ns]').astype(np.int64) // detector.paso_ns
+    cortes = np.flatnonzero(np.diff(cubeta)) + 1
+    for inicio, fin in zip(np.r_[0, cortes], np.r_[cortes, len(df)]):
+        detector.agregar_lote(df.iloc[inicio:fin])
+        alertas += detector.evaluar()
+    return alertas
+
+# --- 3. FUENTES: SOCKET TCP Y ARCHIVO QUE CRECE ---
+
+class Fuente:
+    """Bytes recibidos de una conexión o archivo: se guardan solo líneas completas hasta el próximo lote."""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.columnas = None
+        self.resto = b''
+        self.bloques = []
+        self.recibido = None
+        self.cerrada = False
+
+    def agregar(self, datos):
+        datos = self.resto + datos
+        corte = datos.rfind(b'\n') + 1
+        self.resto = datos[corte:]
+        if not corte:
+            return
+        datos = datos[:corte]
+        if self.columnas is None:
+            # Con cabecera (como el CSV grabado) se respeta su orden; sin cabecera se asume el del esquema
+            if datos.startswith(b'timestamp'):
+                cabecera, _, datos = datos.partition(b'\n')
+                self.columnas = [c.strip() for c in cabecera.decode('utf-8').split(',')]
+            else:
+                self.columnas = COLUMNAS_GPS
+        if datos:
+            self.bloques.append(datos)
+            if self.recibido is None:
+                self.recibido = time.monotonic()
+
+    def tomar(self):
+        datos, recibido = b''.join(self.bloques), self.recibido
+        self.bloques, self.recibido = [], None
+        return datos, recibido
+
+
+def leer_lote(datos, columnas):
+    """Lote de líneas CSV -> DataFrame con el esquema del registro GPS (un solo read_csv por lote)."""
+    df = pd.read_csv(io.BytesIO(datos), names=columnas, header=None, skipinitialspace=True, on_bad_lines='skip')
+    return aplicar_esquema(df.dropna(subset=COLUMNAS_GPS), 'gps')
+
+
+async def atender_conexion(reader, writer, fuentes):
+    fuente = Fuente(str(writer.get_extra_info('peername')))
+    fuentes.append(fuente)
+    try:
+        while datos := await reader.read(TAMANO_LECTURA):
+            fuente.agregar(datos)
+    finally:
+        fuente.cerrada = True
+        writer.close()
+
+
+async def seguir_archivo(ruta, fuentes, desde_inicio=False, intervalo=0.05):
+    """Como 'tail -f': lee lo que se agrega al archivo (desde el final, salvo desde_inicio o archivo nuevo)."""
+    # Si el archivo aún no existe, todo lo que se escriba en él es nuevo: se lee desde el inicio
+    desde_inicio = desde_inicio or not os.path.exists(ruta)
+    while not os.path.exists(ruta):
+        await asyncio.sleep(intervalo)
+    fuente = Fuente(ruta)
+    fuentes.append(fuente)
+    with open(ruta, 'rb') as f:
+        if not desde_inicio:
+            fuente.agregar(f.readline())
+            f.seek(0, os.SEEK_END)
+        while True:
+            datos = f.read(TAMANO_LECTURA)
+            if datos:
+                fuente.agregar(datos)
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(intervalo)
+
+
+async def procesar(detector, fuentes, intervalo_lote=INTERVALO_LOTE_S, intervalo_estado=10.0):
+    """Cada 'intervalo_lote' segundos: un lote por fuente, actualización del estado y evaluación de alertas."""
+    inicio, pings_previos, ultimo_estado = time.monotonic(), 0, time.monotonic()
+    while True:
+        await asyncio.sleep(intervalo_lote)
+        recibidos = []
+        for fuente in list(fuentes):
+            datos, recibido = fuente.tomar()
+            if datos:
+                try:
+                    detector.agregar_lote(leer_lote(datos, fuente.columnas))
+                    recibidos.append(recibido)
+                except (ValueError, pd.errors.ParserError) as error:
+                    print(f"Advertencia: lote descartado de {fuente.nombre}: {error}", file=sys.stderr)
+            if fuente.cerrada and not fuente.bloques:
+                fuentes.remove(fuente)
+        if recibidos:
+            detector.evaluar(min(recibidos))
+        ahora = time.monotonic()
+        if ahora - ultimo_estado >= intervalo_estado:
+            tasa = (detector.pings - pings_previos) / (ahora - ultimo_estado)
+            print(f"[{ahora - inicio:7.1f} s] {detector.pings:,} pings ({tasa:,.0f}/s), "
+                  f"{len(detector.codigos)} camiones, {len(detector.activas)} alertas abiertas", file=sys.stderr)
+            pings_previos, ultimo_estado = detector.pings, ahora
+
+
+def _host_puerto(texto):
+    host, _, puerto = texto.rpartition(':')
+    return host or '127.0.0.1', int(puerto)
+
+
+async def ejecutar(args, detector):
+    fuentes = []
+    tareas = [asyncio.create_task(procesar(detector, fuentes, args.lote))]
+    if args.seguir:
+        tareas.append(asyncio.create_task(seguir_archivo(args.seguir, fuentes, args.desde_inicio)))
+    if args.escuchar or not args.seguir:
+        host, puerto = _host_puerto(args.escuchar or str(PUERTO))
+        servidor = await asyncio.start_server(lambda r, w: atender_conexion(r, w, fuentes), host, puerto)
+        print(f"Escuchando pings GPS en {host}:{puerto}", file=sys.stderr)
+        tareas.append(asyncio.create_task(servidor.serve_forever()))
+    await asyncio.gather(*tareas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector de cuellos de botella en tiempo real sobre el feed GPS.")
+    parser.add_argument('--escuchar', default=None, metavar='[HOST:]PUERTO',
+                        help=f"Recibe líneas CSV por TCP (por defecto 127.0.0.1:{PUERTO} si no se usa --seguir).")
+    parser.add_argument('--seguir', default=None, metavar='ARCHIVO', help="Sigue un CSV que crece (como tail -f).")
+    parser.add_argument('--desde-inicio', action='store_true', help="Con --seguir, procesa también lo ya escrito.")
+    parser.add_argument('--datos', default=DATA_PATH)
+    parser.add_argument('--indice', default=None, help=f"Índice de celdas (por defecto <datos>/{INDICE_DIRNAME}).")
+    parser.add_argument('--base-desde', default=None, help="Primer día de la línea base (por defecto, todo el índice).")
+    parser.add_argument('--base-hasta', default=None)
+    parser.add_argument('--ventana', type=float, default=VENTANA_S, help="Segundos de la ventana deslizante.")
+    parser.add_argument('--paso', type=float, default=PASO_S, help="Segundos por cubeta de la ventana.")
+    parser.add_argument('--factor', type=float, default=FACTOR_ALERTA)
+    parser.add_argument('--recuperacion', type=float, default=FACTOR_RECUPERACION)
+    parser.add_argument('--min-pings', type=int, default=MIN_PINGS_VENTANA)
+    parser.add_argument('--base-minima', type=float, default=BASE_MINIMA_KMH,
+                        help="Celdas con p10 histórico bajo esta velocidad (km/h) no se evalúan.")
+    parser.add_argument('--lote', type=float, default=INTERVALO_LOTE_S, help="Segundos entre lotes.")
+    parser.add_argument('--alertas', default=None, help="Archivo JSON lines para las alertas (por defecto, stdout).")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Repite el registro GPS de la línea base y falla si el detector emite alguna alerta.")
+    args = parser.parse_args()
+
+    linea_base = LineaBase(args.indice or os.path.join(args.datos, INDICE_DIRNAME), args.base_desde, args.base_hasta,
+                           base_minima=args.base_minima)
+    if args.verificar:
+        hasta = (pd.Timestamp(args.base_hasta) + pd.Timedelta(days=1)).strftime('%Y-%m-%d') if args.base_hasta else None
+        alertas = verificar_repeticion(args.datos, linea_base, args.base_desde, hasta, ventana_s=args.ventana,
+                                       paso_s=args.paso, factor=args.factor, factor_recuperacion=args.recuperacion,
+                                       min_pings=args.min_pings, base_minima=args.base_minima)
+        for alerta in alertas:
+            print(json.dumps(alerta, ensure_ascii=False))
+        print(f"Repetición sin desaceleraciones: {len(alertas)} alerta(s) (se esperan 0).", file=sys.stderr)
+        sys.exit(1 if alertas else 0)
+    salida = open(args.alertas, 'a', encoding='utf-8') if args.alertas else sys.stdout
+
+    def emitir(evento):
+        salida.write(json.dumps(evento, ensure_ascii=False) + '\n')
+        salida.flush()
+
+    detector = Detector(linea_base, emitir, args.ventana, args.paso, args.factor, args.recuperacion, args.min_pings,
+                        args.base_minima)
+    # kill (SIGTERM) termina igual que Ctrl+C, con el resumen final
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(ejecutar(args, detector))
+    except KeyboardInterrupt:
+        print(f"\nDetenido: {detector.pings:,} pings procesados, {detector.descartados:,} descartados.",
+              file=sys.stderr)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# Índice persistente de velocidades por celda de camino.
+#
+# Cada ping GPS proyectado (EPSG:32719) cae en una celda cuadrada fija de la grilla. Por cada
+# (celda, estado de carga, hora del día) se guardan agregados que se pueden fusionar sin volver al GPS crudo:
+# conteo, media y M2 (varianza por Welford/Chan) y un histograma de velocidades para percentiles aproximados.
+# Cada día se guarda como una partición .npz; una consulta (p. ej. "las 20 celdas más lentas de la semana,
+# cargados") fusiona solo las particiones de los días pedidos.
+# Cada partición trae además un resumen por (celda, estado) sin hora, que usan las consultas sin filtro horario.
+#
+# Uso:
+#   python indice_celdas.py --ingestar
+#   python indice_celdas.py --consultar 2025-06-02 2025-06-08 --estado cargado --k 20
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.ingesta import leer_registro
+from segmentos import proyectar, EPSG_UTM
+
+DATA_PATH = 'data'
+INDICE_DIRNAME = 'indice_celdas'
+TAMANO_CELDA_M = 25.0
+# Histograma de velocidades: bins de 0.5 km/h hasta 10 km/h (colas, aculatamiento y tramos lentos, donde están
+# los cuellos de botella) y de 2.5 km/h hasta 80 km/h; la última clase acumula lo que exceda (se interpola como
+# si tuviera 2.5 km/h). BORDES_KMH es el borde inferior de cada bin.
+BORDES_KMH = np.r_[np.arange(0.0, 10.0, 0.5), np.arange(10.0, 80.0 + 2.5, 2.5)]
+ANCHOS_KMH = np.r_[np.diff(BORDES_KMH), 2.5]
+N_BINS = len(BORDES_KMH)
+ESTADOS = {'vacio': 0, 'cargado': 1, 'desconocido': 2}
+CAMPOS = ['ix', 'iy', 'estado', 'hora', 'n', 'media', 'm2', 'hist']
+
+# --- 1. CLAVES DE CELDA ---
+
+def celdas(x, y, tamano=TAMANO_CELDA_M):
+    """Índices enteros (ix, iy) de la celda que contiene cada punto."""
+    return np.floor(np.asarray(x) / tamano).astype(np.int64), np.floor(np.asarray(y) / tamano).astype(np.int64)
+
+
+def clave(ix, iy, estado, hora):
+    # Una sola clave int64 por grupo: ix (31 bits) | iy (24 bits) | estado (2 bits) | hora (5 bits)
+    return (((ix << 24 | iy) << 2 | estado) << 5) | hora
+
+
+def desarmar(claves):
+    hora = claves & 31
+    estado = (claves >> 5) & 3
+    iy = (claves >> 7) & ((1 << 24) - 1)
+    ix = claves >> 31
+    return ix, iy, estado, hora
+
+
+def estado_carga(df):
+    """0 vacío, 1 cargado, 2 desconocido (si el registro GPS no trae la columna 'loaded')."""
+    if 'loaded' not in df.columns:
+        return np.full(len(df), ESTADOS['desconocido'], dtype=np.int64)
+    return df['loaded'].to_numpy().astype(np.int64)
+
+# --- 2. AGREGACIÓN Y FUSIÓN ---
+
+def agregar_pings(ix, iy, estado, hora, velocidad):
+    """Agregados por (celda, estado, hora) a partir de pings individuales."""
+    claves = clave(ix, iy, estado, hora)
+    grupos, inverso = np.unique(claves, return_inverse=True)
+    n = np.bincount(inverso)
+    media = np.bincount(inverso, weights=velocidad) / n
+    m2 = np.bincount(inverso, weights=(velocidad - media[inverso]) ** 2)
+    bins = bins_velocidad(velocidad)
+    hist = np.bincount(inverso * N_BINS + bins, minlength=len(grupos) * N_BINS).reshape(-1, N_BINS)
+    return _armar(grupos, n, media, m2, hist)
+
+
+def bins_velocidad(velocidad):
+    """Bin del histograma de cada velocidad (la última clase acumula lo que exceda)."""
+    return (np.searchsorted(BORDES_KMH, velocidad, side='right') - 1).clip(0)
+
+
+def _armar(grupos, n, media, m2, hist):
+    ix, iy, estado, hora = desarmar(grupos)
+    return {'ix': ix, 'iy': iy, 'estado': estado.astype(np.int8), 'hora': hora.astype(np.int8),
+            'n': n.astype(np.int64), 'media': media, 'm2': m2, 'hist': hist.astype(np.uint32)}
+
+
+def fusionar(partes, conservar_estado=True, conservar_hora=True):
+    """
+    Fusiona agregados de varias particiones; con conservar_estado/conservar_hora=False se juntan además
+    todos los estados y/o todas las horas de cada celda.
+    Media y M2 combinados con la fórmula de Chan: M2 = sum(M2_k + n_k (media_k - media)^2).
+    """
+    partes = [p for p in partes if len(p['n'])]
+    if not partes:
+        vacio = {c: np.empty(0, dtype=np.int64) for c in CAMPOS}
+        vacio['hist'] = np.empty((0, N_BINS), dtype=np.uint32)
+        return _armar(vacio['ix'], vacio['n'], vacio['media'].astype(float), vacio['m2'].astype(float), vacio['hist'])
+    junto = {c: np.concatenate([p[c] for p in partes]) for c in CAMPOS}
+    if not conservar_estado:
+        junto['estado'] = np.zeros_like(junto['estado'])
+    if not conservar_hora:
+        junto['hora'] = np.zeros_like(junto['hora'])
+    claves = clave(junto['ix'], junto['iy'], junto['estado'].astype(np.int64), junto['hora'].astype(np.int64))
+    grupos, inverso = np.unique(claves, return_inverse=True)
+    n_k = junto['n']
+    n = np.bincount(inverso, weights=n_k)
+    media = np.bincount(inverso, weights=n_k * junto['media']) / n
+    m2 = np.bincount(inverso, weights=junto['m2'] + n_k * (junto['media'] - media[inverso]) ** 2)
+    # Histogramas: suma por grupo con filas ordenadas por grupo y add.reduceat (sin bucles en Python)
+    orden = np.argsort(inverso, kind='stable')
+    inicios = np.flatnonzero(np.r_[True, np.diff(inverso[orden]) != 0])
+    hist = np.add.reduceat(junto['hist'][orden].astype(np.uint64), inicios, axis=0)
+    return _armar(grupos, n, media, m2, hist)
+
+
+def percentiles_histograma(hist, qs):
+    """Percentiles aproximados (interpolación lineal dentro del bin) para cada fila del histograma."""
+    acumulado = np.cumsum(hist, axis=1)
+    total = acumulado[:, -1:]
+    salida = []
+    for q in qs:
+        objetivo = total * q / 100.0
+        b = np.minimum((acumulado < objetivo).sum(axis=1), N_BINS - 1)
+        previo = np.where(b > 0, np.take_along_axis(acumulado, np.maximum(b - 1, 0)[:, None], axis=1)[:, 0], 0)
+        en_bin = np.take_along_axis(hist, b[:, None], axis=1)[:, 0]
+        fraccion = np.divide(objetivo[:, 0] - previo, en_bin, out=np.zeros(len(b)), where=en_bin > 0)
+        salida.append(BORDES_KMH[b] + np.clip(fraccion, 0, 1) * ANCHOS_KMH[b])
+    return salida
+
+# --- 3. PERSISTENCIA POR DÍA ---
+
+def ruta_dia(indice_dir, dia):
+    return os.path.join(indice_dir, f'dia={dia}.npz')
+
+
+def dias_disponibles(indice_dir):
+    """Días (AAAA-MM-DD) con partición en el índice, en orden."""
+    if not os.path.isdir(indice_dir):
+        return []
+    return sorted(f[4:-4] for f in os.listdir(indice_dir) if f.startswith('dia=') and f.endswith('.npz')
+                  and not f.endswith('.tmp.npz'))
+
+
+def ingestar(data_path=DATA_PATH, indice_dir=None, desde=None, hasta=None):
+    """
+    Agrega los pings del rango (todo el registro si no se indica) y escribe una partición por día.
+    El rango se amplía a días completos (desde baja a las 00:00 de su día, hasta sube a las 00:00 del día siguiente,
+    salvo que ya sea medianoche): cada partición se reescribe con TODOS los pings de su día, así re-ingestar
+    un día o un tramo de él da siempre la misma partición (idempotente). Devuelve {día: pings}.
+    """
+    indice_dir = indice_dir or os.path.join(data_path, INDICE_DIRNAME)
+    desde = pd.Timestamp(desde).floor('D') if desde is not None else None
+    hasta = pd.Timestamp(hasta).ceil('D') if hasta is not None else None
+    os.makedirs(indice_dir, exist_ok=True)
+    df = leer_registro(data_path, 'gps', desde=desde, hasta=hasta)
+    x, y = proyectar(df['longitude'].to_numpy(), df['latitude'].to_numpy(), EPSG_UTM)
+    ix, iy = celdas(x, y)
+    estado = estado_carga(df)
+    hora = df['timestamp'].dt.hour.to_numpy().astype(np.int64)
+    velocidad = df['speed_kmh'].to_numpy(dtype=np.float64)
+    dias = df['timestamp'].dt.strftime('%Y-%m-%d').to_numpy()
+    resultado = {}
+    for dia in np.unique(dias):
+        m = dias == dia
+        agregado = agregar_pings(ix[m], iy[m], estado[m], hora[m], velocidad[m])
+        # Resumen por (celda, estado) sin hora: las consultas sin filtro horario leen ~24 veces menos filas
+        resumen = fusionar([agregado], conservar_hora=False)
+        np.savez(ruta_dia(indice_dir, dia) + '.tmp.npz', tamano_celda=TAMANO_CELDA_M, bordes_kmh=BORDES_KMH, **agregado,
+                 **{f'resumen_{c}': v for c, v in resumen.items()})
+        os.replace(ruta_dia(indice_dir, dia) + '.tmp.npz', ruta_dia(indice_dir, dia))
+        resultado[str(dia)] = int(m.sum())
+    return resultado
+
+
+def cargar_dias(indice_dir, desde, hasta, resumen=False):
+    """Agregados de cada día del rango (inclusive): detalle por hora o el resumen por (celda, estado)."""
+    prefijo = 'resumen_' if resumen else ''
+    partes = []
+    for dia in pd.date_range(desde, hasta, freq='D').strftime('%Y-%m-%d'):
+        ruta = ruta_dia(indice_dir, dia)
+        if os.path.exists(ruta):
+            with np.load(ruta) as z:
+                # Un índice escrito con otros bins o celdas no se puede fusionar con el actual
+                if ('bordes_kmh' not in z or not np.array_equal(z['bordes_kmh'], BORDES_KMH)
+                        or float(z['tamano_celda']) != TAMANO_CELDA_M):
+                    raise ValueError(f"'{ruta}' usa otros bins de velocidad o tamaño de celda. "
+                                     "Vuelve a ingestar: python indice_celdas.py --ingestar")
+                partes.append({c: z[prefijo + c] for c in CAMPOS})
+    return partes
+
+# --- 4. CONSULTAS ---
+
+def consultar(indice_dir, desde, hasta, estados=None, horas=None, zona=None, min_pings=1, por_celda=True):
+    """
+    Estadísticas por celda (o por celda, estado y hora si por_celda=False) fusionando los días pedidos.
+    estados: nombres de ESTADOS; horas: iterable de horas 0-23; zona: (xmin, ymin, xmax, ymax) en metros
+    o un polígono de shapely (p. ej. el corredor del camino a Planta).
+    """
+    partes = cargar_dias(indice_dir, desde, hasta, resumen=horas is None and por_celda)
+    filtradas = []
+    for p in partes:
+        m = np.ones(len(p['n']), dtype=bool)
+        if estados is not None:
+            m &= np.isin(p['estado'], [ESTADOS[e] for e in estados])
+        if horas is not None:
+            m &= np.isin(p['hora'], list(horas))
+        filtradas.append({c: v[m] for c, v in p.items()})
+    agregado = fusionar(filtradas, conservar_estado=not por_celda, conservar_hora=not por_celda)
+
+    xc = (agregado['ix'] + 0.5) * TAMANO_CELDA_M
+    yc = (agregado['iy'] + 0.5) * TAMANO_CELDA_M
+    m = agregado['n'] >= min_pings
+    if zona is not None:
+        if isinstance(zona, tuple):
+            m &= (xc >= zona[0]) & (yc >= zona[1]) & (xc <= zona[2]) & (yc <= zona[3])
+        else:
+            import shapely
+            m &= shapely.contains_xy(zona, xc, yc)
+    p10, p50, p90 = percentiles_histograma(agregado['hist'][m], [10, 50, 90])
+    n = agregado['n'][m]
+    tabla = pd.DataFrame({'ix': agregado['ix'][m], 'iy': agregado['iy'][m], 'x_centro': xc[m], 'y_centro': yc[m],
+                          'n': n, 'media_kmh': agregado['media'][m],
+                          'desv_kmh': np.sqrt(np.divide(agregado['m2'][m], n - 1, out=np.zeros(len(n)), where=n > 1)),
+                          'p10_kmh': p10, 'p50_kmh': p50, 'p90_kmh': p90})
+    if not por_celda:
+        estado_nombre = {v: k for k, v in ESTADOS.items()}
+        tabla.insert(4, 'estado', [estado_nombre[e] for e in agregado['estado'][m]])
+        tabla.insert(5, 'hora', agregado['hora'][m])
+    return tabla
+
+
+def celdas_mas_lentas(indice_dir, desde, hasta, k=20, criterio='p50_kmh', min_pings=30, **filtros):
+    """Las k celdas con menor velocidad (mediana por defecto) con al menos min_pings observaciones."""
+    tabla = consultar(indice_dir, desde, hasta, min_pings=min_pings, **filtros)
+    return tabla.nsmallest(k, criterio).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice persistente de velocidades por celda de camino.")
+    parser.add_argument('--datos', default=DATA_PATH)
+    parser.add_argument('--indice', default=None, help=f"Carpeta del índice (por defecto <datos>/{INDICE_DIRNAME}).")
+    parser.add_argument('--ingestar', action='store_true', help="Agrega el registro GPS al índice (un archivo por día).")
+    parser.add_argument('--desde', default=None, help="Inicio del rango a ingestar (p. ej. el día nuevo); se reingesta desde las 00:00 de ese día.")
+    parser.add_argument('--hasta', default=None, help="Fin (exclusivo) del rango a ingestar; se amplía hasta el final de su día.")
+    parser.add_argument('--consultar', nargs=2, metavar=('DESDE', 'HASTA'), help="Celdas más lentas entre dos fechas.")
+    parser.add_argument('--estado', choices=list(ESTADOS), nargs='+', default=None)
+    parser.add_argument('--horas', type=int, nargs='+', default=None)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--min-pings', type=int, default=30)
+    args = parser.parse_args()
+    indice_dir = args.indice or os.path.join(args.datos, INDICE_DIRNAME)
+
+    if args.ingestar:
+        inicio = time.perf_counter()
+        dias = ingestar(args.datos, indice_dir, args.desde, args.hasta)
+        print(f"Ingesta en {time.perf_counter() - inicio:.2f} s: {sum(dias.values()):,} pings en {len(dias)} día(s)")
+    if args.consultar:
+        inicio = time.perf_counter()
+        tabla = celdas_mas_lentas(indice_dir, *args.consultar, k=args.k, min_pings=args.min_pings,
+                                  estados=args.estado, horas=args.horas)
+        print(f"Consulta en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        print(tabla.to_string(index=False, float_format=lambda v: f'{v:,.1f}'))
+
+
+if __name__ == "__main__":
+    main()
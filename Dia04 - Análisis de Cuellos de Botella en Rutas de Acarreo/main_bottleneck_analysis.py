@@ -1,82 +1,146 @@
-import pandas as pd
-import geopandas
-from shapely.geometry import Point, LineString
 import matplotlib.pyplot as plt
 import os
+import sys
+import argparse
+
+# Capa de ingesta compartida con el Día 03 (carpeta 'comun' en la raíz del repositorio)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.ingesta import leer_registro
+from comun import instrumentacion
+from comun.instrumentacion import etapa
+from segmentos import construir_segmentos, a_geodataframe, proyectar, UMBRAL_BRECHA_S, EPSG_UTM
+import raster_calor
 
-# --- 1. CONFIGURACIÓN Y CARGA DE DATOS ---
-print("[1/4] Cargando datos y configurando el entorno...")
 DATA_PATH = 'data'
 OUTPUT_PATH = 'output'
-os.makedirs(OUTPUT_PATH, exist_ok=True)
 
-df = pd.read_csv(os.path.join(DATA_PATH, 'truck_gps_data.csv'))
+# --- 1. CONFIGURACIÓN Y CARGA DE DATOS ---
+
+def cargar_datos(data_path=DATA_PATH):
+    # timestamp como datetime64 (el orden de los segmentos es cronológico, no alfabético), truck_id categórico
+    return leer_registro(data_path, 'gps')
 
 # --- 2. CONVERSIÓN A GEOESPACIAL Y CREACIÓN DE SEGMENTOS ---
-print("[2/4] Procesando datos GPS a formato geoespacial...")
-gdf = geopandas.GeoDataFrame(
-    df, geometry=geopandas.points_from_xy(df.longitude, df.latitude))
-gdf.set_crs("EPSG:4326", inplace=True)
-gdf = gdf.to_crs(epsg=32719) # ¡Recuerda ajustar tu zona UTM!
-
-segments = []
-for truck_id, truck_data in gdf.groupby('truck_id'):
-    truck_data = truck_data.sort_values('timestamp')
-    points = truck_data.geometry.tolist()
-    speeds = truck_data['speed_kmh'].tolist()
-    for i in range(len(points) - 1):
-        segment = LineString([points[i], points[i+1]])
-        avg_speed = (speeds[i] + speeds[i+1]) / 2
-        segments.append({'geometry': segment, 'avg_speed': avg_speed})
-
-segments_gdf = geopandas.GeoDataFrame(segments, crs="EPSG:32719")
+
+def crear_segmentos(df, umbral_brecha_s=UMBRAL_BRECHA_S, geometrias=True):
+    """
+    Segmentos entre pings consecutivos de cada camión, calculados en bloque (ver segmentos.py):
+    largo, duración, velocidad promedio y rumbo como columnas; las geometrías se agregan solo para dibujar
+    en modo vectorial (el modo raster trabaja directo con x0, y0, x1, y1).
+    """
+    with etapa("Reproyección", filas=len(df)):
+        x, y = proyectar(df['longitude'].to_numpy(), df['latitude'].to_numpy(), EPSG_UTM)
+    with etapa("Segmentos", filas=len(df)):
+        segmentos = construir_segmentos(df, umbral_brecha_s=umbral_brecha_s, epsg=EPSG_UTM, x=x, y=y)
+    if not geometrias:
+        return segmentos
+    with etapa("Geometrías", filas=len(segmentos)):
+        return a_geodataframe(segmentos, epsg=EPSG_UTM)
 
 # --- 3. GENERACIÓN DEL GRÁFICO "HOT" (SECCIÓN CORREGIDA) ---
-print("[3/4] Creando el mapa de calor de velocidades...")
-
-fig, ax = plt.subplots(1, 1, figsize=(15, 12))
-
-### CAMBIO CLAVE 1: CALCULAR LÍMITES DINÁMICAMENTE ###
-# Obtenemos las coordenadas mínimas y máximas de todas nuestras rutas.
-# Añadimos un pequeño buffer (margen) para que no quede tan ajustado.
-buffer = 200 # en metros
-xmin, ymin, xmax, ymax = segments_gdf.total_bounds
-xmin_buf, ymin_buf = xmin - buffer, ymin - buffer
-xmax_buf, ymax_buf = xmax + buffer, ymax + buffer
-
-# OPCIONAL PERO RECOMENDADO: Añadir imagen de fondo
-try:
-    mine_layout_img = plt.imread(os.path.join(DATA_PATH, 'mine_layout.png'))
-    # Usamos los límites calculados dinámicamente como el nuevo 'extent'
-    ax.imshow(mine_layout_img, extent=[xmin_buf, xmax_buf, ymin_buf, ymax_buf], aspect='auto')
-except FileNotFoundError:
-    print("Advertencia: No se encontró 'mine_layout.png'. El gráfico se generará sobre fondo blanco.")
-
-# Dibujar los segmentos de ruta, coloreados por velocidad
-segments_gdf.plot(ax=ax, 
-                  column='avg_speed', 
-                  cmap='RdYlGn', 
-                  linewidth=3, 
-                  legend=True,
-                  legend_kwds={'label': "Velocidad Promedio (km/h)",
-                               'orientation': "vertical",
-                               'shrink': 0.8})
-
-### CAMBIO CLAVE 2: ESTABLECER LÍMITES DEL GRÁFICO ###
-# Forzamos al gráfico a tener los mismos límites que nuestra imagen
-ax.set_xlim(xmin_buf, xmax_buf)
-ax.set_ylim(ymin_buf, ymax_buf)
-
-# Estilo del gráfico
-ax.set_title('Análisis de Cuellos de Botella en Rutas de Acarreo', fontsize=20, weight='bold')
-ax.set_xlabel('Coordenada Este (m)')
-ax.set_ylabel('Coordenada Norte (m)')
-ax.set_aspect('equal', adjustable='box')
-plt.grid(True, linestyle='--', alpha=0.6)
-
-# --- 4. GUARDAR EL RESULTADO ---
-print("[4/4] Guardando el gráfico en alta resolución...")
-output_filename = os.path.join(OUTPUT_PATH, 'speed_heatmap_fixed.png')
-plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-
-print(f"\n¡Éxito! Mapa de calor corregido generado en: {output_filename}")
\ No newline at end of file
+
+def generar_mapa_calor_raster(segmentos, data_path=DATA_PATH, ancho_px=raster_calor.ANCHO_PX, grosor_px=3):
+    """
+    Mapa de calor rasterizado (ver raster_calor.py): los segmentos se acumulan en grillas NumPy sobre los
+    mismos límites (total_bounds + 200 m) y se dibujan como una sola imagen. Devuelve (fig, grilla).
+    """
+    grilla = raster_calor.Grilla(raster_calor.limites_segmentos(segmentos, buffer=200), ancho_px=ancho_px)
+    grilla.acumular_segmentos(segmentos, columna='avg_speed')
+    return raster_calor.dibujar(grilla, data_path, grosor_px=grosor_px), grilla
+
+
+def generar_mapa_calor(segments_gdf, data_path=DATA_PATH):
+    """Mapa vectorial original: un LineString por segmento (solo práctico con pocos miles de segmentos)."""
+    fig, ax = plt.subplots(1, 1, figsize=(15, 12))
+
+    ### CAMBIO CLAVE 1: CALCULAR LÍMITES DINÁMICAMENTE ###
+    # Obtenemos las coordenadas mínimas y máximas de todas nuestras rutas.
+    # Añadimos un pequeño buffer (margen) para que no quede tan ajustado.
+    buffer = 200 # en metros
+    xmin, ymin, xmax, ymax = segments_gdf.total_bounds
+    xmin_buf, ymin_buf = xmin - buffer, ymin - buffer
+    xmax_buf, ymax_buf = xmax + buffer, ymax + buffer
+
+    # OPCIONAL PERO RECOMENDADO: Añadir imagen de fondo
+    try:
+        mine_layout_img = plt.imread(os.path.join(data_path, 'mine_layout.png'))
+        # Usamos los límites calculados dinámicamente como el nuevo 'extent'
+        ax.imshow(mine_layout_img, extent=[xmin_buf, xmax_buf, ymin_buf, ymax_buf], aspect='auto')
+    except FileNotFoundError:
+        print("Advertencia: No se encontró 'mine_layout.png'. El gráfico se generará sobre fondo blanco.")
+
+    # Dibujar los segmentos de ruta, coloreados por velocidad
+    segments_gdf.plot(ax=ax,
+                      column='avg_speed',
+                      cmap='RdYlGn',
+                      linewidth=3,
+                      legend=True,
+                      legend_kwds={'label': "Velocidad Promedio (km/h)",
+                                   'orientation': "vertical",
+                                   'shrink': 0.8})
+
+    ### CAMBIO CLAVE 2: ESTABLECER LÍMITES DEL GRÁFICO ###
+    # Forzamos al gráfico a tener los mismos límites que nuestra imagen
+    ax.set_xlim(xmin_buf, xmax_buf)
+    ax.set_ylim(ymin_buf, ymax_buf)
+
+    # Estilo del gráfico
+    ax.set_title('Análisis de Cuellos de Botella en Rutas de Acarreo', fontsize=20, weight='bold')
+    ax.set_xlabel('Coordenada Este (m)')
+    ax.set_ylabel('Coordenada Norte (m)')
+    ax.set_aspect('equal', adjustable='box')
+    plt.grid(True, linestyle='--', alpha=0.6)
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mapa de calor de velocidades en rutas de acarreo.")
+    parser.add_argument('--umbral-brecha', type=float, default=UMBRAL_BRECHA_S,
+                        help="Segundos máximos entre pings consecutivos para formar un segmento.")
+    parser.add_argument('--modo', choices=['raster', 'vectorial'], default='raster',
+                        help="'raster' acumula los segmentos en una grilla (millones de segmentos en segundos); "
+                             "'vectorial' dibuja un LineString por segmento.")
+    parser.add_argument('--ancho-px', type=int, default=raster_calor.ANCHO_PX,
+                        help="Ancho de la grilla raster en píxeles.")
+    parser.add_argument('--teselas', action='store_true',
+                        help="Además exporta una pirámide de teselas PNG (output/teselas/z/x/y.png) para hacer zoom.")
+    instrumentacion.agregar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacion.configurar_desde_argumentos(args)
+
+    print("[1/4] Cargando datos y configurando el entorno...")
+    with etapa("Carga de datos") as e:
+        os.makedirs(OUTPUT_PATH, exist_ok=True)
+        df = cargar_datos()
+        e.filas = len(df)
+
+    print("[2/4] Procesando datos GPS a formato geoespacial...")
+    segments_gdf = crear_segmentos(df, args.umbral_brecha, geometrias=args.modo == 'vectorial')
+    print(f"      {len(df):,} pings -> {len(segments_gdf):,} segmentos")
+    if not len(segments_gdf):
+        print("ERROR: No hay segmentos para dibujar (¿registro vacío o --umbral-brecha demasiado bajo?).")
+        return
+
+    print("[3/4] Creando el mapa de calor de velocidades...")
+    with etapa("Mapa de calor", filas=len(segments_gdf), modo=args.modo):
+        if args.modo == 'raster':
+            fig, grilla = generar_mapa_calor_raster(segments_gdf, ancho_px=args.ancho_px)
+        else:
+            fig = generar_mapa_calor(segments_gdf)
+    if args.modo == 'raster' and args.teselas:
+        with etapa("Teselas"):
+            destino = os.path.join(OUTPUT_PATH, 'teselas')
+            n = raster_calor.guardar_teselas(grilla, destino)
+        print(f"      {n} teselas en {destino}")
+
+    # --- 4. GUARDAR EL RESULTADO ---
+    print("[4/4] Guardando el gráfico en alta resolución...")
+    output_filename = os.path.join(OUTPUT_PATH, 'speed_heatmap_fixed.png')
+    with etapa("Guardar PNG"):
+        fig.savefig(output_filename, dpi=300, bbox_inches='tight')
+
+    print(f"\n¡Éxito! Mapa de calor corregido generado en: {output_filename}")
+
+
+if __name__ == "__main__":
+    main()
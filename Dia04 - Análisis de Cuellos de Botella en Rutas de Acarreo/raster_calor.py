@@ -0,0 +1,228 @@
+# Renderizador rasterizado del mapa de calor de velocidades.
+#
+# GeoDataFrame.plot() crea un artista de matplotlib por LineString: con cientos de miles de segmentos el dibujo
+# y el guardado a 300 dpi se vuelven lentísimos y consumen mucha memoria. Aquí cada segmento se recorre
+# píxel a píxel (DDA: un paso de 1 píxel en el eje de mayor avance) y las muestras se acumulan con
+# np.bincount en dos grillas fijas (metros recorridos y metros x velocidad) sobre total_bounds + buffer. La velocidad
+# media por píxel se colorea con el colormap y se dibuja como UNA sola imagen sobre mine_layout.png. La memoria depende del tamaño de la grilla
+# y del bloque de segmentos, no del número total de segmentos.
+# Para hacer zoom se puede exportar una pirámide de teselas PNG (z/x/y.png): cada nivel suma bloques de 2x2
+# píxeles del conteo y la suma, así la media de cada nivel sigue siendo exacta.
+
+import json
+import os
+
+import numpy as np
+
+BUFFER_M = 200.0
+ANCHO_PX = 2000
+# Muestras (puntos a lo largo de los segmentos) por bloque al acumular: acota la memoria temporal
+MUESTRAS_POR_BLOQUE = 1_000_000
+TAMANO_TESELA = 256
+CMAP = 'RdYlGn'
+
+# --- 1. GRILLA ---
+
+def limites_segmentos(segmentos, buffer=BUFFER_M):
+    """(xmin, ymin, xmax, ymax) de todos los extremos de los segmentos, más el buffer (igual que total_bounds)."""
+    if not len(segmentos):
+        raise ValueError("No hay segmentos para dibujar (rango de fechas vacío o todas las brechas superan el umbral).")
+    x = np.concatenate([segmentos['x0'].to_numpy(), segmentos['x1'].to_numpy()])
+    y = np.concatenate([segmentos['y0'].to_numpy(), segmentos['y1'].to_numpy()])
+    return (x.min() - buffer, y.min() - buffer, x.max() + buffer, y.max() + buffer)
+
+
+class Grilla:
+    """
+    Grillas de metros recorridos ('conteo') y suma de metros x velocidad sobre un rectángulo fijo.
+    La fila 0 es el borde norte (como una imagen).
+    """
+
+    def __init__(self, limites, ancho_px=ANCHO_PX, metros_por_pixel=None):
+        self.xmin, self.ymin, self.xmax, self.ymax = limites
+        self.metros_por_pixel = metros_por_pixel or (self.xmax - self.xmin) / ancho_px
+        self.ancho = int(np.ceil((self.xmax - self.xmin) / self.metros_por_pixel))
+        self.alto = int(np.ceil((self.ymax - self.ymin) / self.metros_por_pixel))
+        self.conteo = np.zeros(self.alto * self.ancho, dtype=np.float64)
+        self.suma = np.zeros(self.alto * self.ancho, dtype=np.float64)
+
+    @property
+    def extent(self):
+        """Extensión real cubierta por los píxeles (para imshow)."""
+        return [self.xmin, self.xmin + self.ancho * self.metros_por_pixel,
+                self.ymax - self.alto * self.metros_por_pixel, self.ymax]
+
+    def acumular(self, x0, y0, x1, y1, velocidad, muestras_por_bloque=MUESTRAS_POR_BLOQUE):
+        """
+        Suma la cobertura de cada segmento ponderada por su largo: cada segmento se muestrea una vez por
+        píxel recorrido (DDA) y cada muestra pesa largo / n metros, así la media de un píxel pondera cada
+        velocidad por los metros recorridos en él. Los segmentos de largo 0 (camión detenido) no aportan,
+        igual que en el mapa vectorial, donde no se dibujan.
+        Los segmentos se procesan en bloques de ~'muestras_por_bloque' muestras (la memoria no crece con el total).
+        """
+        # Coordenadas en píxeles (columna, fila desde el norte)
+        c0, c1 = (x0 - self.xmin) / self.metros_por_pixel, (x1 - self.xmin) / self.metros_por_pixel
+        f0, f1 = (self.ymax - y0) / self.metros_por_pixel, (self.ymax - y1) / self.metros_por_pixel
+        n = np.ceil(np.maximum(np.abs(c1 - c0), np.abs(f1 - f0))).astype(np.int64) + 1
+        largo = np.hypot(x1 - x0, y1 - y0)
+        acumulado = np.cumsum(n)
+        cortes = np.searchsorted(acumulado, np.arange(muestras_por_bloque, acumulado[-1] if len(n) else 0,
+                                                      muestras_por_bloque), side='right')
+        for b in np.split(np.arange(len(n)), cortes):
+            if len(b):
+                b = slice(b[0], b[-1] + 1)
+                self._acumular_bloque(c0[b], f0[b], c1[b], f1[b], n[b], largo[b], velocidad[b])
+
+    def _acumular_bloque(self, c0, f0, c1, f1, n, largo, velocidad):
+        # Muestra k de un segmento con n muestras: t = k / (n - 1)  (t = 0 si el segmento cabe en un píxel)
+        segmento = np.repeat(np.arange(len(n)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        t = k / np.maximum(n - 1, 1)[segmento]
+        col = (c0[segmento] + t * (c1 - c0)[segmento]).astype(np.int64)
+        fila = (f0[segmento] + t * (f1 - f0)[segmento]).astype(np.int64)
+        dentro = (col >= 0) & (col < self.ancho) & (fila >= 0) & (fila < self.alto)
+        pixel = fila[dentro] * self.ancho + col[dentro]
+        if not pixel.size:
+            return
+        peso = (largo / n)[segmento[dentro]]
+        # bincount solo sobre el tramo de píxeles tocado por el bloque (no sobre toda la grilla)
+        base = pixel.min()
+        conteo = np.bincount(pixel - base, weights=peso)
+        self.conteo[base:base + conteo.size] += conteo
+        self.suma[base:base + conteo.size] += np.bincount(pixel - base, weights=peso * velocidad[segmento[dentro]],
+                                                          minlength=conteo.size)
+
+    def acumular_segmentos(self, segmentos, columna='avg_speed', muestras_por_bloque=MUESTRAS_POR_BLOQUE):
+        self.acumular(segmentos['x0'].to_numpy(), segmentos['y0'].to_numpy(),
+                      segmentos['x1'].to_numpy(), segmentos['y1'].to_numpy(),
+                      segmentos[columna].to_numpy(dtype=np.float64), muestras_por_bloque)
+
+    def grillas(self, grosor_px=1):
+        """(conteo, suma) como matrices alto x ancho, ensanchadas a un trazo de 'grosor_px' píxeles."""
+        conteo = self.conteo.reshape(self.alto, self.ancho)
+        suma = self.suma.reshape(self.alto, self.ancho)
+        if grosor_px > 1:
+            conteo, suma = _ensanchar(conteo, grosor_px), _ensanchar(suma, grosor_px)
+        return conteo, suma
+
+
+def _suma_ventana(m, ancho, eje):
+    """Suma móvil centrada de 'ancho' celdas a lo largo de un eje (con sumas acumuladas, O(n))."""
+    antes = ancho // 2
+    relleno = [(0, 0), (0, 0)]
+    relleno[eje] = (antes + 1, ancho - antes - 1)
+    acumulado = np.cumsum(np.pad(m, relleno), axis=eje)
+    n = m.shape[eje]
+    return np.take(acumulado, np.arange(ancho, ancho + n), axis=eje) - np.take(acumulado, np.arange(n), axis=eje)
+
+
+def _ensanchar(m, grosor_px):
+    return _suma_ventana(_suma_ventana(m, grosor_px, 0), grosor_px, 1)
+
+
+def velocidad_media(conteo, suma):
+    """Velocidad media por píxel; NaN donde no pasó ningún segmento (queda transparente)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(conteo > 0, suma / conteo, np.nan)
+
+# --- 2. IMAGEN ÚNICA SOBRE EL FONDO ---
+
+def colorear(media, vmin, vmax, cmap=CMAP):
+    """Matriz RGBA uint8 de la velocidad media (píxeles sin datos transparentes)."""
+    from matplotlib import colormaps
+    normalizada = np.clip((media - vmin) / max(vmax - vmin, 1e-9), 0, 1)
+    rgba = colormaps[cmap](np.nan_to_num(normalizada), bytes=True)
+    rgba[np.isnan(media), 3] = 0
+    return rgba
+
+
+def rango_velocidad(media):
+    """(vmin, vmax) de la escala de colores, igual que el mapa vectorial: mínimo y máximo observados."""
+    validos = media[~np.isnan(media)]
+    if not validos.size:
+        return 0.0, 1.0
+    return float(validos.min()), float(validos.max())
+
+
+def dibujar(grilla, data_path, grosor_px=3, cmap=CMAP, vmin=None, vmax=None):
+    """Figura con mine_layout.png de fondo y la velocidad media como una sola imagen encima."""
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import Normalize
+    from matplotlib.cm import ScalarMappable
+
+    media = velocidad_media(*grilla.grillas(grosor_px))
+    rmin, rmax = rango_velocidad(media)
+    vmin = rmin if vmin is None else vmin
+    vmax = rmax if vmax is None else vmax
+
+    fig, ax = plt.subplots(1, 1, figsize=(15, 12))
+    xmin, xmax, ymin, ymax = grilla.extent
+    try:
+        mine_layout_img = plt.imread(os.path.join(data_path, 'mine_layout.png'))
+        ax.imshow(mine_layout_img, extent=[xmin, xmax, ymin, ymax], aspect='auto')
+    except FileNotFoundError:
+        print("Advertencia: No se encontró 'mine_layout.png'. El gráfico se generará sobre fondo blanco.")
+
+    # Ya viene coloreada: sin interpolación ni remuestreo por parte de matplotlib más allá del necesario
+    ax.imshow(colorear(media, vmin, vmax, cmap), extent=[xmin, xmax, ymin, ymax], interpolation='nearest')
+    fig.colorbar(ScalarMappable(norm=Normalize(vmin, vmax), cmap=cmap), ax=ax,
+                 label="Velocidad Promedio (km/h)", orientation='vertical', shrink=0.8)
+
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    ax.set_title('Análisis de Cuellos de Botella en Rutas de Acarreo', fontsize=20, weight='bold')
+    ax.set_xlabel('Coordenada Este (m)')
+    ax.set_ylabel('Coordenada Norte (m)')
+    ax.set_aspect('equal', adjustable='box')
+    plt.grid(True, linestyle='--', alpha=0.6)
+    return fig
+
+# --- 3. TESELAS PARA ZOOM ---
+
+def _reducir(m):
+    """Suma de bloques 2x2 (rellena con ceros si las dimensiones son impares)."""
+    alto, ancho = m.shape
+    m = np.pad(m, ((0, alto % 2), (0, ancho % 2)))
+    return m.reshape(m.shape[0] // 2, 2, m.shape[1] // 2, 2).sum(axis=(1, 3))
+
+
+def guardar_teselas(grilla, destino, grosor_px=3, tamano_tesela=TAMANO_TESELA, cmap=CMAP, vmin=None, vmax=None):
+    """
+    Pirámide de teselas PNG transparentes en destino/z/x/y.png. El nivel de mayor z es la resolución de la grilla;
+    cada nivel anterior agrega bloques de 2x2 hasta que todo cabe en una tesela (z = 0).
+    Escribe destino/teselas.json con los límites y metros por píxel de cada nivel. Devuelve el número de teselas.
+    """
+    import matplotlib.pyplot as plt
+
+    os.makedirs(destino, exist_ok=True)
+    conteo, suma = grilla.grillas(grosor_px)
+    rmin, rmax = rango_velocidad(velocidad_media(conteo, suma))
+    vmin = rmin if vmin is None else vmin
+    vmax = rmax if vmax is None else vmax
+
+    niveles = [(conteo, suma)]
+    while max(niveles[-1][0].shape) > tamano_tesela:
+        niveles.append(tuple(_reducir(m) for m in niveles[-1]))
+    niveles.reverse()
+
+    xmin, _, _, ymax = grilla.extent
+    meta = {'xmin': xmin, 'ymax': ymax, 'tamano_tesela': tamano_tesela, 'vmin': vmin, 'vmax': vmax, 'niveles': []}
+    n_teselas = 0
+    for z, (c, s) in enumerate(niveles):
+        rgba = colorear(velocidad_media(c, s), vmin, vmax, cmap)
+        for ty in range(0, rgba.shape[0], tamano_tesela):
+            for tx in range(0, rgba.shape[1], tamano_tesela):
+                tesela = rgba[ty:ty + tamano_tesela, tx:tx + tamano_tesela]
+                if not tesela[..., 3].any():
+                    continue  # sin datos: no se escribe (el visor la deja vacía)
+                carpeta = os.path.join(destino, str(z), str(tx // tamano_tesela))
+                os.makedirs(carpeta, exist_ok=True)
+                completa = np.zeros((tamano_tesela, tamano_tesela, 4), dtype=np.uint8)
+                completa[:tesela.shape[0], :tesela.shape[1]] = tesela
+                plt.imsave(os.path.join(carpeta, f'{ty // tamano_tesela}.png'), completa)
+                n_teselas += 1
+        meta['niveles'].append({'z': z, 'metros_por_pixel': grilla.metros_por_pixel * 2 ** (len(niveles) - 1 - z),
+                                'ancho_px': rgba.shape[1], 'alto_px': rgba.shape[0]})
+    with open(os.path.join(destino, 'teselas.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return n_teselas
@@ -0,0 +1,99 @@
+# Reproductor local del feed GPS para probar detector_tiempo_real.py.
+#
+# Lee un CSV grabado (truck_gps_data.csv), ordena las líneas por timestamp y las envía tal cual respetando los
+# intervalos del registro, acelerados N veces: por TCP al detector o agregándolas a un archivo que el detector
+# sigue con --seguir. Con --velocidad 0 envía todo lo más rápido posible (prueba de rendimiento).
+#
+# Uso:
+#   python reproducir_gps.py data/truck_gps_data.csv --velocidad 60 --destino 127.0.0.1:9100
+#   python reproducir_gps.py data/truck_gps_data.csv --velocidad 60 --archivo data/gps_en_vivo.csv
+
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+INTERVALO_S = 0.05
+LINEAS_POR_ENVIO = 20_000
+FORMATO_TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+
+# --- 1. GRABACIÓN ---
+
+def cargar_grabacion(ruta):
+    """(cabecera, líneas ordenadas por timestamp, timestamps en ns). Las líneas se envían sin reformatear."""
+    with open(ruta, 'rb') as f:
+        cabecera = f.readline()
+        lineas = [l if l.endswith(b'\n') else l + b'\n' for l in f.read().splitlines(keepends=True) if l.strip()]
+    t = pd.to_datetime(pd.read_csv(ruta, usecols=['timestamp'], skipinitialspace=True)['timestamp'],
+                       format=FORMATO_TIMESTAMP).to_numpy().astype('datetime64[ns]').astype(np.int64)
+    orden = np.argsort(t, kind='stable')
+    return cabecera, np.array(lineas, dtype=object)[orden], t[orden]
+
+# --- 2. ENVÍO A N× ---
+
+async def reproducir(lineas, t, escribir, velocidad, intervalo=INTERVALO_S):
+    """
+    Envía las líneas cuyo tiempo del evento ya 'ocurrió' según el reloj acelerado: en cada tick,
+    todo lo que cae hasta t0 + transcurrido x velocidad. Devuelve los segundos reales empleados.
+    """
+    inicio = time.monotonic()
+    if velocidad <= 0:
+        for i in range(0, len(lineas), LINEAS_POR_ENVIO):
+            await escribir(b''.join(lineas[i:i + LINEAS_POR_ENVIO]))
+        return time.monotonic() - inicio
+    i = 0
+    while i < len(lineas):
+        limite = t[0] + (time.monotonic() - inicio) * velocidad * 1e9
+        j = int(np.searchsorted(t, limite, side='right'))
+        for k in range(i, j, LINEAS_POR_ENVIO):
+            await escribir(b''.join(lineas[k:min(k + LINEAS_POR_ENVIO, j)]))
+        i = j
+        await asyncio.sleep(intervalo)
+    return time.monotonic() - inicio
+
+
+async def ejecutar(args, cabecera, lineas, t):
+    if args.destino:
+        host, _, puerto = args.destino.rpartition(':')
+        reader, writer = await asyncio.open_connection(host or '127.0.0.1', int(puerto))
+
+        async def escribir(datos):
+            writer.write(datos)
+            await writer.drain()
+        await escribir(cabecera)
+        segundos = await reproducir(lineas, t, escribir, args.velocidad)
+        writer.close()
+        await writer.wait_closed()
+    else:
+        nuevo = not os.path.exists(args.archivo) or os.path.getsize(args.archivo) == 0
+        with open(args.archivo, 'ab') as f:
+            async def escribir(datos):
+                f.write(datos)
+                f.flush()
+            if nuevo:
+                await escribir(cabecera)
+            segundos = await reproducir(lineas, t, escribir, args.velocidad)
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce un registro GPS grabado a N veces la velocidad real.")
+    parser.add_argument('csv', help="CSV grabado (columnas de truck_gps_data.csv).")
+    parser.add_argument('--velocidad', type=float, default=60.0,
+                        help="Factor de aceleración (60 = una hora por minuto; 0 = sin pausas).")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--destino', metavar='[HOST:]PUERTO', help="Envía por TCP (detector con --escuchar).")
+    destino.add_argument('--archivo', help="Agrega las líneas a un archivo (detector con --seguir).")
+    args = parser.parse_args()
+
+    cabecera, lineas, t = cargar_grabacion(args.csv)
+    print(f"{len(lineas):,} pings, {(t[-1] - t[0]) / 1e9 / 3600:.1f} h de registro a {args.velocidad:g}x")
+    segundos = asyncio.run(ejecutar(args, cabecera, lineas, t))
+    print(f"Enviados en {segundos:.1f} s ({len(lineas) / max(segundos, 1e-9):,.0f} pings/s)")
+
+
+if __name__ == "__main__":
+    main()
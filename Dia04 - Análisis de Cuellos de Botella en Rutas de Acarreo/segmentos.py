@@ -0,0 +1,97 @@
+# Motor vectorizado de segmentos GPS.
+#
+# Reemplaza el doble bucle (por camión y por par de pings) que creaba un LineString y un dict por segmento.
+# Se ordena UNA vez por (truck_id, timestamp), se emparejan pings consecutivos con arreglos desplazados
+# (i, i+1) y se descartan los pares que cruzan de un camión a otro o que tienen una brecha de tiempo mayor
+# al umbral. Largo, duración, velocidad y rumbo salen como arreglos NumPy; las geometrías de shapely
+# se construyen solo si se piden, todas de una vez.
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+EPSG_GPS = 4326
+EPSG_UTM = 32719  # ¡Recuerda ajustar tu zona UTM!
+# Pares de pings separados por más de este tiempo no forman segmento (pérdida de señal, camión detenido y apagado)
+UMBRAL_BRECHA_S = 60.0
+COLUMNAS_SEGMENTO = ['truck_id', 't_inicio', 't_fin', 'x0', 'y0', 'x1', 'y1',
+                     'largo_m', 'duracion_s', 'avg_speed', 'velocidad_calc_kmh', 'rumbo_deg']
+
+_TRANSFORMADORES = {}
+
+# --- 1. PROYECCIÓN EN BLOQUE ---
+
+def proyectar(longitud, latitud, epsg=EPSG_UTM):
+    """Este/Norte en metros para arreglos completos de lon/lat (una sola llamada a pyproj)."""
+    if epsg not in _TRANSFORMADORES:
+        _TRANSFORMADORES[epsg] = Transformer.from_crs(EPSG_GPS, epsg, always_xy=True)
+    return _TRANSFORMADORES[epsg].transform(np.asarray(longitud, dtype=float), np.asarray(latitud, dtype=float))
+
+# --- 2. SEGMENTOS COMO ARREGLOS ---
+
+def codigos_camion(truck_id):
+    """(códigos enteros, categorías) de truck_id; comparar enteros es mucho más barato que comparar textos."""
+    if isinstance(truck_id.dtype, pd.CategoricalDtype):
+        return truck_id.cat.codes.to_numpy(), truck_id.cat.categories
+    codigos, categorias = pd.factorize(truck_id, sort=True)
+    return codigos, categorias
+
+
+def orden_camion_tiempo(codigos, timestamps):
+    """Permutación que ordena por (truck_id, timestamp), estable para pings con el mismo instante."""
+    return np.lexsort((timestamps, codigos))
+
+
+def construir_segmentos(df, umbral_brecha_s=UMBRAL_BRECHA_S, epsg=EPSG_UTM, x=None, y=None):
+    """
+    Segmentos entre pings consecutivos de un mismo camión.
+    df: columnas timestamp (datetime64), truck_id, latitude, longitude, speed_kmh.
+    x, y: coordenadas ya proyectadas (opcional, en el orden de df) para no reproyectar.
+    Devuelve un DataFrame con COLUMNAS_SEGMENTO (sin geometrías).
+    """
+    codigos, categorias = codigos_camion(df['truck_id'])
+    t = df['timestamp'].to_numpy()
+    orden = orden_camion_tiempo(codigos, t)
+    camion, t = codigos[orden], t[orden]
+    velocidad = df['speed_kmh'].to_numpy(dtype=np.float64)[orden]
+    if x is None:
+        x, y = proyectar(df['longitude'].to_numpy(), df['latitude'].to_numpy(), epsg)
+    x, y = np.asarray(x)[orden], np.asarray(y)[orden]
+
+    # Pares (i, i+1): mismo camión, tiempo creciente y brecha dentro del umbral
+    dt = (t[1:] - t[:-1]) / np.timedelta64(1, 's')
+    valido = (camion[1:] == camion[:-1]) & (dt > 0) & (dt <= umbral_brecha_s)
+    i = np.flatnonzero(valido)
+    j = i + 1
+
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    largo = np.hypot(dx, dy)
+    duracion = dt[i]
+    return pd.DataFrame({
+        'truck_id': pd.Categorical.from_codes(camion[i], categorias),
+        't_inicio': t[i],
+        't_fin': t[j],
+        'x0': x[i], 'y0': y[i], 'x1': x[j], 'y1': y[j],
+        'largo_m': largo,
+        'duracion_s': duracion,
+        # Mismo criterio que el análisis original: promedio de la velocidad reportada en ambos extremos
+        'avg_speed': (velocidad[i] + velocidad[j]) / 2,
+        # Velocidad implícita en la posición (útil para detectar saltos de GPS)
+        'velocidad_calc_kmh': largo / duracion * 3.6,
+        # Rumbo en grados desde el Norte, sentido horario
+        'rumbo_deg': np.degrees(np.arctan2(dx, dy)) % 360.0,
+    }, columns=COLUMNAS_SEGMENTO)
+
+# --- 3. GEOMETRÍAS A PEDIDO ---
+
+def geometrias(segmentos):
+    """LineStrings de shapely para todos los segmentos en una sola llamada (shapely >= 2)."""
+    import shapely
+    coordenadas = np.stack([segmentos[['x0', 'y0']].to_numpy(), segmentos[['x1', 'y1']].to_numpy()], axis=1)
+    return shapely.linestrings(coordenadas)
+
+
+def a_geodataframe(segmentos, epsg=EPSG_UTM):
+    """GeoDataFrame de los segmentos (solo cuando se necesita dibujar o exportar geometrías)."""
+    import geopandas
+    return geopandas.GeoDataFrame(segmentos, geometry=geometrias(segmentos), crs=f"EPSG:{epsg}")
@@ -1,59 +1,152 @@
 #The Bull Miner
 #Maycol Benavides
 #Dia05 Python para Minería
+#
+# Uso:
+#   python metallurgical_balance.py                                  (balance único, como antes)
+#   python metallurgical_balance.py --lote data/leyes_turno.csv      (un balance por turno, vectorizado)
+#   python metallurgical_balance.py --simular 365 --sankey paginas   (un año de turnos sintéticos)
+#
+# El CSV de --lote trae una fila por turno: periodo, feed_grade, conc_grade, tail_grade y, opcionalmente,
+# feed_tonnes (si falta se usa la base de 100 t). Las filas físicamente imposibles se marcan, no detienen el lote.
 
 
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
+from plotly.offline import get_plotlyjs
+
+# Instrumentación por etapas compartida (carpeta 'comun' en la raíz del repositorio)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun import instrumentacion
+from comun.instrumentacion import etapa
+
+FEED_GRADE = 1.15
+CONC_GRADE = 28.5
+TAIL_GRADE = 0.12
+FEED_MASS = 100
+OUTPUT_PATH = 'output'
+PLOTLYJS_ARCHIVO = 'plotly.min.js'
+COLUMNAS_LEYES = ['feed_grade', 'conc_grade', 'tail_grade']
+
+# --- 1. CÁLCULOS METALÚRGICOS (ESCALARES O ARREGLOS) ---
+
+def calcular_balance(feed_grade, conc_grade, tail_grade):
+    """Recuperación y rendimiento másico (%) por la fórmula de dos productos. Acepta escalares o arreglos."""
+    feed, conc, tail = (np.asarray(v, dtype=float) for v in (feed_grade, conc_grade, tail_grade))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recovery = (conc * (feed - tail)) / (feed * (conc - tail)) * 100
+        mass_pull = (feed - tail) / (conc - tail) * 100
+    return recovery, mass_pull
+
 
-# --- 1. DATOS DE ENTRADA Y CÁLCULOS METALÚRGICOS ---
-print("[1/3] Definiendo datos de entrada y calculando el balance...")
+def validar_leyes(feed_grade, conc_grade, tail_grade):
+    """Motivo por el que cada fila es físicamente imposible ('' si es válida). No lanza excepciones."""
+    feed, conc, tail = (np.asarray(v, dtype=float) for v in (feed_grade, conc_grade, tail_grade))
+    condiciones = [
+        np.isnan(feed) | np.isnan(conc) | np.isnan(tail),
+        (feed <= 0) | (tail < 0),
+        tail >= feed,
+        conc <= feed,
+    ]
+    motivos = ['ley faltante', 'ley negativa o nula', 'colas >= alimentación', 'concentrado <= alimentación']
+    return np.select(condiciones, motivos, default='')
+
+
+def balance_lote(df):
+    """
+    Balance de todas las filas a la vez. Agrega recovery, mass_pull, masas y metal (t) de cada corriente,
+    'valido' y 'motivo'. Las filas imposibles quedan con NaN en los resultados.
+    """
+    resultado = df.copy()
+    feed, conc, tail = (resultado[c].to_numpy(dtype=float) for c in COLUMNAS_LEYES)
+    feed_mass = (resultado['feed_tonnes'].to_numpy(dtype=float) if 'feed_tonnes' in resultado
+                 else np.full(len(resultado), float(FEED_MASS)))
+    motivo = validar_leyes(feed, conc, tail)
+    motivo = np.where((motivo == '') & ~(feed_mass > 0), 'tonelaje faltante o nulo', motivo)
+    valido = motivo == ''
+    recovery, mass_pull = calcular_balance(feed, conc, tail)
+    recovery[~valido] = np.nan
+    mass_pull[~valido] = np.nan
 
-feed_grade = 1.15
-conc_grade = 28.5
-tail_grade = 0.12
+    conc_mass = feed_mass * mass_pull / 100
+    resultado['recovery'] = recovery
+    resultado['mass_pull'] = mass_pull
+    resultado['feed_mass'] = feed_mass
+    resultado['conc_mass'] = conc_mass
+    resultado['tail_mass'] = feed_mass - conc_mass
+    resultado['feed_metal'] = feed_mass * feed / 100
+    resultado['conc_metal'] = conc_mass * conc / 100
+    resultado['tail_metal'] = (feed_mass - conc_mass) * tail / 100
+    resultado['valido'] = valido
+    resultado['motivo'] = motivo
+    return resultado
 
-recovery = (conc_grade * (feed_grade - tail_grade)) / (feed_grade * (conc_grade - tail_grade)) * 100
-mass_pull = (feed_grade - tail_grade) / (conc_grade - tail_grade) * 100
 
-print("\n--- Resultados del Balance Metalúrgico ---")
-print(f"Recuperación de Cobre: {recovery:.2f}%")
-print(f"Rendimiento Másico (Mass Pull): {mass_pull:.2f}%")
+def leer_leyes(ruta):
+    """CSV de leyes por turno. Si no trae 'periodo', se numeran las filas."""
+    df = pd.read_csv(ruta, skipinitialspace=True)
+    faltantes = [c for c in COLUMNAS_LEYES if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Al CSV {ruta} le faltan las columnas {faltantes}")
+    if 'periodo' not in df.columns:
+        df.insert(0, 'periodo', np.arange(1, len(df) + 1))
+    df['periodo'] = df['periodo'].astype(str)
+    return df
 
-# --- 2. PREPARACIÓN DE DATOS PARA LOS DIAGRAMAS SANKEY ---
-print("\n[2/3] Preparando datos para la visualización de flujos...")
 
-nodes = ['Alimentación (Feed)', 'Concentrado (Conc)', 'Colas (Tails)']
+def simular_turnos(dias, turnos_por_dia=2, semilla=7):
+    """Leyes de un turno típico con ruido y ~0,5% de filas imposibles (muestras cruzadas) para probar el lote."""
+    rng = np.random.default_rng(semilla)
+    n = dias * turnos_por_dia
+    inicio = pd.Timestamp('2024-01-01 08:00')
+    periodos = inicio + pd.to_timedelta(np.arange(n) * (24 // turnos_por_dia), unit='h')
+    df = pd.DataFrame({
+        'periodo': periodos.strftime('%Y-%m-%d %H:%M'),
+        'feed_grade': rng.normal(FEED_GRADE, 0.08, n).round(3),
+        'conc_grade': rng.normal(CONC_GRADE, 1.2, n).round(2),
+        'tail_grade': np.abs(rng.normal(TAIL_GRADE, 0.02, n)).round(3),
+        'feed_tonnes': rng.normal(60_000, 4_000, n).round(0),
+    })
+    cruzadas = rng.random(n) < 0.005
+    df.loc[cruzadas, ['feed_grade', 'tail_grade']] = df.loc[cruzadas, ['tail_grade', 'feed_grade']].to_numpy()
+    return df
+
+# --- 2. DIAGRAMAS SANKEY ---
+
+def etiquetas_masa(conc, tail, unit):
+    """Etiquetas de nodos y flujos del Sankey (valor y % de la alimentación)."""
+    total = conc + tail
+    node_labels = [
+        f"Alimentación<br>{total:.2f} {unit}",  # Feed
+        f"Concentrado<br>{conc:.2f} {unit}",    # Conc
+        f"Colas<br>{tail:.2f} {unit}"           # Tail
+    ]
+    link_labels = [f"{conc:.2f} {unit} ({conc * 100 / total:.1f}%)", f"{tail:.2f} {unit} ({tail * 100 / total:.1f}%)"]
+    return node_labels, link_labels
 
-# --- Datos para el Sankey de MASA TOTAL ---
-feed_mass = 100
-conc_mass = feed_mass * (mass_pull / 100)
-tail_mass = feed_mass - conc_mass
-source_mass = [0, 0]
-target_mass = [1, 2]
-value_mass = [conc_mass, tail_mass]
 
-# --- Datos para el Sankey de METAL ---
-feed_metal = feed_mass * (feed_grade / 100)
-conc_metal = conc_mass * (conc_grade / 100)
-tail_metal = tail_mass * (tail_grade / 100)
-source_metal = [0, 0]
-target_metal = [1, 2]
-value_metal = [conc_metal, tail_metal]
+def etiquetas_metal(feed_metal, conc_metal, tail_metal, recovery):
+    """Para el flujo de metal, la etiqueta de recuperación es más importante que el %."""
+    return [
+        f"Alimentación<br>{feed_metal:.2f} t Cu",
+        f"Concentrado<br>{conc_metal:.2f} t Cu<br><b>Recuperación: {recovery:.2f}%</b>",
+        f"Colas<br>{tail_metal:.2f} t Cu<br>Pérdida: {100 - recovery:.2f}%"
+    ]
 
-# --- 3. GENERACIÓN Y EXPORTACIÓN DE LOS GRÁFICOS (VERSIÓN MEJORADA) ---
-print("[3/3] Generando y guardando los diagramas de Sankey mejorados...")
 
 def create_sankey_diagram_v2(source, target, value, title, unit):
     """Función mejorada para crear un diagrama de Sankey estéticamente superior."""
-    
+
     # Preparamos las etiquetas para los nodos y los flujos
-    node_labels = [
-        f"Alimentación<br>{value[0] + value[1]:.2f} {unit}",  # Feed
-        f"Concentrado<br>{value[0]:.2f} {unit}",             # Conc
-        f"Colas<br>{value[1]:.2f} {unit}"                    # Tail
-    ]
-    
+    node_labels, link_labels = etiquetas_masa(value[0], value[1], unit)
+
     # Definimos el layout del Sankey
     fig = go.Figure(data=[go.Sankey(
         arrangement="snap",  # 'snap' fuerza los nodos a las coordenadas X dadas
@@ -74,10 +167,7 @@ def create_sankey_diagram_v2(source, target, value, title, unit):
             target=target,
             value=value,
             # Añadimos etiquetas a los flujos con porcentajes relativos
-            label=[
-                f"{value[0]:.2f} {unit} ({value[0]*100/(value[0]+value[1]):.1f}%)", 
-                f"{value[1]:.2f} {unit} ({value[1]*100/(value[0]+value[1]):.1f}%)"
-            ],
+            label=link_labels,
             color="rgba(150, 150, 150, 0.5)",
             arrowlen=15 # Añadimos una pequeña flecha para indicar la dirección
         ))])
@@ -93,26 +183,235 @@ def create_sankey_diagram_v2(source, target, value, title, unit):
     )
     return fig
 
-# Generar y guardar el gráfico de Masa 
-fig_mass = create_sankey_diagram_v2(source_mass, target_mass, value_mass,
-                                    "Balance de Masa del Circuito (Base 100t)", "Toneladas")
-fig_mass.write_html("output_mass_flow_v2.html")
 
-# Generar y guardar el gráfico de Metal 
-# Para el flujo de metal, la etiqueta de recuperación es más importante que el %
-metal_labels = [
-    f"Concentrado<br>{value_metal[0]:.2f} t Cu<br><b>Recuperación: {recovery:.2f}%</b>",
-    f"Colas<br>{value_metal[1]:.2f} t Cu<br>Pérdida: {100-recovery:.2f}%"
-]
-metal_node_labels = [f"Alimentación<br>{feed_metal:.2f} t Cu"] + metal_labels
+def figuras_balance(fila, unit_masa="Toneladas"):
+    """Sankey de masa y de metal (Cu fino) para una fila del balance (o para el balance único)."""
+    fig_mass = create_sankey_diagram_v2([0, 0], [1, 2], [fila['conc_mass'], fila['tail_mass']],
+                                        f"Balance de Masa del Circuito (Base {fila['feed_mass']:g}t)", unit_masa)
+    fig_metal = create_sankey_diagram_v2([0, 0], [1, 2], [fila['conc_metal'], fila['tail_metal']],
+                                         "Balance de Metal (Cobre Fino)", "t Cu")
+    # Sobreescribimos las etiquetas de los nodos para el gráfico de metal para añadir la recuperación
+    fig_metal.data[0].node.label = etiquetas_metal(fila['feed_metal'], fila['conc_metal'], fila['tail_metal'],
+                                                   fila['recovery'])
+    return fig_mass, fig_metal
+
+# --- 3. SALIDA POR LOTES: PLOTLY.JS COMPARTIDO ---
+# Las figuras base se serializan una sola vez; cada período solo aporta valores y etiquetas, así que no se
+# construye ni se serializa una figura de Plotly por turno, y plotly.js (~4,8 MB) se escribe una sola vez.
+
+PAGINA_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{titulo}</title>
+{script_plotly}
+</head>
+<body style="font-family:Arial; margin:0">
+{cabecera}
+<div id="masa" style="height:460px"></div>
+<div id="metal" style="height:460px"></div>
+{script_base}
+<script>
+{script}
+</script>
+</body></html>
+"""
+
+SCRIPT_BASE = """const FIGURAS = {figuras};
+Plotly.newPlot('masa', FIGURAS.masa.data, FIGURAS.masa.layout);
+Plotly.newPlot('metal', FIGURAS.metal.data, FIGURAS.metal.layout);
+function mostrar(p) {{
+  Plotly.restyle('masa', {{'link.value': [p.vm], 'node.label': [p.nm], 'link.label': [p.lm]}});
+  Plotly.restyle('metal', {{'link.value': [p.vc], 'node.label': [p.nc], 'link.label': [p.lc]}});
+  document.getElementById('resumen').textContent =
+    `Recuperación ${{p.rec.toFixed(2)}}% | Mass pull ${{p.mp.toFixed(2)}}%`;
+}}
+"""
+
+SCRIPT_SELECTOR = """const PERIODOS = {periodos};
+const selector = document.getElementById('periodo');
+PERIODOS.forEach((p, i) => selector.add(new Option(p.periodo, i)));
+selector.addEventListener('change', () => mostrar(PERIODOS[+selector.value]));
+document.addEventListener('keydown', (e) => {{
+  const paso = {{ArrowLeft: -1, ArrowRight: 1}}[e.key];
+  if (!paso || e.target === selector) return;
+  selector.value = Math.min(Math.max(+selector.value + paso, 0), PERIODOS.length - 1);
+  mostrar(PERIODOS[+selector.value]);
+}});
+mostrar(PERIODOS[0]);
+"""
+
+SCRIPT_BASE_ARCHIVO = 'sankey_base.js'
+
+
+def _json_script(objeto):
+    """JSON seguro para incrustar dentro de <script> (las etiquetas llevan <br> y <b>)."""
+    return json.dumps(objeto, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def datos_periodos(resultado):
+    """Valores y etiquetas de cada período válido, en el formato compacto que consume mostrar()."""
+    periodos = []
+    for fila in resultado[resultado['valido']].itertuples(index=False):
+        nodos_masa, flujos_masa = etiquetas_masa(fila.conc_mass, fila.tail_mass, "Toneladas")
+        _, flujos_metal = etiquetas_masa(fila.conc_metal, fila.tail_metal, "t Cu")
+        periodos.append({
+            'periodo': fila.periodo,
+            'vm': [round(fila.conc_mass, 3), round(fila.tail_mass, 3)], 'nm': nodos_masa, 'lm': flujos_masa,
+            'vc': [round(fila.conc_metal, 4), round(fila.tail_metal, 4)], 'lc': flujos_metal,
+            'nc': etiquetas_metal(fila.feed_metal, fila.conc_metal, fila.tail_metal, fila.recovery),
+            'rec': round(fila.recovery, 4), 'mp': round(fila.mass_pull, 4),
+        })
+    return periodos
+
+
+def script_base(resultado):
+    """Figuras base (estilo de create_sankey_diagram_v2) y la función mostrar(p) que les cambia los datos."""
+    fila = resultado[resultado['valido']].iloc[0]
+    fig_mass, fig_metal = figuras_balance(fila)
+    fig_mass.update_layout(title_text="<b>Balance de Masa del Circuito</b>")
+    figuras = {'masa': json.loads(fig_mass.to_json()), 'metal': json.loads(fig_metal.to_json())}
+    return SCRIPT_BASE.format(figuras=_json_script(figuras))
+
+
+def escribir_plotlyjs(destino):
+    """Escribe plotly.min.js una sola vez en la carpeta de salida (las páginas lo referencian en forma relativa)."""
+    ruta = os.path.join(destino, PLOTLYJS_ARCHIVO)
+    if not os.path.exists(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+    return ruta
+
+
+def sankey_selector(resultado, ruta):
+    """Un único HTML autocontenido con todos los períodos válidos y un selector (flechas ← → para recorrerlos)."""
+    cabecera = ('<div style="text-align:center; margin:12px">'
+                '<label><b>Período:</b> <select id="periodo"></select></label> '
+                '<span id="resumen" style="margin-left:16px"></span></div>')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(PAGINA_HTML.format(
+            titulo="Balance Metalúrgico por Período",
+            script_plotly=f'<script type="text/javascript">{get_plotlyjs()}</script>', cabecera=cabecera,
+            script_base=f'<script>\n{script_base(resultado)}</script>',
+            script=SCRIPT_SELECTOR.format(periodos=_json_script(datos_periodos(resultado)))))
+    return ruta
+
+
+def sankey_paginas(resultado, destino):
+    """
+    Una página liviana por período válido más un index.html. Todas comparten plotly.min.js y sankey_base.js
+    locales; cada página solo trae los datos de su período. Devuelve la lista de páginas escritas.
+    """
+    os.makedirs(destino, exist_ok=True)
+    escribir_plotlyjs(destino)
+    with open(os.path.join(destino, SCRIPT_BASE_ARCHIVO), 'w', encoding='utf-8') as f:
+        f.write(script_base(resultado))
+    paginas, filas_indice = [], []
+    for i, p in enumerate(datos_periodos(resultado)):
+        nombre = f"periodo_{i:05d}.html"
+        cabecera = (f'<div style="text-align:center; margin:12px"><a href="index.html">Índice</a> | '
+                    f'<b>{p["periodo"]}</b> | <span id="resumen"></span></div>')
+        with open(os.path.join(destino, nombre), 'w', encoding='utf-8') as f:
+            f.write(PAGINA_HTML.format(
+                titulo=f"Balance {p['periodo']}", script_plotly=f'<script src="{PLOTLYJS_ARCHIVO}"></script>',
+                cabecera=cabecera, script_base=f'<script src="{SCRIPT_BASE_ARCHIVO}"></script>',
+                script=f"mostrar({_json_script(p)});"))
+        paginas.append(nombre)
+        filas_indice.append(f'<tr><td><a href="{nombre}">{p["periodo"]}</a></td>'
+                            f'<td>{p["rec"]:.2f}</td><td>{p["mp"]:.2f}</td></tr>')
+    with open(os.path.join(destino, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Balances por Período</title></head>'
+                '<body style="font-family:Arial"><h2>Balances por Período</h2><table>'
+                '<tr><th>Período</th><th>Recuperación (%)</th><th>Mass pull (%)</th></tr>'
+                + '\n'.join(filas_indice) + '</table></body></html>')
+    return paginas
+
+# --- 4. EJECUCIÓN ---
+
+def balance_unico():
+    """El balance original: un juego de leyes, dos HTML autocontenidos."""
+    print("[1/3] Definiendo datos de entrada y calculando el balance...")
+    with etapa("Balance", filas=1):
+        recovery, mass_pull = calcular_balance(FEED_GRADE, CONC_GRADE, TAIL_GRADE)
+
+    print("\n--- Resultados del Balance Metalúrgico ---")
+    print(f"Recuperación de Cobre: {recovery:.2f}%")
+    print(f"Rendimiento Másico (Mass Pull): {mass_pull:.2f}%")
+
+    print("\n[2/3] Preparando datos para la visualización de flujos...")
+    fila = balance_lote(pd.DataFrame({'feed_grade': [FEED_GRADE], 'conc_grade': [CONC_GRADE],
+                                      'tail_grade': [TAIL_GRADE]})).iloc[0]
+
+    print("[3/3] Generando y guardando los diagramas de Sankey mejorados...")
+    with etapa("Sankey", filas=1):
+        fig_mass, fig_metal = figuras_balance(fila)
+        fig_mass.write_html("output_mass_flow_v2.html")
+        fig_metal.write_html("output_metal_flow_v2.html")
+
+    print("\n¡Éxito! Gráficos mejorados guardados como '..._v2.html'.")
+
+
+def balance_por_lotes(df, salida, sankey):
+    os.makedirs(salida, exist_ok=True)
+    print(f"[1/3] Calculando el balance de {len(df):,} períodos...")
+    inicio = time.perf_counter()
+    with etapa("Balance", filas=len(df)):
+        resultado = balance_lote(df)
+    invalidos = resultado[~resultado['valido']]
+    print(f"      {time.perf_counter() - inicio:.3f} s; {len(invalidos):,} períodos físicamente imposibles")
+    for motivo, n in invalidos['motivo'].value_counts().items():
+        print(f"        - {motivo}: {n}")
+
+    print("\n--- Resultados del Balance Metalúrgico (períodos válidos) ---")
+    print(resultado.loc[resultado['valido'], ['recovery', 'mass_pull']]
+          .describe().T[['mean', 'std', 'min', 'max']].round(2).to_string())
+
+    print("\n[2/3] Guardando resultados...")
+    ruta_csv = os.path.join(salida, 'balance_por_periodo.csv')
+    with etapa("Escritura CSV", filas=len(resultado)):
+        resultado.to_csv(ruta_csv, index=False, float_format='%.4f')
+
+    if not resultado['valido'].any() or sankey == 'ninguno':
+        print("[3/3] Sin diagramas de Sankey.")
+    elif sankey == 'selector':
+        print("[3/3] Generando un HTML con selector de período...")
+        with etapa("Sankey", filas=int(resultado['valido'].sum()), modo=sankey):
+            ruta = sankey_selector(resultado, os.path.join(salida, 'balance_periodos.html'))
+        print(f"      {ruta} ({os.path.getsize(ruta) / 1e6:.1f} MB)")
+    else:
+        print("[3/3] Generando una página por período con plotly.js compartido...")
+        destino = os.path.join(salida, 'sankey')
+        with etapa("Sankey", filas=int(resultado['valido'].sum()), modo=sankey):
+            paginas = sankey_paginas(resultado, destino)
+        total = sum(os.path.getsize(os.path.join(destino, a)) for a in os.listdir(destino))
+        print(f"      {len(paginas):,} páginas en {destino} ({total / 1e6:.1f} MB en total)")
+
+    print(f"\n¡Éxito! Balance por período en: {ruta_csv} ({time.perf_counter() - inicio:.1f} s)")
 
-fig_metal = create_sankey_diagram_v2(source_metal, target_metal, value_metal,
-                                     "Balance de Metal (Cobre Fino)", "t Cu")
 
-# Sobreescribimos las etiquetas de los nodos para el gráfico de metal para añadir la recuperación
-fig_metal.data[0].node.label = [f"Alimentación<br>{feed_metal:.2f} t Cu", metal_labels[0], metal_labels[1]]
+def main():
+    parser = argparse.ArgumentParser(description="Balance metalúrgico de dos productos con diagramas de Sankey.")
+    entrada = parser.add_mutually_exclusive_group()
+    entrada.add_argument('--lote', help="CSV con leyes por turno (periodo, feed_grade, conc_grade, tail_grade "
+                                        "[, feed_tonnes]).")
+    entrada.add_argument('--simular', type=int, metavar='DIAS', help="Genera DIAS de turnos sintéticos y los procesa.")
+    parser.add_argument('--sankey', choices=['selector', 'paginas', 'ninguno'], default='selector',
+                        help="Un HTML con selector de período (por defecto) o una página por período.")
+    parser.add_argument('--salida', default=OUTPUT_PATH, help="Carpeta de salida del modo por lotes.")
+    instrumentacion.agregar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacion.configurar_desde_argumentos(args)
 
-fig_metal.write_html("output_metal_flow_v2.html")
+    if args.lote is None and args.simular is None:
+        balance_unico()
+        return
+    if args.simular is not None:
+        df = simular_turnos(args.simular)
+        os.makedirs(args.salida, exist_ok=True)
+        df.to_csv(os.path.join(args.salida, 'leyes_simuladas.csv'), index=False)
+    else:
+        with etapa("Lectura de leyes") as e:
+            df = leer_leyes(args.lote)
+            e.filas = len(df)
+    balance_por_lotes(df, args.salida, args.sankey)
 
 
-print("\n¡Éxito! Gráficos mejorados guardados como '..._v2.html'.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# Reconciliación de datos del circuito de flotación (balance de masa y metal multi-nodo).
+#
+# metallurgical_balance.py resuelve un solo rougher con la fórmula de dos productos. Una concentradora real
+# tiene rougher, scavenger, remolienda y cleaner con recirculaciones, y ensayes redundantes cada dos horas que
+# nunca cierran exactamente. Aquí el circuito es un grafo de nodos y corrientes (circuito_concentradora.json)
+# y cada período se ajusta por mínimos cuadrados ponderados (1/sigma^2) sujeto a conservación de:
+#   - masa en cada nodo:              sum(F entrantes) - sum(F salientes) = 0
+#   - cada elemento en cada nodo:     sum(F * ley entrantes) - sum(F * ley salientes) = 0
+# Las restricciones de metal son bilineales (flujo x ley): se resuelven por Gauss-Newton, linealizando en cada
+# iteración. Cada iteración es UN problema de álgebra lineal por lotes para todos los períodos a la vez:
+#   z = y - W^-1 J^T nu,   (J W^-1 J^T) nu = J y - r      (np.linalg.solve sobre un arreglo P x m x m)
+# Los valores no medidos entran con un peso casi nulo: quedan determinados por las restricciones.
+#
+# Uso:
+#   python reconciliacion.py --simular 4380                                  (un año de períodos de 2 h)
+#   python reconciliacion.py --mediciones mediciones.csv --circuito circuito_concentradora.json
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CIRCUITO_PATH = 'circuito_concentradora.json'
+OUTPUT_PATH = 'output'
+# Peso de un valor no medido relativo al que tendría si se midiera (solo para que el sistema sea regular)
+PESO_NO_MEDIDO_RELATIVO = 1e-6
+# Desviación mínima absoluta de una medición (evita pesos infinitos con leyes en cero)
+SIGMA_MINIMO = 1e-4
+ITERACIONES = 50
+TOLERANCIA = 1e-8
+Z_95 = 1.645
+
+# --- 1. CIRCUITO COMO GRAFO ---
+
+class Circuito:
+    """Nodos, corrientes y matriz de incidencia A (nodo x corriente: +1 entra al nodo, -1 sale)."""
+
+    def __init__(self, definicion):
+        self.nombre = definicion.get('nombre', 'Circuito')
+        self.elementos = list(definicion['elementos'])
+        self.nodos = list(definicion['nodos'])
+        self.corrientes = list(definicion['corrientes'])
+        self.ids = [c['id'] for c in self.corrientes]
+        self.simulacion = definicion.get('simulacion')
+        errores = definicion.get('errores_relativos', {})
+        indice_nodo = {n: i for i, n in enumerate(self.nodos)}
+        self.A = np.zeros((len(self.nodos), len(self.corrientes)))
+        for s, c in enumerate(self.corrientes):
+            for extremo, signo in (('hacia', 1.0), ('desde', -1.0)):
+                if c.get(extremo) is not None:
+                    if c[extremo] not in indice_nodo:
+                        raise ValueError(f"La corriente '{c['id']}' apunta al nodo desconocido '{c[extremo]}'.")
+                    self.A[indice_nodo[c[extremo]], s] += signo
+        # Corrientes que entran al circuito (alimentación) y que salen (productos)
+        self.entradas = np.array([c.get('desde') is None for c in self.corrientes])
+        self.productos = np.array([c.get('hacia') is None for c in self.corrientes])
+        self.error_flujo = np.array([c.get('error_flujo', errores.get('flujo', 0.05)) for c in self.corrientes])
+        self.error_ley = np.array([c.get('error_ley', errores.get('ley', 0.05)) for c in self.corrientes])
+
+    @property
+    def columnas(self):
+        """Columnas de mediciones en el orden del vector z: flujos y luego leyes por corriente y elemento."""
+        return ([f'{i}_flujo' for i in self.ids] +
+                [f'{i}_{e}' for i in self.ids for e in self.elementos])
+
+
+def cargar_circuito(ruta=CIRCUITO_PATH):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return Circuito(json.load(f))
+
+# --- 2. MEDICIONES ---
+
+def leer_mediciones(ruta, circuito):
+    """
+    CSV con una fila por período y columnas '<corriente>_flujo' (t/h) y '<corriente>_<elemento>' (%).
+    Una columna ausente o vacía es un valor no medido. Devuelve (periodos, Y) con Y de forma P x n (NaN = no medido).
+    """
+    df = pd.read_csv(ruta)
+    periodos = df['periodo'] if 'periodo' in df.columns else pd.Series(np.arange(len(df)), name='periodo')
+    Y = df.reindex(columns=circuito.columnas).to_numpy(dtype=np.float64)
+    return periodos, Y
+
+
+def desviaciones(circuito, Y):
+    """Sigma de cada medición: error relativo de la corriente x valor medido (con un mínimo absoluto)."""
+    E = len(circuito.elementos)
+    relativo = np.concatenate([circuito.error_flujo, np.repeat(circuito.error_ley, E)])
+    return np.maximum(np.abs(Y) * relativo, SIGMA_MINIMO)
+
+# --- 3. RECONCILIACIÓN POR LOTES ---
+
+def _restricciones(circuito, F, a):
+    """Residuos de las restricciones c(z) (P x m) y su jacobiano J (P x m x n)."""
+    A = circuito.A
+    P, S = F.shape
+    E = a.shape[2]
+    N = A.shape[0]
+    c_masa = F @ A.T
+    c_metal = np.einsum('ns,pse->pne', A, F[:, :, None] * a).reshape(P, N * E)
+    J = np.zeros((P, N + N * E, S + S * E))
+    J[:, :N, :S] = A
+    # d c_metal[n, e] / d F_s = A[n, s] * a[s, e]
+    J[:, N:, :S] = np.einsum('ns,pse->pnes', A, a).reshape(P, N * E, S)
+    # d c_metal[n, e] / d a[s, e'] = A[n, s] * F_s * delta(e, e')
+    J[:, N:, S:] = np.einsum('ns,ps,ef->pnesf', A, F, np.eye(E)).reshape(P, N * E, S * E)
+    return np.concatenate([c_masa, c_metal], axis=1), J
+
+
+def reconciliar(circuito, Y, sigma=None, iteraciones=ITERACIONES, tolerancia=TOLERANCIA):
+    """
+    Reconciliación WLS de todos los períodos a la vez. Y: P x n mediciones (NaN = no medido).
+    Devuelve un dict con flujos (P x S), leyes (P x S x E), ajustes normalizados (P x n, NaN en no medidos),
+    objetivo (suma de ajustes normalizados al cuadrado), grados de libertad, prueba global y convergencia.
+    """
+    S, E = len(circuito.ids), len(circuito.elementos)
+    P = Y.shape[0]
+    sigma = desviaciones(circuito, Y) if sigma is None else sigma
+    medido = ~np.isnan(Y)
+    w = np.where(medido, 1.0 / sigma ** 2, 0.0)
+
+    # Punto de partida para lo no medido: promedio de los flujos medidos y de las leyes medidas de cada elemento
+    y = Y.copy()
+    with np.errstate(all='ignore'):
+        flujo_medio = np.nanmean(np.where(medido[:, :S], Y[:, :S], np.nan), axis=1, keepdims=True)
+        ley_media = np.nanmean(Y[:, S:].reshape(P, S, E), axis=1, keepdims=True)
+    y[:, :S] = np.where(medido[:, :S], Y[:, :S], np.nan_to_num(flujo_medio, nan=1.0))
+    leyes_iniciales = np.where(medido[:, S:].reshape(P, S, E), Y[:, S:].reshape(P, S, E),
+                               np.nan_to_num(ley_media, nan=1.0))
+    y[:, S:] = leyes_iniciales.reshape(P, S * E)
+    # Cada valor no medido pesa una fracción mínima de lo que pesaría medido (escala propia de flujos y leyes)
+    w_no_medido = PESO_NO_MEDIDO_RELATIVO / desviaciones(circuito, y) ** 2
+    w_inv = 1.0 / np.where(medido, w, w_no_medido)
+
+    z = y.copy()
+    activos = np.ones(P, dtype=bool)
+    for iteracion in range(iteraciones):
+        F, a = z[activos, :S], z[activos, S:].reshape(-1, S, E)
+        c, J = _restricciones(circuito, F, a)
+        # Restricción linealizada: J z_nuevo = J z - c(z)
+        r = np.einsum('pmn,pn->pm', J, z[activos]) - c
+        M = np.einsum('pmn,pn,pkn->pmk', J, w_inv[activos], J)
+        nu = np.linalg.solve(M, (np.einsum('pmn,pn->pm', J, y[activos]) - r)[..., None])[..., 0]
+        nuevo = y[activos] - w_inv[activos] * np.einsum('pmn,pm->pn', J, nu)
+        cambio = np.max(np.abs(nuevo - z[activos]) / np.maximum(np.abs(z[activos]), 1.0), axis=1)
+        z[activos] = nuevo
+        indices = np.flatnonzero(activos)
+        activos[indices[cambio < tolerancia]] = False
+        if not activos.any():
+            break
+
+    ajuste_normalizado = np.where(medido, (z - Y) / sigma, np.nan)
+    objetivo = np.nansum(ajuste_normalizado ** 2, axis=1)
+    c_final, _ = _restricciones(circuito, z[:, :S], z[:, S:].reshape(P, S, E))
+    grados = c_final.shape[1] - (~medido).sum(axis=1)
+    return {
+        'flujos': z[:, :S],
+        'leyes': z[:, S:].reshape(P, S, E),
+        'ajuste_normalizado': ajuste_normalizado,
+        'objetivo': objetivo,
+        'grados_libertad': grados,
+        'error_grueso': objetivo > chi2_95(grados),
+        'cierre_max': np.abs(c_final).max(axis=1),
+        'convergido': ~activos,
+        'iteraciones': iteracion + 1,
+    }
+
+
+def chi2_95(grados):
+    """Percentil 95 de chi-cuadrado (aproximación de Wilson-Hilferty; sin depender de scipy)."""
+    k = np.maximum(np.asarray(grados, dtype=float), 1.0)
+    return k * (1 - 2 / (9 * k) + Z_95 * np.sqrt(2 / (9 * k))) ** 3
+
+
+def recuperaciones(circuito, flujos, leyes):
+    """
+    Distribución de masa y de cada elemento en cada corriente, respecto de la alimentación del circuito:
+    en los productos es el rendimiento másico (mass pull) y la recuperación. Formas P x S y P x S x E.
+    """
+    metal = flujos[:, :, None] * leyes
+    masa_alim = flujos[:, circuito.entradas].sum(axis=1, keepdims=True)
+    metal_alim = metal[:, circuito.entradas, :].sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return flujos / masa_alim * 100, metal / metal_alim * 100
+
+
+def tabla_resultados(circuito, periodos, resultado):
+    """Una fila por período: flujos y leyes reconciliados, recuperaciones de los productos y diagnóstico."""
+    S, E = len(circuito.ids), len(circuito.elementos)
+    P = len(periodos)
+    pull, recuperacion = recuperaciones(circuito, resultado['flujos'], resultado['leyes'])
+    columnas = {'periodo': np.asarray(periodos)}
+    z = np.concatenate([resultado['flujos'], resultado['leyes'].reshape(P, S * E)], axis=1)
+    columnas.update(zip(circuito.columnas, z.T))
+    for s in np.flatnonzero(circuito.productos):
+        columnas[f'pull_{circuito.ids[s]}'] = pull[:, s]
+        for k, e in enumerate(circuito.elementos):
+            columnas[f'rec_{circuito.ids[s]}_{e}'] = recuperacion[:, s, k]
+    for clave in ('objetivo', 'grados_libertad', 'error_grueso', 'cierre_max', 'convergido'):
+        columnas[clave] = resultado[clave]
+    return pd.DataFrame(columnas)
+
+# --- 4. SANKEY MULTI-NODO ---
+
+def sankey_circuito(circuito, flujos, leyes, elemento=None, titulo=None):
+    """
+    Diagrama de Sankey del grafo reconciliado (un período, o la suma de varios).
+    flujos: S (t o t/h); leyes: S x E (%). Con 'elemento' los anchos son toneladas de ese elemento.
+    """
+    import plotly.graph_objects as go
+
+    if elemento is None:
+        valores, unidad = np.asarray(flujos, dtype=float), 't'
+    else:
+        k = circuito.elementos.index(elemento)
+        valores, unidad = np.asarray(flujos, dtype=float) * np.asarray(leyes)[:, k] / 100, f't {elemento}'
+
+    # Nodos del circuito + un nodo externo por cada alimentación y cada producto
+    etiquetas = list(circuito.nodos)
+    origen, destino = [], []
+    for s, c in enumerate(circuito.corrientes):
+        if c.get('desde') is None:
+            etiquetas.append(c['nombre'])
+            origen.append(len(etiquetas) - 1)
+        else:
+            origen.append(circuito.nodos.index(c['desde']))
+        if c.get('hacia') is None:
+            etiquetas.append(c['nombre'])
+            destino.append(len(etiquetas) - 1)
+        else:
+            destino.append(circuito.nodos.index(c['hacia']))
+
+    entrada_nodo = np.zeros(len(etiquetas))
+    salida_nodo = np.zeros(len(etiquetas))
+    np.add.at(entrada_nodo, destino, valores)
+    np.add.at(salida_nodo, origen, valores)
+    rotulos = [f"{n}<br>{max(entrada_nodo[i], salida_nodo[i]):,.1f} {unidad}" for i, n in enumerate(etiquetas)]
+    colores = (["#3B82F6"] * len(circuito.nodos) +
+               ["#16A34A" if 'conc' in n.lower() else "#EF4444" if 'relave' in n.lower() or 'cola' in n.lower()
+                else "#64748B" for n in etiquetas[len(circuito.nodos):]])
+
+    fig = go.Figure(data=[go.Sankey(
+        arrangement="snap",
+        node=dict(pad=25, thickness=15, line=dict(color="black", width=0.5), label=rotulos, color=colores),
+        link=dict(source=origen, target=destino, value=np.maximum(valores, 0),
+                  label=[f"{c['nombre']}: {v:,.2f} {unidad}" for c, v in zip(circuito.corrientes, valores)],
+                  color="rgba(150, 150, 150, 0.5)", arrowlen=15))])
+    fig.update_layout(title_text=f"<b>{titulo or circuito.nombre}</b>", font_family="Arial", font_size=14,
+                      title_font_size=22, title_x=0.5, paper_bgcolor='white', plot_bgcolor='white')
+    return fig
+
+# --- 5. DATOS SIMULADOS ---
+
+def simular_mediciones(circuito, periodos, semilla=42):
+    """
+    Períodos balanceados a partir de la sección 'simulacion' del circuito (alimentación, leyes y fracción de
+    masa/elemento que cada nodo envía a su concentrado, con variación entre períodos), más ruido de medición
+    con las mismas desviaciones que usa la reconciliación. Devuelve (mediciones P x n, valores verdaderos P x n).
+    """
+    sim = circuito.simulacion
+    if not sim:
+        raise ValueError("El circuito no tiene sección 'simulacion'.")
+    rng = np.random.default_rng(semilla)
+    S, E, N = len(circuito.ids), len(circuito.elementos), len(circuito.nodos)
+    componentes = ['masa'] + circuito.elementos
+    # B[p, c, s_salida, s_entrada]: fracción del componente c que pasa de la corriente de entrada a la de salida
+    B = np.zeros((periodos, len(componentes), S, S))
+    externo = np.zeros((periodos, len(componentes), S))
+    alimentacion = sim['alimentacion_tph'] * rng.normal(1, 0.08, periodos)
+    for s in np.flatnonzero(circuito.entradas):
+        externo[:, 0, s] = alimentacion
+        for k, e in enumerate(circuito.elementos):
+            externo[:, k + 1, s] = alimentacion * sim['leyes_alimentacion'][e] * rng.normal(1, 0.10, periodos) / 100
+    for n, nodo in enumerate(circuito.nodos):
+        entradas = np.flatnonzero(circuito.A[n] > 0)
+        salidas = np.flatnonzero(circuito.A[n] < 0)
+        if nodo in sim['fraccion_a_concentrado']:
+            conc = circuito.ids.index(sim['corriente_concentrado'][nodo])
+            otra = [s for s in salidas if s != conc][0]
+            for k, comp in enumerate(componentes):
+                f = np.clip(sim['fraccion_a_concentrado'][nodo][comp] * rng.normal(1, 0.03, periodos), 0.01, 0.99)
+                B[:, k, conc][:, entradas] = f[:, None]
+                B[:, k, otra][:, entradas] = (1 - f)[:, None]
+        else:
+            # Nodo sin separación (p. ej. remolienda): todo lo que entra sale por su única salida
+            B[:, :, salidas[0]][:, :, entradas] = 1.0
+    # Estado estacionario con recirculaciones: (I - B) m = externo
+    m = np.linalg.solve(np.eye(S) - B, externo[..., None])[..., 0]
+    F = m[:, 0, :]
+    leyes = m[:, 1:, :].transpose(0, 2, 1) / F[:, :, None] * 100
+    verdadero = np.concatenate([F, leyes.reshape(periodos, S * E)], axis=1)
+    sigma = desviaciones(circuito, verdadero)
+    Y = verdadero + rng.normal(size=verdadero.shape) * sigma
+    no_medidas = set(sim.get('corrientes_no_medidas', []))
+    for s, i in enumerate(circuito.ids):
+        if i in no_medidas:
+            Y[:, s] = np.nan
+    return Y, verdadero
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconciliación de balance de masa y metal multi-nodo por períodos.")
+    parser.add_argument('--circuito', default=CIRCUITO_PATH)
+    parser.add_argument('--mediciones', default=None, help="CSV con una fila por período ('periodo' + columnas).")
+    parser.add_argument('--simular', type=int, default=None, metavar='PERIODOS',
+                        help="Genera mediciones simuladas (p. ej. 4380 = un año de períodos de 2 h).")
+    parser.add_argument('--salida', default=OUTPUT_PATH)
+    parser.add_argument('--elemento', default=None, help="Elemento para el Sankey de metal (por defecto, el primero).")
+    args = parser.parse_args()
+    os.makedirs(args.salida, exist_ok=True)
+    circuito = cargar_circuito(args.circuito)
+
+    print("[1/4] Cargando mediciones...")
+    if args.mediciones:
+        periodos, Y = leer_mediciones(args.mediciones, circuito)
+    else:
+        n = args.simular or 4380
+        Y, _ = simular_mediciones(circuito, n)
+        periodos = pd.date_range('2024-01-01', periods=n, freq='2h')
+        pd.DataFrame(Y, columns=circuito.columnas).assign(periodo=periodos)[['periodo'] + circuito.columnas].to_csv(
+            os.path.join(args.salida, 'mediciones_simuladas.csv'), index=False)
+    print(f"      {len(periodos):,} períodos, {len(circuito.nodos)} nodos, {len(circuito.ids)} corrientes, "
+          f"{len(circuito.elementos)} elementos")
+
+    print("[2/4] Reconciliando (todos los períodos en lote)...")
+    inicio = time.perf_counter()
+    resultado = reconciliar(circuito, Y)
+    print(f"      {time.perf_counter() - inicio:.2f} s, {resultado['iteraciones']} iteraciones; "
+          f"{resultado['convergido'].mean():.1%} convergidos, {resultado['error_grueso'].sum():,} períodos con "
+          f"posible error grueso (chi2 95%)")
+
+    print("[3/4] Guardando resultados...")
+    tabla = tabla_resultados(circuito, periodos, resultado)
+    tabla.to_csv(os.path.join(args.salida, 'balance_reconciliado.csv'), index=False)
+    pd.DataFrame(resultado['ajuste_normalizado'], columns=circuito.columnas).assign(periodo=np.asarray(periodos))[
+        ['periodo'] + circuito.columnas].to_csv(os.path.join(args.salida, 'ajustes_normalizados.csv'), index=False)
+    resumen = tabla[[c for c in tabla.columns if c.startswith(('rec_', 'pull_'))]].describe().T
+    print(resumen[['mean', 'std', 'min', 'max']].to_string(float_format=lambda v: f'{v:,.2f}'))
+
+    print("[4/4] Generando diagramas de Sankey del circuito (total del período)...")
+    flujos_total = resultado['flujos'].sum(axis=0)
+    # Leyes del total: metal total / masa total (promedio ponderado por flujo)
+    leyes_total = (resultado['flujos'][:, :, None] * resultado['leyes']).sum(axis=0) / flujos_total[:, None]
+    elemento = args.elemento or circuito.elementos[0]
+    sankey_circuito(circuito, flujos_total, leyes_total, titulo="Balance de Masa Reconciliado del Circuito").write_html(
+        os.path.join(args.salida, 'circuito_masa.html'))
+    sankey_circuito(circuito, flujos_total, leyes_total, elemento=elemento,
+                    titulo=f"Balance de Metal Reconciliado ({elemento})").write_html(
+        os.path.join(args.salida, f'circuito_metal_{elemento}.html'))
+    print(f"\n¡Éxito! Balance reconciliado en: {os.path.join(args.salida, 'balance_reconciliado.csv')}")
+
+
+if __name__ == "__main__":
+    main()
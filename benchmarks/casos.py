@@ -0,0 +1,235 @@
+# Casos del benchmark: las etapas de los scripts de cada día, llamadas con sus propias funciones.
+#
+# Cada caso recibe la carpeta con los datos generados, el número de filas, una carpeta de trabajo descartable
+# y 'etapa', que mide una función y devuelve su resultado (ver ejecutar.py). Una etapa con 'max_filas' se omite
+# por encima de ese tamaño: son las que no escalan a propósito (p. ej. un LP con 10^7 variables en PuLP);
+# etapa.omitir(nombre, motivo) deja constancia de una etapa que no se puede correr (dependencia opcional).
+# Si una etapa falla, el caso se corta ahí: las siguientes dependen de su resultado.
+
+import importlib
+import importlib.util
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import generadores
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETAS = {
+    'dia01': 'Day 01 - Making a single database from exploration data',
+    'dia02': 'Dia02 la optimización de mezclas (blending)',
+    'dia03': 'Dia03 - Integrador de datos para automatizar reportes',
+    'dia04': 'Dia04 - Análisis de Cuellos de Botella en Rutas de Acarreo',
+    'dia05': 'Dia05 - Análisis metalúrgicos - Diagramas Sankey',
+}
+# Datos que necesita cada caso (esquemas de generadores.py, más las mediciones del circuito del Dia05)
+DATOS_CASO = {
+    'dia01': ['sondajes'],
+    'dia02': ['stockpiles'],
+    'dia03': ['fms'],
+    'dia04': ['gps'],
+    'dia05': ['leyes_turno', 'mediciones_circuito'],
+}
+PINGS_POR_LOTE_DETECTOR = 20_000
+
+
+def importar(caso, *modulos):
+    """Importa módulos de la carpeta del día (los nombres de carpeta tienen espacios: no son paquetes)."""
+    carpeta = os.path.join(RAIZ, CARPETAS[caso])
+    if carpeta not in sys.path:
+        sys.path.insert(0, carpeta)
+    return [importlib.import_module(m) for m in modulos]
+
+
+def escribir_mediciones_circuito(destino, n, semilla=42):
+    """CSV de reconciliacion.py --mediciones con n períodos, simulado por bloques con el circuito del Dia05."""
+    os.makedirs(destino, exist_ok=True)
+    reconciliacion, = importar('dia05', 'reconciliacion')
+    circuito = reconciliacion.cargar_circuito(os.path.join(RAIZ, CARPETAS['dia05'], reconciliacion.CIRCUITO_PATH))
+
+    def bloques():
+        for b, inicio, fin in generadores._bloques_de(n, generadores.FILAS_POR_BLOQUE // 10):
+            Y, _ = reconciliacion.simular_mediciones(circuito, fin - inicio, semilla=[semilla, b])
+            df = pd.DataFrame(Y, columns=circuito.columnas)
+            df.insert(0, 'periodo', np.arange(inicio, fin))
+            yield df
+
+    ruta = os.path.join(destino, 'mediciones_circuito.csv')
+    generadores.escribir_csv(ruta, bloques())
+    return {'mediciones_circuito': ruta}
+
+
+def escribir_datos(esquema, destino, n, semilla=42):
+    if esquema == 'mediciones_circuito':
+        return escribir_mediciones_circuito(destino, n, semilla)
+    return generadores.ESCRITORES[esquema](destino, n, semilla)
+
+# --- 1. DAY 01: DESURVEY, COMPOSITOS, VARIOGRAMAS Y MODELO DE BLOQUES ---
+
+def caso_dia01(datos, n, trabajo, etapa):
+    bm, desurvey, compositing, block_model, variography, desurvey_store = etapa('importar', lambda: importar(
+        'dia01', '2_Make_BlockModel', 'desurvey', 'compositing', 'block_model', 'variography', 'desurvey_store'))
+    d = datos['sondajes']
+    rutas = {clave: os.path.join(d, archivo) for clave, archivo in generadores.ARCHIVOS_SONDAJES.items()}
+
+    collar, muestras, survey = etapa('leer_csv', lambda: (
+        pd.read_csv(rutas['collar']), pd.read_csv(rutas['muestras'], dtype=bm.SAMPLE_DTYPES),
+        desurvey.load_survey(rutas['survey'])))
+
+    def desurvey_en_memoria():
+        hole_index, arrays = bm.build_collar_lookup(collar[bm.REQUIRED_COLLAR_COLS])
+        stations = desurvey.build_stations(hole_index, arrays, survey)
+        hole = hole_index.get_indexer(muestras['HoleID'])
+        return desurvey.desurvey_xyz(hole, muestras['From_m'].to_numpy(), muestras['To_m'].to_numpy(),
+                                     hole_index, arrays, stations)
+    x, y, z = etapa('desurvey_xyz', desurvey_en_memoria)
+    etapa('desurvey_streaming', lambda: bm.desurvey_drillholes_streaming(
+        rutas['collar'], rutas['muestras'], os.path.join(trabajo, 'xyz.csv'), survey_file_path=rutas['survey']))
+    etapa('compositar_2m', lambda: compositing.composite_samples(muestras, 2.0))
+    etapa('almacen_desurvey', lambda: desurvey_store.update_store(
+        os.path.join(trabajo, 'desurvey_store'), collar[bm.REQUIRED_COLLAR_COLS], muestras[bm.REQUIRED_SAMPLE_COLS],
+        survey), max_filas=10 ** 7)
+
+    puntos = pd.DataFrame({'Sample_X': x, 'Sample_Y': y, 'Sample_Z': z})
+    for columna in bm.METAL_COLUMNS:
+        puntos[columna] = muestras[columna].to_numpy()
+    puntos = puntos.dropna(subset=bm.METAL_COLUMNS, how='all')
+    etapa('variogramas', lambda: variography.experimental_variograms(puntos, lag=10.0, n_lags=5), max_filas=10 ** 6)
+
+    def modelo_bloques():
+        xyz = puntos[['Sample_X', 'Sample_Y', 'Sample_Z']].to_numpy()
+        grid = block_model.grid_from_points(xyz, (25.0, 25.0, 10.0), padding=1)
+        return block_model.estimate_blocks(grid, xyz, puntos[bm.METAL_COLUMNS].to_numpy())
+    etapa('modelo_bloques', modelo_bloques, max_filas=10 ** 6)
+
+# --- 2. DIA02: LP DE MEZCLAS, BARRIDO, MULTIPERIODO Y MONTE CARLO ---
+
+def caso_dia02(datos, n, trabajo, etapa):
+    dia02, barrido, planificador, robustez = etapa('importar', lambda: importar(
+        'dia02', 'Dia02', 'barrido_escenarios', 'planificador_multiperiodo', 'robustez_montecarlo'))
+    stockpiles, planta_req = etapa('leer_stockpiles', lambda: generadores.leer_stockpiles(
+        os.path.join(datos['stockpiles'], 'stockpiles.json')))
+
+    modelo = etapa('pulp_construir', lambda: dia02.construir_modelo(stockpiles, planta_req), max_filas=10 ** 5)
+    if modelo is not None:
+        etapa('pulp_resolver', lambda: dia02.resolver_modelo(modelo[0]), max_filas=10 ** 5)
+
+    def resolver_highs():
+        matrices = barrido.construir_matrices(stockpiles, planta_req['total_feed_tons'])
+        estado, x = barrido.crear_resolvedor(matrices)(planta_req['max_as_grade_plant'], planta_req['max_total_cost'])
+        return dict(zip(matrices['nombres'], x)) if x is not None else None
+    plan = etapa('highs_resolver', resolver_highs, max_filas=10 ** 6)
+
+    feed = planta_req['total_feed_tons']
+    as_escenarios, costo_escenarios = barrido.grilla_escenarios(np.linspace(0.06, 0.14, 5),
+                                                                np.linspace(12 * feed, 16 * feed, 5))
+    etapa('barrido_25', lambda: barrido.barrer_escenarios(stockpiles, feed, as_escenarios, costo_escenarios),
+          max_filas=10 ** 4)
+
+    def multiperiodo():
+        capacidad = sum(s['tons_available'] for s in stockpiles.values())
+        periodos = [{'total_feed_tons': 0.5 * capacidad / 52, 'max_as_grade_plant': 0.10,
+                     'max_total_cost': 15.0 * 0.5 * capacidad / 52}] * 52
+        return planificador.planificar(stockpiles, periodos)
+    etapa('multiperiodo_52', multiperiodo, max_filas=10 ** 3)
+    if plan is not None:
+        etapa('montecarlo_10k', lambda: robustez.evaluar_plan(plan, stockpiles, planta_req, n_realizaciones=10_000),
+              max_filas=10 ** 4)
+
+# --- 3. DIA03: KPIs DEL TURNO, REPORTE Y ALMACÉN INCREMENTAL ---
+
+def caso_dia03(datos, n, trabajo, etapa):
+    reporte, almacen, ingesta = etapa('importar', lambda: importar(
+        'dia03', 'main_report_generator', 'almacen_kpis', 'comun.ingesta'))
+    d = datos['fms']
+    plantillas = os.path.join(RAIZ, CARPETAS['dia03'], reporte.TEMPLATE_PATH)
+    # El Parquet se escribe dentro de la carpeta de datos: se borra para que cargar_datos lea siempre el CSV
+    shutil.rmtree(os.path.join(d, ingesta.PARQUET_DIRNAME), ignore_errors=True)
+    try:
+        shift_info, df_fms, df_drill = etapa('cargar_datos', lambda: reporte.cargar_datos(d))
+        kpis, prod_by_truck = etapa('calcular_kpis', lambda: reporte.calcular_kpis(df_fms, df_drill))
+        svg = etapa('grafico_svg', lambda: reporte.crear_grafico_produccion_svg(prod_by_truck))
+        html_out = etapa('renderizar_html', lambda: reporte.renderizar_html(
+            reporte.cargar_plantilla(plantillas), shift_info, kpis, grafico_produccion_svg=svg,
+            css_inline=reporte.leer_css_texto(plantillas)))
+        if importlib.util.find_spec('weasyprint') is None:
+            etapa.omitir('exportar_pdf', 'weasyprint no instalado')
+        else:
+            etapa('exportar_pdf', lambda: reporte.exportar_pdf(
+                html_out, reporte.cargar_css(plantillas), os.path.join(trabajo, 'reporte.pdf'), plantillas))
+
+        store = os.path.join(trabajo, 'kpi_store')
+        etapa('almacen_ingestar', lambda: almacen.ingestar(d, store))
+        etapa('almacen_kpis_turno', lambda: almacen.kpis_turno(store, shift_info['fecha'], 'A'))
+
+        etapa('parquet_convertir', lambda: [ingesta.convertir_a_parquet(d, r) for r in ('fms', 'perforacion')])
+        etapa('parquet_leer', lambda: reporte.cargar_datos(d))
+    finally:
+        shutil.rmtree(os.path.join(d, ingesta.PARQUET_DIRNAME), ignore_errors=True)
+
+# --- 4. DIA04: SEGMENTOS, MAPA RASTER, ÍNDICE DE CELDAS, CICLOS Y DETECTOR ---
+
+def caso_dia04(datos, n, trabajo, etapa):
+    analisis, raster_calor, indice_celdas, ciclos, detector = etapa('importar', lambda: importar(
+        'dia04', 'main_bottleneck_analysis', 'raster_calor', 'indice_celdas', 'ciclos', 'detector_tiempo_real'))
+    d = datos['gps']
+
+    df = etapa('cargar_gps', lambda: analisis.cargar_datos(d))
+    segmentos = etapa('segmentos', lambda: analisis.crear_segmentos(df, geometrias=False))
+
+    def acumular_raster():
+        grilla = raster_calor.Grilla(raster_calor.limites_segmentos(segmentos, buffer=200))
+        grilla.acumular_segmentos(segmentos, columna='avg_speed')
+        return grilla
+    grilla = etapa('raster_acumular', acumular_raster)
+
+    def colorear_raster():
+        media = raster_calor.velocidad_media(*grilla.grillas(3))
+        return raster_calor.colorear(media, *raster_calor.rango_velocidad(media))
+    etapa('raster_colorear', colorear_raster)
+    del segmentos, grilla
+
+    indice = os.path.join(trabajo, 'indice_celdas')
+    dias = etapa('indice_ingestar', lambda: indice_celdas.ingestar(d, indice))
+    etapa('indice_consultar', lambda: indice_celdas.celdas_mas_lentas(indice, min(dias), max(dias)))
+
+    etapa('ciclos', lambda: ciclos.analizar_ciclos(
+        df, ciclos.cargar_geocercas(os.path.join(d, 'geocercas.geojson'))))
+
+    def detector_por_lotes():
+        alertas = []
+        det = detector.Detector(detector.LineaBase(indice), alertas.append)
+        for inicio in range(0, len(df), PINGS_POR_LOTE_DETECTOR):
+            det.agregar_lote(df.iloc[inicio:inicio + PINGS_POR_LOTE_DETECTOR])
+            det.evaluar()
+        return len(alertas)
+    etapa('detector_lotes_20k', detector_por_lotes, max_filas=10 ** 7)
+
+# --- 5. DIA05: BALANCE POR TURNO, SANKEY Y RECONCILIACIÓN ---
+
+def caso_dia05(datos, n, trabajo, etapa):
+    balance, reconciliacion = etapa('importar', lambda: importar('dia05', 'metallurgical_balance', 'reconciliacion'))
+
+    df = etapa('leer_leyes', lambda: balance.leer_leyes(os.path.join(datos['leyes_turno'], 'leyes_turno.csv')))
+    resultado = etapa('balance_lote', lambda: balance.balance_lote(df))
+    etapa('sankey_selector', lambda: balance.sankey_selector(resultado, os.path.join(trabajo, 'selector.html')),
+          max_filas=10 ** 6)
+    etapa('sankey_paginas', lambda: balance.sankey_paginas(resultado, os.path.join(trabajo, 'sankey')),
+          max_filas=10 ** 5)
+
+    circuito = reconciliacion.cargar_circuito(os.path.join(RAIZ, CARPETAS['dia05'], reconciliacion.CIRCUITO_PATH))
+    _, Y = etapa('leer_mediciones', lambda: reconciliacion.leer_mediciones(
+        os.path.join(datos['mediciones_circuito'], 'mediciones_circuito.csv'), circuito))
+    etapa('reconciliar', lambda: reconciliacion.reconciliar(circuito, Y), max_filas=2 * 10 ** 5)
+
+
+CASOS = {
+    'dia01': caso_dia01,
+    'dia02': caso_dia02,
+    'dia03': caso_dia03,
+    'dia04': caso_dia04,
+    'dia05': caso_dia05,
+}
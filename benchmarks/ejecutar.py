@@ -0,0 +1,346 @@
+# Benchmark de los scripts de los cinco días a distintos tamaños de entrada, con comparación contra una línea base.
+#
+# Cada (caso, tamaño) corre en un proceso propio: la memoria de un caso no ensucia la del siguiente, y si un
+# caso se queda sin memoria o pasa el tiempo límite, el resto del benchmark sigue y el fallo queda registrado.
+# Por etapa se mide tiempo de reloj, tiempo de CPU, pico de RSS (en Linux se reinicia el pico antes de cada etapa
+# con /proc/self/clear_refs; en otros sistemas es el pico acumulado del proceso) y, con --tracemalloc, el pico de
+# memoria asignada desde Python (más lento: úselo para buscar de dónde viene la memoria, no para tiempos).
+#
+# Los datos sintéticos se generan una vez por (esquema, tamaño, semilla) y se reutilizan desde --datos.
+# La línea base es un JSON con los tiempos y picos de cada etapa; solo tiene sentido en la misma máquina.
+#
+# Uso:
+#   python -m benchmarks.ejecutar                                   (todos los casos a 1e3, 1e4 y 1e5 filas)
+#   python -m benchmarks.ejecutar --casos dia04 dia05 --tamanos 1e5 1e6 1e7 --timeout 3600
+#   python -m benchmarks.ejecutar --guardar-linea-base              (agrega/actualiza benchmarks/linea_base.json)
+#   python -m benchmarks.ejecutar --tracemalloc --limite-memoria-mb 8000
+
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+from datetime import datetime
+
+from comun.instrumentacion import memoria_mb, pico_mb, reiniciar_pico
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA = os.path.join(RAIZ, 'benchmarks')
+DATOS_PATH = os.path.join(CARPETA, 'datos')
+RESULTADOS_PATH = os.path.join(CARPETA, 'resultados')
+LINEA_BASE_PATH = os.path.join(CARPETA, 'linea_base.json')
+CASOS = ['dia01', 'dia02', 'dia03', 'dia04', 'dia05']
+TAMANOS = [1e3, 1e4, 1e5]
+TOLERANCIA = 0.25
+# Diferencias absolutas por debajo de estas no cuentan como regresión (ruido de etapas muy cortas)
+MINIMO_SEGUNDOS = 0.05
+MINIMO_MB = 10.0
+CAMPOS = ['caso', 'filas', 'etapa', 'estado', 'segundos', 'cpu_s', 'pico_rss_mb', 'rss_inicial_mb',
+          'pico_tracemalloc_mb', 'filas_por_s', 'pico_por_etapa', 'error']
+
+# --- 1. MEDICIÓN DE ETAPAS (PROCESO HIJO) ---
+
+class Medidor:
+    """
+    Se pasa a los casos como 'etapa': etapa(nombre, funcion, max_filas=None) ejecuta y mide la función.
+    Antes de correrla escribe un registro 'en_curso', así el proceso padre sabe en qué etapa murió el hijo.
+    """
+
+    def __init__(self, caso, filas, ruta_jsonl):
+        self.caso = caso
+        self.filas = filas
+        self.ruta_jsonl = ruta_jsonl
+
+    def _registrar(self, etapa, estado, **campos):
+        registro = {'caso': self.caso, 'filas': self.filas, 'etapa': etapa, 'estado': estado, **campos}
+        with open(self.ruta_jsonl, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    def omitir(self, etapa, motivo):
+        self._registrar(etapa, 'omitida', error=motivo)
+        print(f"  {etapa}: omitida ({motivo})", flush=True)
+
+    def __call__(self, etapa, funcion, max_filas=None):
+        if max_filas is not None and self.filas > max_filas:
+            self.omitir(etapa, f"más de {max_filas:,} filas")
+            return None
+        self._registrar(etapa, 'en_curso')
+        pico_por_etapa = reiniciar_pico()
+        rss_inicial = memoria_mb('VmRSS')
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            resultado = funcion()
+        except Exception as e:
+            self._registrar(etapa, 'error', segundos=time.perf_counter() - t0, pico_rss_mb=pico_mb(),
+                            error=f"{type(e).__name__}: {e}"[:500])
+            raise
+        segundos = time.perf_counter() - t0
+        campos = {
+            'segundos': segundos, 'cpu_s': time.process_time() - c0, 'pico_rss_mb': pico_mb(),
+            'rss_inicial_mb': rss_inicial, 'filas_por_s': self.filas / segundos if segundos > 0 else None,
+            'pico_por_etapa': pico_por_etapa,
+        }
+        if tracemalloc.is_tracing():
+            campos['pico_tracemalloc_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        self._registrar(etapa, 'ok', **campos)
+        print(f"  {etapa}: {segundos:.3f} s, pico {campos['pico_rss_mb']:.0f} MB", flush=True)
+        return resultado
+
+
+def hijo(caso, filas, datos, ruta_jsonl, trabajo, usar_tracemalloc, limite_memoria_mb):
+    """Punto de entrada del proceso hijo: corre un caso y sale con código 1 si alguna etapa falló."""
+    if limite_memoria_mb:
+        limite = int(limite_memoria_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+    if usar_tracemalloc:
+        tracemalloc.start()
+    # Los casos (pandas, numpy, los módulos de cada día) se importan después de fijar el límite de memoria
+    from benchmarks.casos import CASOS as FUNCIONES
+    try:
+        FUNCIONES[caso](datos, filas, trabajo, Medidor(caso, filas, ruta_jsonl))
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+
+# --- 2. DATOS SINTÉTICOS (CON CACHÉ) ---
+
+def preparar_datos(caso, filas, semilla, datos_path):
+    """{esquema: carpeta} con los datos del caso; se generan solo si no están completos en la caché."""
+    from benchmarks.casos import DATOS_CASO, escribir_datos
+    carpetas = {}
+    for esquema in DATOS_CASO[caso]:
+        carpeta = os.path.join(datos_path, esquema, f"{filas}_s{semilla}")
+        marca = os.path.join(carpeta, '.completo')
+        if not os.path.exists(marca):
+            shutil.rmtree(carpeta, ignore_errors=True)
+            inicio = time.perf_counter()
+            escribir_datos(esquema, carpeta, filas, semilla)
+            open(marca, 'w').close()
+            print(f"Datos {esquema} ({filas:,} filas) generados en {time.perf_counter() - inicio:.1f} s")
+        carpetas[esquema] = carpeta
+    return carpetas
+
+# --- 3. EJECUCIÓN AISLADA DE CADA CASO ---
+
+def _ultimos_registros(ruta_jsonl):
+    """Último registro de cada etapa, en el orden en que empezaron."""
+    registros = {}
+    if os.path.exists(ruta_jsonl):
+        with open(ruta_jsonl, encoding='utf-8') as f:
+            for linea in f:
+                if linea.strip():
+                    r = json.loads(linea)
+                    registros[r['etapa']] = r
+    return list(registros.values())
+
+
+def ejecutar_caso(caso, filas, datos, logs_path, args):
+    """Corre el caso en un proceso hijo. Devuelve sus registros, con los fallos del proceso ya anotados."""
+    ruta_jsonl = os.path.join(logs_path, f"{caso}_{filas}.jsonl")
+    ruta_log = os.path.join(logs_path, f"{caso}_{filas}.log")
+    if os.path.exists(ruta_jsonl):
+        os.remove(ruta_jsonl)
+    trabajo = tempfile.mkdtemp(prefix=f"bench_{caso}_")
+    comando = [sys.executable, '-m', 'benchmarks.ejecutar', '--hijo', caso, str(filas), json.dumps(datos),
+               ruta_jsonl, trabajo]
+    if args.tracemalloc:
+        comando.append('--tracemalloc')
+    if args.limite_memoria_mb:
+        comando += ['--limite-memoria-mb', str(args.limite_memoria_mb)]
+    entorno = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1')
+
+    fallo = None
+    try:
+        with open(ruta_log, 'w', encoding='utf-8') as log:
+            codigo = subprocess.run(comando, cwd=RAIZ, env=entorno, stdout=log, stderr=subprocess.STDOUT,
+                                    timeout=args.timeout).returncode
+        if codigo < 0:
+            fallo = ('terminado', f"el proceso recibió la señal {-codigo} (¿sin memoria?)")
+        elif codigo != 0:
+            fallo = ('error', f"el proceso terminó con código {codigo} (ver {ruta_log})")
+    except subprocess.TimeoutExpired:
+        fallo = ('timeout', f"superó {args.timeout} s")
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    registros = _ultimos_registros(ruta_jsonl)
+    if fallo:
+        en_curso = [r for r in registros if r['estado'] == 'en_curso']
+        for r in en_curso:
+            r.update(estado=fallo[0], error=fallo[1])
+        if not en_curso and not any(r['estado'] == 'error' for r in registros):
+            registros.append({'caso': caso, 'filas': filas, 'etapa': '(proceso)', 'estado': fallo[0],
+                              'error': fallo[1]})
+    return registros
+
+# --- 4. COMPARACIÓN CON LA LÍNEA BASE ---
+
+def clave(registro):
+    return f"{registro['caso']}|{registro['filas']}|{registro['etapa']}"
+
+
+def _variacion(actual, base, tolerancia, minimo):
+    """(variación relativa, es regresión) de una magnitud donde más es peor."""
+    if actual is None or not base:
+        return None, False
+    return actual / base - 1, actual > base * (1 + tolerancia) and actual - base > minimo
+
+
+def comparar(registros, linea_base, tolerancia, tolerancia_memoria):
+    """Filas de comparacion.csv, una por etapa presente en la línea base; 'regresion' explica el motivo."""
+    filas = []
+    for r in registros:
+        base = linea_base.get(clave(r))
+        if base is None:
+            continue
+        fila = {'clave': clave(r), 'estado': r['estado'], 'segundos_base': base['segundos'],
+                'segundos': r.get('segundos'), 'pico_rss_mb_base': base.get('pico_rss_mb'),
+                'pico_rss_mb': r.get('pico_rss_mb'), 'var_tiempo': None, 'var_memoria': None, 'regresion': ''}
+        if r['estado'] != 'ok':
+            fila['regresion'] = f"estado {r['estado']}" if r['estado'] != 'omitida' else ''
+        else:
+            fila['var_tiempo'], lento = _variacion(r['segundos'], base['segundos'], tolerancia, MINIMO_SEGUNDOS)
+            fila['var_memoria'], pesado = _variacion(r['pico_rss_mb'], base.get('pico_rss_mb'),
+                                                     tolerancia_memoria, MINIMO_MB)
+            fila['regresion'] = ', '.join(m for m, si in (('tiempo', lento), ('memoria', pesado)) if si)
+        filas.append(fila)
+    return filas
+
+
+def cargar_linea_base(ruta):
+    if not os.path.exists(ruta):
+        return {'metadatos': None, 'etapas': {}}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_linea_base(ruta, registros, metadatos):
+    """Agrega las etapas correctas de esta corrida a la línea base (las demás claves se conservan)."""
+    linea_base = cargar_linea_base(ruta)
+    for r in registros:
+        if r['estado'] == 'ok':
+            linea_base['etapas'][clave(r)] = {'segundos': r['segundos'], 'pico_rss_mb': r['pico_rss_mb']}
+    linea_base['metadatos'] = metadatos
+    with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(linea_base, f, indent=1, sort_keys=True)
+    os.replace(ruta + '.tmp', ruta)
+
+# --- 5. SALIDA ---
+
+def metadatos(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'fecha': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'plataforma': platform.platform(), 'cpus': os.cpu_count(), 'commit': commit, 'semilla': args.semilla,
+            'tracemalloc': args.tracemalloc}
+
+
+def escribir_csv(ruta, filas, campos):
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos, extrasaction='ignore')
+        escritor.writeheader()
+        escritor.writerows(filas)
+
+
+def imprimir_comparacion(filas, tolerancia):
+    regresiones = [f for f in filas if f['regresion']]
+    print(f"\nComparación con la línea base: {len(filas)} etapas, {len(regresiones)} regresiones "
+          f"(tolerancia {tolerancia:.0%}).")
+    for f in regresiones:
+        tiempo = f"{f['segundos_base']:.3f} -> {f['segundos']:.3f} s" if f['segundos'] is not None else ""
+        memoria = (f"{f['pico_rss_mb_base']:.0f} -> {f['pico_rss_mb']:.0f} MB"
+                   if f['pico_rss_mb'] is not None and f['pico_rss_mb_base'] is not None else "")
+        print(f"  REGRESIÓN {f['clave']}: {f['regresion']}  {tiempo}  {memoria}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los scripts de cada día a distintos tamaños.")
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=CASOS)
+    parser.add_argument('--tamanos', nargs='+', type=float, default=TAMANOS,
+                        help="Filas de entrada de cada corrida (acepta notación 1e6).")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--datos', default=DATOS_PATH, help="Caché de datos sintéticos.")
+    parser.add_argument('--salida', default=None,
+                        help="Carpeta de resultados (por defecto benchmarks/resultados/<fecha>).")
+    parser.add_argument('--linea-base', default=LINEA_BASE_PATH)
+    parser.add_argument('--guardar-linea-base', action='store_true',
+                        help="Agrega los resultados de esta corrida a la línea base.")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help="Aumento relativo de tiempo que cuenta como regresión (0.25 = 25%%).")
+    parser.add_argument('--tolerancia-memoria', type=float, default=None,
+                        help="Igual para el pico de memoria (por defecto, la misma tolerancia).")
+    parser.add_argument('--tracemalloc', action='store_true', help="Mide también el pico de tracemalloc.")
+    parser.add_argument('--timeout', type=float, default=None, help="Segundos máximos por caso y tamaño.")
+    parser.add_argument('--limite-memoria-mb', type=float, default=None,
+                        help="Límite de memoria virtual de cada proceso hijo (RLIMIT_AS).")
+    parser.add_argument('--hijo', nargs=5, metavar=('CASO', 'FILAS', 'DATOS', 'JSONL', 'TRABAJO'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        caso, filas, datos, ruta_jsonl, trabajo = args.hijo
+        hijo(caso, int(filas), json.loads(datos), ruta_jsonl, trabajo, args.tracemalloc, args.limite_memoria_mb)
+        return
+
+    salida = args.salida or os.path.join(RESULTADOS_PATH, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    logs_path = os.path.join(salida, 'logs')
+    os.makedirs(logs_path, exist_ok=True)
+    info = metadatos(args)
+
+    registros = []
+    for filas in sorted(int(t) for t in args.tamanos):
+        for caso in args.casos:
+            print(f"\n{caso} - {filas:,} filas", flush=True)
+            datos = preparar_datos(caso, filas, args.semilla, args.datos)
+            inicio = time.perf_counter()
+            nuevos = ejecutar_caso(caso, filas, datos, logs_path, args)
+            for r in nuevos:
+                if r['estado'] == 'ok':
+                    print(f"  {r['etapa']:<22} {r['segundos']:10.3f} s {r['pico_rss_mb']:8.0f} MB")
+                else:
+                    print(f"  {r['etapa']:<22} {r['estado']}: {r.get('error')}")
+            print(f"  total: {time.perf_counter() - inicio:.1f} s")
+            registros += nuevos
+
+    with open(os.path.join(salida, 'resultados.json'), 'w', encoding='utf-8') as f:
+        json.dump({'metadatos': info, 'resultados': registros}, f, indent=1, ensure_ascii=False)
+    escribir_csv(os.path.join(salida, 'resultados.csv'), registros, CAMPOS)
+    print(f"\nResultados en '{salida}'.")
+
+    regresiones = []
+    linea_base = cargar_linea_base(args.linea_base)
+    if linea_base['etapas']:
+        tolerancia_memoria = args.tolerancia if args.tolerancia_memoria is None else args.tolerancia_memoria
+        comparacion = comparar(registros, linea_base['etapas'], args.tolerancia, tolerancia_memoria)
+        escribir_csv(os.path.join(salida, 'comparacion.csv'), comparacion,
+                     ['clave', 'estado', 'segundos_base', 'segundos', 'var_tiempo', 'pico_rss_mb_base',
+                      'pico_rss_mb', 'var_memoria', 'regresion'])
+        base_info = linea_base.get('metadatos') or {}
+        if base_info.get('plataforma') != info['plataforma'] or base_info.get('cpus') != info['cpus']:
+            print(f"AVISO: la línea base es de otra máquina ({base_info.get('plataforma')}, "
+                  f"{base_info.get('cpus')} CPU); los tiempos no son comparables.")
+        regresiones = imprimir_comparacion(comparacion, args.tolerancia)
+
+    if args.guardar_linea_base:
+        guardar_linea_base(args.linea_base, registros, info)
+        print(f"Línea base actualizada: '{args.linea_base}'.")
+    if regresiones:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+# Generadores sintéticos (con semilla) de los registros de entrada de cada día, para medir los scripts a escala.
+#
+# Cada generador entrega bloques de filas (DataFrames) con el mismo esquema que los archivos de ejemplo del
+# repositorio, y escribir_csv los agrega al archivo bloque a bloque: un registro de 10^8 filas se escribe sin
+# tenerlo entero en memoria. La misma semilla y el mismo número de filas dan siempre los mismos archivos.
+#
+#   sondajes     MPA_Collar / MPA_Samples / survey del Day 01 (100 muestras por pozo, malla de 25 m)
+#   stockpiles   dict de stockpiles y requerimientos de planta con la forma de Dia02.py (JSON)
+#   fms          fms_data.csv + drill_data.csv + shift_info.json del Dia03
+#   gps          truck_gps_data.csv + geocercas.geojson del Dia04 (camiones en ciclo pala -> destino)
+#   leyes_turno  leyes de alimentación, concentrado y colas por turno del Dia05
+#
+# Uso:
+#   python -m benchmarks.generadores gps 1e6 --destino /tmp/datos_gps
+#   python -m benchmarks.generadores sondajes 1e5 --destino /tmp/sondajes --semilla 7
+
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_BLOQUE = 1_000_000
+FORMATO_TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+# Punto de referencia de la mina de ejemplo (Dia04/data) y su zona UTM
+ORIGEN_LONLAT = (-69.30, -23.55)
+EPSG_UTM = 32719
+
+ARCHIVOS_SONDAJES = {'collar': 'MPA_Collar_20240227.csv', 'muestras': 'MPA_Samples_BD_20240227.csv',
+                     'survey': 'MPA_Survey_20240227.csv'}
+MUESTRAS_POR_POZO = 100
+ESPACIAMIENTO_POZOS_M = 25.0
+
+PASO_GPS_S = 5
+PINGS_POR_CAMION_DIA = 86400 // PASO_GPS_S
+MAX_CAMIONES = 120
+
+# --- 1. ESCRITURA POR BLOQUES ---
+
+def escribir_csv(ruta, bloques):
+    """Escribe los bloques uno tras otro (cabecera solo en el primero). Atómico: se renombra al terminar."""
+    filas = 0
+    with open(ruta + '.tmp', 'w', newline='', encoding='utf-8') as f:
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(f, header=(i == 0), index=False, date_format=FORMATO_TIMESTAMP)
+            filas += len(bloque)
+    os.replace(ruta + '.tmp', ruta)
+    return filas
+
+
+def _bloques_de(n, tamano):
+    """(número de bloque, inicio, fin) para recorrer n filas en bloques de 'tamano'."""
+    for b, inicio in enumerate(range(0, n, tamano)):
+        yield b, inicio, min(inicio + tamano, n)
+
+
+def _utm_a_lonlat(x, y):
+    from pyproj import Transformer
+    return Transformer.from_crs(EPSG_UTM, 4326, always_xy=True).transform(x, y)
+
+
+def _origen_utm():
+    from pyproj import Transformer
+    return Transformer.from_crs(4326, EPSG_UTM, always_xy=True).transform(*ORIGEN_LONLAT)
+
+# --- 2. DAY 01: COLLAR, MUESTRAS Y SURVEY ---
+
+def sondajes(n, semilla=42, pozos_por_bloque=FILAS_POR_BLOQUE // MUESTRAS_POR_POZO):
+    """
+    Bloques (collar, muestras, survey) con n muestras en total. Pozos en malla regular, inclinados, con leyes
+    lognormales sobre una tendencia espacial suave, ~1% de muestras sin leyes y ~3% con baja recuperación.
+    """
+    n_pozos = max(1, math.ceil(n / MUESTRAS_POR_POZO))
+    lado = math.ceil(math.sqrt(n_pozos))
+    for b, inicio, fin in _bloques_de(n_pozos, pozos_por_bloque):
+        rng = np.random.default_rng([semilla, b])
+        pozo = np.arange(inicio, fin)
+        k = np.full(len(pozo), MUESTRAS_POR_POZO)
+        k[pozo == n_pozos - 1] = n - MUESTRAS_POR_POZO * (n_pozos - 1)
+        hole_id = np.array([f'BM-{i:07d}' for i in pozo])
+        easting = 430000.0 + (pozo % lado) * ESPACIAMIENTO_POZOS_M + rng.normal(0, 2, len(pozo))
+        northing = 7005000.0 + (pozo // lado) * ESPACIAMIENTO_POZOS_M + rng.normal(0, 2, len(pozo))
+        elevation = 1200.0 + 40 * np.sin(easting / 700) * np.cos(northing / 900)
+        dip = -rng.uniform(50, 90, len(pozo))
+        azimuth = rng.uniform(0, 360, len(pozo))
+
+        # Muestras contiguas desde una profundidad inicial por pozo
+        fila_pozo = np.repeat(np.arange(len(pozo)), k)
+        largo = rng.uniform(0.8, 2.0, len(fila_pozo))
+        acumulado = np.cumsum(largo)
+        primero = np.r_[0, np.cumsum(k)[:-1]]
+        base = np.repeat(acumulado[primero] - largo[primero], k)
+        desde = np.repeat(rng.uniform(0, 10, len(pozo)), k) + acumulado - largo - base
+        hasta = desde + largo
+        ultimo = np.cumsum(k) - 1
+        largo_pozo = hasta[ultimo] + rng.uniform(1, 5, len(pozo))
+
+        # Tendencia de leyes según la posición aproximada de cada muestra (pozo recto)
+        medio = (desde + hasta) / 2
+        d, a = np.radians(dip[fila_pozo]), np.radians(azimuth[fila_pozo])
+        x = easting[fila_pozo] + medio * np.sin(a) * np.cos(d)
+        y = northing[fila_pozo] + medio * np.cos(a) * np.cos(d)
+        z = elevation[fila_pozo] + medio * np.sin(d)
+        tendencia = np.sin(x / 180) * np.cos(y / 140) + 0.5 * np.sin(z / 60)
+        ag = np.exp(np.log(8) + 0.8 * tendencia + rng.normal(0, 0.9, len(x)))
+        pb = np.exp(np.log(0.3) + 0.8 * tendencia + rng.normal(0, 1.0, len(x)))
+        zn = np.exp(np.log(0.6) + 0.6 * tendencia + rng.normal(0, 1.0, len(x)))
+        sin_leyes = rng.random(len(x)) < 0.01
+        ag[sin_leyes] = pb[sin_leyes] = zn[sin_leyes] = np.nan
+
+        collar = pd.DataFrame({'HoleID': hole_id, 'HoleType': 'DDH', 'Year': 2023, 'Easting': easting.round(3),
+                               'Northing': northing.round(3), 'Elevation': elevation.round(3),
+                               'Length_m': largo_pozo.round(2), 'Dip': dip.round(2), 'Azimuth': azimuth.round(2)})
+        muestras = pd.DataFrame({
+            'HoleID': hole_id[fila_pozo], 'From_m': desde.round(2), 'To_m': hasta.round(2),
+            'Ag_ppm': ag.round(2), 'Pb_pct': pb.round(4), 'Zn_pct': zn.round(4),
+            'BD_tonnes_m3': rng.normal(2.6, 0.08, len(x)).round(3), 'Method': 'REG', 'Comment': '',
+            'LowRecovery_<=85pct': np.where(rng.random(len(x)) < 0.03, 'Y', 'N'),
+        })
+
+        # Survey cada 50 m con una deriva suave de dip y azimut
+        estaciones = np.ceil(largo_pozo / 50).astype(int) + 1
+        fila_est = np.repeat(np.arange(len(pozo)), estaciones)
+        profundidad = (np.arange(len(fila_est)) - np.repeat(np.r_[0, np.cumsum(estaciones)[:-1]], estaciones)) * 50.0
+        profundidad = np.minimum(profundidad, largo_pozo[fila_est])
+        deriva_dip = rng.normal(0, 1.5, len(pozo))[fila_est]
+        deriva_az = rng.normal(0, 2.0, len(pozo))[fila_est]
+        survey = pd.DataFrame({
+            'HoleID': hole_id[fila_est], 'Depth_m': profundidad.round(2),
+            'Dip': np.clip(dip[fila_est] + deriva_dip * profundidad / 100, -90, -10).round(2),
+            'Azimuth': np.mod(azimuth[fila_est] + deriva_az * profundidad / 100, 360).round(2),
+        })
+        yield collar, muestras, survey
+
+
+def escribir_sondajes(destino, n, semilla=42):
+    os.makedirs(destino, exist_ok=True)
+    rutas = {clave: os.path.join(destino, archivo) for clave, archivo in ARCHIVOS_SONDAJES.items()}
+    archivos = {clave: open(ruta + '.tmp', 'w', newline='', encoding='utf-8') for clave, ruta in rutas.items()}
+    try:
+        for i, bloques in enumerate(sondajes(n, semilla)):
+            for clave, bloque in zip(('collar', 'muestras', 'survey'), bloques):
+                bloque.to_csv(archivos[clave], header=(i == 0), index=False)
+    finally:
+        for f in archivos.values():
+            f.close()
+    for ruta in rutas.values():
+        os.replace(ruta + '.tmp', ruta)
+    return rutas
+
+# --- 3. DIA02: STOCKPILES ---
+
+def stockpiles(n, semilla=42):
+    """n stockpiles con la forma del dict de Dia02.py y requerimientos de planta factibles para ellos."""
+    rng = np.random.default_rng(semilla)
+    pilas = {
+        f'Stockpile_{i:07d}': {
+            'tons_available': float(t), 'cost_per_ton': float(c), 'cu_grade': float(cu), 'as_grade': float(ars),
+        } for i, (t, c, cu, ars) in enumerate(zip(rng.uniform(5000, 60000, n).round(0), rng.uniform(8, 20, n).round(2),
+                                                   rng.uniform(0.3, 1.8, n).round(3), rng.uniform(0.01, 0.20, n).round(3)))
+    }
+    capacidad = sum(p['tons_available'] for p in pilas.values())
+    feed = round(0.25 * capacidad, 0)
+    planta_req = {'total_feed_tons': feed, 'max_as_grade_plant': 0.10, 'max_total_cost': round(14.0 * feed, 0)}
+    return pilas, planta_req
+
+
+def escribir_stockpiles(destino, n, semilla=42):
+    os.makedirs(destino, exist_ok=True)
+    pilas, planta_req = stockpiles(n, semilla)
+    ruta = os.path.join(destino, 'stockpiles.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'stockpiles': pilas, 'planta_req': planta_req}, f)
+    return {'stockpiles': ruta}
+
+
+def leer_stockpiles(ruta):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    return datos['stockpiles'], datos['planta_req']
+
+# --- 4. DIA03: FMS, PERFORACIÓN E INFORMACIÓN DEL TURNO ---
+
+INICIO_REGISTROS = pd.Timestamp('2025-06-15 20:00:00')
+
+
+def _duracion_registro_s(n, filas_por_dia=2_000, max_dias=730):
+    """El registro dura más días cuanto más filas tiene (hasta ~2 años); la flota crece con el resto."""
+    return min(max(1, math.ceil(n / filas_por_dia)), max_dias) * 86400
+
+
+def fms(n, semilla=42, viajes_por_camion_dia=25):
+    """Bloques de fms_data.csv: viajes ordenados en el tiempo, ~65% a Planta."""
+    dias = _duracion_registro_s(n) / 86400
+    dt = dias * 86400 / n
+    n_camiones = int(np.clip(round(n / dias / viajes_por_camion_dia), 5, 400))
+    for b, inicio, fin in _bloques_de(n, FILAS_POR_BLOQUE):
+        rng = np.random.default_rng([semilla, b])
+        i = np.arange(inicio, fin)
+        t = INICIO_REGISTROS + pd.to_timedelta(np.floor(i * dt + rng.uniform(0, dt, len(i))), unit='s')
+        camion = rng.integers(0, n_camiones, len(i))
+        yield pd.DataFrame({
+            'timestamp': t, 'truck_id': np.char.add('CA-', (101 + camion).astype(str)),
+            'shovel_id': np.char.add('PA-0', (1 + camion % 4).astype(str)),
+            'payload_tons': rng.normal(200, 6, len(i)).round(0),
+            'destination': np.where(rng.random(len(i)) < 0.65, 'Planta', 'Botadero'),
+        })
+
+
+def perforacion(n, semilla=42):
+    """Bloques de drill_data.csv: pozos perforados ordenados en el tiempo."""
+    dt = _duracion_registro_s(n) / n
+    for b, inicio, fin in _bloques_de(n, FILAS_POR_BLOQUE):
+        rng = np.random.default_rng([semilla, 10_000 + b])
+        i = np.arange(inicio, fin)
+        t = INICIO_REGISTROS + pd.to_timedelta(np.floor(i * dt + rng.uniform(0, dt, len(i))), unit='s')
+        yield pd.DataFrame({
+            'timestamp': t, 'drill_id': np.char.add('PE-50', (1 + rng.integers(0, 6, len(i))).astype(str)),
+            'hole_id': np.char.add('M10-', i.astype(str)), 'depth_meters': rng.normal(15.5, 0.8, len(i)).round(1),
+        })
+
+
+def escribir_fms(destino, n, semilla=42):
+    os.makedirs(destino, exist_ok=True)
+    rutas = {'fms': os.path.join(destino, 'fms_data.csv'), 'perforacion': os.path.join(destino, 'drill_data.csv'),
+             'turno': os.path.join(destino, 'shift_info.json')}
+    escribir_csv(rutas['fms'], fms(n, semilla))
+    escribir_csv(rutas['perforacion'], perforacion(n, semilla))
+    with open(rutas['turno'], 'w', encoding='utf-8') as f:
+        json.dump({'fecha': INICIO_REGISTROS.strftime('%Y-%m-%d'), 'turno': 'Turno A - Noche',
+                   'supervisor': 'Supervisor Sintético'}, f, ensure_ascii=False, indent=2)
+    return rutas
+
+# --- 5. DIA04: GPS DE LA FLOTA Y GEOCERCAS ---
+
+def _disposicion_mina(n_palas):
+    """Palas al oeste, Planta y Botadero al este/norte (coordenadas UTM) y el destino de cada pala."""
+    x0, y0 = _origen_utm()
+    palas = {f'PA-{k + 1:02d}': np.array([x0, y0 + 800.0 * k]) for k in range(n_palas)}
+    destinos = {'Planta': np.array([x0 + 3000.0, y0]), 'Botadero': np.array([x0 + 500.0, y0 + 3500.0])}
+    ruta = {pala: ('Planta' if k % 2 == 0 else 'Botadero') for k, pala in enumerate(palas)}
+    return palas, destinos, ruta
+
+
+def _ciclos_camion(rng, pala, destino, horizonte_s):
+    """
+    Inicio de cada ciclo y fin acumulado de sus etapas (retorno, cola, aculatamiento, carga, acarreo, descarga),
+    más los puntos inicial y final de cada etapa.
+    """
+    u = (destino - pala) / np.linalg.norm(destino - pala)
+    cola, descarga = pala + u * 70, destino - u * 30
+    p0 = np.array([descarga, cola, cola, pala, pala, descarga])
+    p1 = np.array([cola, cola, pala, pala, descarga, descarga])
+    distancia = np.linalg.norm(p1 - p0, axis=1)
+    n = int(horizonte_s / (distancia[0] / (44 / 3.6) + distancia[4] / (31 / 3.6) + 200)) + 2
+    duraciones = np.column_stack([
+        distancia[0] / (rng.uniform(36, 44, n) / 3.6), rng.exponential(90, n), np.full(n, 30.0),
+        rng.uniform(120, 180, n), distancia[4] / (rng.uniform(25, 31, n) / 3.6), rng.uniform(50, 70, n),
+    ])
+    fines = np.cumsum(duraciones, axis=1)
+    inicios = np.r_[0, np.cumsum(fines[:, -1])[:-1]]
+    return inicios, fines, p0, p1, distancia
+
+
+def gps(n, semilla=42):
+    """
+    Bloques de truck_gps_data.csv ordenados por timestamp: un ping cada 5 s por camión, con la flota en ciclo
+    pala -> destino -> pala (colas, carga y descarga detenidos). Crecen los camiones (hasta 120) y los días.
+    """
+    n_camiones = int(np.clip(math.ceil(n / PINGS_POR_CAMION_DIA), 1, MAX_CAMIONES))
+    instantes = math.ceil(n / n_camiones)
+    palas, destinos, ruta = _disposicion_mina(max(1, min(6, n_camiones // 8 + 1)))
+    nombres_pala = list(palas)
+    camiones = []
+    for c in range(n_camiones):
+        rng = np.random.default_rng([semilla, 1, c])
+        pala = nombres_pala[c % len(nombres_pala)]
+        inicios, fines, p0, p1, distancia = _ciclos_camion(rng, palas[pala], destinos[ruta[pala]],
+                                                           instantes * PASO_GPS_S + 3600)
+        camiones.append((inicios, fines, p0, p1, distancia, rng.uniform(0, 1200)))
+    ids = np.array([f'CA-{101 + c}' for c in range(n_camiones)])
+    inicio_registro = pd.Timestamp('2023-11-16 00:00:00')
+
+    por_bloque = max(1, FILAS_POR_BLOQUE // n_camiones)
+    for b, k0, k1 in _bloques_de(instantes, por_bloque):
+        rng = np.random.default_rng([semilla, 2, b])
+        t = np.arange(k0, k1) * float(PASO_GPS_S)
+        x = np.empty((len(t), n_camiones))
+        y, v = np.empty_like(x), np.empty_like(x)
+        cargado = np.empty(x.shape, dtype=bool)
+        for c, (inicios, fines, p0, p1, distancia, fase) in enumerate(camiones):
+            tc = t + fase
+            ciclo = np.searchsorted(inicios, tc, side='right') - 1
+            tau = tc - inicios[ciclo]
+            limites = fines[ciclo]
+            etapa = np.minimum((tau[:, None] >= limites).sum(axis=1), 5)
+            fila = np.arange(len(t))
+            desde = np.where(etapa > 0, limites[fila, np.maximum(etapa - 1, 0)], 0.0)
+            duracion = limites[fila, etapa] - desde
+            f = np.clip((tau - desde) / duracion, 0, 1)[:, None]
+            p = p0[etapa] + (p1[etapa] - p0[etapa]) * f
+            x[:, c], y[:, c] = p[:, 0], p[:, 1]
+            v[:, c] = distancia[etapa] / duracion * 3.6
+            cargado[:, c] = etapa >= 4
+        x += rng.normal(0, 1.5, x.shape)
+        y += rng.normal(0, 1.5, y.shape)
+        v = np.where(v > 0.5, np.maximum(v + rng.normal(0, 0.8, v.shape), 0), np.abs(rng.normal(0, 0.3, v.shape)))
+        lon, lat = _utm_a_lonlat(x.ravel(), y.ravel())
+        bloque = pd.DataFrame({
+            'timestamp': np.repeat(inicio_registro + pd.to_timedelta(t, unit='s'), n_camiones),
+            'truck_id': np.tile(ids, len(t)), 'latitude': np.round(lat, 7), 'longitude': np.round(lon, 7),
+            'speed_kmh': v.ravel().round(1), 'loaded': cargado.ravel(),
+        })
+        sobrante = k1 * n_camiones - n
+        yield bloque.iloc[:len(bloque) - sobrante] if sobrante > 0 else bloque
+
+
+def geocercas(n, radio_pala_m=40.0, radio_destino_m=60.0, vertices=32):
+    """GeoJSON de palas y destinos de la mina que usa gps(n) (círculos en lon/lat)."""
+    n_camiones = int(np.clip(math.ceil(n / PINGS_POR_CAMION_DIA), 1, MAX_CAMIONES))
+    palas, destinos, _ = _disposicion_mina(max(1, min(6, n_camiones // 8 + 1)))
+    angulo = np.linspace(0, 2 * np.pi, vertices + 1)
+
+    def circulo(centro, radio):
+        lon, lat = _utm_a_lonlat(centro[0] + radio * np.cos(angulo), centro[1] + radio * np.sin(angulo))
+        return {'type': 'Polygon', 'coordinates': [np.column_stack([lon, lat]).round(7).tolist()]}
+
+    elementos = [{'type': 'Feature', 'properties': {'nombre': f'Pala {nombre}', 'tipo': 'pala', 'equipo': nombre},
+                  'geometry': circulo(centro, radio_pala_m)} for nombre, centro in palas.items()]
+    elementos += [{'type': 'Feature', 'properties': {'nombre': nombre, 'tipo': nombre.lower(), 'equipo': None},
+                   'geometry': circulo(centro, radio_destino_m)} for nombre, centro in destinos.items()]
+    return {'type': 'FeatureCollection', 'features': elementos}
+
+
+def escribir_gps(destino, n, semilla=42):
+    os.makedirs(destino, exist_ok=True)
+    rutas = {'gps': os.path.join(destino, 'truck_gps_data.csv'), 'geocercas': os.path.join(destino, 'geocercas.geojson')}
+    escribir_csv(rutas['gps'], gps(n, semilla))
+    with open(rutas['geocercas'], 'w', encoding='utf-8') as f:
+        json.dump(geocercas(n), f, ensure_ascii=False)
+    return rutas
+
+# --- 6. DIA05: LEYES POR TURNO ---
+
+def leyes_turno(n, semilla=42, horas_por_turno=12):
+    """Bloques del CSV de metallurgical_balance.py --lote, con ~0,5% de filas imposibles (muestras cruzadas)."""
+    for b, inicio, fin in _bloques_de(n, FILAS_POR_BLOQUE):
+        rng = np.random.default_rng([semilla, b])
+        m = fin - inicio
+        periodo = pd.Timestamp('2024-01-01 08:00') + pd.to_timedelta(np.arange(inicio, fin) * horas_por_turno, unit='h')
+        feed = rng.normal(1.15, 0.08, m).round(3)
+        tail = np.abs(rng.normal(0.12, 0.02, m)).round(3)
+        cruzadas = rng.random(m) < 0.005
+        feed[cruzadas], tail[cruzadas] = tail[cruzadas], feed[cruzadas]
+        yield pd.DataFrame({'periodo': periodo.strftime('%Y-%m-%d %H:%M'), 'feed_grade': feed,
+                            'conc_grade': rng.normal(28.5, 1.2, m).round(2), 'tail_grade': tail,
+                            'feed_tonnes': rng.normal(60_000, 4_000, m).round(0)})
+
+
+def escribir_leyes_turno(destino, n, semilla=42):
+    os.makedirs(destino, exist_ok=True)
+    ruta = os.path.join(destino, 'leyes_turno.csv')
+    escribir_csv(ruta, leyes_turno(n, semilla))
+    return {'leyes_turno': ruta}
+
+
+ESCRITORES = {
+    'sondajes': escribir_sondajes,
+    'stockpiles': escribir_stockpiles,
+    'fms': escribir_fms,
+    'gps': escribir_gps,
+    'leyes_turno': escribir_leyes_turno,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el esquema de entrada de cada día.")
+    parser.add_argument('esquema', choices=sorted(ESCRITORES))
+    parser.add_argument('filas', type=float, help="Número de filas (acepta notación 1e6).")
+    parser.add_argument('--destino', required=True, help="Carpeta donde se escriben los archivos.")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    rutas = ESCRITORES[args.esquema](args.destino, int(args.filas), args.semilla)
+    print(f"{args.esquema}: {int(args.filas):,} filas en {time.perf_counter() - inicio:.1f} s")
+    for ruta in rutas.values():
+        print(f"  {ruta} ({os.path.getsize(ruta) / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
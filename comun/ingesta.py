@@ -0,0 +1,237 @@
+# Capa de ingesta tipada y columnar para los registros de FMS, Perforación y GPS (Día 03 y Día 04).
+#
+# Cada registro tiene un esquema declarado: 'timestamp' se convierte a datetime64, los IDs de equipos se guardan
+# como categóricas y las magnitudes como float32 donde la precisión alcanza (latitud/longitud siguen en float64:
+# en float32 se pierde ~1 m). Los CSV se convierten UNA vez a un dataset Parquet particionado por fecha;
+# las lecturas siguientes piden solo las columnas y fechas necesarias (poda de particiones y de row groups).
+# Si pyarrow no está instalado, o el registro aún no se convirtió, se lee el CSV con el mismo esquema.
+# Junto al dataset se guarda el tamaño y la fecha de modificación del CSV convertido: si el CSV cambió después
+# (se le agregaron filas), el dataset quedó desactualizado y se lee el CSV, con una advertencia.
+#
+# Uso:
+#   python -m comun.ingesta "Dia03 - Integrador de datos para automatizar reportes/data"
+#   python -m comun.ingesta "Dia04 - Análisis de Cuellos de Botella en Rutas de Acarreo/data" --registros gps
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    pa_csv = None
+    ds = None
+
+# Registro -> archivo CSV de origen y tipos por columna. Las columnas marcadas como opcionales pueden no existir.
+ESQUEMAS = {
+    'fms': {
+        'archivo': 'fms_data.csv',
+        'columnas': {'timestamp': 'datetime64[ns]', 'truck_id': 'category', 'shovel_id': 'category',
+                     'payload_tons': 'float32', 'destination': 'category'},
+        'opcionales': {'sitio': 'category'},
+    },
+    'perforacion': {
+        'archivo': 'drill_data.csv',
+        'columnas': {'timestamp': 'datetime64[ns]', 'drill_id': 'category', 'hole_id': 'str',
+                     'depth_meters': 'float32'},
+        'opcionales': {'sitio': 'category'},
+    },
+    'gps': {
+        'archivo': 'truck_gps_data.csv',
+        'columnas': {'timestamp': 'datetime64[ns]', 'truck_id': 'category', 'latitude': 'float64',
+                     'longitude': 'float64', 'speed_kmh': 'float32'},
+        # loaded: estado de carga informado por el equipo (True cargado / False vacío), si el FMS lo entrega
+        'opcionales': {'sitio': 'category', 'loaded': 'bool'},
+    },
+}
+FORMATO_TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+PARQUET_DIRNAME = 'parquet'
+# Huella del CSV de origen dentro del dataset (el prefijo '_' hace que Arrow no lo lea como dato)
+ARCHIVO_ORIGEN = '_origen.json'
+COLUMNA_PARTICION = 'fecha'
+# Bytes por bloque al leer/convertir el CSV (acota la memoria) y filas por row group en cada archivo Parquet
+TAMANO_BLOQUE = 64 * 1024 * 1024
+FILAS_POR_ROW_GROUP = 250_000
+
+# --- 1. ESQUEMAS Y LECTURA TIPADA DEL CSV ---
+
+def _tipos(nombre):
+    esquema = ESQUEMAS[nombre]
+    return {**esquema['columnas'], **esquema['opcionales']}
+
+
+def _tipo_arrow(tipo):
+    if tipo.startswith('datetime'):
+        return pa.timestamp('ns')
+    return {'category': pa.dictionary(pa.int32(), pa.string()), 'str': pa.string(),
+            'float32': pa.float32(), 'float64': pa.float64(), 'bool': pa.bool_()}[tipo]
+
+
+def aplicar_esquema(df, nombre):
+    """Convierte un DataFrame ya leído (p. ej. la cola de un CSV) a los tipos declarados del registro."""
+    tipos = _tipos(nombre)
+    for columna, tipo in tipos.items():
+        if columna not in df.columns:
+            continue
+        if tipo.startswith('datetime') and not pd.api.types.is_datetime64_any_dtype(df[columna]):
+            df[columna] = pd.to_datetime(df[columna], format=FORMATO_TIMESTAMP)
+        df[columna] = df[columna].astype(tipo)
+        # Categorías en orden alfabético (Arrow las deja en orden de aparición): los groupby y tablas del
+        # reporte salen en el mismo orden que con columnas de texto, sin importar de dónde se leyó el registro
+        if tipo == 'category' and not df[columna].cat.categories.is_monotonic_increasing:
+            df[columna] = df[columna].cat.reorder_categories(df[columna].cat.categories.sort_values())
+    return df
+
+
+def _columnas_presentes(ruta, tipos, columnas):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        cabecera = [c.strip() for c in f.readline().split(',')]
+    pedidas = set(columnas) if columnas else set(tipos)
+    return [c for c in cabecera if c in pedidas and c in tipos]
+
+
+def leer_csv(ruta, nombre, columnas=None, por_bloques=False, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Lee el CSV de un registro con su esquema. Con 'por_bloques' devuelve un iterador de DataFrames tipados.
+    Las columnas opcionales se incluyen solo si existen en el archivo.
+    Con pyarrow, el lector CSV de Arrow convierte timestamps y categóricas en C++ (varias veces más rápido
+    que pd.to_datetime sobre texto); sin pyarrow se usa pandas con los mismos tipos.
+    """
+    tipos = _tipos(nombre)
+    presentes = _columnas_presentes(ruta, tipos, columnas)
+    if pa_csv is not None:
+        opciones = dict(read_options=pa_csv.ReadOptions(block_size=tamano_bloque),
+                        convert_options=pa_csv.ConvertOptions(
+                            include_columns=presentes, column_types={c: _tipo_arrow(tipos[c]) for c in presentes}))
+        if not por_bloques:
+            return aplicar_esquema(pa_csv.read_csv(ruta, **opciones).to_pandas(), nombre)
+        lector = pa_csv.open_csv(ruta, **opciones)
+        return (aplicar_esquema(lote.to_pandas(), nombre) for lote in lector)
+
+    tipos_texto = {c: t for c, t in tipos.items() if c in presentes and not t.startswith('datetime')}
+    lector = pd.read_csv(ruta, usecols=lambda c: c.strip() in presentes, dtype=tipos_texto, skipinitialspace=True,
+                         chunksize=1_000_000 if por_bloques else None)
+    if not por_bloques:
+        return aplicar_esquema(lector, nombre)
+    return (aplicar_esquema(bloque, nombre) for bloque in lector)
+
+# --- 2. CONVERSIÓN A PARQUET PARTICIONADO POR FECHA ---
+
+def ruta_parquet(data_path, nombre):
+    return os.path.join(data_path, PARQUET_DIRNAME, nombre)
+
+
+def _huella_csv(ruta_csv):
+    estado = os.stat(ruta_csv)
+    return {'archivo': os.path.basename(ruta_csv), 'tamano': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def parquet_vigente(data_path, nombre):
+    """True si el dataset Parquet del registro corresponde al CSV actual (mismo tamaño y fecha de modificación)."""
+    ruta_csv = os.path.join(data_path, ESQUEMAS[nombre]['archivo'])
+    ruta_origen = os.path.join(ruta_parquet(data_path, nombre), ARCHIVO_ORIGEN)
+    if not os.path.exists(ruta_csv):
+        # Sin CSV (p. ej. archivado tras convertir) el dataset es la única fuente
+        return True
+    if not os.path.exists(ruta_origen):
+        return False
+    with open(ruta_origen, 'r', encoding='utf-8') as f:
+        return json.load(f) == _huella_csv(ruta_csv)
+
+
+def convertir_a_parquet(data_path, nombre, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Reescribe el CSV del registro como dataset Parquet: data/parquet/<registro>/fecha=AAAA-MM-DD/*.parquet.
+    Se lee por bloques; dentro de cada bloque las filas se ordenan por timestamp, así las estadísticas min/max
+    de cada row group permiten saltar los que quedan fuera del rango pedido. Devuelve el número de filas.
+    """
+    if pa is None:
+        raise ImportError("La conversión a Parquet requiere pyarrow (pip install pyarrow).")
+    destino = ruta_parquet(data_path, nombre)
+    # Conversión completa: se parte de un directorio vacío para no duplicar filas de una conversión anterior
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    filas = 0
+    ruta_csv = os.path.join(data_path, ESQUEMAS[nombre]['archivo'])
+    # Huella tomada antes de leer: si el CSV crece durante la conversión, el dataset ya queda desactualizado
+    huella = _huella_csv(ruta_csv)
+    for i, bloque in enumerate(leer_csv(ruta_csv, nombre, por_bloques=True, tamano_bloque=tamano_bloque)):
+        bloque = bloque.sort_values('timestamp', kind='stable')
+        bloque[COLUMNA_PARTICION] = bloque['timestamp'].dt.strftime('%Y-%m-%d')
+        ds.write_dataset(
+            pa.Table.from_pandas(bloque, preserve_index=False), destino, format='parquet',
+            partitioning=ds.partitioning(pa.schema([(COLUMNA_PARTICION, pa.string())]), flavor='hive'),
+            basename_template=f'parte-{i:05d}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=FILAS_POR_ROW_GROUP, min_rows_per_group=min(FILAS_POR_ROW_GROUP, len(bloque)))
+        filas += len(bloque)
+    with open(os.path.join(destino, ARCHIVO_ORIGEN), 'w', encoding='utf-8') as f:
+        json.dump(huella, f)
+    return filas
+
+# --- 3. LECTURA CON PODA DE COLUMNAS Y FECHAS ---
+
+def leer_registro(data_path, nombre, columnas=None, desde=None, hasta=None):
+    """
+    Registro tipado, desde Parquet si ya se convirtió y sigue vigente (si no, desde el CSV).
+    desde/hasta: límites de 'timestamp' (hasta es exclusivo). Con Parquet se leen solo las particiones
+    y row groups que se cruzan con el rango, y solo las columnas pedidas.
+    """
+    desde = pd.Timestamp(desde) if desde is not None else None
+    hasta = pd.Timestamp(hasta) if hasta is not None else None
+    destino = ruta_parquet(data_path, nombre)
+    usar_parquet = ds is not None and os.path.isdir(destino)
+    if usar_parquet and not parquet_vigente(data_path, nombre):
+        print(f"Advertencia: '{destino}' no corresponde al CSV actual de {nombre} (cambió después de convertirlo). "
+              f"Se lee el CSV; vuelva a convertir con: python -m comun.ingesta \"{data_path}\"", file=sys.stderr)
+        usar_parquet = False
+    if usar_parquet:
+        dataset = ds.dataset(destino, format='parquet', partitioning=ds.partitioning(
+            pa.schema([(COLUMNA_PARTICION, pa.string())]), flavor='hive'))
+        filtro = None
+        if desde is not None:
+            filtro = ((ds.field(COLUMNA_PARTICION) >= desde.strftime('%Y-%m-%d')) &
+                      (ds.field('timestamp') >= pa.scalar(desde.to_datetime64())))
+        if hasta is not None:
+            filtro_hasta = ((ds.field(COLUMNA_PARTICION) <= hasta.strftime('%Y-%m-%d')) &
+                            (ds.field('timestamp') < pa.scalar(hasta.to_datetime64())))
+            filtro = filtro_hasta if filtro is None else filtro & filtro_hasta
+        disponibles = [c for c in dataset.schema.names if c != COLUMNA_PARTICION]
+        columnas = [c for c in columnas if c in disponibles] if columnas else disponibles
+        df = dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+    else:
+        if columnas and (desde is not None or hasta is not None) and 'timestamp' not in columnas:
+            columnas = list(columnas) + ['timestamp']
+        df = leer_csv(os.path.join(data_path, ESQUEMAS[nombre]['archivo']), nombre, columnas)
+        if desde is not None:
+            df = df[df['timestamp'] >= desde]
+        if hasta is not None:
+            df = df[df['timestamp'] < hasta]
+    # El mismo esquema en ambos caminos (Parquet devuelve los textos como object/str y los IDs como categóricas)
+    return aplicar_esquema(df.reset_index(drop=True), nombre)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte los CSV de registros a Parquet particionado por fecha.")
+    parser.add_argument('data_path', help="Carpeta 'data' que contiene los CSV.")
+    parser.add_argument('--registros', nargs='+', choices=list(ESQUEMAS), default=None,
+                        help="Registros a convertir (por defecto, todos los que tengan CSV en la carpeta).")
+    args = parser.parse_args()
+    registros = args.registros or [n for n, e in ESQUEMAS.items()
+                                   if os.path.exists(os.path.join(args.data_path, e['archivo']))]
+    for nombre in registros:
+        inicio = time.perf_counter()
+        filas = convertir_a_parquet(args.data_path, nombre)
+        print(f"{nombre}: {filas:,} filas -> {ruta_parquet(args.data_path, nombre)} "
+              f"({time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# Instrumentación por etapas, compartida por los scripts de todos los días: tiempo de reloj, CPU, pico de RSS y filas.
+#
+# Cada script marca sus etapas con
+#     with etapa("Carga de datos") as e:
+#         df = cargar_datos()
+#         e.filas = len(df)
+# Sin configurar (lo normal), etapa() devuelve siempre el mismo objeto vacío: el costo es una llamada y un 'if'.
+# Con --traza (o la variable de entorno MINERIA_TRAZA) cada etapa escribe un registro al terminar, como JSON lines
+# (.jsonl) o como Chrome trace (.json, se abre en chrome://tracing o https://ui.perfetto.dev). Las etapas se anidan.
+# El pico de RSS se mide reiniciando el pico del proceso (VmHWM de Linux) al entrar en cada etapa; en otros sistemas
+# es el pico acumulado del proceso, y el delta solo aparece en la etapa que lo supera por primera vez.
+# --perfil cprofile guarda un .prof por etapa de primer nivel (pstats, snakeviz); --perfil muestreo toma la pila
+# del hilo principal cada pocos milisegundos y la guarda en formato "folded" (speedscope, flamegraph.pl), sin el
+# sobrecosto por llamada de cProfile.
+#
+# Uso:
+#   python main_report_generator.py --traza output/traza.jsonl
+#   python main_bottleneck_analysis.py --traza output/traza.json --perfil muestreo
+#   MINERIA_TRAZA=/tmp/noche.jsonl python Dia02.py
+#   python -m comun.instrumentacion /tmp/noche.jsonl             (resumen por etapa de una o varias trazas)
+
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+VARIABLE_TRAZA = 'MINERIA_TRAZA'
+VARIABLE_PERFIL = 'MINERIA_PERFIL'
+FORMATOS = ('jsonl', 'chrome')
+PERFILES = ('cprofile', 'muestreo')
+INTERVALO_MUESTREO_S = 0.005
+
+_config = None  # Configuración activa; None = instrumentación apagada
+
+# --- 1. MEMORIA DEL PROCESO ---
+
+def memoria_mb(campo='VmRSS'):
+    """VmRSS / VmHWM de /proc/self/status en MB; None si no existe (fuera de Linux)."""
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith(campo + ':'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reiniciar_pico():
+    """Reinicia VmHWM al RSS actual (Linux >= 4.0). Devuelve False si no se pudo."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def pico_mb():
+    """Pico de RSS desde el último reinicio (o desde que arrancó el proceso, fuera de Linux)."""
+    pico = memoria_mb('VmHWM')
+    if pico is not None:
+        return pico
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1024 * 1024) if sys.platform == 'darwin' else maximo / 1024
+
+# --- 2. PERFILADORES POR ETAPA ---
+
+class _Muestreador(threading.Thread):
+    """Cuenta las pilas del hilo principal cada 'intervalo' segundos (perfilador estadístico)."""
+
+    def __init__(self, hilo, intervalo=INTERVALO_MUESTREO_S):
+        super().__init__(daemon=True)
+        self.hilo = hilo
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pila:
+                self.pilas[';'.join(reversed(pila))] += 1
+
+    def detener(self, ruta):
+        self._parar.set()
+        self.join()
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for pila, n in self.pilas.most_common():
+                f.write(f"{pila} {n}\n")
+
+
+def _iniciar_perfil(tipo):
+    if tipo == 'cprofile':
+        perfil = cProfile.Profile()
+        perfil.enable()
+        return perfil
+    perfil = _Muestreador(threading.get_ident())
+    perfil.start()
+    return perfil
+
+
+def _detener_perfil(perfil, ruta):
+    if isinstance(perfil, cProfile.Profile):
+        perfil.disable()
+        perfil.dump_stats(ruta)
+    else:
+        perfil.detener(ruta)
+
+# --- 3. ETAPAS ---
+
+class _EtapaNula:
+    """Lo que devuelve etapa() con la instrumentación apagada: no mide nada."""
+    filas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        return False
+
+
+_NULA = _EtapaNula()
+
+
+class Etapa:
+    """Una etapa medida. 'filas' se puede fijar al crearla o dentro del bloque (e.filas = len(df))."""
+
+    def __init__(self, config, nombre, filas=None, datos=None):
+        self.config = config
+        self.nombre = nombre
+        self.filas = filas
+        self.datos = datos or {}
+
+    def __enter__(self):
+        pila = self.config.pila
+        # Reiniciar el pico borra el de las etapas que contienen a esta: se les traspasa antes
+        pico = pico_mb()
+        for e in pila:
+            e.pico = max(e.pico, pico)
+        reiniciar_pico()
+        self.rss_inicial = memoria_mb('VmRSS') or pico_mb()
+        self.pico = self.rss_inicial
+        self.perfil = _iniciar_perfil(self.config.perfil) if self.config.perfil and not pila else None
+        pila.append(self)
+        self.inicio = time.time()
+        self.t0, self.c0 = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        segundos = time.perf_counter() - self.t0
+        cpu_s = time.process_time() - self.c0
+        pila = self.config.pila
+        pila.pop()
+        self.pico = max(self.pico, pico_mb())
+        if pila:
+            pila[-1].pico = max(pila[-1].pico, self.pico)
+        registro = {
+            'script': self.config.script, 'etapa': self.nombre,
+            'ruta': '/'.join([e.nombre for e in pila] + [self.nombre]), 'nivel': len(pila),
+            'inicio': datetime.fromtimestamp(self.inicio).isoformat(timespec='milliseconds'),
+            'segundos': round(segundos, 6), 'cpu_s': round(cpu_s, 6),
+            'rss_inicial_mb': round(self.rss_inicial, 1), 'pico_rss_mb': round(self.pico, 1),
+            'delta_pico_mb': round(self.pico - self.rss_inicial, 1),
+            'filas': self.filas,
+            'filas_por_s': round(self.filas / segundos) if self.filas and segundos > 0 else None,
+            'pid': os.getpid(), **self.datos,
+        }
+        if tipo is not None:
+            registro['error'] = tipo.__name__
+        if self.perfil is not None:
+            registro['perfil'] = self.config.ruta_perfil(self.nombre)
+            _detener_perfil(self.perfil, registro['perfil'])
+        self.config.escribir(registro, self.t0, segundos)
+        return False
+
+
+class _Configuracion:
+    def __init__(self, destino, formato, perfil, script):
+        self.destino = destino
+        self.formato = formato or ('chrome' if destino and destino.endswith('.json') else 'jsonl')
+        self.perfil = perfil
+        self.script = script
+        self.registros = []
+        self.pila = []
+        self.origen = time.perf_counter()
+        self.perfiles = 0
+        self.archivo = None
+        if destino:
+            os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+            # JSON lines se agrega (varias corridas en el mismo archivo); el Chrome trace es uno por corrida
+            self.archivo = open(destino, 'a' if self.formato == 'jsonl' else 'w', encoding='utf-8')
+            if self.formato == 'chrome':
+                # Sin el ']' final el archivo sigue siendo válido para Chrome/Perfetto si el proceso muere
+                self.archivo.write('[' + json.dumps({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                                     'args': {'name': script}}))
+                self.archivo.flush()
+        atexit.register(self.cerrar)
+
+    def ruta_perfil(self, nombre):
+        self.perfiles += 1
+        carpeta = os.path.dirname(os.path.abspath(self.destino)) if self.destino else os.getcwd()
+        base = re.sub(r'\W+', '_', f"{os.path.splitext(self.script)[0]}_{self.perfiles:02d}_{nombre}").strip('_')
+        return os.path.join(carpeta, base + ('.prof' if self.perfil == 'cprofile' else '.folded'))
+
+    def escribir(self, registro, t0, segundos):
+        self.registros.append(registro)
+        if self.archivo is None:
+            return
+        if self.formato == 'jsonl':
+            self.archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        else:
+            evento = {'name': registro['etapa'], 'cat': self.script, 'ph': 'X', 'pid': registro['pid'],
+                      'tid': threading.get_ident(), 'ts': round((t0 - self.origen) * 1e6),
+                      'dur': round(segundos * 1e6), 'args': registro}
+            self.archivo.write(',\n' + json.dumps(evento, ensure_ascii=False))
+        self.archivo.flush()
+
+    def cerrar(self):
+        if self.archivo is not None and not self.archivo.closed:
+            if self.formato == 'chrome':
+                self.archivo.write(']\n')
+            self.archivo.close()
+
+
+def etapa(nombre, filas=None, **datos):
+    """Context manager que mide un bloque; 'datos' se agrega tal cual al registro (p. ej. modo='raster')."""
+    if _config is None:
+        return _NULA
+    return Etapa(_config, nombre, filas, datos)
+
+# --- 4. CONFIGURACIÓN ---
+
+def configurar(destino=None, formato=None, perfil=None, script=None):
+    """
+    Activa la instrumentación. Sin 'destino' los registros quedan solo en memoria (ver registros()).
+    formato: 'jsonl' o 'chrome' (por defecto, 'chrome' si el destino termina en .json).
+    perfil: None, 'cprofile' o 'muestreo' (uno por etapa de primer nivel, junto al destino).
+    """
+    global _config
+    desactivar()
+    _config = _Configuracion(destino, formato, perfil, script or os.path.basename(sys.argv[0]) or 'python')
+
+
+def desactivar():
+    global _config
+    if _config is not None:
+        _config.cerrar()
+    _config = None
+
+
+def activa():
+    return _config is not None
+
+
+def registros():
+    """Registros de las etapas terminadas en este proceso (lista vacía si la instrumentación está apagada)."""
+    return list(_config.registros) if _config is not None else []
+
+
+def agregar_argumentos(parser):
+    """--traza, --formato-traza y --perfil, con valores por defecto tomados del entorno (para corridas nocturnas)."""
+    grupo = parser.add_argument_group('instrumentación')
+    grupo.add_argument('--traza', default=os.environ.get(VARIABLE_TRAZA) or None,
+                       help=f"Archivo de tiempos y memoria por etapa (.jsonl o .json de Chrome trace). "
+                            f"También: variable {VARIABLE_TRAZA}.")
+    grupo.add_argument('--formato-traza', choices=FORMATOS, default=None,
+                       help="Formato de --traza (por defecto según la extensión).")
+    grupo.add_argument('--perfil', choices=PERFILES, default=os.environ.get(VARIABLE_PERFIL) or None,
+                       help=f"Perfilar cada etapa de primer nivel. También: variable {VARIABLE_PERFIL}.")
+    return parser
+
+
+def configurar_desde_argumentos(args, en_memoria=False):
+    """Activa la instrumentación si se pidió una traza o un perfil (o si 'en_memoria', p. ej. para --tiempos)."""
+    if args.traza or args.perfil or en_memoria:
+        configurar(args.traza, args.formato_traza, args.perfil)
+
+# --- 5. RESUMEN DE TRAZAS ---
+
+def leer_traza(ruta):
+    """Registros de un archivo JSON lines o Chrome trace (también incompleto, sin el ']' final)."""
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read().strip()
+    if texto.startswith('['):
+        texto = texto if texto.endswith(']') else texto + ']'
+        return [e['args'] for e in json.loads(texto) if e.get('ph') == 'X']
+    return [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+
+
+def resumen(registros):
+    """Filas (script, ruta, corridas, segundos totales, pico máximo, filas) ordenadas por tiempo."""
+    tabla = {}
+    for r in registros:
+        fila = tabla.setdefault((r['script'], r['ruta']), {'corridas': 0, 'segundos': 0.0, 'cpu_s': 0.0,
+                                                           'pico_rss_mb': 0.0, 'filas': 0})
+        fila['corridas'] += 1
+        fila['segundos'] += r['segundos']
+        fila['cpu_s'] += r['cpu_s']
+        fila['pico_rss_mb'] = max(fila['pico_rss_mb'], r['pico_rss_mb'])
+        fila['filas'] += r.get('filas') or 0
+    return sorted(((s, ruta, f) for (s, ruta), f in tabla.items()), key=lambda x: -x[2]['segundos'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen por etapa de una o varias trazas de instrumentación.")
+    parser.add_argument('trazas', nargs='+', help="Archivos .jsonl o .json (Chrome trace).")
+    args = parser.parse_args()
+    registros_trazas = [r for ruta in args.trazas for r in leer_traza(ruta)]
+    print(f"{'script':<28} {'etapa':<44} {'n':>4} {'segundos':>10} {'cpu_s':>10} {'pico MB':>9} {'filas':>12}")
+    for script, ruta, f in resumen(registros_trazas):
+        print(f"{script:<28} {ruta:<44} {f['corridas']:>4} {f['segundos']:>10.3f} {f['cpu_s']:>10.3f} "
+              f"{f['pico_rss_mb']:>9.0f} {f['filas']:>12,}")
+
+
+if __name__ == "__main__":
+    main()